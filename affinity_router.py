@@ -0,0 +1,351 @@
+"""
+Affinity Router
+Front router for several API workers that sends every request of a user to
+the same worker, so that worker's in-memory ConversationMemory stays the
+authoritative, warm copy of the user's running context instead of each turn
+round-tripping to a shared state backend
+Users are placed on a consistent-hash ring with virtual nodes: a worker
+joining or leaving only moves the users it takes over or held (about 1/N of
+them). When a user's owner changes, the router hands the user off before
+forwarding: the previous owner drops its copy (turns and preferences are
+written through to SQLite) and the new owner drops any stale one, then
+rereads the user from the database.
+The router only remembers the owner of its most recently seen users; a user
+it forgot (or every user, after a router restart) moves without a handoff.
+Usage: python affinity_router.py --workers http://127.0.0.1:8001,http://127.0.0.1:8002 [--port 8000]
+       (or AFFINITY_WORKERS=... uvicorn affinity_router:app --port 8000)
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Virtual nodes per worker: enough for an even spread of users
+DEFAULT_REPLICAS = 160
+# Users whose owner is remembered for handoffs (least recently seen forgotten first)
+MAX_TRACKED_USERS = 100_000
+FORWARD_TIMEOUT = 30.0
+HANDOFF_PATH = "/admin/handoff/{user_id}"
+# Paths carrying the user id as their next segment, and chat paths with a JSON body
+USER_PATH_PREFIXES = ("/memory/",)
+CHAT_PATHS = ("/chat", "/chatbot")
+# ChatMessage.user_id default of the API
+DEFAULT_USER_ID = "anonymous"
+# Headers of one connection, not forwarded (the body is re-framed with its length)
+HOP_BY_HOP_HEADERS = {b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization", b"te",
+                      b"trailers", b"transfer-encoding", b"upgrade", b"host", b"content-length"}
+
+Response = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+
+def ring_hash(key: str) -> int:
+    """Position on the ring: 64 bits of BLAKE2b (stable across processes, unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring of worker URLs, replicas virtual nodes per worker
+    A key belongs to the first virtual node at or after its position, so a
+    worker added or removed only changes the owner of keys next to its own
+    virtual nodes.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = DEFAULT_REPLICAS):
+        self.replicas = replicas
+        self.nodes: List[str] = []
+        self._positions: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def _rebuild(self):
+        points = sorted((ring_hash(f"{node}#{replica}"), node)
+                        for node in self.nodes for replica in range(self.replicas))
+        self._positions = [position for position, _ in points]
+        self._owners = [node for _, node in points]
+
+    def add(self, node: str) -> bool:
+        if node in self.nodes:
+            return False
+        self.nodes.append(node)
+        self._rebuild()
+        return True
+
+    def remove(self, node: str) -> bool:
+        if node not in self.nodes:
+            return False
+        self.nodes.remove(node)
+        self._rebuild()
+        return True
+
+    def node_for(self, key: str) -> Optional[str]:
+        """Owner of key, None on an empty ring"""
+        if not self._positions:
+            return None
+        index = bisect.bisect_left(self._positions, ring_hash(key))
+        return self._owners[index % len(self._owners)]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self.nodes
+
+
+class WorkerUnavailable(ConnectionError):
+    """The worker refused or timed out the connection: the request was not sent"""
+
+
+async def read_response(reader: asyncio.StreamReader, method: str) -> Response:
+    """Status, end-to-end headers and body of an HTTP/1.1 response"""
+    status = int((await reader.readline()).split()[1])
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        headers.append((name.strip().lower(), value.strip()))
+    fields = dict(headers)
+
+    if method == "HEAD" or status in (204, 304) or status < 200:
+        body = b""
+    elif fields.get(b"transfer-encoding", b"").lower() == b"chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif b"content-length" in fields:
+        body = await reader.readexactly(int(fields[b"content-length"]))
+    else:
+        body = await reader.read()  # delimited by the end of the connection
+    return status, [(name, value) for name, value in headers if name not in HOP_BY_HOP_HEADERS], body
+
+
+async def forward(worker: str, method: str, target: bytes, headers: Iterable[Tuple[bytes, bytes]],
+                  body: bytes, timeout: float = FORWARD_TIMEOUT) -> Response:
+    """Send one request to worker over a new connection and read the whole response"""
+    address = urlsplit(worker)
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(address.hostname, address.port or 80), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise WorkerUnavailable(f"{worker}: {e!r}") from e
+
+    try:
+        head = [f"{method} ".encode("latin-1") + target + b" HTTP/1.1",
+                b"host: " + address.netloc.encode("latin-1"),
+                b"content-length: " + str(len(body)).encode(),
+                b"connection: close"]
+        head.extend(name + b": " + value for name, value in headers if name.lower() not in HOP_BY_HOP_HEADERS)
+        writer.write(b"\r\n".join(head) + b"\r\n\r\n" + body)
+        await writer.drain()
+        return await asyncio.wait_for(read_response(reader, method), timeout)
+    finally:
+        writer.close()
+
+
+def extract_user_id(path: str, query_string: bytes, body: bytes) -> Optional[str]:
+    """User a request belongs to: /memory/{user_id}, ?user_id=, or the user_id of a chat body"""
+    for prefix in USER_PATH_PREFIXES:
+        if path.startswith(prefix):
+            return path[len(prefix):].split("/")[0] or None
+
+    query = parse_qs(query_string.decode("latin-1"))
+    if "user_id" in query:
+        return query["user_id"][0]
+
+    if path in CHAT_PATHS:
+        try:
+            user_id = json.loads(body).get("user_id")
+        except (ValueError, AttributeError):
+            return None
+        return user_id if isinstance(user_id, str) else DEFAULT_USER_ID
+    return None
+
+
+def json_response(status: int, content: Any) -> Response:
+    return status, [(b"content-type", b"application/json")], json.dumps(content).encode("utf-8")
+
+
+class AffinityRouter:
+    """
+    ASGI app forwarding each request to the ring owner of its user
+    Requests without a user (catalog, stats...) are spread round-robin.
+    A worker refusing connections leaves the ring and the request goes to
+    the next owner; timeouts and errors after the request was sent are
+    reported (502), never retried, since /chat is not idempotent.
+    Membership is managed under /router: GET the state, POST or DELETE
+    /router/workers with {"url": ...}.
+    """
+
+    def __init__(self, workers: Iterable[str] = (), replicas: int = DEFAULT_REPLICAS,
+                 max_tracked_users: int = MAX_TRACKED_USERS, timeout: float = FORWARD_TIMEOUT):
+        self.ring = HashRing((worker.rstrip("/") for worker in workers), replicas)
+        self.max_tracked_users = max_tracked_users
+        self.timeout = timeout
+        # Worker that served each recently seen user, least recently seen first
+        self.owners: "OrderedDict[str, str]" = OrderedDict()
+        self._handoffs: Dict[str, asyncio.Future] = {}
+        self._next_worker = 0
+        self.stats = {"forwarded": 0, "handoffs": 0, "handoff_errors": 0, "failovers": 0, "errors": 0}
+
+    def add_worker(self, url: str) -> bool:
+        added = self.ring.add(url.rstrip("/"))
+        if added:
+            logger.info(f"Worker {url} joined ({len(self.ring)} workers)")
+        return added
+
+    def remove_worker(self, url: str) -> bool:
+        removed = self.ring.remove(url.rstrip("/"))
+        if removed:
+            logger.info(f"Worker {url} left ({len(self.ring)} workers)")
+        return removed
+
+    def route(self, user_id: Optional[str]) -> Optional[str]:
+        if user_id is not None:
+            return self.ring.node_for(user_id)
+        if not self.ring.nodes:
+            return None
+        self._next_worker = (self._next_worker + 1) % len(self.ring.nodes)
+        return self.ring.nodes[self._next_worker]
+
+    async def hand_off(self, user_id: str, owner: str):
+        """Before a user's first request to a new owner, release it on the previous and new owners"""
+        pending = self._handoffs.get(user_id)
+        if pending is not None:
+            # Requests arriving during a handoff wait for it
+            await asyncio.shield(pending)
+            return
+
+        previous = self.owners.pop(user_id, None)
+        self.owners[user_id] = owner
+        if len(self.owners) > self.max_tracked_users:
+            self.owners.popitem(last=False)
+        if previous is None or previous == owner:
+            return
+
+        task = self._handoffs[user_id] = asyncio.ensure_future(self._release(user_id, (previous, owner)))
+        task.add_done_callback(lambda _: self._handoffs.pop(user_id, None))
+        await asyncio.shield(task)
+
+    async def _release(self, user_id: str, workers: Tuple[str, str]):
+        self.stats["handoffs"] += 1
+        target = HANDOFF_PATH.format(user_id=user_id).encode("utf-8")
+        for worker in workers:
+            try:
+                status, _, body = await forward(worker, "POST", target, (), b"", self.timeout)
+                if status != 200:
+                    raise RuntimeError(f"status {status}: {body[:200]!r}")
+            except Exception as e:
+                # A previous owner that is gone holds nothing to flush
+                self.stats["handoff_errors"] += 1
+                logger.warning(f"Handoff of {user_id} on {worker} failed: {e}")
+
+    async def dispatch(self, user_id: Optional[str], method: str, target: bytes,
+                       headers: List[Tuple[bytes, bytes]], body: bytes) -> Response:
+        while True:
+            worker = self.route(user_id)
+            if worker is None:
+                return json_response(503, {"detail": "No worker available"})
+            if user_id is not None:
+                await self.hand_off(user_id, worker)
+            try:
+                response = await forward(worker, method, target, headers, body, self.timeout)
+                self.stats["forwarded"] += 1
+                return response
+            except WorkerUnavailable as e:
+                logger.error(f"Removing unreachable worker: {e}")
+                self.stats["failovers"] += 1
+                self.remove_worker(worker)
+            except Exception as e:
+                logger.error(f"Forwarding to {worker} failed: {e!r}")
+                self.stats["errors"] += 1
+                return json_response(502, {"detail": f"Worker error: {e!r}"})
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"workers": list(self.ring.nodes), "replicas": self.ring.replicas,
+                "tracked_users": len(self.owners), "handoffs_in_progress": len(self._handoffs), **self.stats}
+
+    def admin(self, method: str, path: str, body: bytes) -> Response:
+        if path == "/router" and method == "GET":
+            return json_response(200, self.get_status())
+        if path == "/router/workers" and method in ("POST", "DELETE"):
+            try:
+                url = json.loads(body)["url"]
+            except (ValueError, KeyError, TypeError):
+                return json_response(422, {"detail": 'Expected {"url": "http://host:port"}'})
+            changed = self.add_worker(url) if method == "POST" else self.remove_worker(url)
+            return json_response(200, {"changed": changed, "workers": list(self.ring.nodes)})
+        return json_response(404, {"detail": "Not Found"})
+
+    async def __call__(self, scope: Dict[str, Any], receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+
+        path, method = scope["path"], scope["method"]
+        if path == "/router" or path.startswith("/router/"):
+            status, headers, payload = self.admin(method, path, body)
+        else:
+            target = scope.get("raw_path") or path.encode("utf-8")
+            if scope.get("query_string"):
+                target += b"?" + scope["query_string"]
+            user_id = extract_user_id(path, scope.get("query_string", b""), body)
+            status, headers, payload = await self.dispatch(user_id, method, target, scope["headers"], body)
+
+        await send({"type": "http.response.start", "status": status,
+                    "headers": headers + [(b"content-length", str(len(payload)).encode())]})
+        await send({"type": "http.response.body", "body": payload})
+
+
+# Global router (AFFINITY_WORKERS: comma-separated worker URLs)
+app = AffinityRouter(worker for worker in os.environ.get("AFFINITY_WORKERS", "").split(",") if worker)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Route each user to the same API worker")
+    parser.add_argument("--workers", default=os.environ.get("AFFINITY_WORKERS", ""),
+                        help="comma-separated worker URLs, e.g. http://127.0.0.1:8001,http://127.0.0.1:8002")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--replicas", type=int, default=DEFAULT_REPLICAS, help="virtual nodes per worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    app = AffinityRouter((worker for worker in args.workers.split(",") if worker), replicas=args.replicas)
+    print(f"🔀 Affinity router on {args.host}:{args.port} -> {', '.join(app.ring.nodes) or 'no workers yet'}")
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="info")
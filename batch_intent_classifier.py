@@ -0,0 +1,334 @@
+"""
+Batch Intent Classification
+Offline scoring of large message corpora with sparse matrix products
+Usage: python batch_intent_classifier.py [db_path] [--workers N]
+"""
+
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Sequence, Tuple
+
+from intent_scorer import IntentScorer, IntentScore, intent_scorer, is_word_occurrence
+
+# Scoring rules of IntentScorer.score_intent
+WHOLE_WORD_BOOST = 1.2
+PRIORITY_INTENTS = ["off_topic", "personal_question"]
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over all keywords
+    Finds every (possibly overlapping) keyword occurrence in one scan
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[int, ...]] = [()]
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] += (pattern_id,)
+
+        # Breadth-first failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def find(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (pattern id, end offset) for every occurrence"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern_id in output[state]:
+                yield pattern_id, position + 1
+
+
+class SparseRows:
+    """Compressed sparse row matrix built one row at a time"""
+
+    __slots__ = ("indptr", "indices", "data", "columns")
+
+    def __init__(self, columns: int):
+        self.indptr = array("l", [0])
+        self.indices = array("l")
+        self.data = array("d")
+        self.columns = columns
+
+    def append_row(self, entries: List[Tuple[int, float]]):
+        """Add a row from (column, value) pairs sorted by column"""
+        for column, value in entries:
+            self.indices.append(column)
+            self.data.append(value)
+        self.indptr.append(len(self.indices))
+
+    @property
+    def rows(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+
+class BatchIntentClassifier:
+    """
+    Scores many messages at once with the online scorer's rules
+    Each message becomes a sparse row over (intent, keyword) columns, valued
+    1.0 for a substring match or 1.2 for a whole-word match. Multiplying by
+    the column weights and summing per intent in column order gives exactly
+    the online confidences.
+    """
+
+    def __init__(self, scorer: Optional[IntentScorer] = None):
+        self.scorer = scorer or intent_scorer
+        # The whole corpus is scored against one definitions snapshot
+        self.snapshot = self.scorer.snapshot
+        self.intents: List[str] = list(self.snapshot.intent_definitions)
+        self.thresholds = array("d", [
+            self.snapshot.intent_definitions[intent]["threshold"] for intent in self.intents
+        ])
+
+        # Intent-weight matrix: one column per (intent, keyword), intent-major
+        self.column_intent = array("l")
+        self.column_weight = array("d")
+        self.column_display: List[str] = []
+        term_ids: Dict[str, int] = {}
+        self.term_columns: List[List[int]] = []
+        # Short terms only count where they occur as words
+        self.term_bounded: List[bool] = []
+
+        for intent_index, intent in enumerate(self.intents):
+            for entry in self.snapshot.compiled_keywords[intent]:
+                term_id = term_ids.get(entry.keyword)
+                if term_id is None:
+                    term_id = term_ids[entry.keyword] = len(self.term_columns)
+                    self.term_columns.append([])
+                    self.term_bounded.append(entry.pattern is not None)
+                self.term_columns[term_id].append(len(self.column_weight))
+                self.column_intent.append(intent_index)
+                self.column_weight.append(entry.weight)
+                self.column_display.append(entry.display)
+
+        self.terms = list(term_ids)
+        self.automaton = KeywordAutomaton(self.terms)
+
+    def document_terms(self, normalized: Sequence[str]) -> SparseRows:
+        """Tokenize normalized messages into the sparse document-term matrix"""
+        matrix = SparseRows(len(self.column_weight))
+        terms = self.terms
+        for text in normalized:
+            matched: Dict[int, bool] = {}
+            length = len(text)
+            for term_id, end in self.automaton.find(text):
+                start = end - len(terms[term_id])
+                if self.term_bounded[term_id] and not is_word_occurrence(text, start, end):
+                    continue
+                whole = (start == 0 or text[start - 1] == " ") and (end == length or text[end] == " ")
+                matched[term_id] = matched.get(term_id, False) or whole
+
+            entries = []
+            for term_id, whole in matched.items():
+                value = WHOLE_WORD_BOOST if whole else 1.0
+                for column in self.term_columns[term_id]:
+                    entries.append((column, value))
+            entries.sort()
+            matrix.append_row(entries)
+        return matrix
+
+    def intent_totals(self, matrix: SparseRows) -> List[array]:
+        """Sparse product of the document-term matrix with the intent weights"""
+        indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+        column_intent, column_weight = self.column_intent, self.column_weight
+        intent_count = len(self.intents)
+
+        totals = []
+        for row in range(matrix.rows):
+            row_totals = array("d", bytes(8 * intent_count))
+            for j in range(indptr[row], indptr[row + 1]):
+                column = indices[j]
+                row_totals[column_intent[column]] += column_weight[column] * data[j]
+            totals.append(row_totals)
+        return totals
+
+    def confidences(self, messages: Sequence[str]) -> List[array]:
+        """Per-message confidence of every intent, in self.intents order"""
+        normalized = [self.scorer.normalize_message(message, self.snapshot) for message in messages]
+        return self._confidences(normalized, self.intent_totals(self.document_terms(normalized)))
+
+    def _confidences(self, normalized: Sequence[str], totals: List[array]) -> List[array]:
+        for text, row in zip(normalized, totals):
+            word_count = len(text.split())
+            divisor = max(word_count * 0.5, 1.0)
+            for i, total in enumerate(row):
+                row[i] = min(total / divisor, 1.0) if word_count > 0 else 0.0
+        return totals
+
+    def _matched_keywords(self, matrix: SparseRows, row: int, intent_index: int) -> List[str]:
+        return [
+            self.column_display[matrix.indices[j]]
+            for j in range(matrix.indptr[row], matrix.indptr[row + 1])
+            if self.column_intent[matrix.indices[j]] == intent_index
+        ]
+
+    def classify_chunk(self, messages: Sequence[str], top_k: int = 3) -> List[List[IntentScore]]:
+        """Same results as IntentScorer.detect_intents for every message"""
+        normalized = [self.scorer.normalize_message(message, self.snapshot) for message in messages]
+        matrix = self.document_terms(normalized)
+        confidences = self._confidences(normalized, self.intent_totals(matrix))
+        index_of = {intent: i for i, intent in enumerate(self.intents)}
+
+        results = []
+        for row, (message, text, scores) in enumerate(zip(messages, normalized, confidences)):
+            if not message or not message.strip():
+                results.append([])
+                continue
+
+            context_data = self.scorer.extract_context_data(text, self.snapshot)
+
+            def build(intent_index: int) -> IntentScore:
+                return IntentScore(
+                    intent=self.intents[intent_index],
+                    confidence=scores[intent_index],
+                    matched_keywords=self._matched_keywords(matrix, row, intent_index),
+                    context_data=dict(context_data)
+                )
+
+            # Off-topic and personal questions override every other intent
+            priority = [
+                index_of[intent] for intent in PRIORITY_INTENTS
+                if intent in index_of and scores[index_of[intent]] >= self.thresholds[index_of[intent]]
+            ]
+            if priority:
+                results.append([build(priority[0])])
+                continue
+
+            candidates = [
+                i for i, intent in enumerate(self.intents)
+                if intent not in PRIORITY_INTENTS and scores[i] >= self.thresholds[i]
+            ]
+            candidates.sort(key=lambda i: scores[i], reverse=True)
+            results.append([build(i) for i in candidates[:top_k]])
+
+        return results
+
+    def classify(self, messages: Iterable[str], top_k: int = 3, chunk_size: int = 1000,
+                 workers: int = 0) -> Iterator[List[IntentScore]]:
+        """
+        Stream results for any iterable of messages, chunk by chunk
+        With workers > 0, chunks are scored in a process pool with at most
+        two chunks in flight per worker, so memory stays bounded
+        """
+        chunks = _chunked(messages, chunk_size)
+
+        if workers <= 0:
+            for chunk in chunks:
+                yield from self.classify_chunk(chunk, top_k)
+            return
+
+        document = self.snapshot.to_document()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(document,)) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_classify_in_worker, chunk, top_k))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "intents": len(self.intents),
+            "terms": len(self.terms),
+            "columns": len(self.column_weight),
+            "automaton_states": len(self.automaton.goto)
+        }
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_worker_classifier: Optional[BatchIntentClassifier] = None
+
+
+def _init_worker(document: Dict[str, Any]):
+    """Build a classifier with the parent's intent definitions in each worker"""
+    global _worker_classifier
+    _worker_classifier = BatchIntentClassifier(IntentScorer(definitions=document))
+
+
+def _classify_in_worker(chunk: List[str], top_k: int) -> List[List[IntentScore]]:
+    return _worker_classifier.classify_chunk(chunk, top_k)
+
+
+if __name__ == "__main__":
+    from conversation_memory import ConversationMemory
+
+    args = sys.argv[1:]
+    workers = 0
+    if "--workers" in args:
+        position = args.index("--workers")
+        workers = int(args[position + 1])
+        del args[position:position + 2]
+    db_path = args[0] if args else "chatbot_memory.db"
+
+    memory = ConversationMemory(db_path=None)
+    memory.db_path = db_path
+    classifier = BatchIntentClassifier()
+
+    rows = memory.iter_logged_messages()
+    stored = deque()
+
+    def messages():
+        for _, message, intent in rows:
+            stored.append(intent)
+            yield message
+
+    start = time.perf_counter()
+    distribution: Dict[str, int] = {}
+    agreement = 0
+    for scores in classifier.classify(messages(), workers=workers):
+        intent = scores[0].intent if scores else "unknown"
+        distribution[intent] = distribution.get(intent, 0) + 1
+        agreement += intent == stored.popleft()
+    elapsed = time.perf_counter() - start
+
+    total = sum(distribution.values())
+    print(f"📊 Scored {total} messages in {elapsed:.2f} s ({total / max(elapsed, 1e-9):.0f} msg/s)")
+    if total:
+        print(f"   Agreement with stored intents: {agreement / total:.1%}")
+    for intent, count in sorted(distribution.items(), key=lambda item: -item[1]):
+        print(f"   {intent:<22} {count}")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark of the API process
+Starts fresh interpreters and measures, from process spawn, the time until
+the app module is imported, the first /chat request is answered and the
+background warm-up reports ready. Runs with an empty startup cache (first
+deployment) and a primed one (every later restart), and checks the time to
+first request against the target.
+Without FastAPI installed the child imports the chatbot core and answers
+through IntelligentChatbot.process_message instead (reported as "core").
+Usage: python benchmarks/bench_cold_start.py [--app main_intelligent] [--runs 7]
+       [--target-ms 300]
+"""
+
+import time
+
+CHILD_START = time.time()
+
+# Only what the measured child needs is imported up front
+import importlib
+import json
+import os
+import sys
+from typing import Dict, List, Any
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_MESSAGE = "Je cherche un cadeau pour ma fille de 8 ans"
+DEFAULT_TARGET_MS = 300.0
+
+
+def child(app_name: str):
+    """Runs in the measured process: import, first request, readiness"""
+    sys.path.insert(0, REPO_ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    timings: Dict[str, Any] = {}
+    try:
+        importlib.import_module("fastapi")
+        mode = "app"
+    except ImportError:
+        mode = "core"
+
+    if mode == "app":
+        import asyncio
+        from load_test import AsgiClient, Lifespan
+        app = importlib.import_module(app_name).app
+        timings["imported"] = time.time()
+
+        async def first_request():
+            async with Lifespan(app):
+                timings["started"] = time.time()
+                status, _ = await AsgiClient(app).request("POST", "/chat", {"message": FIRST_MESSAGE,
+                                                                            "user_id": "cold_start"})
+                timings["first_response"] = time.time()
+                assert status == 200, status
+                from readiness import readiness
+                readiness.wait(120)
+                timings["ready"] = time.time()
+        asyncio.run(first_request())
+    else:
+        from intelligent_chatbot import intelligent_chatbot
+        from conversation_memory import conversation_memory, DEFAULT_DB_PATH
+        timings["imported"] = time.time()
+        # What the app's startup hook does
+        conversation_memory.open_database(DEFAULT_DB_PATH)
+        timings["started"] = time.time()
+        intelligent_chatbot.process_message("cold_start", FIRST_MESSAGE)
+        timings["first_response"] = time.time()
+        from readiness import readiness
+        from text_search import product_text_index
+        from product_similarity import similarity_index
+        readiness.add_step("conversation_history", conversation_memory.load_recent_conversations)
+        readiness.add_step("product_text_index", product_text_index.ensure_built)
+        readiness.add_step("similarity_index", similarity_index.ensure_built)
+        readiness.run()
+        timings["ready"] = time.time()
+
+    print(json.dumps({"mode": mode, "interpreter": CHILD_START, **timings}))
+
+
+def spawn(app_name: str, cache_dir: str, workdir: str) -> Dict[str, float]:
+    """One process start; milliseconds since spawn of each milestone"""
+    import subprocess
+    env = dict(os.environ, STARTUP_CACHE_DIR=cache_dir)
+    spawned = time.time()
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--app", app_name],
+                            cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return {"mode": result.pop("mode"),
+            **{name: (moment - spawned) * 1000 for name, moment in result.items()}}
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    import statistics
+    return {name: statistics.median(run[name] for run in runs)
+            for name in ("interpreter", "imported", "first_response", "ready")}
+
+
+def main(argv=None):
+    import argparse
+    import tempfile
+    parser = argparse.ArgumentParser(description="Time from process start to first request")
+    parser.add_argument("--app", default="main_intelligent", choices=["main_intelligent", "main"])
+    parser.add_argument("--runs", type=int, default=7, help="process starts per scenario")
+    parser.add_argument("--target-ms", type=float, default=DEFAULT_TARGET_MS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return child(args.app)
+
+    print(f"🚀 Cold start of {args.app}: {args.runs} process starts per scenario")
+    print("=" * 80)
+    print(f"   {'scenario':<16}{'interpreter':>12}{'imported':>10}{'1st request':>13}{'ready':>10}   (ms, median)")
+    summaries = {}
+    with tempfile.TemporaryDirectory(prefix="chatbot-cold-start-") as scratch:
+        cache_dir = os.path.join(scratch, "cache")
+        for scenario in ("empty cache", "primed cache"):
+            runs = []
+            for _ in range(args.runs):
+                # A fresh working directory: the app creates its database there
+                workdir = tempfile.mkdtemp(dir=scratch)
+                if scenario == "empty cache" and os.path.isdir(cache_dir):
+                    for name in os.listdir(cache_dir):
+                        os.remove(os.path.join(cache_dir, name))
+                runs.append(spawn(args.app, cache_dir, workdir))
+            summaries[scenario] = summary = summarize(runs)
+            print(f"   {scenario:<16}{summary['interpreter']:>12.1f}{summary['imported']:>10.1f}"
+                  f"{summary['first_response']:>13.1f}{summary['ready']:>10.1f}   [{runs[0]['mode']}]")
+
+    primed = summaries["primed cache"]["first_response"]
+    verdict = "✅ within" if primed <= args.target_ms else "❌ above"
+    print(f"\n{verdict} the {args.target_ms:.0f} ms target: first request {primed:.1f} ms after spawn (primed cache)")
+
+
+if __name__ == "__main__":
+    main()
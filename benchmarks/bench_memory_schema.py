@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the conversation memory schema
+Builds a database in the original layout (ISO text timestamps, JSON context),
+migrates a copy to the current schema and compares startup loading, per-user
+history queries and file size
+Usage: python benchmarks/bench_memory_schema.py [turn count] [user count]
+"""
+
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_memory import ConversationMemory, ConversationTurn
+from memory_schema import migrate, from_epoch_ms
+
+INTENTS = ["greeting", "product_search", "gift_intent", "budget_info", "color_preference", "unknown"]
+CONTEXTS = [{}, {}, {}, {"recipient": "fille"}, {"color": "bleu"}, {"max_price": 50.0},
+            {"age": 8, "max_price": 30.0, "recipient": "garçon"}, {"color": "rouge", "recipient": "femme"}]
+HISTORY_QUERY_USERS = 2000
+
+
+def build_legacy_database(path: str, turns: int, users: int, seed: int = 42):
+    """Original schema, filled with turns spread over the last 30 days"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                message TEXT NOT NULL,
+                intent TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                context_data TEXT NOT NULL,
+                response TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("CREATE TABLE user_preferences (user_id TEXT PRIMARY KEY, preferences TEXT NOT NULL, "
+                     "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
+        conn.execute("CREATE INDEX idx_conversations_user_id ON conversations(user_id)")
+        conn.execute("CREATE INDEX idx_conversations_timestamp ON conversations(timestamp)")
+        conn.executemany("""
+            INSERT INTO conversations (user_id, message, intent, confidence, context_data, response, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            (f"user{rng.randrange(users)}", f"message {i}", rng.choice(INTENTS), rng.random(),
+             json.dumps(rng.choice(CONTEXTS)), "réponse",
+             (now - timedelta(seconds=rng.randrange(30 * 86400))).isoformat())
+            for i in range(turns)
+        ))
+        conn.commit()
+
+
+def legacy_load(path: str, days: int = 7, memory_limit: int = 5) -> int:
+    """The former load_recent_conversations: string compare, fromisoformat, json.loads"""
+    cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+    conversations = {}
+    with sqlite3.connect(path) as conn:
+        conn.row_factory = sqlite3.Row
+        for row in conn.execute("""
+            SELECT user_id, message, intent, confidence, context_data, response, timestamp
+            FROM conversations WHERE timestamp > ? ORDER BY user_id, timestamp
+        """, (cutoff,)):
+            turn = ConversationTurn(
+                user_id=row["user_id"], message=row["message"], intent=row["intent"],
+                confidence=row["confidence"], context_data=json.loads(row["context_data"]),
+                response=row["response"], timestamp=datetime.fromisoformat(row["timestamp"])
+            )
+            conversations.setdefault(turn.user_id, deque(maxlen=memory_limit)).append(turn)
+    return len(conversations)
+
+
+def legacy_history(conn: sqlite3.Connection, user_id: str, limit: int = 20) -> list:
+    return [(json.loads(context), datetime.fromisoformat(timestamp)) for context, timestamp in conn.execute("""
+        SELECT context_data, timestamp FROM conversations
+        WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?
+    """, (user_id, limit))]
+
+
+def current_history(conn: sqlite3.Connection, memory: ConversationMemory, user_id: str, limit: int = 20) -> list:
+    return [(memory.codec.decode(context), from_epoch_ms(timestamp)) for context, timestamp in conn.execute("""
+        SELECT context_data, timestamp FROM conversations
+        WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?
+    """, (user_id, limit))]
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = os.path.join(directory, "legacy.db")
+        current_path = os.path.join(directory, "current.db")
+        build_legacy_database(legacy_path, turns, users)
+        shutil.copy(legacy_path, current_path)
+
+        migration_ms = timed(migrate, current_path)
+        with sqlite3.connect(current_path, isolation_level=None) as conn:
+            conn.execute("VACUUM")
+        memory = ConversationMemory(db_path=current_path, unknown_flush_interval=3600)
+
+        rng = random.Random(1)
+        sample = [f"user{rng.randrange(users)}" for _ in range(HISTORY_QUERY_USERS)]
+        with sqlite3.connect(legacy_path) as legacy_conn, sqlite3.connect(current_path) as current_conn:
+            legacy_history_ms = timed(lambda: [legacy_history(legacy_conn, user) for user in sample])
+            current_history_ms = timed(lambda: [current_history(current_conn, memory, user) for user in sample])
+
+        def current_load():
+            memory.user_conversations.clear()
+            memory.load_recent_conversations()
+
+        print(f"📊 Memory schema benchmark ({turns} turns, {users} users)")
+        print("=" * 60)
+        print(f"{'migration':<28}: {migration_ms:8.1f} ms")
+        print(f"{'file size       legacy':<28}: {os.path.getsize(legacy_path) / 1024:8.0f} KiB")
+        print(f"{'                current':<28}: {os.path.getsize(current_path) / 1024:8.0f} KiB")
+        print(f"{'startup load    legacy':<28}: {timed(legacy_load, legacy_path):8.1f} ms")
+        print(f"{'                current':<28}: {timed(current_load):8.1f} ms")
+        print(f"{f'{HISTORY_QUERY_USERS} histories legacy':<28}: {legacy_history_ms:8.1f} ms")
+        print(f"{'                current':<28}: {current_history_ms:8.1f} ms")
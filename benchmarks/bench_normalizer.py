@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark of message normalization on a realistic customer message corpus
+Compares the former lowercase + regex + sequential str.replace pipeline with
+the translate-table fold and single-pass phrase rewriter
+Usage: python benchmarks/bench_normalizer.py [message count]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_scorer import IntentScorer
+from text_normalizer import fold_text, collapse_whitespace
+
+OPENINGS = ["Bonjour, ", "Salut ", "", "", "Hello ! ", "Bonsoir, "]
+REQUESTS = [
+    "je cherche {item} {color} pour ma {recipient}",
+    "j'ai besoin d'un cadeau à mon {recipient} de {age} ans",
+    "je veux {item} {color} qui ne dépasse pas {price} dt",
+    "avez-vous {item} pas cher ? pas plus de {price} euro",
+    "comme un cadeau a ma {recipient}, un produit {color}",
+    "Je   cherche   des produits    pour l'anniversaire de mon {recipient}",
+    "quel est le prix de {item} {color} ?",
+    "{item} {color}  maximum de {price} DT svp"
+]
+ITEMS = ["une casquette", "un sac", "des bijoux", "une montre", "un jouet", "un livre", "un vêtement"]
+COLORS = ["rouge", "bleue", "noire", "blanche", "rose", "verte", "dorée"]
+RECIPIENTS = ["fille", "femme", "mari", "fils", "garçon", "bébé", "maman"]
+
+LEGACY_REPLACEMENTS = {
+    "j'ai besoin": "besoin", "je veux": "veux", "je cherche": "cherche",
+    "pour ma": "pour", "pour mon": "pour", "cadeau a": "cadeau", "cadeau à": "cadeau",
+    "comme un cadeau": "cadeau", "comme une cadeau": "cadeau", "un produit": "produit",
+    "une produit": "produit", "le produit": "produit", "des produits": "produit",
+    "ne depasse pas": "maximum", "ne dépasse pas": "maximum", "pas plus de": "maximum",
+    "maximum de": "maximum"
+}
+
+
+def build_corpus(size: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        rng.choice(OPENINGS) + rng.choice(REQUESTS).format(
+            item=rng.choice(ITEMS), color=rng.choice(COLORS), recipient=rng.choice(RECIPIENTS),
+            age=rng.randint(2, 70), price=rng.choice([20, 35, 50, 80, 120])
+        )
+        for _ in range(size)
+    ]
+
+
+def legacy_normalize(message: str) -> str:
+    normalized = re.sub(r'\s+', ' ', message.lower().strip())
+    for old, new in LEGACY_REPLACEMENTS.items():
+        normalized = normalized.replace(old, new)
+    return normalized
+
+
+def time_per_message(function, corpus) -> float:
+    start = time.perf_counter()
+    for message in corpus:
+        function(message)
+    return (time.perf_counter() - start) / len(corpus) * 1e6
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    corpus = build_corpus(size)
+    scorer = IntentScorer()
+
+    def folded_rewrite(message: str) -> str:
+        return scorer.phrase_rewriter.rewrite(collapse_whitespace(fold_text(message)))
+
+    print(f"📊 Normalization benchmark ({size} messages)")
+    print("=" * 60)
+    print(f"legacy lower + regex + str.replace : {time_per_message(legacy_normalize, corpus):6.2f} µs")
+    print(f"fold table + one-pass rewrite      : {time_per_message(folded_rewrite, corpus):6.2f} µs")
+    print(f"full normalize_message (with typos): {time_per_message(scorer.normalize_message, corpus):6.2f} µs")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the similar products index build and lookups
+Usage: python benchmarks/bench_similarity.py [catalog sizes...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from product_similarity import SimilarityIndex
+from synthetic_catalog import build_synthetic_database
+
+
+def bench(size: int):
+    database = build_synthetic_database(size)
+    index = SimilarityIndex(database)
+
+    start = time.perf_counter()
+    index.build()
+    build_seconds = time.perf_counter() - start
+
+    ids = database.get_all_product_ids()
+    lookups = min(len(ids), 10000)
+    start = time.perf_counter()
+    for product_id in ids[:lookups]:
+        index.get_similar_ids(product_id)
+    lookup_us = (time.perf_counter() - start) / lookups * 1e6
+
+    new_id = size + 1
+    start = time.perf_counter()
+    database.add_product({**database.get_product_by_id(1), "id": new_id})
+    update_ms = (time.perf_counter() - start) * 1000
+
+    stats = index.get_stats()
+    print(f"{size:>8} products | build {build_seconds:7.2f} s | lookup {lookup_us:6.1f} µs | "
+          f"incremental add {update_ms:8.1f} ms | {stats['bytes'] / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [30, 1000, 10000, 100000]
+    print("📊 Similar products index benchmark")
+    print("=" * 90)
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark of the in-memory conversation history
+Fills a ConversationMemory.user_conversations-like dict with realistic
+turns, in the former layout (a bounded deque of dataclass turns per user)
+and the current one (a tuple of compact ConversationTurn per user), and
+reports bytes per turn, the projected and measured footprint at scale, and
+the to_dict serialization time.
+Usage: python benchmarks/bench_turn_memory.py [--users 1000000] [--turns-per-user 5]
+       [--sample-users 20000] [--skip-full]
+"""
+
+import argparse
+import gc
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from random import Random
+from typing import Dict, Any, Callable, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from conversation_memory import ConversationMemory, ConversationTurn
+from synthetic_conversations import generate_session, response_for
+
+SEARCH_INTENTS = {"product_search", "gift_intent", "budget_info", "color_preference", "age_info",
+                  "recipient_info", "category_preference"}
+SERIALIZATION_TURNS = 100000
+
+
+@dataclass
+class LegacyConversationTurn:
+    """The former representation: a plain dataclass serialized with asdict"""
+    user_id: str
+    message: str
+    intent: str
+    confidence: float
+    context_data: Dict[str, Any]
+    response: str
+    timestamp: datetime
+    turn_id: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['timestamp'] = self.timestamp.isoformat()
+        return data
+
+
+def search_response(context: Dict[str, Any], count: int) -> str:
+    """Same shape as IntelligentChatbot.handle_product_search's message"""
+    response = "🎯 Excellente question ! Laissez-moi vous montrer nos meilleures options..."
+    criteria = []
+    if context.get("recipient"):
+        criteria.append(f"pour {context['recipient']}")
+    if context.get("max_price"):
+        criteria.append(f"budget {context['max_price']} DT")
+    if context.get("color"):
+        criteria.append(f"couleur {context['color']}")
+    if criteria:
+        response += f"\n\n📋 Critères: {', '.join(criteria)}"
+    response += f"\n\n✨ J'ai trouvé {count} produit(s) correspondant !"
+    return response
+
+
+def legacy_store(turns_per_user: int) -> Tuple[Dict[str, Any], Callable[[Any], None]]:
+    """The former user_conversations: a bounded deque per user"""
+    conversations: Dict[str, deque] = {}
+
+    def remember(turn: LegacyConversationTurn):
+        if turn.user_id not in conversations:
+            conversations[turn.user_id] = deque(maxlen=turns_per_user)
+        conversations[turn.user_id].append(turn)
+    return conversations, remember
+
+
+def current_store(turns_per_user: int) -> Tuple[Dict[str, Any], Callable[[Any], None]]:
+    memory = ConversationMemory(memory_limit=turns_per_user)
+    return memory.user_conversations, memory._remember_turn
+
+
+VARIANTS = {
+    "dataclass": (LegacyConversationTurn, legacy_store),
+    "compact": (ConversationTurn, current_store),
+}
+
+
+def fill(variant: str, users: int, turns_per_user: int, seed: int = 42) -> Dict[str, Any]:
+    """Per-user histories, built like the chatbot builds them (new strings per turn)"""
+    turn_class, store = VARIANTS[variant]
+    conversations, remember = store(turns_per_user)
+    rng = Random(seed)
+    random = rng.random
+    start = datetime.now() - timedelta(days=1)
+    for user_index in range(users):
+        remaining = turns_per_user
+        while remaining:
+            for turn in generate_session(rng)[1][:remaining]:
+                if turn.intent in SEARCH_INTENTS:
+                    response = search_response(turn.context, 1 + int(random() * 40))
+                else:
+                    response = response_for(turn, random)
+                remember(turn_class(
+                    f"user_{user_index}", turn.message, turn.intent, turn.confidence, dict(turn.context),
+                    response, start + timedelta(milliseconds=int(random() * 86_400_000))
+                ))
+                remaining -= 1
+    return conversations
+
+
+def traced_bytes_per_turn(variant: str, users: int, turns_per_user: int) -> float:
+    """Memory retained per turn (per-user containers and dict included), measured with tracemalloc"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    conversations = fill(variant, users, turns_per_user)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del conversations
+    return retained / (users * turns_per_user)
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def available_bytes() -> int:
+    with open("/proc/meminfo") as meminfo:
+        for line in meminfo:
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def full_run(variant: str, users: int, turns_per_user: int) -> str:
+    """Build the full history and report the resident memory it took"""
+    gc.collect()
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    conversations = fill(variant, users, turns_per_user)
+    build_seconds = time.perf_counter() - start
+    gc.collect()
+    grown = rss_bytes() - rss_before
+
+    sample = [turn for history in list(conversations.values())[:SERIALIZATION_TURNS // turns_per_user]
+              for turn in history]
+    start = time.perf_counter()
+    for turn in sample:
+        turn.to_dict()
+    to_dict_us = (time.perf_counter() - start) / len(sample) * 1e6
+    return (f"   {variant:<10} RSS +{grown / 2 ** 20:9.0f} MiB | build {build_seconds:6.1f} s | "
+            f"to_dict {to_dict_us:5.2f} µs/turn")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory footprint of cached conversation turns")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--turns-per-user", type=int, default=5, help="turns kept per user (memory_limit)")
+    parser.add_argument("--sample-users", type=int, default=20000, help="users measured with tracemalloc")
+    parser.add_argument("--skip-full", action="store_true", help="only measure the sample")
+    args = parser.parse_args(argv)
+
+    total_turns = args.users * args.turns_per_user
+    print(f"📊 Cached conversation turns: {args.users} users x {args.turns_per_user} turns")
+    print("=" * 80)
+    projected = {}
+    for name in VARIANTS:
+        per_turn = traced_bytes_per_turn(name, args.sample_users, args.turns_per_user)
+        projected[name] = per_turn * total_turns
+        print(f"   {name:<10} {per_turn:7.0f} bytes/turn | projected {projected[name] / 2 ** 20:9.0f} MiB")
+    print(f"   saving     {1 - projected['compact'] / projected['dataclass']:.0%}")
+
+    if args.skip_full:
+        return
+    print(f"\n🏗️ Full build ({total_turns} turns)")
+    for name in VARIANTS:
+        # Leave headroom: RSS also grows with allocator fragmentation
+        if projected[name] * 1.3 > available_bytes():
+            print(f"   {name:<10} skipped: projected {projected[name] / 2 ** 20:.0f} MiB exceeds available memory")
+            continue
+        # A fresh process per variant, so one doesn't reuse the memory the other freed
+        with multiprocessing.get_context("fork").Pool(1) as pool:
+            print(pool.apply(full_run, (name, args.users, args.turns_per_user)))
+
+
+if __name__ == "__main__":
+    main()
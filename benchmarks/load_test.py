@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Load test of the chatbot API
+Generates multi-turn French shopping sessions from templates and replays them
+in-process against the ASGI app with concurrent virtual users. Reports
+throughput, per-endpoint latency percentiles and memory growth, and saves
+the results as JSON so runs can be compared across commits.
+Usage: python benchmarks/load_test.py [--app main_intelligent|main] [--users 50]
+       [--sessions 500] [--seed 42] [--output FILE] [--compare BASELINE.json]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_conversations import generate_session, CATEGORIES, COLORS, BUDGETS
+
+DEFAULT_RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+# Tracked conversation database: runs use a scratch copy and must leave it untouched
+REPO_MEMORY_DB = os.path.join(REPO_ROOT, "chatbot_memory.db")
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    label: str
+    body: Optional[Dict[str, Any]] = None
+    query: str = ""
+
+
+@dataclass
+class Session:
+    user_id: str
+    kind: str
+    requests: List[Request] = field(default_factory=list)
+
+
+def generate_sessions(count: int, seed: int = 42, typo_rate: float = 0.1,
+                      app_name: str = "main_intelligent") -> List[Session]:
+    """Deterministic sessions: the same seed always yields the same requests"""
+    sessions = []
+    for index in range(count):
+        rng = random.Random(seed * 1_000_003 + index)
+        kind, turns = generate_session(rng, typo_rate)
+        session = Session(user_id=f"load_{seed}_{index}", kind=kind)
+        for turn in turns:
+            session.requests.append(Request("POST", "/chat", "POST /chat",
+                                            {"message": turn.message, "user_id": session.user_id}))
+
+        # Some users also browse the catalog or reopen their history
+        if rng.random() < 0.3:
+            session.requests.append(Request("POST", "/products/search", "POST /products/search",
+                                            {"category": rng.choice(CATEGORIES), "color": rng.choice(COLORS),
+                                             "max_price": float(rng.choice(BUDGETS))}))
+        if app_name == "main_intelligent" and rng.random() < 0.2:
+            session.requests.append(Request("GET", f"/memory/{session.user_id}", "GET /memory/{user_id}",
+                                            query="limit=5"))
+        sessions.append(session)
+    return sessions
+
+
+class AsgiClient:
+    """Calls an ASGI application directly, without sockets"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None,
+                      query: str = "") -> Tuple[int, bytes]:
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("utf-8"),
+            "query_string": query.encode("ascii"),
+            "root_path": "",
+            "headers": [(b"host", b"loadtest"), (b"content-type", b"application/json"),
+                        (b"content-length", str(len(payload)).encode("ascii"))],
+            "client": ("127.0.0.1", 50000),
+            "server": ("loadtest", 80),
+        }
+        request_sent = False
+        response_done = asyncio.Event()
+        status = 0
+        chunks = []
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_done.set()
+
+        await self.app(scope, receive, send)
+        response_done.set()
+        return status, b"".join(chunks)
+
+
+class Lifespan:
+    """Runs the app's startup and shutdown handlers around the load test"""
+
+    def __init__(self, app):
+        self.app = app
+        self.to_app: asyncio.Queue = asyncio.Queue()
+        self.from_app: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+    async def _exchange(self, message_type: str):
+        await self.to_app.put({"type": message_type})
+        reply = asyncio.ensure_future(self.from_app.get())
+        await asyncio.wait([reply, self.task], return_when=asyncio.FIRST_COMPLETED)
+        if not reply.done():
+            reply.cancel()  # the app does not implement the lifespan protocol
+            return
+        if reply.result()["type"].endswith(".failed"):
+            raise RuntimeError(f"{message_type} failed: {reply.result().get('message', '')}")
+
+    async def __aenter__(self):
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}}
+        self.task = asyncio.ensure_future(self.app(scope, self.to_app.get, self.from_app.put))
+        await self._exchange("lifespan.startup")
+        return self
+
+    async def __aexit__(self, *exc):
+        if not self.task.done():
+            await self._exchange("lifespan.shutdown")
+        return False
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(fraction * len(sorted_values) + 0.999999))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadTest:
+    """Replays sessions with concurrent virtual users and collects measurements"""
+
+    def __init__(self, app, sessions: List[Session], users: int, think_time: float = 0.0,
+                 sample_interval: float = 1.0, trace_memory: bool = False, seed: int = 42):
+        self.client = AsgiClient(app)
+        self.app = app
+        self.sessions = sessions
+        self.users = users
+        self.think_time = think_time
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+        self.seed = seed
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+        self.memory_samples: List[Dict[str, float]] = []
+        self.completed = 0
+        self.started = 0.0
+
+    async def virtual_user(self, number: int, queue: asyncio.Queue):
+        rng = random.Random(self.seed * 7919 + number)
+        while True:
+            try:
+                session = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            for request in session.requests:
+                start = time.perf_counter()
+                status, _ = await self.client.request(request.method, request.path, request.body, request.query)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.latencies.setdefault(request.label, []).append(elapsed_ms)
+                statuses = self.statuses.setdefault(request.label, {})
+                statuses[status] = statuses.get(status, 0) + 1
+                self.completed += 1
+                # Yield so other users interleave even when handlers never await
+                await asyncio.sleep(rng.uniform(0, self.think_time) if self.think_time else 0)
+
+    def sample_memory(self):
+        sample = {"t": round(time.perf_counter() - self.started, 3),
+                  "requests": self.completed, "rss_mb": round(current_rss_mb(), 2)}
+        if self.trace_memory:
+            sample["traced_mb"] = round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2)
+        self.memory_samples.append(sample)
+
+    async def memory_sampler(self):
+        while True:
+            await asyncio.sleep(self.sample_interval)
+            self.sample_memory()
+
+    async def run(self) -> float:
+        queue: asyncio.Queue = asyncio.Queue()
+        for session in self.sessions:
+            queue.put_nowait(session)
+
+        if self.trace_memory:
+            tracemalloc.start()
+        self.started = time.perf_counter()
+        self.sample_memory()
+        sampler = asyncio.ensure_future(self.memory_sampler())
+        await asyncio.gather(*(self.virtual_user(number, queue) for number in range(self.users)))
+        duration = time.perf_counter() - self.started
+        sampler.cancel()
+        self.sample_memory()
+        if self.trace_memory:
+            tracemalloc.stop()
+        return duration
+
+    def report(self, duration: float) -> Dict[str, Any]:
+        endpoints = {}
+        for label, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            statuses = self.statuses[label]
+            endpoints[label] = {
+                "count": len(values),
+                "errors": sum(count for status, count in statuses.items() if status >= 400),
+                "throughput_rps": round(len(values) / duration, 2),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(percentile(values, 0.50), 3),
+                "p95_ms": round(percentile(values, 0.95), 3),
+                "p99_ms": round(percentile(values, 0.99), 3),
+                "max_ms": round(values[-1], 3),
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            }
+        rss = [sample["rss_mb"] for sample in self.memory_samples]
+        return {
+            "totals": {
+                "requests": self.completed,
+                "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+                "sessions": len(self.sessions),
+                "duration_s": round(duration, 3),
+                "throughput_rps": round(self.completed / duration, 2) if duration else 0.0,
+            },
+            "endpoints": endpoints,
+            "memory": {
+                "start_rss_mb": rss[0],
+                "end_rss_mb": rss[-1],
+                "peak_rss_mb": max(rss),
+                "growth_mb": round(rss[-1] - rss[0], 2),
+                "samples": self.memory_samples,
+            },
+        }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    totals = result["totals"]
+    print(f"📊 Load test {result['meta']['app']} @ {result['meta']['commit'] or 'unknown'}: "
+          f"{totals['requests']} requests, {totals['errors']} errors, "
+          f"{totals['throughput_rps']} req/s over {totals['duration_s']} s")
+    print("=" * 78)
+    print(f"{'endpoint':<26}{'count':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for label, endpoint in result["endpoints"].items():
+        print(f"{label:<26}{endpoint['count']:>7}{endpoint['throughput_rps']:>9}"
+              f"{endpoint['p50_ms']:>9.2f}{endpoint['p95_ms']:>9.2f}{endpoint['p99_ms']:>9.2f}{endpoint['max_ms']:>9.2f}")
+        previous = (baseline or {}).get("endpoints", {}).get(label)
+        if previous:
+            deltas = "".join(f"{(endpoint[key] / previous[key] - 1) * 100 if previous[key] else 0.0:>+8.1f}%"
+                             for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"))
+            print(f"{'  vs ' + (baseline['meta'].get('commit') or 'baseline'):<33}{deltas}")
+    memory = result["memory"]
+    print(f"💾 RSS {memory['start_rss_mb']} MB -> {memory['end_rss_mb']} MB "
+          f"(peak {memory['peak_rss_mb']} MB, growth {memory['growth_mb']:+} MB)")
+
+
+def database_state(path: str) -> Tuple[Optional[str], Dict[str, int]]:
+    """SHA-256 of a SQLite file and the row count of each of its tables"""
+    if not os.path.exists(path):
+        return None, {}
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        counts = {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+    finally:
+        conn.close()
+    return digest, counts
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Replay synthetic chat sessions against the API in-process")
+    parser.add_argument("--app", default="main_intelligent", choices=["main_intelligent", "main"])
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20, help="sessions replayed before measuring")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--typo-rate", type=float, default=0.1)
+    parser.add_argument("--think-time", type=float, default=0.0, help="max seconds between turns")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between memory samples")
+    parser.add_argument("--tracemalloc", action="store_true", help="also track Python heap (slower)")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/...)")
+    parser.add_argument("--compare", help="previous result file to print deltas against")
+    args = parser.parse_args(argv)
+
+    # The app opens chatbot_memory.db and archives/ relative to the working
+    # directory: run from a scratch directory so the real database is untouched
+    repo_database = database_state(REPO_MEMORY_DB)
+    original_directory = os.getcwd()
+    scratch = tempfile.TemporaryDirectory(prefix="chatbot-load-")
+    os.chdir(scratch.name)
+    try:
+        app = importlib.import_module(args.app).app
+        from metrics import metrics
+
+        async def replay() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+            async with Lifespan(app):
+                warmup = generate_sessions(args.warmup, args.seed + 1, args.typo_rate, args.app)
+                await LoadTest(app, warmup, args.users, seed=args.seed).run()
+                metrics.reset()
+
+                sessions = generate_sessions(args.sessions, args.seed, args.typo_rate, args.app)
+                load_test = LoadTest(app, sessions, args.users, args.think_time, args.sample_interval,
+                                     args.tracemalloc, args.seed)
+                duration = await load_test.run()
+                return load_test.report(duration), metrics.snapshot()
+
+        result, stages = asyncio.run(replay())
+    finally:
+        # Flush buffered writes while the scratch database is still the one open
+        memory_module = sys.modules.get("conversation_memory")
+        if memory_module is not None:
+            memory_module.conversation_memory.close_database()
+        os.chdir(original_directory)
+        scratch.cleanup()
+
+    if database_state(REPO_MEMORY_DB) != repo_database:
+        raise RuntimeError(f"The load test modified {REPO_MEMORY_DB} (rows before: {repo_database[1]}, "
+                           f"after: {database_state(REPO_MEMORY_DB)[1]})")
+
+    result = {
+        "meta": {
+            "app": args.app,
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        **result,
+        "stages": stages,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR,
+        f"load_test-{args.app}-{result['meta']['commit'] or 'nocommit'}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"📝 Results saved to {output}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks of the hot paths: message normalization, intent detection,
+entity extraction and catalog search at several synthetic catalog sizes
+Each case is calibrated to a minimum round duration, timed over several
+rounds, and compared to a stored baseline; the run fails (exit code 1) when
+a case's best round is slower than the baseline by more than the threshold.
+Timings are machine-specific, so no baseline is committed: record one with
+--save-baseline on the machine that runs the gate. Without one the gate
+fails (exit code 2) rather than pass without comparing anything.
+Usage: python benchmarks/microbench.py [--sizes 100,10000,1000000] [--filter TEXT]
+       [--save-baseline] [--baseline FILE] [--threshold 0.25] [--output FILE]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Any, Callable, Iterator, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from intent_scorer import intent_scorer
+from chatbot_logic import ecommerce_chatbot
+from synthetic_catalog import build_synthetic_database
+
+DEFAULT_SIZES = (100, 10_000, 1_000_000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "microbench.json")
+DEFAULT_THRESHOLD = 0.25
+MIN_ROUND_TIME = 0.02   # seconds; fast cases loop until a round takes at least this long
+MAX_CASE_TIME = 2.0     # seconds spent timing one case, once MIN_ROUNDS are done
+MIN_ROUNDS = 3
+MAX_ROUNDS = 15
+
+MESSAGES = {
+    "short": "cadeau fille",
+    "medium": "Bonjour, je cherche un cadeau pour ma fille de 8 ans en rouge, pas plus de 30 euros",
+    "long": ("Bonjour ! Alors voilà, c'est bientôt l'anniversaire de ma nièce et je ne sais vraiment pas "
+             "quoi lui offrir. Elle a 12 ans, elle adore le sport et la musique, sa couleur préférée est "
+             "le bleu mais le rose peut aller aussi. J'aimerais un cadeau original, pas trop cher, "
+             "disons pas plus de 45 euros, et si possible livré avant samedi. Vous auriez des idées "
+             "de vêtements, d'accessoires ou de jouets qui pourraient lui plaire ? Merci d'avance"),
+}
+
+# Catalog searches and their arguments; max_size skips sizes where a case
+# would take minutes (search_by_tags is quadratic in the number of matches)
+CATALOG_CASES = [
+    ("search_by_color", lambda db: db.search_by_color("rouge"), None),
+    ("search_by_category", lambda db: db.search_by_category("vêtements"), None),
+    ("search_by_price_range", lambda db: db.search_by_price_range(50, 10), None),
+    ("search_by_tags", lambda db: db.search_by_tags(["marin"]), 100_000),
+    ("search_by_gender_and_age", lambda db: db.search_by_gender_and_age("fille", "enfant"), None),
+    ("complex_search", lambda db: db.complex_search(color="bleu", category="vêtements", max_price=40,
+                                                    gender="femme", age_group="adulte"), None),
+    ("relaxed_search", lambda db: db.relaxed_search({"color": "vert", "category": "jouets", "max_price": 20,
+                                                     "age_group": "enfant"}, ["color", "category"]), None),
+    ("search_with_relaxation_cached", lambda db: db.search_with_relaxation(
+        {"color": "vert", "category": "jouets", "age_group": "enfant"}, ["color", "category"]), None),
+]
+
+
+@dataclass
+class Case:
+    """One benchmark: a zero-argument callable and the id it is stored under"""
+    case_id: str
+    function: Callable[[], Any]
+
+
+def message_cases() -> Iterator[Case]:
+    for length, message in MESSAGES.items():
+        yield Case(f"intent/normalize_message[{length}]", lambda m=message: intent_scorer.normalize_message(m))
+        yield Case(f"intent/detect_intents[{length}]", lambda m=message: intent_scorer.detect_intents(m))
+        yield Case(f"intent/extract_context_data[{length}]",
+                   lambda m=message: intent_scorer.extract_context_data(intent_scorer.normalize_message(m)))
+        yield Case(f"logic/detect_intent_and_context[{length}]",
+                   lambda m=message: ecommerce_chatbot.detect_intent_and_context(m, "microbench"))
+
+
+def catalog_cases(size: int, database) -> Iterator[Case]:
+    for name, search, max_size in CATALOG_CASES:
+        if max_size is None or size <= max_size:
+            yield Case(f"catalog/{name}[{size}]", lambda s=search: s(database))
+
+
+def calibrate(function: Callable[[], Any]) -> int:
+    """Loops per round so that a round lasts at least MIN_ROUND_TIME"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_ROUND_TIME:
+            return loops
+        loops *= 10 if elapsed < MIN_ROUND_TIME / 10 else 2
+
+
+def measure(case: Case) -> Dict[str, Any]:
+    """Per-call time statistics in microseconds, over several rounds"""
+    loops = calibrate(case.function)
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        case_start = time.perf_counter()
+        while len(timings) < MAX_ROUNDS:
+            start = time.perf_counter()
+            for _ in range(loops):
+                case.function()
+            timings.append((time.perf_counter() - start) / loops * 1e6)
+            if len(timings) >= MIN_ROUNDS and time.perf_counter() - case_start > MAX_CASE_TIME:
+                break
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "min_us": round(min(timings), 3),
+        "median_us": round(statistics.median(timings), 3),
+        "mean_us": round(statistics.fmean(timings), 3),
+        "stddev_us": round(statistics.stdev(timings), 3) if len(timings) > 1 else 0.0,
+        "rounds": len(timings),
+        "loops": loops,
+    }
+
+
+def run(sizes: List[int], name_filter: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    results = {}
+
+    def record(case: Case):
+        if name_filter and name_filter not in case.case_id:
+            return
+        results[case.case_id] = measure(case)
+        print(f"   {case.case_id:<52}{results[case.case_id]['min_us']:>14.2f} µs")
+
+    print("💬 Message processing")
+    for case in message_cases():
+        record(case)
+
+    for size in sizes:
+        if name_filter and not any(name_filter in f"catalog/{name}[{size}]" for name, _, _ in CATALOG_CASES):
+            continue
+        start = time.perf_counter()
+        database = build_synthetic_database(size)
+        print(f"📦 Catalog of {size} products (built in {time.perf_counter() - start:.1f} s)")
+        for case in catalog_cases(size, database):
+            record(case)
+        del database
+        gc.collect()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Ids of the cases whose best round regressed beyond the threshold"""
+    regressions = []
+    print(f"\n📈 Comparison with baseline {baseline['meta'].get('date', '')} (threshold {threshold:.0%})")
+    for case_id, result in results.items():
+        previous = baseline["results"].get(case_id)
+        if previous is None:
+            continue
+        change = result["min_us"] / previous["min_us"] - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(case_id)
+        marker = "❌" if regressed else ("🚀" if change < -threshold else "  ")
+        print(f"{marker} {case_id:<52}{previous['min_us']:>12.2f} -> {result['min_us']:>12.2f} µs ({change:+.1%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the chatbot hot paths")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated catalog sizes")
+    parser.add_argument("--filter", help="only run cases whose id contains this text")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before a case counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--output", help="also write this run's results to a file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    print(f"🚀 Microbenchmarks (catalog sizes {sizes})")
+    print("=" * 80)
+    report = {
+        "meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "platform": platform.platform(), "sizes": sizes},
+        "results": run(sizes, args.filter),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        previous = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                previous = json.load(f)
+        # Merge, so a filtered run only replaces the cases it measured
+        report["results"] = {**previous["results"], **report["results"]}
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n📝 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n❌ No baseline at {args.baseline}: nothing to compare against. Record one on this "
+              f"machine with --save-baseline (or pass --baseline FILE), then rerun to check for regressions")
+        return 2
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(report["results"], baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
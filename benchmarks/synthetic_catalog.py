@@ -0,0 +1,181 @@
+"""
+Synthetic product catalogs for benchmarks and scale fixtures
+Products are drawn from the distributions of the real catalog (categories,
+subcategories, colors, genders, age groups, tags, prices) with a seeded
+generator, so the same size and seed always give the same catalog.
+Usage: python benchmarks/synthetic_catalog.py SIZE OUTPUT.jsonl[.gz] [--seed 42]
+"""
+
+import gzip
+import json
+import math
+import os
+import sys
+import time
+from itertools import accumulate
+from random import Random
+from typing import Dict, List, Any, Iterator, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ProductDatabase
+
+WRITE_BATCH_SIZE = 10000
+# Share of products keeping the template's gender and age group
+KEEP_AUDIENCE_RATE = 0.8
+# Log-normal spread of prices around the template price
+PRICE_SIGMA = 0.35
+EXTRA_TAG_RATE = 0.3
+GIFT_TAG_RATE = 0.15
+CHILD_GENDERS = ("fille", "garçon")
+
+
+class CatalogModel:
+    """Empirical distributions of a base catalog"""
+
+    def __init__(self, base: Optional[List[Dict[str, Any]]] = None):
+        self.templates = base if base is not None else ProductDatabase().get_all_products()
+        # Templates are drawn uniformly, so category and subcategory shares follow
+        # the real catalog; colors and audiences are smoothed so rare ones still appear
+        self.colors, self.color_weights = self.smoothed(p["color"] for p in self.templates)
+        self.audiences, self.audience_weights = self.smoothed(
+            (p["gender"], p["age_group"]) for p in self.templates
+        )
+        self.tag_pools: Dict[str, List[str]] = {}
+        for product in self.templates:
+            pool = self.tag_pools.setdefault(product["category"], [])
+            pool.extend(tag for tag in product["tags"] if tag not in pool)
+        # Recolored (name, description) of each template, built on first use
+        self._recolored: Dict[tuple, tuple] = {}
+
+    @staticmethod
+    def smoothed(values: Iterator[Any]) -> tuple:
+        counts: Dict[Any, int] = {}
+        for value in values:
+            counts[value] = counts.get(value, 0) + 1
+        keys = sorted(counts)
+        return keys, list(accumulate(counts[key] + 1 for key in keys))
+
+    def recolor(self, text: str, old_color: str, new_color: str) -> str:
+        """Swap the template color in a name or description ("Robe Bleue" -> "Robe Verte")"""
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if word.lower().startswith(old_color):
+                replacement = new_color.capitalize() if word[0].isupper() else new_color
+                words[i] = replacement
+        return " ".join(words)
+
+    def recolored(self, template_index: int, color: str) -> tuple:
+        texts = self._recolored.get((template_index, color))
+        if texts is None:
+            template = self.templates[template_index]
+            texts = self._recolored[(template_index, color)] = (
+                self.recolor(template["name"], template["color"], color),
+                self.recolor(template["description"], template["color"], color)
+            )
+        return texts
+
+    def product(self, product_id: int, rng: Random) -> Dict[str, Any]:
+        template_index = rng.randrange(len(self.templates))
+        template = self.templates[template_index]
+        color = rng.choices(self.colors, cum_weights=self.color_weights)[0]
+        name, description = self.recolored(template_index, color)
+        if rng.random() < KEEP_AUDIENCE_RATE:
+            gender, age_group = template["gender"], template["age_group"]
+        else:
+            gender, age_group = rng.choices(self.audiences, cum_weights=self.audience_weights)[0]
+
+        tags = list(template["tags"])
+        if rng.random() < EXTRA_TAG_RATE:
+            extra = rng.choice(self.tag_pools[template["category"]])
+            if extra not in tags:
+                tags.append(extra)
+        if rng.random() < GIFT_TAG_RATE and "cadeau" not in tags:
+            tags.append("cadeau")
+        if gender in CHILD_GENDERS and gender not in tags:
+            tags.append(gender)
+
+        price = template["price"] * math.exp(rng.gauss(0, PRICE_SIGMA))
+        return {
+            **template,
+            "id": product_id,
+            "name": f"{name} #{product_id}",
+            "color": color,
+            "description": description,
+            "price": max(2.0, round(price * 2) / 2),
+            "tags": tags,
+            "age_group": age_group,
+            "gender": gender,
+            "stock": rng.randint(0, 30)
+        }
+
+
+def iter_synthetic_products(size: int, seed: int = 42, start_id: int = 1,
+                            model: Optional[CatalogModel] = None) -> Iterator[Dict[str, Any]]:
+    """Stream size products with ids start_id, start_id + 1, ..."""
+    model = model or CatalogModel()
+    rng = Random(seed)
+    for product_id in range(start_id, start_id + size):
+        yield model.product(product_id, rng)
+
+
+def build_synthetic_products(size: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Generate size products in memory"""
+    return list(iter_synthetic_products(size, seed))
+
+
+def build_synthetic_database(size: int, seed: int = 42) -> ProductDatabase:
+    """ProductDatabase whose catalog is replaced by size synthetic products"""
+    database = ProductDatabase()
+    database.load_products(build_synthetic_products(size, seed))
+    return database
+
+
+def open_text(path: str, mode: str):
+    if path.endswith(".gz"):
+        # Level 1: large fixtures are written faster, still about 5x smaller
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=1)
+    return open(path, mode, encoding="utf-8")
+
+
+def write_catalog(path: str, size: int, seed: int = 42) -> int:
+    """Stream a catalog to a JSON Lines file (gzipped when the name ends in .gz)"""
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    written = 0
+    with open_text(path, "w") as out:
+        batch = []
+        for product in iter_synthetic_products(size, seed):
+            batch.append(encoder.encode(product) + "\n")
+            if len(batch) >= WRITE_BATCH_SIZE:
+                out.writelines(batch)
+                written += len(batch)
+                batch.clear()
+        out.writelines(batch)
+        written += len(batch)
+    return written
+
+
+def read_catalog(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream the products of a file written by write_catalog"""
+    with open_text(path, "r") as lines:
+        for line in lines:
+            yield json.loads(line)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    seed = 42
+    if "--seed" in args:
+        position = args.index("--seed")
+        seed = int(args[position + 1])
+        del args[position:position + 2]
+    if len(args) != 2:
+        print(__doc__)
+        sys.exit(1)
+
+    size, path = int(args[0]), args[1]
+    start = time.perf_counter()
+    count = write_catalog(path, size, seed)
+    elapsed = time.perf_counter() - start
+    print(f"📦 {count} products -> {path} in {elapsed:.1f} s "
+          f"({count / elapsed:,.0f}/s, {os.path.getsize(path) / 2 ** 20:.1f} MiB)")
@@ -5,8 +5,46 @@ Analyse les demandes clients, motive les achats et propose des alternatives
 
 import random
 import re
-from typing import Dict, List, Any, Optional
-from database import product_db
+from typing import Dict, List, Any, Optional, Tuple
+from database import product_db, RelaxedSearchResult, CRITERIA_LABELS
+from product_ranking import product_ranker
+from text_search import product_text_index
+from fuzzy_matcher import SymSpellIndex, COMMON_FRENCH_WORDS, words_of
+from metrics import metrics
+from startup_cache import startup_cache, digest, source_digest
+from response_templates import template, templates, text, EMPTY
+from state_backend import StateBackend, state_backend
+
+INTRO_PHRASES = templates([
+    "🎯 Parfait ! Je commence à comprendre vos besoins.",
+    "💡 Excellent ! Laissez-moi en savoir un peu plus.",
+    "✨ Super ! J'ai quelques questions pour vous trouver le produit idéal.",
+    "🤔 Très bien ! Encore quelques détails pour vous proposer exactement ce qu'il faut."
+])
+PROACTIVE_QUESTIONS = [
+    "🎯 Pour commencer, dites-moi : c'est pour qui ?",
+    "💰 Quel est votre budget approximatif ?",
+    "🌈 Avez-vous une couleur préférée ?"
+]
+GREETING_DETAILS = template("\n\n💡 Pour vous proposer exactement ce qu'il vous faut :\n• {questions:\n• }"
+                            "\n\n✨ Plus vous me donnez d'infos, mieux je peux vous conseiller !")
+SUMMARY = template("📝 Récapitulatif : {parts:, }\n\n")
+QUESTIONS = template("• {questions:\n• }")
+PARAGRAPH = text("\n\n")
+UNDERSTANDING_OUTRO = text("\n\n💬 Répondez simplement, je prépare une sélection personnalisée !")
+FOUND = template("🎉 PARFAIT ! J'ai trouvé {found} produit(s) idéal(s) !\n\n📋 Profil : {profile:, }\n\n")
+GIFT_NOTE = text("🎁 Ces produits feront des cadeaux formidables !\n")
+CHILD_NOTE = text("🧒 Parfaitement adapté pour cet âge !\n")
+TEEN_NOTE = text("😎 Dans la tendance pour les ados !\n")
+BUDGET_NOTE = template("💰 Tous respectent votre budget de {max_price} DT !\n\n")
+RELAXED_NOTE = template("ℹ️ Pour vous proposer ces produits, j'ai assoupli : {labels:, }.\n\n")
+SELECTION = text("✨ Voici ma sélection personnalisée :")
+NOT_FOUND = template("🤔 Hmm, je n'ai pas trouvé de produits qui correspondent exactement à :\n\n📋 {profile:, }\n\n"
+                     "💡 Mais regardez ces alternatives qui pourraient vous intéresser :")
+# Messages gardés dans l'historique d'une session (seule sa longueur compte)
+MAX_SESSION_HISTORY = 20
+NO_RESULTS = text("🤔 Je n'ai pas trouvé exactement ce que vous cherchez, mais regardez ces alternatives :\n\n"
+                  "💡 N'hésitez pas à me donner plus de détails pour que je vous trouve le produit parfait !")
 
 
 class SmartSalesAssistant:
@@ -15,10 +53,14 @@ class SmartSalesAssistant:
     Motive les clients, pose des questions et propose des alternatives
     """
     
-    def __init__(self):
+    def __init__(self, state: Optional[StateBackend] = None):
         self.user_sessions = {}
+        # Backend partagé (plusieurs workers) : les sessions y sont lues et
+        # écrites à chaque message ; None quand ce processus les garde
+        self.shared_state = state if state is not None and state.shared else None
         
-        self.responses = {
+        # Réponses précompilées, rendues au moment de la sérialisation
+        self.responses = {intent: templates(variants) for intent, variants in {
             "salutations": [
                 "🛍️ Bonjour et bienvenue dans notre boutique ! Je suis ravi de vous aider à trouver le produit parfait !",
                 "✨ Salut ! Quelle excellente idée de faire du shopping ! Je suis votre conseiller personnel.",
@@ -37,7 +79,7 @@ class SmartSalesAssistant:
                 "🎯 Excellente question ! Parlez-moi de vos besoins.",
                 "✨ Avec plaisir ! Plus j'en sais, mieux je peux vous conseiller !"
             ]
-        }
+        }.items()}
         
         self.color_patterns = {
             "rouge": r"\b(rouge|red|bordeaux|cerise)\b",
@@ -84,6 +126,27 @@ class SmartSalesAssistant:
             "sport": r"\b(sport|gym|fitness|course|jogging)\b",
             "quotidien": r"\b(quotidien|tous les jours|casual|décontracté)\b"
         }
+        
+        # Index de correction des fautes de frappe ("casqette" -> "casquette"),
+        # relu depuis le cache de démarrage tant que motifs et catalogue sont inchangés
+        self.typo_index = startup_cache.cached("sales_typo_index", digest(
+            self.color_patterns, self.category_patterns, self.price_patterns, self.recipient_patterns,
+            self.occasion_patterns, product_db.catalog_fingerprint(), source_digest("fuzzy_matcher", __name__)
+        ), self.build_typo_index)
+    
+    def build_typo_index(self) -> SymSpellIndex:
+        """Précalcule l'index de suppressions sur les mots des motifs et des produits"""
+        index = SymSpellIndex(max_distance=2)
+        for patterns in [self.color_patterns, self.category_patterns, self.price_patterns,
+                         self.recipient_patterns, self.occasion_patterns]:
+            index.add_words(words_of(patterns.keys()), priority=2)
+            index.add_words(words_of(patterns.values()), priority=2)
+        for product in product_db.get_all_products():
+            index.add_words(words_of([product["name"], product["category"],
+                                      product["subcategory"], product["color"]]))
+            index.add_known_words(words_of([product["description"], *product["tags"]]))
+        index.add_known_words(COMMON_FRENCH_WORDS)
+        return index
     
     def get_or_create_session(self, session_id: str = "default") -> Dict[str, Any]:
         """Récupère ou crée une session utilisateur"""
@@ -113,7 +176,7 @@ class SmartSalesAssistant:
     
     def detect_intent_and_context(self, message: str, session_id: str = "default") -> Dict[str, Any]:
         """Analyse complète du message pour comprendre l'intention et le contexte"""
-        message_lower = message.lower()
+        message_lower = self.typo_index.correct_text(message.lower())
         
         session = self.get_or_create_session(session_id)
         existing_context = session["context"].copy()
@@ -186,6 +249,11 @@ class SmartSalesAssistant:
     
     def search_products_smart(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Recherche intelligente avec alternatives"""
+        return product_db.resolve(self.search_products_relaxed(context))
+    
+    @metrics.timed("product_search")
+    def search_products_relaxed(self, context: Dict[str, Any]) -> RelaxedSearchResult:
+        """Recherche intelligente en un seul passage, en retirant la catégorie si aucun résultat"""
         criteria = {}
         
         if context["color"]:
@@ -224,14 +292,7 @@ class SmartSalesAssistant:
         if tags:
             criteria["tags"] = tags
         
-        products = product_db.complex_search(**criteria)
-        
-        if not products and context["category"]:
-            alt_criteria = {k: v for k, v in criteria.items() if k != "category"}
-            if alt_criteria:
-                products = product_db.complex_search(**alt_criteria)
-        
-        return products
+        return product_db.search_with_relaxation(criteria, ["category"])
     
     def should_show_products(self, context: Dict[str, Any], session_id: str = "default") -> bool:
         """Détermine si on doit montrer les produits (après 2-3 questions max)"""
@@ -286,13 +347,6 @@ class SmartSalesAssistant:
     
     def build_understanding_response(self, context: Dict[str, Any], questions: List[str]) -> Dict[str, Any]:
         """Construit une réponse de compréhension du besoin (sans produits)"""
-        intro_phrases = [
-            "🎯 Parfait ! Je commence à comprendre vos besoins.",
-            "💡 Excellent ! Laissez-moi en savoir un peu plus.",
-            "✨ Super ! J'ai quelques questions pour vous trouver le produit idéal.",
-            "🤔 Très bien ! Encore quelques détails pour vous proposer exactement ce qu'il faut."
-        ]
-        
         summary_parts = []
         if context["recipient"]:
             summary_parts.append(f"pour {context['recipient']}")
@@ -303,21 +357,21 @@ class SmartSalesAssistant:
         if context["max_price"]:
             summary_parts.append(f"budget {context['max_price']} DT")
         
-        intro = random.choice(intro_phrases)
-        
-        if summary_parts:
-            summary = f"📝 Récapitulatif : {', '.join(summary_parts)}\n\n"
-        else:
-            summary = ""
+        intro = random.choice(INTRO_PHRASES)()
         
-        questions_text = "\n".join([f"• {q}" for q in questions])
+        summary = SUMMARY(parts=tuple(summary_parts)) if summary_parts else EMPTY
+        questions_text = QUESTIONS(questions=tuple(questions)) if questions else EMPTY
         
-        response = f"{intro}\n\n{summary}{questions_text}\n\n💬 Répondez simplement, je prépare une sélection personnalisée !"
+        response = intro + PARAGRAPH + summary + questions_text + UNDERSTANDING_OUTRO
         
         return {"text": response}
     
-    def build_final_recommendation_response(self, products: List[Dict], context: Dict) -> Dict[str, Any]:
+    def build_final_recommendation_response(self, products: List[Dict], context: Dict,
+                                            relaxed: Tuple[str, ...] = (),
+                                            total: Optional[int] = None) -> Dict[str, Any]:
         """Construit une réponse finale avec recommandations personnalisées"""
+        found = len(products) if total is None else total
+        
         profile_parts = []
         if context["recipient"]:
             if context["age"]:
@@ -334,39 +388,57 @@ class SmartSalesAssistant:
         if context["color"]:
             profile_parts.append(f"couleur {context['color']}")
         
-        profile_summary = ", ".join(profile_parts)
+        profile_parts = tuple(profile_parts)
         
-        if len(products) > 0:
-            response = f"🎉 PARFAIT ! J'ai trouvé {len(products)} produit(s) idéal(s) !\n\n"
-            response += f"📋 Profil : {profile_summary}\n\n"
+        if found > 0:
+            response = FOUND(found=found, profile=profile_parts)
             
             if context["occasion"] == "cadeau":
-                response += "🎁 Ces produits feront des cadeaux formidables !\n"
+                response += GIFT_NOTE
             if context["age"] and isinstance(context["age"], int):
                 if 5 <= context["age"] <= 12:
-                    response += "🧒 Parfaitement adapté pour cet âge !\n"
+                    response += CHILD_NOTE
                 elif 13 <= context["age"] <= 17:
-                    response += "😎 Dans la tendance pour les ados !\n"
+                    response += TEEN_NOTE
+            
+            response += BUDGET_NOTE(max_price=context["max_price"])
             
-            response += f"💰 Tous respectent votre budget de {context['max_price']} DT !\n\n"
-            response += "✨ Voici ma sélection personnalisée :"
+            if relaxed:
+                response += RELAXED_NOTE(labels=tuple(CRITERIA_LABELS.get(key, key) for key in relaxed))
+            response += SELECTION
             
         else:
-            response = f"🤔 Hmm, je n'ai pas trouvé de produits qui correspondent exactement à :\n\n"
-            response += f"📋 {profile_summary}\n\n"
-            response += "💡 Mais regardez ces alternatives qui pourraient vous intéresser :"
+            response = NOT_FOUND(profile=profile_parts)
         
         return {"text": response}
     
     def build_no_results_response(self, context: Dict) -> Dict[str, Any]:
         """Construit une réponse alternative quand aucun produit n'est trouvé"""
-        response = "🤔 Je n'ai pas trouvé exactement ce que vous cherchez, mais regardez ces alternatives :\n\n"
-        response += "💡 N'hésitez pas à me donner plus de détails pour que je vous trouve le produit parfait !"
-        
-        return {"text": response}
+        return {"text": NO_RESULTS}
     
     def generate_smart_response(self, user_message: str, session_id: str = "default") -> Dict[str, Any]:
         """Génère une réponse commerciale intelligente avec questions de clarification"""
+        if self.shared_state is None:
+            return self._generate_smart_response(user_message, session_id)
+        
+        # Session partagée : copie locale le temps du message, réécrite par une
+        # mise à jour atomique ; rejouée si un autre worker l'a modifiée entre-temps
+        results = []
+        
+        def answer(stored: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            self.user_sessions.pop(session_id, None)
+            if stored is not None:
+                self.user_sessions[session_id] = stored
+            results[:] = [self._generate_smart_response(user_message, session_id)]
+            return self.user_sessions[session_id]
+        
+        try:
+            self.shared_state.update("sessions", session_id, answer)
+            return results[0]
+        finally:
+            self.user_sessions.pop(session_id, None)
+    
+    def _generate_smart_response(self, user_message: str, session_id: str) -> Dict[str, Any]:
         context = self.detect_intent_and_context(user_message, session_id)
         session = self.get_or_create_session(session_id)
         
@@ -374,23 +446,18 @@ class SmartSalesAssistant:
             "user": user_message,
             "context": context.copy()
         })
+        del session["conversation_history"][:-MAX_SESSION_HISTORY]
         
         if context["intent"] == "salutations":
-            greeting = random.choice(self.responses["salutations"])
-            proactive_questions = [
-                "🎯 Pour commencer, dites-moi : c'est pour qui ?",
-                "💰 Quel est votre budget approximatif ?",
-                "🌈 Avez-vous une couleur préférée ?"
-            ]
+            greeting = random.choice(self.responses["salutations"])()
+            proactive_questions = list(PROACTIVE_QUESTIONS)
             
-            response_text = f"{greeting}\n\n💡 Pour vous proposer exactement ce qu'il vous faut :\n"
-            response_text += "\n".join([f"• {q}" for q in proactive_questions])
-            response_text += "\n\n✨ Plus vous me donnez d'infos, mieux je peux vous conseiller !"
+            response_text = greeting + GREETING_DETAILS(questions=tuple(proactive_questions))
             
             session["last_questions"] = proactive_questions
             
             return {
-                "response": response_text,
+                "response": str(response_text),
                 "products": [],
                 "criteria": context,
                 "follow_up": "awaiting_details",
@@ -399,7 +466,7 @@ class SmartSalesAssistant:
         
         if context["intent"] in ["au_revoir", "aide"]:
             return {
-                "response": random.choice(self.responses[context["intent"]]),
+                "response": str(random.choice(self.responses[context["intent"]])()),
                 "products": [],
                 "criteria": context,
                 "follow_up": None,
@@ -408,12 +475,18 @@ class SmartSalesAssistant:
         
 
         if self.should_show_products(context, session_id):
-            products = self.search_products_smart(context)
-            response = self.build_final_recommendation_response(products, context)
+            search_result = self.search_products_relaxed(context)
+            text_scores = product_text_index.relative_scores(user_message)
+            
+            if search_result.product_ids:
+                products = product_ranker.top_k(search_result.product_ids, context, 6,
+                                                text_scores=text_scores)
+            else:
+                products = product_ranker.alternatives(search_result.partial_ids, context, 6, text_scores)
             
-            if not products:
-                alt_products = product_db.get_all_products()[:6] 
-                products = alt_products
+            response = self.build_final_recommendation_response(
+                products, context, search_result.relaxed, total=len(search_result.product_ids)
+            )
             
             questions = []
         
@@ -424,7 +497,7 @@ class SmartSalesAssistant:
             products = [] 
         
         return {
-            "response": response["text"],
+            "response": str(response["text"]),
             "products": products[:6] if products else [],
             "criteria": context,
             "follow_up": response.get("follow_up"),
@@ -440,8 +513,10 @@ class SmartSalesAssistant:
             "total_products": total_products,
             "categories": list(categories),
             "sessions": len(self.user_sessions),
+            "shared_state": self.shared_state.get_stats() if self.shared_state is not None else None,
+            "search_cache": product_db.search_cache.get_stats(),
             "type": "Smart Sales Assistant with Session Management"
         }
 
 
-ecommerce_chatbot = SmartSalesAssistant()
\ No newline at end of file
+ecommerce_chatbot = SmartSalesAssistant(state=state_backend)
\ No newline at end of file
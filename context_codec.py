@@ -0,0 +1,240 @@
+"""
+Context Data Codec
+Compact binary encoding of conversation context dictionaries, with keys
+interned as small integers in a per-database table
+"""
+
+import sqlite3
+import struct
+import threading
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+CODEC_VERSION = 1
+
+# Value tags
+TAG_NONE, TAG_FALSE, TAG_TRUE, TAG_INT, TAG_FLOAT, TAG_STR, TAG_LIST, TAG_DICT = range(8)
+
+DOUBLE = struct.Struct("<d")
+# Decoded flat contexts are few and repeat a lot ({}, {"recipient": "fille"}, ...)
+DECODE_CACHE_SIZE = 4096
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class ContextCodec:
+    """
+    Encodes context dicts as: version byte, then (key id, tag, payload)
+    entries. Key ids come from the context_keys table, so a key like
+    "max_price" costs one byte per row instead of its JSON spelling.
+    Empty contexts, the common case, encode to an empty blob.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path
+        self.key_ids: Dict[str, int] = {}
+        self.keys: List[Optional[str]] = []
+        self._lock = threading.Lock()
+        self._decoded: Dict[bytes, Tuple[Tuple[str, Any], ...]] = {}
+        if db_path:
+            self.reload_keys()
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS context_keys (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE
+            )
+        """)
+
+    def reload_keys(self):
+        """Read the interned keys (other processes may have added some)"""
+        with sqlite3.connect(self.db_path) as conn:
+            self.create_table(conn)
+            rows = conn.execute("SELECT id, key FROM context_keys").fetchall()
+        with self._lock:
+            for key_id, key in rows:
+                self._register(key_id, key)
+
+    def _register(self, key_id: int, key: str):
+        if key_id >= len(self.keys):
+            self.keys.extend([None] * (key_id + 1 - len(self.keys)))
+        self.keys[key_id] = key
+        self.key_ids[key] = key_id
+
+    def intern(self, key: str, conn: Optional[sqlite3.Connection] = None) -> int:
+        """
+        Id of a key, adding it to context_keys on first use
+        Pass conn when already inside a transaction on the same database
+        """
+        key_id = self.key_ids.get(key)
+        if key_id is not None:
+            return key_id
+
+        with self._lock:
+            if key in self.key_ids:
+                return self.key_ids[key]
+            if conn is not None:
+                key_id = self._insert_key(conn, key)
+            elif self.db_path:
+                with sqlite3.connect(self.db_path) as own_conn:
+                    key_id = self._insert_key(own_conn, key)
+                    own_conn.commit()
+            else:
+                key_id = len(self.keys)
+            self._register(key_id, key)
+            return key_id
+
+    def _insert_key(self, conn: sqlite3.Connection, key: str) -> int:
+        self.create_table(conn)
+        conn.execute("INSERT OR IGNORE INTO context_keys (key) VALUES (?)", (key,))
+        return conn.execute("SELECT id FROM context_keys WHERE key = ?", (key,)).fetchone()[0]
+
+    def encode(self, context: Dict[str, Any], conn: Optional[sqlite3.Connection] = None) -> bytes:
+        if not context:
+            return b""
+        out = bytearray((CODEC_VERSION,))
+        self._encode_entries(out, context, conn)
+        return bytes(out)
+
+    def _encode_entries(self, out: bytearray, mapping: Dict[str, Any], conn: Optional[sqlite3.Connection]):
+        for key, value in mapping.items():
+            _write_varint(out, self.intern(str(key), conn))
+            self._encode_value(out, value, conn)
+
+    def _encode_value(self, out: bytearray, value: Any, conn: Optional[sqlite3.Connection]):
+        if value is None:
+            out.append(TAG_NONE)
+        elif value is True or value is False:
+            out.append(TAG_TRUE if value else TAG_FALSE)
+        elif isinstance(value, int):
+            out.append(TAG_INT)
+            _write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)  # zigzag
+        elif isinstance(value, float):
+            out.append(TAG_FLOAT)
+            out += DOUBLE.pack(value)
+        elif isinstance(value, str):
+            encoded = value.encode("utf-8")
+            out.append(TAG_STR)
+            _write_varint(out, len(encoded))
+            out += encoded
+        elif isinstance(value, (list, tuple)):
+            out.append(TAG_LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                self._encode_value(out, item, conn)
+        elif isinstance(value, dict):
+            out.append(TAG_DICT)
+            _write_varint(out, len(value))
+            self._encode_entries(out, value, conn)
+        else:
+            raise TypeError(f"Cannot encode context value of type {type(value).__name__}")
+
+    def encode_values(self, out: bytearray, values: Iterable[Any], conn: Optional[sqlite3.Connection] = None):
+        """Append tagged values, for other blobs that share this encoding"""
+        for value in values:
+            self._encode_value(out, value, conn)
+
+    def decode_values(self, data: bytes, position: int, count: int) -> Tuple[List[Any], int]:
+        """Read count values written by encode_values"""
+        values = []
+        for _ in range(count):
+            value, position = self._decode_value(data, position)
+            values.append(value)
+        return values, position
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        if not data:
+            return {}
+        data = bytes(data)
+        items = self._decoded.get(data)
+        if items is not None:
+            return dict(items)
+        return self._decode(data)
+
+    def decode_items(self, data: bytes) -> Tuple[Tuple[str, Any], ...]:
+        """Decoded (key, value) pairs; flat contexts share one tuple per distinct blob"""
+        if not data:
+            return ()
+        data = bytes(data)
+        items = self._decoded.get(data)
+        if items is None:
+            result = self._decode(data)
+            # Contexts with nested values are not cached
+            items = self._decoded.get(data) or tuple(result.items())
+        return items
+
+    def _decode(self, data: bytes) -> Dict[str, Any]:
+        if data[0] != CODEC_VERSION:
+            raise ValueError(f"Unsupported context encoding version {data[0]}")
+        try:
+            result, _ = self._decode_entries(data, 1, None)
+        except (IndexError, KeyError):
+            # A key interned by another process: refresh and retry once
+            if not self.db_path:
+                raise
+            self.reload_keys()
+            result, _ = self._decode_entries(data, 1, None)
+
+        if all(not isinstance(value, (list, dict)) for value in result.values()):
+            if len(self._decoded) >= DECODE_CACHE_SIZE:
+                self._decoded.clear()
+            self._decoded[data] = tuple(result.items())
+        return result
+
+    def _decode_entries(self, data: bytes, position: int, count: Optional[int]) -> Tuple[Dict[str, Any], int]:
+        result: Dict[str, Any] = {}
+        keys = self.keys
+        end = len(data)
+        while position < end if count is None else len(result) < count:
+            key_id, position = _read_varint(data, position)
+            key = keys[key_id]
+            if key is None:
+                raise KeyError(key_id)
+            result[key], position = self._decode_value(data, position)
+        return result, position
+
+    def _decode_value(self, data: bytes, position: int) -> Tuple[Any, int]:
+        tag = data[position]
+        position += 1
+        if tag == TAG_STR:
+            length, position = _read_varint(data, position)
+            return data[position:position + length].decode("utf-8"), position + length
+        if tag == TAG_INT:
+            value, position = _read_varint(data, position)
+            return (value >> 1) ^ -(value & 1), position
+        if tag == TAG_FLOAT:
+            return DOUBLE.unpack_from(data, position)[0], position + 8
+        if tag == TAG_NONE:
+            return None, position
+        if tag == TAG_FALSE:
+            return False, position
+        if tag == TAG_TRUE:
+            return True, position
+        if tag == TAG_LIST:
+            length, position = _read_varint(data, position)
+            items = []
+            for _ in range(length):
+                item, position = self._decode_value(data, position)
+                items.append(item)
+            return items, position
+        if tag == TAG_DICT:
+            length, position = _read_varint(data, position)
+            return self._decode_entries(data, position, length)
+        raise ValueError(f"Unknown context value tag {tag}")
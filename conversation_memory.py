@@ -3,152 +3,482 @@ Conversation Memory System
 Manages user conversation history and context for personalized responses
 """
 
+import atexit
+import base64
 import json
+import logging
+import os
 import sqlite3
+import struct
+import sys
+import threading
+import time
+import weakref
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
-from collections import deque
+from typing import Dict, List, Any, Iterator, Optional, Sequence, Tuple
+
+from heavy_hitters import SpaceSavingCounter
+from memory_maintenance import delete_in_chunks
+from context_codec import ContextCodec
+from response_templates import Response, TemplateStore
+from memory_schema import migrate, to_epoch_ms, from_epoch_ms
+from metrics import metrics
+from state_backend import StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+
+# Unknown queries longer than this are truncated before counting (bounds buffer memory)
+UNKNOWN_QUERY_MAX_LENGTH = 500
+# Days of history kept in memory, and users read per batch when preloading it
+RECENT_HISTORY_DAYS = 7
+PRELOAD_BATCH_USERS = 500
+# Database of the API, opened (and migrated) by its startup
+DEFAULT_DB_PATH = "chatbot_memory.db"
+# Namespaces of the running context in a shared state backend
+HISTORY_NAMESPACE = "history"
+PREFERENCES_NAMESPACE = "preferences"
+
+
+# Numeric fields of a turn packed in one bytes object:
+# timestamp (epoch ms), turn id (0 until persisted), confidence (float32)
+PACKED_FIELDS = struct.Struct("<qqf")
+# Contexts and responses repeat a lot ((), (("recipient", "fille"),), greetings...):
+# turns share one object per distinct value
+SHARED_CACHE_SIZE = 4096
+_shared_contexts: Dict[tuple, tuple] = {}
+_shared_responses: Dict[str, bytes] = {}
+
+
+def compact_context(context: Any) -> Tuple[Tuple[str, Any], ...]:
+    """Context dict (or pairs) as a shared tuple of (key, value) pairs"""
+    items = tuple(context.items()) if isinstance(context, dict) else tuple(context)
+    try:
+        shared = _shared_contexts.get(items)
+    except TypeError:
+        return items  # list or dict values: not shareable
+    if shared is None:
+        if len(_shared_contexts) >= SHARED_CACHE_SIZE:
+            _shared_contexts.clear()
+        shared = _shared_contexts[items] = items
+    return shared
+
+
+def compact_response(response: str) -> bytes:
+    """Response text as shared UTF-8 bytes"""
+    encoded = _shared_responses.get(response)
+    if encoded is None:
+        if len(_shared_responses) >= SHARED_CACHE_SIZE:
+            _shared_responses.clear()
+        encoded = _shared_responses[response] = response.encode("utf-8")
+    return encoded
 
 
-@dataclass
 class ConversationTurn:
-    """Represents a single conversation turn"""
-    user_id: str
-    message: str
-    intent: str
-    confidence: float
-    context_data: Dict[str, Any]
-    response: str
-    timestamp: datetime
-    
+    """
+    Represents a single conversation turn
+    Memory keeps several turns for every active user, so a turn is compact:
+    slots instead of a __dict__, interned user id and intent, the numeric
+    fields packed in 20 bytes, a shared context tuple, and the response kept
+    as UTF-8 bytes (a str holding emoji takes 4 bytes per character) or as a
+    deferred object rendered with str() when read.
+    """
+    __slots__ = ("user_id", "message", "intent", "_packed", "_context", "_response")
+
+    def __init__(self, user_id: str, message: str, intent: str, confidence: float,
+                 context_data: Any, response: Any, timestamp: Any, turn_id: Optional[int] = None):
+        self.user_id = sys.intern(user_id)
+        self.message = message
+        self.intent = sys.intern(intent)
+        # timestamp: datetime, or epoch milliseconds as stored in the database
+        timestamp_ms = timestamp if isinstance(timestamp, int) else to_epoch_ms(timestamp)
+        self._packed = PACKED_FIELDS.pack(timestamp_ms, turn_id or 0, confidence)
+        self._context = compact_context(context_data)
+        self.response = response
+
+    @property
+    def timestamp_ms(self) -> int:
+        return PACKED_FIELDS.unpack(self._packed)[0]
+
+    @property
+    def timestamp(self) -> datetime:
+        return from_epoch_ms(self.timestamp_ms)
+
+    @property
+    def turn_id(self) -> Optional[int]:
+        """conversations.id once persisted"""
+        return PACKED_FIELDS.unpack(self._packed)[1] or None
+
+    @turn_id.setter
+    def turn_id(self, value: Optional[int]):
+        timestamp_ms, _, confidence = PACKED_FIELDS.unpack(self._packed)
+        self._packed = PACKED_FIELDS.pack(timestamp_ms, value or 0, confidence)
+
+    @property
+    def confidence(self) -> float:
+        # float32 keeps about 7 significant digits
+        return round(PACKED_FIELDS.unpack(self._packed)[2], 6)
+
+    @property
+    def context_items(self) -> Tuple[Tuple[str, Any], ...]:
+        return self._context
+
+    @property
+    def context_data(self) -> Dict[str, Any]:
+        return dict(self._context)
+
+    @property
+    def deferred_response(self) -> Any:
+        """The response object when it is rendered on access (template replies), else None"""
+        return None if type(self._response) is bytes else self._response
+
+    @property
+    def response(self) -> str:
+        response = self._response
+        return response.decode("utf-8") if type(response) is bytes else str(response)
+
+    @response.setter
+    def response(self, value: Any):
+        self._response = compact_response(value) if isinstance(value, str) else value
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ConversationTurn):
+            return NotImplemented
+        return (self.user_id, self.message, self.intent, self._packed, self._context, self.response) == \
+            (other.user_id, other.message, other.intent, other._packed, other._context, other.response)
+
+    def __repr__(self) -> str:
+        return (f"ConversationTurn(user_id={self.user_id!r}, message={self.message!r}, intent={self.intent!r}, "
+                f"confidence={self.confidence!r}, timestamp={self.timestamp!r}, turn_id={self.turn_id!r})")
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
-        data = asdict(self)
-        data['timestamp'] = self.timestamp.isoformat()
-        return data
+        timestamp_ms, turn_id, _ = PACKED_FIELDS.unpack(self._packed)
+        return {
+            "user_id": self.user_id,
+            "message": self.message,
+            "intent": self.intent,
+            "confidence": self.confidence,
+            "context_data": dict(self._context),
+            "response": self.response,
+            "timestamp": from_epoch_ms(timestamp_ms).isoformat(),
+            "turn_id": turn_id or None
+        }
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ConversationTurn':
         """Create from dictionary"""
-        data['timestamp'] = datetime.fromisoformat(data['timestamp'])
+        data = dict(data, timestamp=datetime.fromisoformat(data['timestamp']))
         return cls(**data)
 
 
+def encode_history_cursor(timestamp_ms: int, turn_id: int) -> str:
+    """Opaque pagination cursor pointing just after a (timestamp, id) position"""
+    return base64.urlsafe_b64encode(f"{timestamp_ms}:{turn_id}".encode()).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> Tuple[int, int]:
+    """Inverse of encode_history_cursor; ValueError on a malformed cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp_ms, turn_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        return int(timestamp_ms), int(turn_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid history cursor: {cursor!r}") from e
+
+
+# Memories with an open database, flushed once at interpreter exit
+open_memories: "weakref.WeakSet[ConversationMemory]" = weakref.WeakSet()
+
+
+@atexit.register
+def flush_open_memories():
+    """Write the unknown queries still buffered by every open database"""
+    for memory in list(open_memories):
+        try:
+            memory.flush_unknown_queries()
+        except sqlite3.Error as e:
+            logger.error(f"Unknown query flush at exit failed: {e}")
+
+
+def merge_preferences(preferences: Dict[str, Any], context_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Count the non-empty context values of a turn into preferences (updated in place and returned)"""
+    for key, value in context_data.items():
+        if value is not None:
+            if key in preferences:
+                # Keep track of frequency for repeated preferences
+                if isinstance(preferences[key], dict) and 'value' in preferences[key]:
+                    if preferences[key]['value'] == value:
+                        preferences[key]['frequency'] = preferences[key].get('frequency', 1) + 1
+                    else:
+                        # New value, reset frequency
+                        preferences[key] = {'value': value, 'frequency': 1}
+                else:
+                    # Convert to frequency tracking
+                    preferences[key] = {'value': value, 'frequency': 1}
+            else:
+                preferences[key] = {'value': value, 'frequency': 1}
+    return preferences
+
+
 class ConversationMemory:
     """
     Manages conversation history and user context
     Supports both in-memory and persistent SQLite storage
+    With a shared state backend (several API workers), the last turns and the
+    preferences of each user live in the backend instead of this process, so
+    every worker sees the same running context.
     """
     
-    def __init__(self, db_path: Optional[str] = None, memory_limit: int = 5):
+    def __init__(self, db_path: Optional[str] = None, memory_limit: int = 5,
+                 unknown_query_capacity: int = 1000, unknown_flush_interval: float = 5.0,
+                 preload: bool = True, state: Optional[StateBackend] = None):
         self.memory_limit = memory_limit
-        self.db_path = db_path
+        self.db_path: Optional[str] = None
+        # None when this process owns the running context (single worker)
+        self.shared_state = state if state is not None and state.shared else None
         
-        # In-memory storage (fast access)
-        self.user_conversations: Dict[str, deque] = {}
+        # In-memory storage (fast access); the last memory_limit turns of each
+        # user as a tuple: 5 turns take 80 bytes of slots where a deque takes 600
+        self.user_conversations: Dict[str, Tuple[ConversationTurn, ...]] = {}
         self.user_preferences: Dict[str, Dict[str, Any]] = {}
+        # Without preload, users whose recent turns were read on first access;
+        # None once every recent turn is in memory
+        self._loaded_users: Optional[set] = None
+        # Users handed off to another worker: reread from the database on next access
+        self._released_users: set = set()
+        self._load_lock = threading.Lock()
+        
+        # Unknown queries are counted in memory and upserted in batches
+        self.unknown_query_counter = SpaceSavingCounter(unknown_query_capacity)
+        self.unknown_flush_interval = unknown_flush_interval
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        
+        # Binary context_data encoding with interned keys
+        self.codec = ContextCodec()
+        # Template replies are stored as template ids and parameters
+        self.templates = TemplateStore(None, self.codec)
         
         # Initialize database if path provided
         if db_path:
-            self.init_database()
+            self.open_database(db_path, preload)
+    
+    def open_database(self, db_path: str, preload: bool = False):
+        """
+        Persist to db_path from now on, migrating the file to the current schema
+        Opening a database writes to it, so an instance created without a
+        path stays in memory until its owner opens one explicitly (the API at
+        startup, the command-line tools on the file they are given).
+        The path is made absolute, so later writes (the exit flush included)
+        go to the same file whatever the working directory is by then.
+        """
+        db_path = os.path.abspath(db_path)
+        self.db_path = db_path
+        open_memories.add(self)
+        self.codec = ContextCodec(db_path=db_path)
+        self.templates = TemplateStore(db_path, self.codec)
+        self.init_database()
+        if preload or self.shared_state is not None:
             self.load_recent_conversations()
+        else:
+            self._loaded_users = set()
+    
+    def close_database(self):
+        """Flush buffered writes and go back to in-memory storage"""
+        self.flush_unknown_queries()
+        open_memories.discard(self)
+        with self._load_lock:
+            self.db_path = None
+            self.codec = ContextCodec()
+            self.templates = TemplateStore(None, self.codec)
+            self._loaded_users = None
+            self._released_users.clear()
     
     def init_database(self):
-        """Initialize SQLite database tables"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS conversations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    intent TEXT NOT NULL,
-                    confidence REAL NOT NULL,
-                    context_data TEXT NOT NULL,
-                    response TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS user_preferences (
-                    user_id TEXT PRIMARY KEY,
-                    preferences TEXT NOT NULL,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS unknown_queries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    message TEXT NOT NULL,
-                    frequency INTEGER DEFAULT 1,
-                    first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(message)
-                )
-            """)
-            
-            # Create indexes for better performance
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations(user_id)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp)")
-            conn.commit()
+        """Create the database, or migrate an older file to the current schema"""
+        migrate(self.db_path, self.codec)
+        self.codec.reload_keys()
     
-    def load_recent_conversations(self, days: int = 7):
-        """Load recent conversations from database into memory"""
-        if not self.db_path:
+    @property
+    def history_preloaded(self) -> bool:
+        """Whether every recent turn is in memory (else users are loaded on first access)"""
+        return self._loaded_users is None
+    
+    def load_recent_conversations(self, days: int = RECENT_HISTORY_DAYS, batch_size: int = PRELOAD_BATCH_USERS):
+        """
+        Load recent conversations from database into memory
+        Users are read in batches, each a short read that doesn't hold up
+        writers, so this can run in the background while requests are served;
+        users loaded on demand in the meantime are skipped.
+        """
+        if not self.db_path or self.shared_state is not None:
+            # Shared history is read from the backend, nothing to hold here
+            self._loaded_users = None
             return
         
-        cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
+        cutoff = to_epoch_ms(datetime.now() - timedelta(days=days))
+        after = ""
+        while True:
+            with sqlite3.connect(self.db_path) as conn:
+                users = [row[0] for row in conn.execute("""
+                    SELECT DISTINCT user_id FROM conversations
+                    WHERE user_id > ? AND timestamp > ?
+                    ORDER BY user_id LIMIT ?
+                """, (after, cutoff, batch_size))]
+                if not users:
+                    break
+                conn.row_factory = sqlite3.Row
+                rows = conn.execute(f"""
+                    SELECT id, user_id, message, intent, confidence, context_data, response, timestamp
+                    FROM conversations 
+                    WHERE user_id IN ({", ".join("?" * len(users))}) AND timestamp > ?
+                    ORDER BY user_id, timestamp, id
+                """, (*users, cutoff)).fetchall()
+            
+            with self._load_lock:
+                loaded = self._loaded_users
+                for row in rows:
+                    if loaded is None or row['user_id'] not in loaded:
+                        self._remember_turn(self._row_to_turn(row))
+                if loaded is not None:
+                    loaded.update(users)
+            after = users[-1]
+        
+        with self._load_lock:
+            self._loaded_users = None
+    
+    def _ensure_user_loaded(self, user_id: str):
+        """Until the history is preloaded, read a user's recent turns on first access"""
+        loaded = self._loaded_users
+        if (loaded is None or user_id in loaded) and user_id not in self._released_users:
+            return
         
+        with self._load_lock:
+            loaded = self._loaded_users
+            released = user_id in self._released_users
+            if (loaded is None or user_id in loaded) and not released:
+                return
+            for turn in self._query_recent(user_id):
+                self._remember_turn(turn)
+            if released:
+                # Learned by the previous owner: only the database has them
+                preferences = self._query_preferences(user_id)
+                if preferences:
+                    self.user_preferences[user_id] = preferences
+                self._released_users.discard(user_id)
+            if loaded is not None:
+                loaded.add(user_id)
+    
+    def _query_recent(self, user_id: str) -> List[ConversationTurn]:
+        """A user's last memory_limit persisted turns of the recent days, oldest first"""
+        cutoff = to_epoch_ms(datetime.now() - timedelta(days=RECENT_HISTORY_DAYS))
         with sqlite3.connect(self.db_path) as conn:
             conn.row_factory = sqlite3.Row
-            cursor = conn.execute("""
-                SELECT user_id, message, intent, confidence, context_data, response, timestamp
-                FROM conversations 
-                WHERE timestamp > ?
-                ORDER BY user_id, timestamp
-            """, (cutoff_date,))
-            
-            for row in cursor:
-                user_id = row['user_id']
-                turn = ConversationTurn(
-                    user_id=user_id,
-                    message=row['message'],
-                    intent=row['intent'],
-                    confidence=row['confidence'],
-                    context_data=json.loads(row['context_data']),
-                    response=row['response'],
-                    timestamp=datetime.fromisoformat(row['timestamp'])
-                )
-                
-                if user_id not in self.user_conversations:
-                    self.user_conversations[user_id] = deque(maxlen=self.memory_limit)
-                
-                self.user_conversations[user_id].append(turn)
+            rows = conn.execute("""
+                SELECT id, user_id, message, intent, confidence, context_data, response, timestamp
+                FROM conversations
+                WHERE user_id = ? AND timestamp > ?
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            """, (user_id, cutoff, self.memory_limit)).fetchall()
+        return [self._row_to_turn(row) for row in reversed(rows)]
+    
+    def _query_preferences(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT preferences FROM user_preferences WHERE user_id = ?",
+                               (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def release_user(self, user_id: str) -> bool:
+        """
+        Hand a user off to another worker (affinity routing moved them)
+        Turns and preferences are written through to the database, so the
+        in-memory copy is simply dropped; if the user comes back, it is reread
+        rather than served stale. Returns whether anything was held.
+        """
+        if self.shared_state is not None:
+            return False  # Nothing held here
+        
+        with self._load_lock:
+            held = self.user_conversations.pop(user_id, None) is not None
+            held = self.user_preferences.pop(user_id, None) is not None or held
+            if self.db_path:
+                self._released_users.add(user_id)
+        return held
+    
+    def _recent_turns(self, user_id: str) -> Sequence[ConversationTurn]:
+        """A user's last turns, oldest first, from this process or the shared backend"""
+        if self.shared_state is None:
+            self._ensure_user_loaded(user_id)
+            return self.user_conversations.get(user_id, ())
+        
+        records = self.shared_state.get(HISTORY_NAMESPACE, user_id)
+        if records is None:
+            # Not in the backend yet (turns persisted before it was deployed)
+            return self._query_recent(user_id) if self.db_path else []
+        return [ConversationTurn.from_dict(record) for record in records]
+    
+    def _share_turn(self, turn: ConversationTurn):
+        """Append a turn (persisted first, so it carries its id) to the shared history"""
+        record = turn.to_dict()
+        
+        def append(records: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+            if records is None:
+                records = [persisted.to_dict() for persisted in
+                           (self._query_recent(turn.user_id) if self.db_path else [])
+                           if persisted.turn_id != turn.turn_id]
+            return (records + [record])[-self.memory_limit:]
+        
+        self.shared_state.update(HISTORY_NAMESPACE, turn.user_id, append)
+    
+    def _remember_turn(self, turn: ConversationTurn):
+        # turn.user_id is interned: the dict key and the turns share it
+        history = self.user_conversations.get(turn.user_id, ())
+        if len(history) >= self.memory_limit:
+            history = history[len(history) - self.memory_limit + 1:] if self.memory_limit > 1 else ()
+        self.user_conversations[turn.user_id] = history + (turn,)
+    
+    def _row_to_turn(self, row: sqlite3.Row) -> ConversationTurn:
+        return ConversationTurn(
+            user_id=row['user_id'],
+            message=row['message'],
+            intent=row['intent'],
+            confidence=row['confidence'],
+            context_data=self.codec.decode_items(row['context_data']),
+            response=self.decode_response(row['response']),
+            timestamp=row['timestamp'],
+            turn_id=row['id']
+        )
+    
+    def decode_response(self, stored: Any) -> Any:
+        """Stored response column: rendered text, or a template reply blob"""
+        return self.templates.decode(stored) if isinstance(stored, bytes) else stored
     
     def add_conversation_turn(self, turn: ConversationTurn):
         """Add a conversation turn to memory and optionally to database"""
         user_id = turn.user_id
         
-        # Add to in-memory storage
-        if user_id not in self.user_conversations:
-            self.user_conversations[user_id] = deque(maxlen=self.memory_limit)
-        
-        self.user_conversations[user_id].append(turn)
+        # Add to in-memory storage, after the turns already persisted
+        if self.shared_state is None:
+            self._ensure_user_loaded(user_id)
+            self._remember_turn(turn)
         
         # Persist to database if available
         if self.db_path:
             self.save_conversation_turn(turn)
         
+        if self.shared_state is not None:
+            self._share_turn(turn)
+        
         # Update user preferences based on context
         self.update_user_preferences(user_id, turn.context_data)
     
+    @metrics.timed("sqlite_write")
     def save_conversation_turn(self, turn: ConversationTurn):
         """Save conversation turn to database"""
         with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
+            deferred = turn.deferred_response
+            cursor = conn.execute("""
                 INSERT INTO conversations 
                 (user_id, message, intent, confidence, context_data, response, timestamp)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -157,24 +487,88 @@ class ConversationMemory:
                 turn.message,
                 turn.intent,
                 turn.confidence,
-                json.dumps(turn.context_data),
-                turn.response,
-                turn.timestamp.isoformat()
+                self.codec.encode(turn.context_data),
+                self.templates.encode(deferred, conn) if isinstance(deferred, Response) else turn.response,
+                turn.timestamp_ms
             ))
             conn.commit()
+            turn.turn_id = cursor.lastrowid
     
     def get_conversation_history(self, user_id: str, limit: Optional[int] = None) -> List[ConversationTurn]:
         """Get conversation history for a user"""
-        if user_id not in self.user_conversations:
-            return []
-        
-        history = list(self.user_conversations[user_id])
+        history = list(self._recent_turns(user_id))
         
         if limit:
             return history[-limit:]
         
         return history
     
+    def get_history_page(self, user_id: str, limit: int = 10, cursor: Optional[str] = None,
+                         intent: Optional[str] = None, since: Optional[datetime] = None,
+                         until: Optional[datetime] = None) -> Tuple[List[ConversationTurn], Optional[str]]:
+        """
+        One page of a user's full history, newest first, and the cursor of the next page
+        The in-memory turns (the newest ones) are used first; older turns come
+        from a keyset query on (user_id, timestamp, id), so every page costs one
+        index seek whatever its depth
+        """
+        before = decode_history_cursor(cursor) if cursor else None
+        since_ms = to_epoch_ms(since) if since else None
+        until_ms = to_epoch_ms(until) if until else None
+        
+        def position(turn: ConversationTurn) -> Tuple[int, int]:
+            return turn.timestamp_ms, turn.turn_id or 0
+        
+        def matches(turn: ConversationTurn) -> bool:
+            timestamp_ms = turn.timestamp_ms
+            return ((intent is None or turn.intent == intent)
+                    and (since_ms is None or timestamp_ms >= since_ms)
+                    and (until_ms is None or timestamp_ms < until_ms))
+        
+        recent = [turn for turn in reversed(self._recent_turns(user_id))
+                  if before is None or position(turn) < before]
+        page = [turn for turn in recent if matches(turn)][:limit + 1]
+        
+        # Turns without an id were never persisted, so SQLite can't continue after them
+        if self.db_path and len(page) <= limit and all(turn.turn_id for turn in recent):
+            boundary = position(recent[-1]) if recent else before
+            page.extend(self._query_history(user_id, limit + 1 - len(page), boundary,
+                                            intent, since_ms, until_ms))
+        
+        if len(page) > limit:
+            page = page[:limit]
+            return page, encode_history_cursor(*position(page[-1]))
+        return page, None
+    
+    def _query_history(self, user_id: str, count: int, before: Optional[Tuple[int, int]],
+                       intent: Optional[str], since_ms: Optional[int],
+                       until_ms: Optional[int]) -> List[ConversationTurn]:
+        """Persisted turns strictly older than the (timestamp, id) position"""
+        conditions, params = ["user_id = ?"], [user_id]
+        if before is not None:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(before)
+        if intent is not None:
+            conditions.append("intent = ?")
+            params.append(intent)
+        if since_ms is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since_ms)
+        if until_ms is not None:
+            conditions.append("timestamp < ?")
+            params.append(until_ms)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f"""
+                SELECT id, user_id, message, intent, confidence, context_data, response, timestamp
+                FROM conversations
+                WHERE {" AND ".join(conditions)}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            """, (*params, count)).fetchall()
+        return [self._row_to_turn(row) for row in rows]
+    
     def get_conversation_context(self, user_id: str) -> Dict[str, Any]:
         """Get aggregated context from recent conversations"""
         history = self.get_conversation_history(user_id)
@@ -187,7 +581,7 @@ class ConversationMemory:
         
         # Get most recent values for each context key
         for turn in reversed(history):
-            for key, value in turn.context_data.items():
+            for key, value in turn.context_items:
                 if key not in context and value is not None:
                     context[key] = value
         
@@ -200,69 +594,109 @@ class ConversationMemory:
     
     def update_user_preferences(self, user_id: str, context_data: Dict[str, Any]):
         """Update user preferences based on conversation context"""
-        if user_id not in self.user_preferences:
-            self.user_preferences[user_id] = {}
-        
-        preferences = self.user_preferences[user_id]
-        
-        # Update preferences with new context data
-        for key, value in context_data.items():
-            if value is not None:
-                if key in preferences:
-                    # Keep track of frequency for repeated preferences
-                    if isinstance(preferences[key], dict) and 'value' in preferences[key]:
-                        if preferences[key]['value'] == value:
-                            preferences[key]['frequency'] = preferences[key].get('frequency', 1) + 1
-                        else:
-                            # New value, reset frequency
-                            preferences[key] = {'value': value, 'frequency': 1}
-                    else:
-                        # Convert to frequency tracking
-                        preferences[key] = {'value': value, 'frequency': 1}
-                else:
-                    preferences[key] = {'value': value, 'frequency': 1}
+        if self.shared_state is not None:
+            # Merged under the backend's update, so concurrent workers don't lose counts
+            preferences = self.shared_state.update(PREFERENCES_NAMESPACE, user_id,
+                                                   lambda stored: merge_preferences(stored or {}, context_data))
+        else:
+            preferences = merge_preferences(self.user_preferences.setdefault(user_id, {}), context_data)
         
         # Save to database if available
         if self.db_path:
-            self.save_user_preferences(user_id)
+            self.save_user_preferences(user_id, preferences)
     
-    def save_user_preferences(self, user_id: str):
+    @metrics.timed("sqlite_write")
+    def save_user_preferences(self, user_id: str, preferences: Optional[Dict[str, Any]] = None):
         """Save user preferences to database"""
-        if user_id not in self.user_preferences:
+        if preferences is None:
+            preferences = self.user_preferences.get(user_id)
+        if preferences is None:
             return
         
         with sqlite3.connect(self.db_path) as conn:
             conn.execute("""
                 INSERT OR REPLACE INTO user_preferences (user_id, preferences, updated_at)
                 VALUES (?, ?, CURRENT_TIMESTAMP)
-            """, (user_id, json.dumps(self.user_preferences[user_id])))
+            """, (user_id, json.dumps(preferences)))
             conn.commit()
     
     def get_user_preferences(self, user_id: str) -> Dict[str, Any]:
         """Get user preferences"""
+        if self.shared_state is not None:
+            return self.shared_state.get(PREFERENCES_NAMESPACE, user_id) or {}
+        self._ensure_user_loaded(user_id)
         return self.user_preferences.get(user_id, {})
     
     def log_unknown_query(self, message: str):
-        """Log an unknown query for analysis"""
+        """
+        Log an unknown query for analysis
+        Only a bounded in-memory counter is updated here; the background
+        flusher writes the counts to unknown_queries in one batched upsert
+        """
         if not self.db_path:
             return
         
-        with sqlite3.connect(self.db_path) as conn:
-            # Try to increment frequency if exists, otherwise insert new
-            conn.execute("""
-                INSERT INTO unknown_queries (message, frequency, first_seen, last_seen)
-                VALUES (?, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT(message) DO UPDATE SET
-                    frequency = frequency + 1,
-                    last_seen = CURRENT_TIMESTAMP
-            """, (message,))
-            conn.commit()
+        self.unknown_query_counter.add(message[:UNKNOWN_QUERY_MAX_LENGTH])
+        if self._flusher is None or not self._flusher.is_alive():
+            self.start_unknown_query_flusher()
+    
+    @metrics.timed("sqlite_write")
+    def flush_unknown_queries(self) -> int:
+        """
+        Upsert the buffered unknown-query counts in a single transaction
+        Guaranteed counts (count - error) are written, so queries that slipped
+        into the buffer by evicting others never inflate the table
+        """
+        if not self.db_path:
+            return 0
+        
+        with self._flush_lock:
+            drained = self.unknown_query_counter.drain()
+            rows = [
+                (message, count - error, _sql_timestamp(first_seen), _sql_timestamp(last_seen))
+                for message, count, error, first_seen, last_seen in drained
+            ]
+            if not rows:
+                return 0
+            
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.executemany("""
+                        INSERT INTO unknown_queries (message, frequency, first_seen, last_seen)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(message) DO UPDATE SET
+                            frequency = frequency + excluded.frequency,
+                            last_seen = MAX(last_seen, excluded.last_seen)
+                    """, rows)
+                    conn.commit()
+            except sqlite3.Error:
+                # Keep the window for the next flush ("database is locked"...)
+                self.unknown_query_counter.restore(drained)
+                raise
+            return len(rows)
+    
+    def start_unknown_query_flusher(self) -> threading.Thread:
+        """Flush buffered unknown queries every unknown_flush_interval seconds in a daemon thread"""
+        if self._flusher is None or not self._flusher.is_alive():
+            def flush_periodically():
+                while True:
+                    time.sleep(self.unknown_flush_interval)
+                    try:
+                        self.flush_unknown_queries()
+                    except sqlite3.Error as e:
+                        logger.error(f"Unknown query flush failed: {e}")
+            
+            self._flusher = threading.Thread(target=flush_periodically,
+                                             name="unknown-query-flusher", daemon=True)
+            self._flusher.start()
+        return self._flusher
     
     def get_unknown_queries(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Get most frequent unknown queries for analysis"""
         if not self.db_path:
             return []
         
+        self.flush_unknown_queries()
         with sqlite3.connect(self.db_path) as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.execute("""
@@ -274,6 +708,45 @@ class ConversationMemory:
             
             return [dict(row) for row in cursor]
     
+    def iter_logged_messages(self, batch_size: int = 1000,
+                             after_id: int = 0) -> Iterator[Tuple[int, str, str]]:
+        """
+        Stream (id, message, intent) rows of the conversations table
+        Rows are read in id order, one batch at a time, so memory stays bounded
+        """
+        if not self.db_path:
+            return
+        
+        with sqlite3.connect(self.db_path) as conn:
+            while True:
+                rows = conn.execute("""
+                    SELECT id, message, intent FROM conversations
+                    WHERE id > ? ORDER BY id LIMIT ?
+                """, (after_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                yield from rows
+                after_id = rows[-1][0]
+    
+    def iter_unknown_queries(self, batch_size: int = 1000) -> Iterator[Tuple[str, int]]:
+        """Stream (message, frequency) rows of the unknown_queries table in id order"""
+        if not self.db_path:
+            return
+        
+        self.flush_unknown_queries()
+        after_id = 0
+        with sqlite3.connect(self.db_path) as conn:
+            while True:
+                rows = conn.execute("""
+                    SELECT id, message, frequency FROM unknown_queries
+                    WHERE id > ? ORDER BY id LIMIT ?
+                """, (after_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                for _, message, frequency in rows:
+                    yield message, frequency
+                after_id = rows[-1][0]
+    
     def get_conversation_stats(self) -> Dict[str, Any]:
         """Get conversation statistics"""
         total_users = len(self.user_conversations)
@@ -288,16 +761,28 @@ class ConversationMemory:
             for turn in conversations:
                 intent_counts[turn.intent] = intent_counts.get(turn.intent, 0) + 1
         
-        return {
+        stats = {
             "total_users": total_users,
             "total_conversations": total_conversations,
             "avg_conversation_length": avg_length,
             "intent_distribution": intent_counts,
-            "memory_limit": self.memory_limit
+            "memory_limit": self.memory_limit,
+            "history_preloaded": self.history_preloaded,
+            "unknown_query_buffer": self.unknown_query_counter.get_stats()
         }
+        if self.shared_state is not None:
+            # In-memory counts are empty: the running context is in the backend
+            stats["shared_state"] = self.shared_state.get_stats()
+        return stats
     
     def clear_user_data(self, user_id: str):
         """Clear all data for a specific user (GDPR compliance)"""
+        # A preload running in the background must not bring the turns back
+        with self._load_lock:
+            if self._loaded_users is not None:
+                self._loaded_users.add(user_id)
+            self._released_users.discard(user_id)
+        
         # Clear from memory
         if user_id in self.user_conversations:
             del self.user_conversations[user_id]
@@ -305,16 +790,29 @@ class ConversationMemory:
         if user_id in self.user_preferences:
             del self.user_preferences[user_id]
         
-        # Clear from database
+        if self.shared_state is not None:
+            self.shared_state.delete(HISTORY_NAMESPACE, user_id)
+            self.shared_state.delete(PREFERENCES_NAMESPACE, user_id)
+        
+        # Clear from database, in chunks so long histories don't block other writers
         if self.db_path:
             with sqlite3.connect(self.db_path) as conn:
-                conn.execute("DELETE FROM conversations WHERE user_id = ?", (user_id,))
+                delete_in_chunks(conn, "conversations", "user_id = ?", (user_id,))
                 conn.execute("DELETE FROM user_preferences WHERE user_id = ?", (user_id,))
                 conn.commit()
 
 
-# Global instance (can be configured with database path)
+def _sql_timestamp(epoch: float) -> str:
+    """Format like SQLite's CURRENT_TIMESTAMP (UTC)"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+# Global instance; importing it touches no file: the API opens DEFAULT_DB_PATH
+# at startup, then recent history is read per user on first access and
+# preloaded by the startup warm-up. With a shared STATE_BACKEND the running
+# context lives in the backend.
 conversation_memory = ConversationMemory(
-    db_path="chatbot_memory.db",  # Enable persistence in current directory
-    memory_limit=5
+    memory_limit=5,
+    preload=False,
+    state=state_backend
 )
\ No newline at end of file
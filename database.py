@@ -3,9 +3,35 @@ Base de données simulée pour la boutique e-commerce
 Contient les produits avec leurs caractéristiques
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+from dataclasses import dataclass
+import hashlib
 import json
 
+from search_cache import SearchCache, canonicalize_criteria
+
+
+# Libellés des critères de recherche, utilisés pour expliquer un repli
+CRITERIA_LABELS = {
+    "color": "couleur",
+    "category": "catégorie",
+    "max_price": "budget",
+    "tags": "occasion",
+    "gender": "destinataire",
+    "age_group": "tranche d'âge"
+}
+
+
+@dataclass(frozen=True)
+class RelaxedSearchResult:
+    """Résultat d'une recherche avec repli progressif"""
+    product_ids: Tuple[int, ...]
+    relaxed: Tuple[str, ...]          # critères retirés pour obtenir ces produits
+    satisfied: int                    # nombre de critères satisfaits par ces produits
+    total_criteria: int
+    partial_ids: Tuple[int, ...]      # meilleures correspondances partielles si aucun résultat
+
+
 class ProductDatabase:
     """
     Base de données des produits de la boutique
@@ -485,11 +511,80 @@ class ProductDatabase:
                 "stock": 18
             }
         ]
+        
+        # Version du catalogue, incrémentée à chaque modification
+        self.catalog_version = 0
+        self._products_by_id: Optional[Dict[int, Dict[str, Any]]] = None
+        self._product_ids: Optional[Tuple[int, ...]] = None
+        self._fingerprint: Optional[Tuple[int, str]] = None
+        self.search_cache = SearchCache(max_entries=512)
+        self._change_listeners: List[Callable[[str, int], None]] = []
     
     def get_all_products(self) -> List[Dict[str, Any]]:
         """Retourne tous les produits"""
         return self.products
     
+    def get_all_product_ids(self) -> Tuple[int, ...]:
+        """Retourne les identifiants de tous les produits (dans l'ordre du catalogue)"""
+        if self._product_ids is None:
+            self._product_ids = tuple(p["id"] for p in self.products)
+        return self._product_ids
+    
+    def get_product_by_id(self, product_id: int) -> Optional[Dict[str, Any]]:
+        """Retourne un produit par son identifiant"""
+        if self._products_by_id is None:
+            self._products_by_id = {p["id"]: p for p in self.products}
+        return self._products_by_id.get(product_id)
+    
+    def catalog_fingerprint(self) -> str:
+        """Empreinte du contenu du catalogue (clé des index précalculés), recalculée après modification"""
+        if self._fingerprint is None or self._fingerprint[0] != self.catalog_version:
+            content = json.dumps(self.products, ensure_ascii=False, sort_keys=True, default=str)
+            self._fingerprint = (self.catalog_version, hashlib.sha256(content.encode("utf-8")).hexdigest())
+        return self._fingerprint[1]
+    
+    def load_products(self, products: List[Dict[str, Any]]):
+        """Remplace tout le catalogue"""
+        self.products = products
+        self._catalog_changed("reload", 0)
+    
+    def add_product(self, product: Dict[str, Any]):
+        """Ajoute un produit au catalogue"""
+        self.products.append(product)
+        self._catalog_changed("add", product["id"])
+    
+    def update_product(self, product_id: int, **fields) -> Optional[Dict[str, Any]]:
+        """Met à jour les champs d'un produit existant"""
+        product = self.get_product_by_id(product_id)
+        if product is None:
+            return None
+        product.update(fields)
+        self._catalog_changed("update", product_id)
+        return product
+    
+    def remove_product(self, product_id: int) -> bool:
+        """Supprime un produit du catalogue"""
+        product = self.get_product_by_id(product_id)
+        if product is None:
+            return False
+        self.products.remove(product)
+        self._catalog_changed("remove", product_id)
+        return True
+    
+    def add_change_listener(self, listener: Callable[[str, int], None]):
+        """Enregistre une fonction appelée avec (action, id produit) à chaque modification"""
+        self._change_listeners.append(listener)
+    
+    def _catalog_changed(self, action: str, product_id: int):
+        """Invalide les index et le cache après une modification du catalogue"""
+        self.catalog_version += 1
+        self._products_by_id = None
+        self._product_ids = None
+        self.search_cache.invalidate(self.catalog_version)
+        
+        for listener in self._change_listeners:
+            listener(action, product_id)
+    
     def search_by_color(self, color: str) -> List[Dict[str, Any]]:
         """Recherche par couleur"""
         color_lower = color.lower()
@@ -530,33 +625,152 @@ class ProductDatabase:
         
         return results
     
-    def complex_search(self, **criteria) -> List[Dict[str, Any]]:
-        """Recherche complexe avec plusieurs critères"""
-        results = self.products.copy()
+    def _compile_criteria(self, criteria: Dict[str, Any]) -> List[Tuple[str, Callable[[Dict[str, Any]], bool]]]:
+        """
+        Compile les critères en prédicats évalués une seule fois par produit
+        Même sémantique que les méthodes search_by_* utilisées par complex_search
+        """
+        predicates = []
+        
+        if criteria.get("color"):
+            color_lower = criteria["color"].lower()
+            predicates.append(("color", lambda p: color_lower in p["color"].lower()))
         
-        if "color" in criteria and criteria["color"]:
-            color_results = self.search_by_color(criteria["color"])
-            results = [p for p in results if p in color_results]
+        if criteria.get("category"):
+            category_lower = criteria["category"].lower()
+            predicates.append(("category", lambda p: category_lower in p["category"].lower() or
+                               category_lower in p["subcategory"].lower()))
         
-        if "category" in criteria and criteria["category"]:
-            category_results = self.search_by_category(criteria["category"])
-            results = [p for p in results if p in category_results]
+        if criteria.get("max_price"):
+            max_price = criteria["max_price"]
+            predicates.append(("max_price", lambda p: 0 <= p["price"] <= max_price))
         
-        if "max_price" in criteria and criteria["max_price"]:
-            price_results = self.search_by_price_range(criteria["max_price"])
-            results = [p for p in results if p in price_results]
+        if criteria.get("tags"):
+            tags_lower = [tag.lower() for tag in criteria["tags"]]
+            predicates.append(("tags", lambda p: any(tag in product_tag.lower()
+                                                     for tag in tags_lower
+                                                     for product_tag in p["tags"])))
         
-        if "tags" in criteria and criteria["tags"]:
-            tag_results = self.search_by_tags(criteria["tags"])
-            results = [p for p in results if p in tag_results]
+        if criteria.get("gender"):
+            gender_lower = criteria["gender"].lower()
+            predicates.append(("gender", lambda p: gender_lower in p["gender"].lower() or
+                               p["gender"].lower() == "unisexe"))
         
-        if "gender" in criteria or "age_group" in criteria:
-            gender_age_results = self.search_by_gender_and_age(
-                criteria.get("gender"), criteria.get("age_group")
+        if criteria.get("age_group"):
+            age_lower = criteria["age_group"].lower()
+            predicates.append(("age_group", lambda p: age_lower in p["age_group"].lower()))
+        
+        return predicates
+    
+    def complex_search(self, **criteria) -> List[Dict[str, Any]]:
+        """Recherche complexe avec plusieurs critères (un seul passage sur le catalogue)"""
+        predicates = [predicate for _, predicate in self._compile_criteria(criteria)]
+        return [p for p in self.products if all(predicate(p) for predicate in predicates)]
+    
+    def relaxed_search(self, criteria: Dict[str, Any],
+                       relax_order: Sequence[str]) -> RelaxedSearchResult:
+        """
+        Recherche avec repli progressif en un seul passage sur le catalogue.
+        Chaque critère est évalué une fois par produit ; on garde le masque des
+        critères non satisfaits, puis on choisit le meilleur palier :
+        correspondance exacte, sinon un seul critère retiré dans l'ordre donné
+        (comme l'ancienne boucle de recherches successives).
+        """
+        predicates = self._compile_criteria(criteria)
+        bits = {name: 1 << i for i, (name, _) in enumerate(predicates)}
+        
+        exact = []
+        failed_masks = []
+        best_partial_count = -1
+        best_partial = []
+        
+        for product in self.products:
+            mask = 0
+            for name, predicate in predicates:
+                if not predicate(product):
+                    mask |= bits[name]
+            
+            if mask == 0:
+                exact.append(product["id"])
+                continue
+            
+            failed_masks.append((product["id"], mask))
+            satisfied = len(predicates) - bin(mask).count("1")
+            if satisfied > best_partial_count:
+                best_partial_count = satisfied
+                best_partial = [product["id"]]
+            elif satisfied == best_partial_count:
+                best_partial.append(product["id"])
+        
+        if exact or len(criteria) <= 1:
+            return RelaxedSearchResult(
+                product_ids=tuple(exact),
+                relaxed=(),
+                satisfied=len(predicates),
+                total_criteria=len(predicates),
+                partial_ids=() if exact else tuple(best_partial)
             )
-            results = [p for p in results if p in gender_age_results]
         
-        return results
+        for key_to_remove in relax_order:
+            bit = bits.get(key_to_remove)
+            if bit is None:
+                continue
+            tier = [product_id for product_id, mask in failed_masks if mask == bit]
+            if tier:
+                return RelaxedSearchResult(
+                    product_ids=tuple(tier),
+                    relaxed=(key_to_remove,),
+                    satisfied=len(predicates) - 1,
+                    total_criteria=len(predicates),
+                    partial_ids=()
+                )
+        
+        return RelaxedSearchResult(
+            product_ids=(),
+            relaxed=(),
+            satisfied=0,
+            total_criteria=len(predicates),
+            partial_ids=tuple(best_partial)
+        )
+    
+    def _products_from_ids(self, product_ids: Sequence[int]) -> List[Dict[str, Any]]:
+        """Résout une liste d'identifiants en produits"""
+        products = []
+        for product_id in product_ids:
+            product = self.get_product_by_id(product_id)
+            if product is not None:
+                products.append(product)
+        return products
+    
+    def cached_search(self, **criteria) -> List[Dict[str, Any]]:
+        """complex_search avec cache des identifiants de résultats"""
+        key = ("search", canonicalize_criteria(criteria))
+        product_ids = self.search_cache.get(key, self.catalog_version)
+        
+        if product_ids is None:
+            product_ids = tuple(p["id"] for p in self.complex_search(**criteria))
+            self.search_cache.put(key, product_ids, self.catalog_version)
+        
+        return self._products_from_ids(product_ids)
+    
+    def search_with_relaxation(self, criteria: Dict[str, Any],
+                               relax_order: Sequence[str]) -> RelaxedSearchResult:
+        """
+        relaxed_search avec cache : toute la chaîne de repli est mise en cache
+        comme une seule entrée
+        """
+        key = ("relaxed", canonicalize_criteria(criteria), tuple(relax_order))
+        result = self.search_cache.get(key, self.catalog_version)
+        
+        if result is None:
+            result = self.relaxed_search(criteria, relax_order)
+            self.search_cache.put(key, result, self.catalog_version)
+        
+        return result
+    
+    def resolve(self, result: RelaxedSearchResult) -> List[Dict[str, Any]]:
+        """Retourne les produits d'un résultat de recherche avec repli"""
+        return self._products_from_ids(result.product_ids)
 
 # Instance globale de la base de données
 product_db = ProductDatabase()
\ No newline at end of file
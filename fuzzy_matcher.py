@@ -0,0 +1,233 @@
+"""
+Typo-Tolerant Word Matching
+SymSpell-style precomputed deletion index for O(1)-ish fuzzy lookups
+"""
+
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+# Shorter words are too ambiguous to be corrected
+MIN_CORRECTED_LENGTH = 4
+# Below this length a word is only corrected one edit away, keeping its first letter
+SHORT_WORD_LENGTH = 7
+# One more edit is allowed per this many letters ("chapeau" is not two edits from "cadeau")
+LETTERS_PER_EDIT = 4
+CORRECTABLE_WORD_PATTERN = re.compile(r"[^\W\d_]{%d,}" % MIN_CORRECTED_LENGTH)
+
+# Common French words that must never be "corrected" into a keyword
+# Only frequent function words and request verbs belong here: the catalog
+# and intent vocabulary is added when an index is built, and the distance
+# rules keep other real words apart. A new false correction is fixed in
+# those rules or in the data, not by listing the word.
+COMMON_FRENCH_WORDS = {
+    "alors", "aime", "aimer", "aussi", "autre", "avez", "avoir", "beaucoup", "bien",
+    "bonne", "cela", "celle", "celui", "comme", "dans", "depuis", "donc", "elle", "elles",
+    "encore", "entre", "était", "être", "faire", "faut", "leur", "mais", "même", "merci",
+    "moins", "notre", "nous", "offre", "peut", "peux", "plus", "pouvez", "quand", "quel",
+    "quelle", "quels", "rien", "sans", "sont", "souhaite", "suis", "tous", "tout", "toute",
+    "très", "trouver", "veut", "voici", "voilà", "vos", "votre", "voudrais", "vouloir",
+    "vous", "montrez", "montre-moi", "avec", "chez", "cette", "aujourd'hui", "faites",
+    "selon", "parlez", "moment", "quelque", "chose", "quoi", "pourquoi", "combien", "vers"
+}
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (Damerau-Levenshtein with adjacent
+    transpositions), returning max_distance + 1 as soon as it is exceeded
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous: Optional[List[int]] = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+
+    return previous[-1]
+
+
+class SymSpellIndex:
+    """
+    Maps every deletion variant (up to max_distance deletes) of each vocabulary
+    word back to the word. A lookup generates the deletions of the query and
+    verifies the few candidates it hits with a bounded edit distance.
+    """
+
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7, cache_size: int = 4096):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.cache_size = cache_size
+
+        self.words: Dict[str, int] = {}            # vocabulary word -> priority
+        self.deletes: Dict[str, List[str]] = {}
+        self.known: Set[str] = set()               # words returned unchanged
+        self.excluded: Set[str] = set()            # words never used as a correction
+        self._cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+
+    def allowed_distance(self, word: str) -> int:
+        """Short words are too ambiguous to be corrected aggressively"""
+        if len(word) < MIN_CORRECTED_LENGTH:
+            return 0
+        if len(word) < SHORT_WORD_LENGTH:
+            return min(1, self.max_distance)
+        return min(len(word) // LETTERS_PER_EDIT, self.max_distance)
+
+    def _deletions(self, word: str, distance: int) -> Set[str]:
+        variants = {word}
+        frontier = {word}
+        for _ in range(distance):
+            next_frontier = set()
+            for variant in frontier:
+                if len(variant) <= 1:
+                    continue
+                for i in range(len(variant)):
+                    next_frontier.add(variant[:i] + variant[i + 1:])
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
+
+    def add_word(self, word: str, priority: int = 1):
+        """Add a correction target to the vocabulary"""
+        word = word.lower()
+        self.known.add(word)
+        if len(word) < MIN_CORRECTED_LENGTH or word in self.excluded:
+            return
+
+        if word in self.words:
+            self.words[word] += priority
+            return
+        self.words[word] = priority
+
+        prefix = word[:self.prefix_length]
+        for variant in self._deletions(prefix, self.max_distance):
+            self.deletes.setdefault(variant, []).append(word)
+        self._cache.clear()
+
+    def add_words(self, words: Iterable[str], priority: int = 1):
+        for word in words:
+            self.add_word(word, priority)
+
+    def add_known_words(self, words: Iterable[str]):
+        """Words that are valid as typed but are not correction targets"""
+        self.known.update(word.lower() for word in words)
+        self._cache.clear()
+
+    def exclude_words(self, words: Iterable[str]):
+        """Words kept as typed that no other word may be corrected into"""
+        words = {word.lower() for word in words}
+        self.excluded |= words
+        self.known |= words
+        for word in words & self.words.keys():
+            del self.words[word]
+        for variant, targets in list(self.deletes.items()):
+            targets[:] = [target for target in targets if target not in words]
+            if not targets:
+                del self.deletes[variant]
+        self._cache.clear()
+
+    def lookup(self, word: str) -> Optional[Tuple[str, int]]:
+        """Best (vocabulary word, distance) within the allowed distance, or None"""
+        distance = self.allowed_distance(word)
+        if distance == 0:
+            return None
+
+        prefix = word[:self.prefix_length]
+        candidates = set()
+        for variant in self._deletions(prefix, distance):
+            candidates.update(self.deletes.get(variant, ()))
+
+        best = None
+        for candidate in candidates:
+            d = edit_distance(word, candidate, distance)
+            if d > distance:
+                continue
+            # A short word with another first letter is another word, not a typo
+            if len(word) < SHORT_WORD_LENGTH and candidate[0] != word[0]:
+                continue
+            rank = (d, -self.words[candidate], candidate)
+            if best is None or rank < best[0]:
+                best = (rank, candidate, d)
+
+        if best is None:
+            return None
+        return best[1], best[2]
+
+    def correct_word(self, word: str) -> str:
+        """Return the vocabulary word closest to word, or word itself"""
+        lowered = word.lower()
+        if lowered in self.known:
+            return word
+
+        cached = self._cache.get(lowered, False)
+        if cached is False:
+            match = self.lookup(lowered)
+            cached = None
+            # Inflections of a known word already match it as a substring
+            if match is not None and not lowered.startswith(match[0]):
+                cached = match[0]
+            self._cache[lowered] = cached
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return cached if cached is not None else word
+
+    def correct_text(self, text: str) -> str:
+        """Correct every word of a text, leaving punctuation untouched"""
+        # Fast path: every correctable word is already known
+        if self.known.issuperset(CORRECTABLE_WORD_PATTERN.findall(text.lower())):
+            return text
+        return CORRECTABLE_WORD_PATTERN.sub(lambda match: self.correct_word(match.group()), text)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "vocabulary": len(self.words),
+            "known_words": len(self.known),
+            "delete_entries": len(self.deletes),
+            "cached_lookups": len(self._cache)
+        }
+
+
+def plural_forms(word: str) -> List[str]:
+    """French plurals of a word: cadeau -> cadeaux, cheval -> chevaux, sac -> sacs"""
+    if word.endswith(("s", "x", "z")):
+        return []
+    if word.endswith(("au", "eu")):
+        return [word + "x"]
+    if word.endswith("al"):
+        return [word[:-2] + "aux", word + "s"]
+    return [word + "s"]
+
+
+def with_plurals(words: Iterable[str]) -> List[str]:
+    """Words followed by their plurals, so a misspelled plural finds its keyword"""
+    forms = []
+    for word in words:
+        forms.append(word)
+        forms.extend(plural_forms(word))
+    return forms
+
+
+def words_of(texts: Iterable[str]) -> List[str]:
+    """All words of several texts (keywords, product names, regex alternatives)"""
+    words = []
+    for text in texts:
+        words.extend(WORD_PATTERN.findall(text.lower()))
+    return words
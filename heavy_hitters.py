@@ -0,0 +1,146 @@
+"""
+Heavy Hitters Counter
+Bounded Space-Saving counter for frequent items in an unbounded stream
+"""
+
+import threading
+import time
+from typing import Dict, List, Any, Hashable, Optional, Tuple
+
+
+class SpaceSavingCounter:
+    """
+    Space-Saving top-k counter (Metwally et al.) with O(1) updates
+    At most `capacity` items are tracked. When a new item arrives and the
+    counter is full, the item with the smallest count is replaced and the new
+    one inherits that count as its possible overestimation (error). Any item
+    seen more than total / capacity times is guaranteed to be tracked, so the
+    head of the distribution stays exact enough whatever the input.
+
+    Counts are kept in buckets (count -> items) so the minimum is found
+    without scanning, even when every message is new (spam bursts).
+    """
+
+    def __init__(self, capacity: int = 1000):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+
+        # item -> [count, error, first_seen, last_seen]
+        self._entries: Dict[Hashable, List[Any]] = {}
+        # count -> items with that count, in insertion order (oldest evicted first)
+        self._buckets: Dict[int, Dict[Hashable, None]] = {}
+        self._min_count = 0
+        self._lock = threading.Lock()
+
+        self.total = 0
+        self.evictions = 0
+
+    def add(self, item: Hashable, now: Optional[float] = None):
+        """Count one occurrence of item"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.total += 1
+            entry = self._entries.get(item)
+            if entry is not None:
+                self._move(item, entry[0], entry[0] + 1)
+                entry[0] += 1
+                entry[3] = now
+                return
+
+            if len(self._entries) < self.capacity:
+                self._entries[item] = [1, 0, now, now]
+                self._buckets.setdefault(1, {})[item] = None
+                self._min_count = 1
+                return
+
+            # Replace the oldest item with the smallest count
+            minimum = self._min_count
+            bucket = self._buckets[minimum]
+            victim = next(iter(bucket))
+            del bucket[victim]
+            if not bucket:
+                del self._buckets[minimum]
+            del self._entries[victim]
+            self.evictions += 1
+
+            self._entries[item] = [minimum + 1, minimum, now, now]
+            self._buckets.setdefault(minimum + 1, {})[item] = None
+            if minimum not in self._buckets:
+                self._min_count = minimum + 1
+
+    def _move(self, item: Hashable, count: int, new_count: int):
+        bucket = self._buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = new_count
+        self._buckets.setdefault(new_count, {})[item] = None
+
+    def drain(self) -> List[Tuple[Hashable, int, int, float, float]]:
+        """
+        Take all tracked items as (item, count, error, first_seen, last_seen)
+        and reset the counter, so each window is flushed exactly once
+        """
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            self._buckets = {}
+            self._min_count = 0
+            self.total = 0
+        return [(item, count, error, first_seen, last_seen)
+                for item, (count, error, first_seen, last_seen) in entries.items()]
+
+    def restore(self, rows: List[Tuple[Hashable, int, int, float, float]]):
+        """
+        Put drained rows back, after a flush that could not write them
+        Items counted since the drain are merged with their restored counts;
+        when the counter is full, a restored item replaces the smallest one
+        like a new item would, inheriting its count as error.
+        """
+        with self._lock:
+            for item, count, error, first_seen, last_seen in rows:
+                self.total += count
+                entry = self._entries.get(item)
+                if entry is not None:
+                    self._move(item, entry[0], entry[0] + count)
+                    entry[0] += count
+                    entry[1] += error
+                    entry[2] = min(entry[2], first_seen)
+                    entry[3] = max(entry[3], last_seen)
+                else:
+                    if len(self._entries) >= self.capacity:
+                        minimum = self._min_count
+                        bucket = self._buckets[minimum]
+                        victim = next(iter(bucket))
+                        del bucket[victim]
+                        if not bucket:
+                            del self._buckets[minimum]
+                        del self._entries[victim]
+                        self.evictions += 1
+                        count += minimum
+                        error += minimum
+                    self._entries[item] = [count, error, first_seen, last_seen]
+                    self._buckets.setdefault(count, {})[item] = None
+                # Counts jump by more than one here: find the minimum again
+                self._min_count = min(self._buckets) if self._buckets else 0
+
+    def top(self, limit: int = 10) -> List[Tuple[Hashable, int, int]]:
+        """Most frequent tracked items as (item, count, error)"""
+        with self._lock:
+            items = [(item, entry[0], entry[1]) for item, entry in self._entries.items()]
+        items.sort(key=lambda item: -item[1])
+        return items[:limit]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked": len(self._entries),
+                "capacity": self.capacity,
+                "pending_hits": self.total,
+                "min_count": self._min_count,
+                "evictions": self.evictions
+            }
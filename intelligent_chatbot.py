@@ -10,19 +10,110 @@ from dataclasses import dataclass
 
 from intent_scorer import intent_scorer, IntentScore
 from conversation_memory import conversation_memory, ConversationTurn
-from database import product_db
+from database import product_db, RelaxedSearchResult, CRITERIA_LABELS
+from product_ranking import product_ranker
+from text_search import product_text_index
+from metrics import metrics
+from response_templates import Response, template, templates, text, EMPTY
+
+# Products reported as found when the message gave no criteria: every product
+# is ranked, but only this popular selection counts as relevant
+POPULAR_PRODUCT_COUNT = 8
+
+PARAGRAPH = text("\n\n")
+
+UNCERTAIN_SHOPPING = templates([
+    "🛍️ Parfait ! Je vois que vous cherchez quelque chose de spécial.",
+    "✨ Excellente idée ! Laissez-moi vous aider à trouver ce qu'il vous faut.",
+    "🎯 Super ! J'ai quelques suggestions qui pourraient vous intéresser.",
+    "💡 Génial ! Voici ce que j'ai trouvé selon vos critères."
+])
+UNCERTAIN_OTHER = templates([
+    "🤔 Je pense comprendre, mais pouvez-vous être plus précis ?",
+    "💭 J'ai une idée de ce que vous cherchez, mais aidez-moi à mieux comprendre.",
+    "🔍 Je vois plusieurs possibilités. Pouvez-vous me donner plus de détails ?"
+])
+UNDERSTOOD = template("✅ J'ai compris: {keywords:, }")
+MENTIONED = template("Vous parlez de: {keywords:, }")
+SHOPPING_FOUND = template("\n\n🔍 J'ai trouvé {count} produit(s) correspondant !")
+REFINE_HINT = text("\n\n💬 Pour affiner la recherche, précisez-moi:\n• La couleur souhaitée\n• Votre budget maximum\n• L'occasion ou le style")
+CLARIFY_HINT = text("\n\n💡 Pour mieux vous aider, précisez:\n• Ce que vous cherchez exactement\n• Votre budget\n• Pour qui c'est destiné")
+
+UNKNOWN_SUGGESTIONS = text("\n\n💡 Basé sur vos critères, voici quelques suggestions:")
+UNKNOWN_REDIRECT = text("\n\n💡 Je suis un assistant e-commerce. Je peux vous aider à:\n• Trouver des produits par catégorie\n• Suggérer des cadeaux personnalisés\n• Filtrer par budget et couleur")
+UNKNOWN_EXAMPLES = text("\n\n👉 Soyez plus précis:\n• 'Je cherche un cadeau pour ma fille de 8 ans'\n• 'Montrez-moi des casquettes rouges'\n• 'Budget maximum 30 DT'")
+
+PERSONAL_RESPONSES = templates([
+    "Je suis un assistant e-commerce et je ne peux pas répondre aux questions personnelles ou générales.",
+    "Je suis conçu uniquement pour vous aider avec vos achats. Je ne peux pas discuter de sujets personnels.",
+    "Mon rôle est de vous assister dans vos recherches de produits. Je ne réponds qu'aux questions liées au shopping.",
+    "Je suis spécialisé dans l'e-commerce. Pour les questions personnelles, consultez d'autres sources."
+])
+SHOPPING_REDIRECTS = templates([
+    "👉 Posez-moi une question liée aux produits ou aux cadeaux.",
+    "💡 Demandez-moi plutôt ce que vous souhaitez acheter.",
+    "🛍️ Je peux vous aider à trouver des produits ou des cadeaux.",
+    "🎯 Parlez-moi de vos besoins d'achat."
+])
+OFF_TOPIC_RESPONSES = templates([
+    "Je suis un assistant e-commerce et je ne peux pas répondre aux questions générales ou non liées au shopping.",
+    "Je suis spécialisé dans l'aide à l'achat. Je ne peux répondre qu'aux questions sur les produits et le shopping.",
+    "Mon domaine d'expertise est l'e-commerce. Je peux vous aider à trouver des articles, des cadeaux ou des produits.",
+    "Je suis conçu pour vous assister dans vos achats en ligne. Pour d'autres sujets, consultez d'autres sources."
+])
+SHOPPING_EXAMPLES = templates([
+    "👉 Par exemple : 'Je cherche un cadeau pour ma sœur'",
+    "💡 Essayez : 'Montrez-moi des produits bleus'",
+    "🎁 Ou demandez : 'Quel cadeau pour un budget de 50 DT ?'",
+    "🛒 Vous pouvez dire : 'Je veux acheter une casquette'"
+])
+
+RETURNING_GREETINGS = templates([
+    "✨ Ravi de vous revoir ! Comment puis-je vous aider aujourd'hui ?",
+    "🌟 Hello ! Que puis-je faire pour vous cette fois ?",
+    "🎉 Salut ! Prêt pour une nouvelle session shopping ?"
+])
+PREFERENCES_HINT = text("\n\n💡 Basé sur vos préférences, je peux vous proposer des suggestions personnalisées !")
+HELP_DETAILS = text("\n\n💡 Voici ce que je peux faire:\n" + "\n".join(f"• {detail}" for detail in [
+    "🔍 Recherche de produits par catégorie",
+    "🎁 Suggestions de cadeaux personnalisés",
+    "💰 Filtrage par budget",
+    "🌈 Recherche par couleur",
+    "👥 Recommandations selon l'âge/genre"
+]))
+
+SEARCH_CRITERIA = template("\n\n📋 Critères: {criteria:, }")
+SEARCH_FOUND = template("\n\n✨ J'ai trouvé {count} produit(s) correspondant !")
+SEARCH_NOTHING = text("🤔 Je n'ai pas trouvé de produits correspondant exactement à vos critères."
+                      "\n\n💡 Essayons avec des critères différents ou regardez ces alternatives :")
+ACKNOWLEDGMENTS = {
+    "recipient_info": text("👥 Parfait ! J'ai noté le destinataire."),
+    "budget_info": text("💰 Très bien ! Budget enregistré."),
+    "color_preference": text("🌈 Excellent ! Couleur notée."),
+    "age_info": text("🎂 Parfait ! Âge pris en compte.")
+}
+DEFAULT_ACKNOWLEDGMENT = text("✅ Information enregistrée !")
+UPDATE_FOUND = template("\n\n🔍 Avec ces informations, j'ai trouvé {count} produit(s) !")
+UPDATE_NEEDS_DETAILS = text("\n\n🤔 J'ai besoin de quelques détails supplémentaires pour vous proposer des produits.")
+GENERAL_RESPONSE = template("🤖 J'ai détecté votre intention ({intent}) avec {confidence:.1%} de confiance."
+                            "\n\n💡 Comment puis-je vous aider concrètement ?")
+RELAXED_CRITERIA = template("\n\nℹ️ Aucun produit ne correspondait à tous vos critères, j'ai donc assoupli : {labels:, }.")
 
 
 @dataclass
 class ChatbotResponse:
-    """Structured chatbot response"""
-    message: str
+    """Structured chatbot response; the reply is rendered when message is read"""
+    reply: Response
     products: List[Dict[str, Any]]
     confidence: float
     detected_intents: List[str]
     context_used: Dict[str, Any]
     needs_clarification: bool
     suggested_questions: List[str]
+    
+    @property
+    def message(self) -> str:
+        return str(self.reply)
 
 
 class IntelligentChatbot:
@@ -35,8 +126,8 @@ class IntelligentChatbot:
         self.confidence_threshold = 0.4  # Lowered from 0.6 for better shopping detection
         self.unknown_threshold = 0.2     # Lowered from 0.3
         
-        # Response templates organized by intent
-        self.response_templates = {
+        # Response templates organized by intent, compiled once
+        self.response_templates = {intent: templates(variants) for intent, variants in {
             "greeting": [
                 "🛍️ Bonjour ! Je suis votre assistant shopping intelligent. Comment puis-je vous aider aujourd'hui ?",
                 "✨ Salut ! Ravi de vous revoir ! Que recherchez-vous ?",
@@ -71,7 +162,7 @@ class IntelligentChatbot:
                 "🔄 Je n'ai pas bien saisi. Essayez de me donner plus de détails.",
                 "❓ Pouvez-vous m'expliquer différemment ce que vous voulez ?"
             ]
-        }
+        }.items()}
         
         # Clarification questions by missing context
         self.clarification_questions = {
@@ -102,45 +193,50 @@ class IntelligentChatbot:
         Main message processing pipeline
         """
         # Step 1: Detect intents using scoring system
-        primary_intent = intent_scorer.get_primary_intent(message)
-        all_intents = intent_scorer.detect_intents(message, top_k=3)
+        with metrics.stage("intent_detection"):
+            primary_intent = intent_scorer.get_primary_intent(message)
+            all_intents = intent_scorer.detect_intents(message, top_k=3)
         
         # Step 2: Get conversation context
-        conversation_context = conversation_memory.get_conversation_context(user_id)
-        user_preferences = conversation_memory.get_user_preferences(user_id)
+        with metrics.stage("context_fetch"):
+            conversation_context = conversation_memory.get_conversation_context(user_id)
+            user_preferences = conversation_memory.get_user_preferences(user_id)
         
         # Step 3: Merge context from intent detection and conversation history
-        merged_context = self.merge_contexts(
-            primary_intent.context_data,
-            conversation_context,
-            user_preferences
-        )
+        with metrics.stage("context_merge"):
+            merged_context = self.merge_contexts(
+                primary_intent.context_data,
+                conversation_context,
+                user_preferences
+            )
         
         # Step 4: Generate response based on intent and context
-        if primary_intent.confidence >= self.confidence_threshold:
-            response = self.generate_confident_response(
-                primary_intent, all_intents, merged_context, user_id
-            )
-        elif primary_intent.confidence >= self.unknown_threshold:
-            response = self.generate_uncertain_response(
-                primary_intent, merged_context, user_id
-            )
-        else:
-            # Log unknown query for learning
-            conversation_memory.log_unknown_query(message)
-            response = self.generate_unknown_response(merged_context, user_id)
+        with metrics.stage("response_generation"):
+            if primary_intent.confidence >= self.confidence_threshold:
+                response = self.generate_confident_response(
+                    primary_intent, all_intents, merged_context, user_id, message
+                )
+            elif primary_intent.confidence >= self.unknown_threshold:
+                response = self.generate_uncertain_response(
+                    primary_intent, merged_context, user_id, message
+                )
+            else:
+                # Log unknown query for learning
+                conversation_memory.log_unknown_query(message)
+                response = self.generate_unknown_response(merged_context, user_id)
         
         # Step 5: Save conversation turn
-        turn = ConversationTurn(
-            user_id=user_id,
-            message=message,
-            intent=primary_intent.intent,
-            confidence=primary_intent.confidence,
-            context_data=primary_intent.context_data,
-            response=response.message,
-            timestamp=datetime.now()
-        )
-        conversation_memory.add_conversation_turn(turn)
+        with metrics.stage("persistence"):
+            turn = ConversationTurn(
+                user_id=user_id,
+                message=message,
+                intent=primary_intent.intent,
+                confidence=primary_intent.confidence,
+                context_data=primary_intent.context_data,
+                response=response.reply,
+                timestamp=datetime.now()
+            )
+            conversation_memory.add_conversation_turn(turn)
         
         return response
     
@@ -173,7 +269,8 @@ class IntelligentChatbot:
     def generate_confident_response(self, primary_intent: IntentScore, 
                                   all_intents: List[IntentScore],
                                   context: Dict[str, Any],
-                                  user_id: str) -> ChatbotResponse:
+                                  user_id: str,
+                                  message: str = "") -> ChatbotResponse:
         """Generate response when we're confident about the intent"""
         
         intent_name = primary_intent.intent
@@ -195,17 +292,18 @@ class IntelligentChatbot:
             return self.handle_help_request(context)
         
         elif intent_name in ["product_search", "gift_intent", "category_preference"]:
-            return self.handle_product_search(context, all_intents)
+            return self.handle_product_search(context, all_intents, message)
         
         elif intent_name in ["recipient_info", "budget_info", "color_preference", "age_info"]:
-            return self.handle_context_update(context, intent_name)
+            return self.handle_context_update(context, intent_name, message)
         
         else:
             return self.handle_general_response(primary_intent, context)
     
     def generate_uncertain_response(self, primary_intent: IntentScore,
                                   context: Dict[str, Any],
-                                  user_id: str) -> ChatbotResponse:
+                                  user_id: str,
+                                  message: str = "") -> ChatbotResponse:
         """
         Generate response when we're uncertain about the intent
         CRITICAL: Return products for shopping intents, but NOT for off-topic/personal
@@ -217,46 +315,40 @@ class IntelligentChatbot:
         
         if is_shopping_intent:
             # Shopping intent with low confidence - be more positive
-            clarification_msg = random.choice([
-                "🛍️ Parfait ! Je vois que vous cherchez quelque chose de spécial.",
-                "✨ Excellente idée ! Laissez-moi vous aider à trouver ce qu'il vous faut.",
-                "🎯 Super ! J'ai quelques suggestions qui pourraient vous intéresser.",
-                "💡 Génial ! Voici ce que j'ai trouvé selon vos critères."
-            ])
+            clarification_msg = random.choice(UNCERTAIN_SHOPPING)()
             
             # Suggest what we detected
-            suggestions = []
+            suggestions = EMPTY
             if primary_intent.matched_keywords:
-                suggestions.append(f"✅ J'ai compris: {', '.join(primary_intent.matched_keywords)}")
+                suggestions = UNDERSTOOD(keywords=tuple(primary_intent.matched_keywords))
             
             # Show products and ask for more details if needed
-            products = self.search_products_with_context(context)[:6]
-            shopping_guidance = f"\n\n🔍 J'ai trouvé {len(products)} produit(s) correspondant !"
+            products = self.rank_search_result(
+                self.search_products_detailed(context), context, 6,
+                product_text_index.relative_scores(message)
+            )
+            shopping_guidance = SHOPPING_FOUND(count=len(products))
             
             if len(context) < 3:
-                shopping_guidance += "\n\n💬 Pour affiner la recherche, précisez-moi:\n• La couleur souhaitée\n• Votre budget maximum\n• L'occasion ou le style"
+                shopping_guidance += REFINE_HINT
             
         else:
             # Non-shopping intent - ask for clarification
-            clarification_msg = random.choice([
-                "🤔 Je pense comprendre, mais pouvez-vous être plus précis ?",
-                "💭 J'ai une idée de ce que vous cherchez, mais aidez-moi à mieux comprendre.",
-                "🔍 Je vois plusieurs possibilités. Pouvez-vous me donner plus de détails ?"
-            ])
+            clarification_msg = random.choice(UNCERTAIN_OTHER)()
             
-            suggestions = []
+            suggestions = EMPTY
             if primary_intent.matched_keywords:
-                suggestions.append(f"Vous parlez de: {', '.join(primary_intent.matched_keywords)}")
+                suggestions = MENTIONED(keywords=tuple(primary_intent.matched_keywords))
             
             products = []
-            shopping_guidance = "\n\n💡 Pour mieux vous aider, précisez:\n• Ce que vous cherchez exactement\n• Votre budget\n• Pour qui c'est destiné"
+            shopping_guidance = CLARIFY_HINT
         
         return ChatbotResponse(
-            message=f"{clarification_msg}\n\n" + "\n".join(suggestions) + shopping_guidance,
+            reply=clarification_msg + PARAGRAPH + suggestions + shopping_guidance,
             products=products,
             confidence=primary_intent.confidence,
             detected_intents=[primary_intent.intent],
-            context_used=context,
+            context_used=self.with_ranking_weights(context) if products else context,
             needs_clarification=True,
             suggested_questions=self.generate_clarification_questions(context)
         )
@@ -268,7 +360,7 @@ class IntelligentChatbot:
         CRITICAL: Be very strict - only return products for EXPLICIT shopping context
         """
         
-        unknown_msg = random.choice(self.response_templates["unknown"])
+        unknown_msg = random.choice(self.response_templates["unknown"])()
         
         # STRICT CHECK: Only allow products if there's EXPLICIT shopping context from CURRENT message
         # Do NOT use conversation history context for unknown intents
@@ -285,22 +377,23 @@ class IntelligentChatbot:
         
         if has_strong_shopping_context:
             # Strong shopping context - provide products
-            help_msg = "\n\n💡 Basé sur vos critères, voici quelques suggestions:"
-            products = self.search_products_with_context(current_message_context)[:4]
+            help_msg = UNKNOWN_SUGGESTIONS
+            products = self.rank_search_result(
+                self.search_products_detailed(current_message_context), current_message_context, 4
+            )
         else:
             # Weak or no shopping context - redirect to shopping without products
-            help_msg = "\n\n💡 Je suis un assistant e-commerce. Je peux vous aider à:\n• Trouver des produits par catégorie\n• Suggérer des cadeaux personnalisés\n• Filtrer par budget et couleur"
+            help_msg = UNKNOWN_REDIRECT
             products = []
         
         # Add shopping suggestions for unclear requests
-        suggestions_msg = "\n\n👉 Soyez plus précis:\n• 'Je cherche un cadeau pour ma fille de 8 ans'\n• 'Montrez-moi des casquettes rouges'\n• 'Budget maximum 30 DT'"
-        
         return ChatbotResponse(
-            message=unknown_msg + help_msg + suggestions_msg,
+            reply=unknown_msg + help_msg + UNKNOWN_EXAMPLES,
             products=products,
             confidence=0.0,
             detected_intents=["unknown"],
-            context_used=current_message_context,  # Only use current message context
+            context_used=(self.with_ranking_weights(current_message_context) if products
+                          else current_message_context),  # Only use current message context
             needs_clarification=True,
             suggested_questions=[
                 "🛍️ Que recherchez-vous exactement ?",
@@ -315,28 +408,12 @@ class IntelligentChatbot:
         CRITICAL: Completely ignore any shopping context
         """
         
-        personal_responses = [
-            "Je suis un assistant e-commerce et je ne peux pas répondre aux questions personnelles ou générales.",
-            "Je suis conçu uniquement pour vous aider avec vos achats. Je ne peux pas discuter de sujets personnels.",
-            "Mon rôle est de vous assister dans vos recherches de produits. Je ne réponds qu'aux questions liées au shopping.",
-            "Je suis spécialisé dans l'e-commerce. Pour les questions personnelles, consultez d'autres sources."
-        ]
-        
-        shopping_redirect = [
-            "👉 Posez-moi une question liée aux produits ou aux cadeaux.",
-            "💡 Demandez-moi plutôt ce que vous souhaitez acheter.",
-            "🛍️ Je peux vous aider à trouver des produits ou des cadeaux.",
-            "🎯 Parlez-moi de vos besoins d'achat."
-        ]
-        
         # Select random responses
-        main_response = random.choice(personal_responses)
-        redirect = random.choice(shopping_redirect)
-        
-        full_message = f"{main_response}\n\n{redirect}"
+        main_response = random.choice(PERSONAL_RESPONSES)()
+        redirect = random.choice(SHOPPING_REDIRECTS)()
         
         return ChatbotResponse(
-            message=full_message,
+            reply=main_response + PARAGRAPH + redirect,
             products=[],  # NEVER return products for personal questions
             confidence=1.0,
             detected_intents=["personal_question"],
@@ -355,28 +432,12 @@ class IntelligentChatbot:
         CRITICAL: Completely ignore any shopping context
         """
         
-        off_topic_responses = [
-            "Je suis un assistant e-commerce et je ne peux pas répondre aux questions générales ou non liées au shopping.",
-            "Je suis spécialisé dans l'aide à l'achat. Je ne peux répondre qu'aux questions sur les produits et le shopping.",
-            "Mon domaine d'expertise est l'e-commerce. Je peux vous aider à trouver des articles, des cadeaux ou des produits.",
-            "Je suis conçu pour vous assister dans vos achats en ligne. Pour d'autres sujets, consultez d'autres sources."
-        ]
-        
-        shopping_suggestions = [
-            "👉 Par exemple : 'Je cherche un cadeau pour ma sœur'",
-            "💡 Essayez : 'Montrez-moi des produits bleus'",
-            "🎁 Ou demandez : 'Quel cadeau pour un budget de 50 DT ?'",
-            "🛒 Vous pouvez dire : 'Je veux acheter une casquette'"
-        ]
-        
         # Select random responses
-        main_response = random.choice(off_topic_responses)
-        suggestion = random.choice(shopping_suggestions)
-        
-        full_message = f"{main_response}\n\n{suggestion}"
+        main_response = random.choice(OFF_TOPIC_RESPONSES)()
+        suggestion = random.choice(SHOPPING_EXAMPLES)()
         
         return ChatbotResponse(
-            message=full_message,
+            reply=main_response + PARAGRAPH + suggestion,
             products=[],  # NEVER return products for off-topic
             confidence=1.0,
             detected_intents=["off_topic"],
@@ -396,22 +457,17 @@ class IntelligentChatbot:
         history = conversation_memory.get_conversation_history(user_id)
         
         if len(history) > 1:  # Returning user
-            greeting = random.choice([
-                "✨ Ravi de vous revoir ! Comment puis-je vous aider aujourd'hui ?",
-                "🌟 Hello ! Que puis-je faire pour vous cette fois ?",
-                "🎉 Salut ! Prêt pour une nouvelle session shopping ?"
-            ])
+            greeting = random.choice(RETURNING_GREETINGS)()
         else:  # New user
-            greeting = random.choice(self.response_templates["greeting"])
+            greeting = random.choice(self.response_templates["greeting"])()
         
         # Add personalized suggestions based on preferences
-        suggestions = []
         user_prefs = conversation_memory.get_user_preferences(user_id)
         if user_prefs:
-            suggestions.append("💡 Basé sur vos préférences, je peux vous proposer des suggestions personnalisées !")
+            greeting += PREFERENCES_HINT
         
         return ChatbotResponse(
-            message=greeting + ("\n\n" + "\n".join(suggestions) if suggestions else ""),
+            reply=greeting,
             products=[],
             confidence=1.0,
             detected_intents=["greeting"],
@@ -427,10 +483,10 @@ class IntelligentChatbot:
     def handle_farewell(self, context: Dict[str, Any]) -> ChatbotResponse:
         """Handle farewell intents"""
         
-        farewell_msg = random.choice(self.response_templates["farewell"])
+        farewell_msg = random.choice(self.response_templates["farewell"])()
         
         return ChatbotResponse(
-            message=farewell_msg,
+            reply=farewell_msg,
             products=[],
             confidence=1.0,
             detected_intents=["farewell"],
@@ -442,21 +498,11 @@ class IntelligentChatbot:
     def handle_help_request(self, context: Dict[str, Any]) -> ChatbotResponse:
         """Handle help request intents"""
         
-        help_msg = random.choice(self.response_templates["help_request"])
+        help_msg = random.choice(self.response_templates["help_request"])()
         
         # Add specific help based on context
-        help_details = [
-            "🔍 Recherche de produits par catégorie",
-            "🎁 Suggestions de cadeaux personnalisés",
-            "💰 Filtrage par budget",
-            "🌈 Recherche par couleur",
-            "👥 Recommandations selon l'âge/genre"
-        ]
-        
-        full_message = f"{help_msg}\n\n💡 Voici ce que je peux faire:\n" + "\n".join(f"• {detail}" for detail in help_details)
-        
         return ChatbotResponse(
-            message=full_message,
+            reply=help_msg + HELP_DETAILS,
             products=[],
             confidence=1.0,
             detected_intents=["help_request"],
@@ -470,15 +516,17 @@ class IntelligentChatbot:
         )
     
     def handle_product_search(self, context: Dict[str, Any], 
-                            all_intents: List[IntentScore]) -> ChatbotResponse:
+                            all_intents: List[IntentScore],
+                            message: str = "") -> ChatbotResponse:
         """Handle product search intents"""
         
-        # Search for products using context
-        products = self.search_products_with_context(context)
+        # Search for products using context, full-text matches refine the ranking
+        search_result = self.search_products_detailed(context)
+        text_scores = product_text_index.relative_scores(message)
         
         # Generate response based on results
-        if products:
-            response_msg = random.choice(self.response_templates["product_search"])
+        if search_result.product_ids:
+            response_msg = random.choice(self.response_templates["product_search"])()
             
             # Add context-specific information
             context_info = []
@@ -490,57 +538,56 @@ class IntelligentChatbot:
                 context_info.append(f"couleur {context['color']}")
             
             if context_info:
-                response_msg += f"\n\n📋 Critères: {', '.join(context_info)}"
+                response_msg += SEARCH_CRITERIA(criteria=tuple(context_info))
             
-            response_msg += f"\n\n✨ J'ai trouvé {len(products)} produit(s) correspondant !"
+            response_msg += SEARCH_FOUND(count=self.found_count(search_result))
+            response_msg += self.describe_relaxed_criteria(search_result)
             
+            products = self.rank_search_result(search_result, context, 6, text_scores)
             needs_clarification = len(context) < 3  # Need more context
             
         else:
-            response_msg = "🤔 Je n'ai pas trouvé de produits correspondant exactement à vos critères."
-            response_msg += "\n\n💡 Essayons avec des critères différents ou regardez ces alternatives :"
+            response_msg = SEARCH_NOTHING
             
             # Get alternative products
-            products = product_db.get_all_products()[:6]
+            products = self.rank_alternatives(search_result, context, 6, text_scores)
             needs_clarification = True
         
         return ChatbotResponse(
-            message=response_msg,
-            products=products[:6],
+            reply=response_msg,
+            products=products,
             confidence=0.9,
             detected_intents=[intent.intent for intent in all_intents],
-            context_used=context,
+            context_used=self.with_ranking_weights(context),
             needs_clarification=needs_clarification,
             suggested_questions=self.generate_clarification_questions(context) if needs_clarification else []
         )
     
     def handle_context_update(self, context: Dict[str, Any], 
-                            intent_name: str) -> ChatbotResponse:
+                            intent_name: str,
+                            message: str = "") -> ChatbotResponse:
         """Handle context information updates"""
         
-        acknowledgments = {
-            "recipient_info": "👥 Parfait ! J'ai noté le destinataire.",
-            "budget_info": "💰 Très bien ! Budget enregistré.",
-            "color_preference": "🌈 Excellent ! Couleur notée.",
-            "age_info": "🎂 Parfait ! Âge pris en compte."
-        }
-        
-        ack_msg = acknowledgments.get(intent_name, "✅ Information enregistrée !")
+        ack_msg = ACKNOWLEDGMENTS.get(intent_name, DEFAULT_ACKNOWLEDGMENT)
         
         # Search for products with updated context
-        products = self.search_products_with_context(context)
+        search_result = self.search_products_detailed(context)
+        products = self.rank_search_result(
+            search_result, context, 6, product_text_index.relative_scores(message)
+        )
         
         if products:
-            ack_msg += f"\n\n🔍 Avec ces informations, j'ai trouvé {len(products)} produit(s) !"
+            ack_msg += UPDATE_FOUND(count=self.found_count(search_result))
+            ack_msg += self.describe_relaxed_criteria(search_result)
         else:
-            ack_msg += "\n\n🤔 J'ai besoin de quelques détails supplémentaires pour vous proposer des produits."
+            ack_msg += UPDATE_NEEDS_DETAILS
         
         return ChatbotResponse(
-            message=ack_msg,
-            products=products[:6],
+            reply=ack_msg,
+            products=products,
             confidence=0.8,
             detected_intents=[intent_name],
-            context_used=context,
+            context_used=self.with_ranking_weights(context),
             needs_clarification=len(context) < 3,
             suggested_questions=self.generate_clarification_questions(context)
         )
@@ -549,11 +596,8 @@ class IntelligentChatbot:
                               context: Dict[str, Any]) -> ChatbotResponse:
         """Handle general/other intents"""
         
-        general_msg = f"🤖 J'ai détecté votre intention ({intent.intent}) avec {intent.confidence:.1%} de confiance."
-        general_msg += "\n\n💡 Comment puis-je vous aider concrètement ?"
-        
         return ChatbotResponse(
-            message=general_msg,
+            reply=GENERAL_RESPONSE(intent=intent.intent, confidence=intent.confidence),
             products=[],
             confidence=intent.confidence,
             detected_intents=[intent.intent],
@@ -567,12 +611,15 @@ class IntelligentChatbot:
         )
     
     def search_products_with_context(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Search products using available context"""
+        """Search products using available context (the popular selection without criteria)"""
+        search_result = self.search_products_detailed(context)
+        return product_db.resolve(search_result)[:self.found_count(search_result)]
+    
+    def build_search_criteria(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Map conversation context to database criteria"""
         
-        # Build search criteria from context
         criteria = {}
         
-        # Map context to database criteria
         if context.get("color"):
             criteria["color"] = context["color"]
         
@@ -606,24 +653,62 @@ class IntelligentChatbot:
         if context.get("category"):
             criteria["category"] = context["category"]
         
-        # Search with criteria
+        return criteria
+    
+    @metrics.timed("product_search")
+    def search_products_detailed(self, context: Dict[str, Any]) -> RelaxedSearchResult:
+        """
+        Search products using available context, keeping track of relaxed criteria
+        If no product matches everything, the least important criterion is dropped
+        (color, then category, then age_group) in a single catalog pass
+        """
+        criteria = self.build_search_criteria(context)
+        
         if criteria:
-            products = product_db.complex_search(**criteria)
-            
-            # If no results, try with fewer criteria
-            if not products and len(criteria) > 1:
-                # Remove least important criteria and try again
-                for key_to_remove in ["color", "category", "age_group"]:
-                    if key_to_remove in criteria:
-                        reduced_criteria = {k: v for k, v in criteria.items() if k != key_to_remove}
-                        products = product_db.complex_search(**reduced_criteria)
-                        if products:
-                            break
-            
-            return products
-        else:
-            # No specific criteria, return popular products
-            return product_db.get_all_products()[:8]
+            return product_db.search_with_relaxation(
+                criteria, ["color", "category", "age_group"]
+            )
+        
+        # No specific criteria, every product is a candidate for ranking
+        return RelaxedSearchResult(
+            product_ids=product_db.get_all_product_ids(),
+            relaxed=(),
+            satisfied=0,
+            total_criteria=0,
+            partial_ids=()
+        )
+    
+    def found_count(self, search_result: RelaxedSearchResult) -> int:
+        """Number of products to report as found for a search result"""
+        if search_result.total_criteria:
+            return len(search_result.product_ids)
+        return min(len(search_result.product_ids), POPULAR_PRODUCT_COUNT)
+    
+    def rank_search_result(self, search_result: RelaxedSearchResult,
+                           context: Dict[str, Any], k: int,
+                           text_scores: Optional[Dict[int, float]] = None) -> List[Dict[str, Any]]:
+        """Pick the k most relevant products of a search result"""
+        criteria_ratio = (search_result.satisfied / search_result.total_criteria
+                          if search_result.total_criteria else 1.0)
+        return product_ranker.top_k(search_result.product_ids, context, k, criteria_ratio, text_scores)
+    
+    def rank_alternatives(self, search_result: RelaxedSearchResult,
+                          context: Dict[str, Any], k: int,
+                          text_scores: Optional[Dict[int, float]] = None) -> List[Dict[str, Any]]:
+        """Best alternatives when nothing matches: text and partial matches, then the rest of the catalog"""
+        return product_ranker.alternatives(search_result.partial_ids, context, k, text_scores)
+    
+    def with_ranking_weights(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Expose the ranking weights alongside the context used"""
+        return {**context, "ranking_weights": product_ranker.get_weights()}
+    
+    def describe_relaxed_criteria(self, search_result: RelaxedSearchResult) -> Response:
+        """Explain which criteria had to be dropped to find products"""
+        if not search_result.relaxed:
+            return EMPTY
+        
+        labels = tuple(CRITERIA_LABELS.get(key, key) for key in search_result.relaxed)
+        return RELAXED_CRITERIA(labels=labels)
     
     def generate_clarification_questions(self, context: Dict[str, Any]) -> List[str]:
         """Generate clarification questions based on missing context"""
@@ -654,6 +739,8 @@ class IntelligentChatbot:
             "conversation_memory": conversation_memory.get_conversation_stats(),
             "confidence_threshold": self.confidence_threshold,
             "unknown_threshold": self.unknown_threshold,
+            "search_cache": product_db.search_cache.get_stats(),
+            "text_index": product_text_index.get_stats(),
             "response_templates": {k: len(v) for k, v in self.response_templates.items()}
         }
 
@@ -0,0 +1,288 @@
+"""
+Linear Intent Model
+Softmax regression over hashed word n-grams, trained from logged conversations
+and served from a memory-mapped float32 weight file
+Usage: python intent_model.py [db_path] [model_path]
+"""
+
+import json
+import math
+import mmap
+import random
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from array import array
+from typing import Dict, List, Any, Callable, Optional, Sequence, Tuple
+
+MODEL_MAGIC = b"INTM"
+MODEL_VERSION = 1
+# magic, version, dimension, classes, max n-gram, labels length
+HEADER_FORMAT = "<4sIIIII"
+DEFAULT_DIMENSION = 1 << 15
+DEFAULT_MODEL_PATH = "intent_model.bin"
+UNKNOWN_LABEL = "unknown"
+
+
+class HashingFeaturizer:
+    """
+    Maps a normalized message to sparse hashed features (hashing trick)
+    Word unigrams and bigrams are hashed with crc32, which is stable across
+    processes, into a fixed number of buckets, then L2-normalized
+    """
+
+    def __init__(self, dimension: int = DEFAULT_DIMENSION, max_ngram: int = 2):
+        if dimension & (dimension - 1):
+            raise ValueError("dimension must be a power of two")
+        self.dimension = dimension
+        self.max_ngram = max_ngram
+        self.mask = dimension - 1
+
+    def features(self, text: str) -> Dict[int, float]:
+        words = text.split()
+        counts: Dict[int, float] = {}
+        mask = self.mask
+        for n in range(1, self.max_ngram + 1):
+            for i in range(len(words) - n + 1):
+                gram = " ".join(words[i:i + n])
+                index = zlib.crc32(f"{n}:{gram}".encode()) & mask
+                counts[index] = counts.get(index, 0.0) + 1.0
+
+        norm = math.sqrt(sum(value * value for value in counts.values()))
+        if norm:
+            for index in counts:
+                counts[index] /= norm
+        return counts
+
+
+def softmax(logits: Sequence[float]) -> List[float]:
+    top = max(logits)
+    exps = [math.exp(value - top) for value in logits]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+
+class IntentModel:
+    """
+    Serving side of the model: bias and weights are float32 views over a
+    memory-mapped file, so loading copies nothing and the page cache is
+    shared between worker processes
+    """
+
+    def __init__(self, labels: List[str], featurizer: HashingFeaturizer,
+                 bias: Sequence[float], weights: Sequence[float], source: Any = None):
+        self.labels = labels
+        self.featurizer = featurizer
+        self.bias = bias
+        self.weights = weights   # feature-major: weights[feature * classes + class]
+        self._source = source    # keeps the mmap alive
+
+    @classmethod
+    def load(cls, path: str) -> "IntentModel":
+        """Memory-map a weight file written by save_model"""
+        with open(path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header_size = struct.calcsize(HEADER_FORMAT)
+        magic, version, dimension, classes, max_ngram, labels_length = struct.unpack_from(
+            HEADER_FORMAT, mapped, 0
+        )
+        if magic != MODEL_MAGIC or version != MODEL_VERSION:
+            raise ValueError(f"{path} is not an intent model file (version {MODEL_VERSION})")
+
+        labels = json.loads(bytes(mapped[header_size:header_size + labels_length]).decode("utf-8"))
+        offset = _aligned(header_size + labels_length)
+        view = memoryview(mapped)[offset:offset + 4 * (classes + dimension * classes)]
+
+        if sys.byteorder == "little":
+            floats = view.cast("f")
+        else:
+            floats = array("f", view)
+            floats.byteswap()
+
+        featurizer = HashingFeaturizer(dimension, max_ngram)
+        return cls(labels, featurizer, floats[:classes], floats[classes:], source=mapped)
+
+    def predict(self, normalized: str) -> List[Tuple[str, float]]:
+        """(label, probability) pairs sorted by decreasing probability"""
+        classes = len(self.labels)
+        logits = list(self.bias)
+        weights = self.weights
+        for index, value in self.featurizer.features(normalized).items():
+            base = index * classes
+            for c, weight in enumerate(weights[base:base + classes]):
+                logits[c] += value * weight
+
+        probabilities = softmax(logits)
+        return sorted(zip(self.labels, probabilities), key=lambda item: item[1], reverse=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "labels": len(self.labels),
+            "dimension": self.featurizer.dimension,
+            "bytes": 4 * (len(self.bias) + len(self.weights))
+        }
+
+
+def _aligned(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def train_model(messages: Sequence[str], labels: Sequence[str],
+                featurizer: Optional[HashingFeaturizer] = None, epochs: int = 10,
+                learning_rate: float = 0.5, l2: float = 1e-6,
+                seed: int = 0) -> Tuple[List[str], array, Dict[int, List[float]]]:
+    """
+    Multinomial logistic regression trained with sparse SGD
+    Returns (labels, bias, weights by feature) ready for save_model
+    """
+    featurizer = featurizer or HashingFeaturizer()
+    label_names = sorted(set(labels))
+    label_index = {label: i for i, label in enumerate(label_names)}
+    classes = len(label_names)
+
+    examples = [(featurizer.features(message), label_index[label])
+                for message, label in zip(messages, labels)]
+    bias = array("d", bytes(8 * classes))
+    weights: Dict[int, List[float]] = {}
+    rng = random.Random(seed)
+
+    for epoch in range(epochs):
+        rng.shuffle(examples)
+        rate = learning_rate / (1.0 + epoch)
+        for features, target in examples:
+            logits = list(bias)
+            for index, value in features.items():
+                row = weights.get(index)
+                if row is not None:
+                    for c in range(classes):
+                        logits[c] += value * row[c]
+
+            gradient = softmax(logits)
+            gradient[target] -= 1.0
+            for c in range(classes):
+                bias[c] -= rate * gradient[c]
+            for index, value in features.items():
+                row = weights.get(index)
+                if row is None:
+                    row = weights[index] = [0.0] * classes
+                for c in range(classes):
+                    row[c] -= rate * (gradient[c] * value + l2 * row[c])
+
+    return label_names, bias, weights
+
+
+def save_model(path: str, labels: List[str], bias: Sequence[float],
+               weights: Dict[int, List[float]], featurizer: HashingFeaturizer):
+    """Write the dense float32 weight file read by IntentModel.load"""
+    classes = len(labels)
+    encoded_labels = json.dumps(labels).encode("utf-8")
+    header = struct.pack(HEADER_FORMAT, MODEL_MAGIC, MODEL_VERSION, featurizer.dimension,
+                         classes, featurizer.max_ngram, len(encoded_labels))
+    prefix = header + encoded_labels
+    prefix += b"\0" * (_aligned(len(prefix)) - len(prefix))
+
+    dense = array("f", bytes(4 * featurizer.dimension * classes))
+    for index, row in weights.items():
+        dense[index * classes:(index + 1) * classes] = array("f", row)
+    floats = array("f", bias)
+    floats.extend(dense)
+    if sys.byteorder != "little":
+        floats.byteswap()
+
+    with open(path, "wb") as handle:
+        handle.write(prefix)
+        floats.tofile(handle)
+
+
+def load_training_data(db_path: str, min_confidence: float = 0.0) -> Tuple[List[str], List[str]]:
+    """
+    Labeled messages from the conversations table, plus unknown_queries
+    as examples of the unknown label
+    """
+    messages, labels = [], []
+    with sqlite3.connect(db_path) as conn:
+        for message, intent, confidence in conn.execute(
+                "SELECT message, intent, confidence FROM conversations ORDER BY id"):
+            if intent == UNKNOWN_LABEL or confidence >= min_confidence:
+                messages.append(message)
+                labels.append(intent)
+        for (message,) in conn.execute("SELECT message FROM unknown_queries ORDER BY id"):
+            messages.append(message)
+            labels.append(UNKNOWN_LABEL)
+    return messages, labels
+
+
+def split_holdout(messages: Sequence[str], labels: Sequence[str],
+                  holdout: int = 5) -> Tuple[Tuple[list, list], Tuple[list, list]]:
+    """Deterministic split: a message always lands on the same side"""
+    train, test = ([], []), ([], [])
+    for message, label in zip(messages, labels):
+        side = test if zlib.crc32(message.encode()) % holdout == 0 else train
+        side[0].append(message)
+        side[1].append(label)
+    return train, test
+
+
+def evaluate(model: IntentModel, messages: Sequence[str], labels: Sequence[str],
+             normalize: Callable[[str], str]) -> Dict[str, Any]:
+    """Accuracy, per-label precision/recall/F1 and scoring latency"""
+    normalized = [normalize(message) for message in messages]
+
+    start = time.perf_counter()
+    predicted = [model.predict(text)[0][0] for text in normalized]
+    latency_us = (time.perf_counter() - start) / max(len(normalized), 1) * 1e6
+
+    report: Dict[str, Dict[str, float]] = {}
+    for label in sorted(set(labels) | set(predicted)):
+        true_positive = sum(1 for p, l in zip(predicted, labels) if p == label and l == label)
+        predicted_count = sum(1 for p in predicted if p == label)
+        support = sum(1 for l in labels if l == label)
+        precision = true_positive / predicted_count if predicted_count else 0.0
+        recall = true_positive / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        report[label] = {"precision": precision, "recall": recall, "f1": f1, "support": support}
+
+    correct = sum(1 for p, l in zip(predicted, labels) if p == l)
+    supported = [scores["f1"] for scores in report.values() if scores["support"]]
+    return {
+        "examples": len(labels),
+        "accuracy": correct / len(labels) if labels else 0.0,
+        "macro_f1": sum(supported) / len(supported) if supported else 0.0,
+        "latency_us": latency_us,
+        "per_label": report
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"   Examples: {report['examples']} | accuracy {report['accuracy']:.1%} | "
+          f"macro F1 {report['macro_f1']:.3f} | {report['latency_us']:.1f} µs/message")
+    for label, scores in report["per_label"].items():
+        print(f"   {label:<22} P {scores['precision']:.2f}  R {scores['recall']:.2f}  "
+              f"F1 {scores['f1']:.2f}  n={scores['support']}")
+
+
+if __name__ == "__main__":
+    from intent_scorer import IntentScorer
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "chatbot_memory.db"
+    model_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_MODEL_PATH
+
+    scorer = IntentScorer()
+    messages, labels = load_training_data(db_path)
+    (train_messages, train_labels), (test_messages, test_labels) = split_holdout(messages, labels)
+
+    featurizer = HashingFeaturizer()
+    normalized = [scorer.normalize_message(message) for message in train_messages]
+    start = time.perf_counter()
+    names, bias, weights = train_model(normalized, train_labels, featurizer)
+    print(f"🧠 Trained on {len(train_messages)} messages in {time.perf_counter() - start:.2f} s")
+
+    save_model(model_path, names, bias, weights, featurizer)
+    model = IntentModel.load(model_path)
+    print(f"💾 Saved {model_path} ({model.get_stats()['bytes'] / 1024:.0f} KiB)")
+
+    print("📊 Held-out evaluation")
+    print_report(evaluate(model, test_messages, test_labels, scorer.normalize_message))
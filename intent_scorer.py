@@ -3,11 +3,39 @@ Intent Detection System with Keyword Scoring
 Academic approach to natural language understanding for e-commerce chatbot
 """
 
+import json
+import logging
+import os
 import re
-from typing import Dict, List, Tuple, Any
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Tuple, Any, Mapping, NamedTuple, Optional
 from dataclasses import dataclass
 from collections import defaultdict
 
+from database import product_db
+from fuzzy_matcher import SymSpellIndex, COMMON_FRENCH_WORDS, words_of, with_plurals
+from text_normalizer import fold_text, fold_pattern, collapse_whitespace, PhraseRewriter
+from intent_model import IntentModel, UNKNOWN_LABEL
+from metrics import metrics
+from startup_cache import startup_cache, digest, source_digest
+
+logger = logging.getLogger(__name__)
+
+# Versioned intent definitions (keywords, thresholds, extractors, rewrites)
+DEFAULT_DEFINITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        "intent_definitions.json")
+# Scoring engines: weighted keywords, or the trained linear model
+ENGINES = ("keywords", "model")
+# Minimum probability for a model prediction to count as an intent
+MODEL_MIN_CONFIDENCE = 0.4
+# Folded keywords this short only match as words (or their plural): "âge"
+# folds to "age", which occurs inside "image"
+SHORT_KEYWORD_LENGTH = 4
+# Rejecting intents: a typo must never turn a shopping message into one of them
+GUARD_INTENTS = ("off_topic", "personal_question")
+
 
 @dataclass
 class IntentScore:
@@ -18,233 +46,318 @@ class IntentScore:
     context_data: Dict[str, Any]
 
 
+class CompiledKeyword(NamedTuple):
+    """An intent keyword as the scorers match it"""
+    keyword: str                        # folded, matched against folded messages
+    display: str                        # spelling reported in matched_keywords
+    weight: float
+    pattern: Optional["re.Pattern"]     # word-boundary pattern of short keywords, else None
+
+
+@dataclass(frozen=True)
+class IntentSnapshot:
+    """
+    Immutable compiled intent definitions
+    Readers take one reference and use it for a whole request, writers build
+    a new snapshot and swap the reference, so the read path needs no lock
+    """
+    version: int
+    revision: int
+    source_mtime: float
+    intent_definitions: Mapping[str, Mapping[str, Any]]
+    data_extractors: Mapping[str, str]
+    phrase_replacements: Mapping[str, str]
+    compiled_keywords: Mapping[str, Tuple[CompiledKeyword, ...]]
+    compiled_extractors: Mapping[str, "re.Pattern"]
+    canonical_values: Mapping[str, str]
+    phrase_rewriter: PhraseRewriter
+    typo_index: SymSpellIndex
+
+    def to_document(self) -> Dict[str, Any]:
+        """Plain (mutable) copy of the definitions, in the file format"""
+        return {
+            "version": self.version,
+            "intents": {
+                intent: {"keywords": dict(definition["keywords"]), "threshold": definition["threshold"]}
+                for intent, definition in self.intent_definitions.items()
+            },
+            "data_extractors": dict(self.data_extractors),
+            "phrase_replacements": dict(self.phrase_replacements)
+        }
+
+
+def short_keyword_pattern(keyword: str) -> Optional["re.Pattern"]:
+    """Word-bounded pattern of a short folded keyword (optional plural s/x), None for longer ones"""
+    if len(keyword) > SHORT_KEYWORD_LENGTH:
+        return None
+    return re.compile(rf"(?<![^\W\d_]){re.escape(keyword)}[sx]?(?![^\W\d_])")
+
+
+def is_word_occurrence(text: str, start: int, end: int) -> bool:
+    """Whether text[start:end] is bounded like short_keyword_pattern requires"""
+    if start > 0 and text[start - 1].isalpha():
+        return False
+    if end < len(text) and text[end] in "sx":
+        end += 1
+    return end == len(text) or not text[end].isalpha()
+
+
+def compile_keywords(keywords: Mapping[str, float]) -> Tuple[CompiledKeyword, ...]:
+    """
+    Fold an intent's keywords into compiled entries
+    Accent variants collapse into one entry keeping the first spelling
+    """
+    entries: Dict[str, Tuple[str, float]] = {}
+    for keyword, weight in keywords.items():
+        folded = fold_text(keyword)
+        if folded in entries:
+            display, previous = entries[folded]
+            entries[folded] = (display, max(previous, weight))
+        else:
+            entries[folded] = (keyword, weight)
+    return tuple(CompiledKeyword(folded, display, weight, short_keyword_pattern(folded))
+                 for folded, (display, weight) in entries.items())
+
+
+def build_typo_index(intents: Mapping[str, Mapping[str, Any]], data_extractors: Mapping[str, str],
+                     phrase_rewriter: PhraseRewriter) -> SymSpellIndex:
+    """Precompute the deletion index used to correct misspelled words"""
+    index = SymSpellIndex(max_distance=2)
+    index.exclude_words(with_plurals(words_of(map(fold_text, (
+        keyword for intent in GUARD_INTENTS if intent in intents for keyword in intents[intent]["keywords"]
+    )))))
+    for definition in intents.values():
+        index.add_words(with_plurals(words_of(map(fold_text, definition["keywords"]))), priority=2)
+    index.add_words(words_of(map(fold_text, data_extractors.values())), priority=2)
+    for product in product_db.get_all_products():
+        index.add_words(words_of(map(fold_text, [product["name"], product["category"],
+                                                 product["subcategory"], product["color"]])))
+        index.add_known_words(words_of(map(fold_text, [product["description"], *product["tags"]])))
+    index.add_known_words(words_of(phrase_rewriter.rewrites))
+    index.add_known_words(words_of(map(fold_text, COMMON_FRENCH_WORDS)))
+    return index
+
+
+def load_typo_index(intents: Mapping[str, Mapping[str, Any]], data_extractors: Mapping[str, str],
+                    phrase_rewriter: PhraseRewriter) -> SymSpellIndex:
+    """The typo index from the startup cache, built only when its inputs changed"""
+    key = digest(
+        [(intent, tuple(definition["keywords"])) for intent, definition in intents.items()],
+        dict(data_extractors), sorted(phrase_rewriter.rewrites.items()), product_db.catalog_fingerprint(),
+        source_digest("fuzzy_matcher", "text_normalizer", __name__)
+    )
+    return startup_cache.cached(
+        "intent_typo_index", key, lambda: build_typo_index(intents, data_extractors, phrase_rewriter)
+    )
+
+
+def compile_snapshot(document: Dict[str, Any], revision: int = 1,
+                     source_mtime: float = 0.0) -> IntentSnapshot:
+    """Validate a definitions document and compile it into a snapshot"""
+    try:
+        version = int(document["version"])
+        intents = {}
+        for intent, definition in document["intents"].items():
+            keywords = {str(keyword): float(weight) for keyword, weight in definition["keywords"].items()}
+            if not keywords:
+                raise ValueError(f"intent '{intent}' has no keywords")
+            intents[intent] = MappingProxyType({
+                "keywords": MappingProxyType(keywords),
+                "threshold": float(definition["threshold"])
+            })
+        data_extractors = dict(document.get("data_extractors", {}))
+        phrase_replacements = dict(document.get("phrase_replacements", {}))
+        compiled_extractors = {
+            data_type: re.compile(fold_pattern(pattern))
+            for data_type, pattern in data_extractors.items()
+        }
+    except (KeyError, TypeError, AttributeError, re.error) as e:
+        raise ValueError(f"Invalid intent definitions: {e!r}") from e
+
+    if "off_topic" not in intents:
+        raise ValueError("Invalid intent definitions: the off_topic intent is required")
+
+    # Messages are accent-folded, so patterns and keywords are folded too
+    phrase_rewriter = PhraseRewriter(phrase_replacements)
+    return IntentSnapshot(
+        version=version,
+        revision=revision,
+        source_mtime=source_mtime,
+        intent_definitions=MappingProxyType(intents),
+        data_extractors=MappingProxyType(data_extractors),
+        phrase_replacements=MappingProxyType(phrase_replacements),
+        compiled_keywords=MappingProxyType({
+            intent: compile_keywords(definition["keywords"]) for intent, definition in intents.items()
+        }),
+        compiled_extractors=MappingProxyType(compiled_extractors),
+        # Folded extracted value -> canonical spelling ("garcon" -> "garçon")
+        canonical_values=MappingProxyType({
+            fold_text(word): word for word in words_of(data_extractors.values())
+        }),
+        phrase_rewriter=phrase_rewriter,
+        # Typo-tolerant lookup over keywords, extractor values and product names
+        typo_index=load_typo_index(intents, data_extractors, phrase_rewriter)
+    )
+
+
+def load_definitions(path: str) -> Dict[str, Any]:
+    """Read a definitions file"""
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
 class IntentScorer:
     """
     Intent detection using weighted keyword scoring system
     More flexible than regex patterns, handles variations better
     """
     
-    def __init__(self):
-        # Intent definitions with weighted keywords
-        self.intent_definitions = {
-            # HIGHEST PRIORITY: Off-topic detection (must be first)
-            "off_topic": {
-                "keywords": {
-                    # General knowledge questions
-                    "messi": 1.0, "football": 0.8, "sport": 0.6, "équipe": 0.7,
-                    "histoire": 1.0, "géographie": 1.0, "mathématiques": 1.0, "math": 1.0,
-                    "science": 1.0, "physique": 1.0, "chimie": 1.0, "biologie": 1.0,
-                    "politique": 1.0, "président": 0.9, "gouvernement": 0.9,
-                    "météo": 1.0, "temps": 0.7, "température": 0.9,
-                    "actualité": 1.0, "news": 1.0, "nouvelles": 1.0,
-                    "capitale": 1.0, "pays": 0.8, "ville": 0.7, "france": 0.9,
-                    "tunisie": 0.9, "calcul": 1.0, "2+2": 1.0,
-                    "réveillon": 1.0, "nouvel an": 1.0, "événement": 0.8,
-                    
-                    # Non-shopping topics
-                    "recette": 1.0, "cuisine": 0.6, "cuisinier": 0.8, "plat": 0.8,
-                    "couscous": 1.0, "manger": 0.7, "nourriture": 0.8,
-                    "voyage": 1.0, "vacances": 0.9, "tourisme": 0.9, "hôtel": 0.8,
-                    "partir": 0.7, "destination": 0.8,
-                    "santé": 1.0, "médecin": 1.0, "maladie": 1.0, "symptôme": 1.0,
-                    "rhume": 1.0, "soigner": 1.0, "guérir": 0.9, "traitement": 0.9,
-                    "travail": 0.7, "emploi": 0.8, "job": 0.8, "carrière": 0.8,
-                    "choisir": 0.6, "métier": 0.8,
-                    "école": 0.9, "université": 0.9, "étudiant": 0.8, "cours": 0.8,
-                    
-                    # Technical/IT questions
-                    "ordinateur": 0.8, "internet": 0.9, "wifi": 1.0, "password": 1.0,
-                    "mot de passe": 1.0, "réparer": 1.0, "installer": 1.0,
-                    "logiciel": 0.9, "application": 0.7, "téléphone": 0.7,
-                    "windows": 1.0, "système": 0.8,
-                    
-                    # Entertainment
-                    "film": 0.9, "cinéma": 0.9, "série": 0.9, "musique": 0.9,
-                    "chanson": 0.9, "artiste": 0.8, "concert": 0.8,
-                    "recommande": 0.7, "recommandation": 0.7,
-                    
-                    # Philosophy/abstract
-                    "sens de la vie": 1.0, "bonheur": 0.8, "amour": 0.8,
-                    "philosophie": 1.0, "religion": 1.0, "dieu": 1.0,
-                    "penses-tu": 0.9, "opinion": 0.8, "crois-tu": 0.9,
-                    
-                    # Question words that often indicate off-topic
-                    "pourquoi": 0.5, "comment faire": 0.7, "expliquer": 0.6,
-                    "parlez-moi": 0.8, "parle-moi": 0.8, "donne-moi": 0.7,
-                    "quelle est": 0.6, "quel est": 0.6, "qu'est-ce": 0.6
-                },
-                "threshold": 0.3  # Very low threshold for aggressive detection
-            },
-            
-            # SECOND HIGHEST PRIORITY: Personal questions about chatbot
-            "personal_question": {
-                "keywords": {
-                    # Personal questions about chatbot identity
-                    "ton âge": 1.0, "votre âge": 1.0, "quel âge": 0.8,
-                    "ton nom": 1.0, "votre nom": 1.0, "comment tu t'appelles": 1.0,
-                    "qui es-tu": 1.0, "qui êtes-vous": 1.0, "que fais-tu": 0.9,
-                    "d'où viens-tu": 1.0, "où habites-tu": 1.0,
-                    "es-tu humain": 1.0, "êtes-vous humain": 1.0, "robot": 0.8,
-                    "intelligence artificielle": 0.9, "ia": 0.8,
-                    "comment ça va": 0.9, "ça va": 0.7, "comment allez-vous": 0.9,
-                    "tu fais quoi": 0.9, "que faites-vous": 0.9
-                },
-                "threshold": 0.4
-            },
-            
-            "greeting": {
-                "keywords": {
-                    "bonjour": 1.0, "salut": 1.0, "hello": 1.0, "hi": 0.9,
-                    "bonsoir": 0.9, "hey": 0.8, "coucou": 0.8
-                },
-                "threshold": 0.7
-            },
-            
-            "farewell": {
-                "keywords": {
-                    "au revoir": 1.0, "bye": 1.0, "à bientôt": 0.9,
-                    "merci": 0.8, "tchao": 0.8, "salut": 0.6
-                },
-                "threshold": 0.7
-            },
-            
-            "product_search": {
-                "keywords": {
-                    "cherche": 1.0, "veux": 1.0, "besoin": 1.0, "trouve": 0.9,
-                    "acheter": 0.9, "commander": 0.8, "voir": 0.7, "montrer": 0.7,
-                    "produit": 1.0, "article": 0.7, "quelque chose": 0.8,
-                    "je veux": 1.0, "je cherche": 1.0, "j'ai besoin": 1.0,
-                    "je veux un": 1.0, "je veux une": 1.0, "je cherche un": 1.0, "je cherche une": 1.0,
-                    "comme un": 0.8, "comme une": 0.8, "un produit": 1.0, "une produit": 1.0
-                },
-                "threshold": 0.3  # Even lower threshold for better detection
-            },
-            
-            "gift_intent": {
-                "keywords": {
-                    "cadeau": 1.0, "offrir": 1.0, "gift": 1.0, "surprise": 0.9,
-                    "anniversaire": 0.8, "fête": 0.8, "noël": 0.8,
-                    "pour ma": 0.9, "pour mon": 0.9, "pour une": 0.9, "pour un": 0.9,
-                    "pour sa": 0.8, "pour son": 0.8, "pour leur": 0.8,
-                    "je veux un cadeau": 1.0, "je cherche un cadeau": 1.0,
-                    "cadeau a": 1.0, "cadeau à": 1.0, "comme un cadeau": 1.0
-                },
-                "threshold": 0.4  # Lower threshold for better detection
-            },
-            
-            "recipient_info": {
-                "keywords": {
-                    "fille": 1.0, "garçon": 1.0, "femme": 1.0, "homme": 1.0,
-                    "enfant": 0.9, "bébé": 0.9, "ado": 0.8, "adulte": 0.8,
-                    "maman": 0.8, "papa": 0.8, "copain": 0.7, "copine": 0.7
-                },
-                "threshold": 0.8
-            },
-            
-            "budget_info": {
-                "keywords": {
-                    "budget": 1.0, "prix": 1.0, "coût": 0.9, "dépenser": 0.9,
-                    "maximum": 0.8, "pas cher": 0.8, "abordable": 0.7,
-                    "dt": 0.6, "dinar": 0.6, "euro": 0.5
-                },
-                "threshold": 0.6
-            },
-            
-            "color_preference": {
-                "keywords": {
-                    "rouge": 1.0, "bleu": 1.0, "vert": 1.0, "noir": 1.0,
-                    "blanc": 1.0, "rose": 1.0, "jaune": 1.0, "violet": 0.9,
-                    "orange": 0.9, "couleur": 0.8, "coloré": 0.7
-                },
-                "threshold": 0.8
-            },
-            
-            "age_info": {
-                "keywords": {
-                    "ans": 1.0, "âge": 1.0, "vieux": 0.8, "jeune": 0.8,
-                    "petit": 0.7, "grand": 0.7, "year": 0.9, "old": 0.8
-                },
-                "threshold": 0.7
-            },
-            
-            "help_request": {
-                "keywords": {
-                    "aide": 1.0, "help": 1.0, "comment": 0.9, "expliquer": 0.8,
-                    "comprendre": 0.8, "savoir": 0.7, "question": 0.7
-                },
-                "threshold": 0.7
-            },
-            
-            "category_preference": {
-                "keywords": {
-                    "casquette": 1.0, "bijoux": 1.0, "sac": 1.0, "vêtement": 1.0,
-                    "jouet": 1.0, "livre": 1.0, "montre": 1.0, "accessoire": 0.9,
-                    "décoration": 0.8, "sport": 0.8, "cuisine": 0.8,
-                    "pas cher": 0.8, "abordable": 0.7, "bon marché": 0.8
-                },
-                "threshold": 0.6
-            }
-        }
-        
-        # Patterns for extracting specific data
-        self.data_extractors = {
-            "age": r"\b(\d+)\s*(?:ans?|years?)\b",
-            "price": r"\b(\d+)\s*(?:dt|dinar|euro|€)\b",
-            "color": r"\b(rouge|bleu|vert|noir|blanc|rose|jaune|violet|orange)\b",
-            "recipient": r"\b(fille|garçon|femme|homme|enfant|bébé)\b"
-        }
+    def __init__(self, engine: str = "keywords", model_path: Optional[str] = None,
+                 definitions_path: Optional[str] = DEFAULT_DEFINITIONS_PATH,
+                 definitions: Optional[Dict[str, Any]] = None):
+        # Intent definitions with weighted keywords, compiled into a snapshot
+        self.definitions_path = definitions_path
+        self._write_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        if definitions is not None:
+            self.snapshot = compile_snapshot(definitions)
+        else:
+            self.snapshot = compile_snapshot(load_definitions(definitions_path), 1,
+                                             os.stat(definitions_path).st_mtime)
+    
+        # Optional trained model, selectable instead of keyword scoring
+        self.intent_model: Optional[IntentModel] = None
+        if model_path:
+            self.load_model(model_path)
+        self.set_engine(engine)
+    
+    # Read-only views of the current snapshot
+    @property
+    def intent_definitions(self) -> Mapping[str, Mapping[str, Any]]:
+        return self.snapshot.intent_definitions
+    
+    @property
+    def data_extractors(self) -> Mapping[str, str]:
+        return self.snapshot.data_extractors
+    
+    @property
+    def phrase_replacements(self) -> Mapping[str, str]:
+        return self.snapshot.phrase_replacements
+    
+    @property
+    def compiled_keywords(self) -> Mapping[str, Tuple[CompiledKeyword, ...]]:
+        return self.snapshot.compiled_keywords
     
-    def normalize_message(self, message: str) -> str:
+    @property
+    def phrase_rewriter(self) -> PhraseRewriter:
+        return self.snapshot.phrase_rewriter
+    
+    @property
+    def typo_index(self) -> SymSpellIndex:
+        return self.snapshot.typo_index
+    
+    def swap_snapshot(self, document: Dict[str, Any], source_mtime: Optional[float] = None) -> IntentSnapshot:
+        """Compile a new snapshot and publish it with a single reference assignment"""
+        with self._write_lock:
+            current = self.snapshot
+            snapshot = compile_snapshot(
+                document, current.revision + 1,
+                current.source_mtime if source_mtime is None else source_mtime
+            )
+            self.snapshot = snapshot
+        logger.info(f"Intent definitions v{snapshot.version} (revision {snapshot.revision}) loaded")
+        return snapshot
+    
+    def reload_definitions(self, path: Optional[str] = None) -> IntentSnapshot:
+        """
+        Reload the definitions file; the current snapshot stays active if the
+        file is invalid (ValueError) or unreadable (OSError)
+        """
+        path = path or self.definitions_path
+        if not path:
+            raise ValueError("No intent definitions file configured")
+        mtime = os.stat(path).st_mtime
+        try:
+            document = load_definitions(path)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid intent definitions: {e}") from e
+        if path != self.definitions_path:
+            self.definitions_path = path
+        return self.swap_snapshot(document, mtime)
+    
+    def reload_if_changed(self) -> bool:
+        """Reload the definitions file if its modification time changed"""
+        if not self.definitions_path:
+            return False
+        try:
+            if os.stat(self.definitions_path).st_mtime == self.snapshot.source_mtime:
+                return False
+            self.reload_definitions()
+            return True
+        except (OSError, ValueError) as e:
+            logger.error(f"Intent definitions reload failed, keeping current snapshot: {e}")
+            return False
+    
+    def watch_definitions(self, interval: float = 2.0) -> threading.Thread:
+        """Poll the definitions file in a daemon thread and hot-reload it on change"""
+        if self._watcher is None or not self._watcher.is_alive():
+            def watch():
+                while True:
+                    time.sleep(interval)
+                    self.reload_if_changed()
+    
+            self._watcher = threading.Thread(target=watch, name="intent-definitions-watcher", daemon=True)
+            self._watcher.start()
+        return self._watcher
+    
+    def load_model(self, model_path: str):
+        """Memory-map a weight file produced by intent_model.py"""
+        self.intent_model = IntentModel.load(model_path)
+    
+    def set_engine(self, engine: str):
+        """Select the scoring engine used by detect_intents"""
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        if engine == "model" and self.intent_model is None:
+            raise ValueError("The model engine requires a loaded model")
+        self.engine = engine
+    
+    def normalize_message(self, message: str, snapshot: Optional[IntentSnapshot] = None) -> str:
         """Normalize message for better matching"""
-        # Convert to lowercase and remove extra spaces
-        normalized = re.sub(r'\s+', ' ', message.lower().strip())
-        
-        # Handle common variations and contractions
-        replacements = {
-            "j'ai besoin": "besoin",
-            "je veux": "veux",
-            "je cherche": "cherche",
-            "pour ma": "pour",
-            "pour mon": "pour",
-            "cadeau a": "cadeau",
-            "cadeau à": "cadeau",
-            "comme un cadeau": "cadeau",
-            "comme une cadeau": "cadeau",
-            "un produit": "produit",
-            "une produit": "produit",
-            "le produit": "produit",
-            "des produits": "produit",
-            "ne depasse pas": "maximum",
-            "ne dépasse pas": "maximum",
-            "pas plus de": "maximum",
-            "maximum de": "maximum"
-        }
-        
-        for old, new in replacements.items():
-            normalized = normalized.replace(old, new)
-        
-        return normalized
+        snapshot = snapshot or self.snapshot
+    
+        # Fold case and accents, then remove extra spaces
+        normalized = collapse_whitespace(fold_text(message))
+    
+        # Fix typos ("casqette" -> "casquette") before exact keyword matching
+        normalized = snapshot.typo_index.correct_text(normalized)
     
-    def score_intent(self, message: str, intent: str) -> IntentScore:
+        # Handle common variations and contractions in a single pass
+        return snapshot.phrase_rewriter.rewrite(normalized)
+    
+    def score_intent(self, message: str, intent: str,
+                     snapshot: Optional[IntentSnapshot] = None) -> IntentScore:
         """Score a message against a specific intent"""
-        normalized_msg = self.normalize_message(message)
-        intent_def = self.intent_definitions[intent]
+        snapshot = snapshot or self.snapshot
+        normalized_msg = self.normalize_message(message, snapshot)
         
         total_score = 0.0
         matched_keywords = []
         word_count = len(normalized_msg.split())
         
         # Score based on keyword matches
-        for keyword, weight in intent_def["keywords"].items():
-            if keyword in normalized_msg:
+        padded_msg = f" {normalized_msg} "
+        for entry in snapshot.compiled_keywords[intent]:
+            keyword = entry.keyword
+            if keyword in normalized_msg and (entry.pattern is None or entry.pattern.search(normalized_msg)):
                 # Boost score for exact matches
-                if f" {keyword} " in f" {normalized_msg} ":
-                    score_boost = weight * 1.2
+                if f" {keyword} " in padded_msg:
+                    score_boost = entry.weight * 1.2
                 else:
-                    score_boost = weight
+                    score_boost = entry.weight
                 
                 total_score += score_boost
-                matched_keywords.append(keyword)
+                matched_keywords.append(entry.display)
         
         # Normalize score by message length (prevent long messages from dominating)
         if word_count > 0:
@@ -253,7 +366,7 @@ class IntentScorer:
             confidence = 0.0
         
         # Extract context data
-        context_data = self.extract_context_data(normalized_msg)
+        context_data = self.extract_context_data(normalized_msg, snapshot)
         
         return IntentScore(
             intent=intent,
@@ -262,23 +375,49 @@ class IntentScorer:
             context_data=context_data
         )
     
-    def extract_context_data(self, message: str) -> Dict[str, Any]:
+    def extract_context_data(self, message: str,
+                             snapshot: Optional[IntentSnapshot] = None) -> Dict[str, Any]:
         """Extract specific data from message using patterns"""
+        snapshot = snapshot or self.snapshot
         context = {}
         
-        for data_type, pattern in self.data_extractors.items():
-            matches = re.findall(pattern, message)
+        for data_type, pattern in snapshot.compiled_extractors.items():
+            matches = pattern.findall(message)
             if matches:
                 if data_type == "age":
                     context["age"] = int(matches[0])
                 elif data_type == "price":
                     context["max_price"] = float(matches[0])
                 elif data_type in ["color", "recipient"]:
-                    context[data_type] = matches[0]
+                    context[data_type] = snapshot.canonical_values.get(matches[0], matches[0])
         
         return context
     
-    def detect_intents(self, message: str, top_k: int = 3) -> List[IntentScore]:
+    def detect_intents_with_model(self, message: str, top_k: int = 3) -> List[IntentScore]:
+        """
+        Detect intents with the trained model
+        Off-topic, personal questions and unknown predictions are exclusive,
+        like their keyword counterparts
+        """
+        snapshot = self.snapshot
+        normalized_msg = self.normalize_message(message, snapshot)
+        context_data = self.extract_context_data(normalized_msg, snapshot)
+        
+        intent_scores = []
+        for label, probability in self.intent_model.predict(normalized_msg)[:top_k]:
+            if probability < MODEL_MIN_CONFIDENCE:
+                break
+            if label in [*GUARD_INTENTS, UNKNOWN_LABEL]:
+                if intent_scores:
+                    break
+                return [] if label == UNKNOWN_LABEL else [
+                    IntentScore(label, probability, [], dict(context_data))
+                ]
+            intent_scores.append(IntentScore(label, probability, [], dict(context_data)))
+        return intent_scores
+    
+    @metrics.timed("intent_scoring")
+    def detect_intents(self, message: str, top_k: int = 3, engine: Optional[str] = None) -> List[IntentScore]:
         """
         Detect multiple intents in a message, return top K by confidence
         OFF-TOPIC and PERSONAL_QUESTION have HIGHEST PRIORITY and override others
@@ -286,39 +425,47 @@ class IntentScorer:
         if not message or not message.strip():
             return []
         
+        if (engine or self.engine) == "model":
+            if self.intent_model is None:
+                raise ValueError("The model engine requires a loaded model")
+            return self.detect_intents_with_model(message, top_k)
+        
+        # One snapshot for the whole request, even if a reload swaps it meanwhile
+        snapshot = self.snapshot
+        definitions = snapshot.intent_definitions
         intent_scores = []
         
         # FIRST: Check for off-topic intent with highest priority
-        off_topic_score = self.score_intent(message, "off_topic")
-        if off_topic_score.confidence >= self.intent_definitions["off_topic"]["threshold"]:
+        off_topic_score = self.score_intent(message, "off_topic", snapshot)
+        if off_topic_score.confidence >= definitions["off_topic"]["threshold"]:
             # OFF-TOPIC DETECTED - Return only this intent, ignore others
             return [off_topic_score]
         
         # SECOND: Check for personal questions with second highest priority
-        if "personal_question" in self.intent_definitions:
-            personal_score = self.score_intent(message, "personal_question")
-            if personal_score.confidence >= self.intent_definitions["personal_question"]["threshold"]:
+        if "personal_question" in definitions:
+            personal_score = self.score_intent(message, "personal_question", snapshot)
+            if personal_score.confidence >= definitions["personal_question"]["threshold"]:
                 # PERSONAL QUESTION DETECTED - Return only this intent, ignore others
                 return [personal_score]
         
         # THIRD: Score against all other intents (excluding off_topic and personal_question)
-        for intent_name in self.intent_definitions:
+        for intent_name in definitions:
             if intent_name in ["off_topic", "personal_question"]:
                 continue  # Already checked above
                 
-            score = self.score_intent(message, intent_name)
+            score = self.score_intent(message, intent_name, snapshot)
             
             # Only include intents above threshold
-            if score.confidence >= self.intent_definitions[intent_name]["threshold"]:
+            if score.confidence >= definitions[intent_name]["threshold"]:
                 intent_scores.append(score)
         
         # Sort by confidence and return top K
         intent_scores.sort(key=lambda x: x.confidence, reverse=True)
         return intent_scores[:top_k]
     
-    def get_primary_intent(self, message: str) -> IntentScore:
+    def get_primary_intent(self, message: str, engine: Optional[str] = None) -> IntentScore:
         """Get the highest confidence intent"""
-        intents = self.detect_intents(message, top_k=1)
+        intents = self.detect_intents(message, top_k=1, engine=engine)
         
         if intents:
             return intents[0]
@@ -332,27 +479,46 @@ class IntentScorer:
             )
     
     def add_intent_keywords(self, intent: str, keywords: Dict[str, float]):
-        """Dynamically add keywords to an intent (for learning)"""
-        if intent in self.intent_definitions:
-            self.intent_definitions[intent]["keywords"].update(keywords)
+        """
+        Dynamically add keywords to an intent (for learning)
+        Copy-on-write: readers keep the snapshot they started with
+        """
+        document = self.snapshot.to_document()
+        if intent in document["intents"]:
+            document["intents"][intent]["keywords"].update(keywords)
         else:
             # Create new intent
-            self.intent_definitions[intent] = {
-                "keywords": keywords,
+            document["intents"][intent] = {
+                "keywords": dict(keywords),
                 "threshold": 0.6
             }
+        self.swap_snapshot(document)
     
     def get_intent_stats(self) -> Dict[str, Any]:
         """Get statistics about intent definitions"""
         stats = {}
-        for intent, definition in self.intent_definitions.items():
+        snapshot = self.snapshot
+        for intent, definition in snapshot.intent_definitions.items():
             stats[intent] = {
                 "keyword_count": len(definition["keywords"]),
                 "threshold": definition["threshold"],
                 "avg_weight": sum(definition["keywords"].values()) / len(definition["keywords"])
             }
         return stats
+    
+    def get_snapshot_info(self) -> Dict[str, Any]:
+        """Version of the active intent definitions"""
+        snapshot = self.snapshot
+        return {
+            "version": snapshot.version,
+            "revision": snapshot.revision,
+            "intents": len(snapshot.intent_definitions),
+            "definitions_path": self.definitions_path
+        }
 
 
-# Global instance
-intent_scorer = IntentScorer()
\ No newline at end of file
+# Global instance (INTENT_ENGINE=model with INTENT_MODEL_PATH serves the trained model)
+intent_scorer = IntentScorer(
+    engine=os.environ.get("INTENT_ENGINE", "keywords"),
+    model_path=os.environ.get("INTENT_MODEL_PATH")
+)
\ No newline at end of file
@@ -5,6 +5,7 @@ Point d'entrée principal du backend
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
 import logging
 
@@ -12,6 +13,10 @@ import logging
 from models import ChatRequest, ChatResponse, ProductSearchRequest, ProductListResponse, Product
 from chatbot_logic import ecommerce_chatbot
 from database import product_db
+from product_similarity import similarity_index
+from metrics import metrics
+from memory_accounting import memory_report, allocation_tracker
+from typing import Optional
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -51,8 +56,11 @@ async def root():
             "chat": "/chat",
             "products": "/products",
             "search": "/products/search",
+            "similar": "/products/{product_id}/similar",
             "health": "/health",
-            "stats": "/stats"
+            "stats": "/stats",
+            "metrics": "/metrics",
+            "debug_memory": "/debug/memory"
         }
     }
 
@@ -70,6 +78,53 @@ async def health_check():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Latences par étape du traitement (format texte Prometheus)
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/memory")
+def get_memory_report(types: int = 20):
+    """
+    Empreinte mémoire par structure, nombre d'objets par type et état du traçage
+    """
+    try:
+        return memory_report(types)
+    except Exception as e:
+        logger.error(f"Erreur lors du rapport mémoire: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur")
+
+
+@app.post("/debug/memory/snapshots")
+def take_memory_snapshot(label: Optional[str] = None, limit: int = 10):
+    """
+    Instantané tracemalloc et principaux sites d'allocation
+    """
+    try:
+        label = allocation_tracker.take_snapshot(label)
+        return {"label": label, "top": allocation_tracker.top(label, limit), **allocation_tracker.get_status()}
+    except Exception as e:
+        logger.error(f"Erreur lors de l'instantané mémoire: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur")
+
+
+@app.get("/debug/memory/diff")
+def diff_memory_snapshots(base: str, current: Optional[str] = None, limit: int = 10):
+    """
+    Sites d'allocation ayant le plus grossi entre deux instantanés
+    """
+    try:
+        return {"base": base, "current": current, "diff": allocation_tracker.diff(base, current, limit)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Instantané inconnu: {e}")
+    except Exception as e:
+        logger.error(f"Erreur lors de la comparaison mémoire: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur")
+
+
 @app.get("/stats")
 async def get_stats():
     """
@@ -108,19 +163,21 @@ async def chat_endpoint(request: ChatRequest):
             )
         
         # Génération de la réponse par le chatbot e-commerce intelligent
-        bot_result = ecommerce_chatbot.generate_smart_response(request.message)
-        
-        # Conversion des produits en modèles Pydantic
-        products = [Product(**product) for product in bot_result["products"]]
+        with metrics.stage("response_generation"):
+            bot_result = ecommerce_chatbot.generate_smart_response(request.message)
         
-        # Création de la réponse structurée
-        response = ChatResponse(
-            response=bot_result["response"],
-            timestamp=datetime.now(),
-            user_message=request.message,
-            products=products,
-            criteria=bot_result["criteria"]
-        )
+        with metrics.stage("serialization"):
+            # Conversion des produits en modèles Pydantic
+            products = [Product(**product) for product in bot_result["products"]]
+            
+            # Création de la réponse structurée
+            response = ChatResponse(
+                response=bot_result["response"],
+                timestamp=datetime.now(),
+                user_message=request.message,
+                products=products,
+                criteria=bot_result["criteria"]
+            )
         
         logger.info(f"Réponse générée avec {len(products)} produits")
         
@@ -164,7 +221,7 @@ async def search_products(search_request: ProductSearchRequest):
         criteria = {k: v for k, v in search_request.dict().items() if v is not None}
         
         # Recherche dans la base de données
-        products = product_db.complex_search(**criteria)
+        products = product_db.cached_search(**criteria)
         products_models = [Product(**product) for product in products]
         
         return ProductListResponse(
@@ -177,6 +234,27 @@ async def search_products(search_request: ProductSearchRequest):
         raise HTTPException(status_code=500, detail="Erreur interne du serveur")
 
 
+@app.get("/products/{product_id}/similar", response_model=ProductListResponse)
+async def get_similar_products(product_id: int, limit: int = 6):
+    """
+    Endpoint pour les produits similaires ("vous aimerez aussi")
+    """
+    if product_db.get_product_by_id(product_id) is None:
+        raise HTTPException(status_code=404, detail="Produit introuvable")
+    
+    try:
+        products = similarity_index.get_similar_products(product_id, k=limit)
+        products_models = [Product(**product) for product in products]
+        
+        return ProductListResponse(
+            products=products_models,
+            total=len(products_models)
+        )
+    except Exception as e:
+        logger.error(f"Erreur lors de la recherche de produits similaires: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur")
+
+
 @app.get("/products/categories")
 async def get_categories():
     """
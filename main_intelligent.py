@@ -5,17 +5,26 @@ Upgraded with intent scoring, conversation memory, and learning capabilities
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-import uvicorn
 import logging
+import os
 
 # Import the new intelligent chatbot system
 from intelligent_chatbot import intelligent_chatbot
-from conversation_memory import conversation_memory
-from intent_scorer import intent_scorer
+from conversation_memory import conversation_memory, DEFAULT_DB_PATH
+from intent_scorer import intent_scorer, ENGINES
 from database import product_db
+from product_similarity import similarity_index
+from text_search import product_text_index
+from memory_maintenance import MemoryMaintenance
+from metrics import metrics
+from readiness import readiness
+from startup_cache import startup_cache
+from state_backend import state_backend
+# memory_accounting (tracemalloc) and uvicorn are imported where they are used
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,6 +38,15 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Largest page of /memory/{user_id} history
+MAX_HISTORY_PAGE_SIZE = 100
+
+# Conversation database, opened and migrated at startup (not on import)
+MEMORY_DB_PATH = os.environ.get("CHATBOT_MEMORY_DB", DEFAULT_DB_PATH)
+
+# Retention, rollups and archiving for the conversation database (created at startup)
+memory_maintenance: Optional[MemoryMaintenance] = None
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -38,6 +56,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Deferred initialization, run after the server accepts requests
+readiness.add_step("conversation_history", conversation_memory.load_recent_conversations)
+readiness.add_step("product_text_index", product_text_index.ensure_built)
+readiness.add_step("similarity_index", similarity_index.ensure_built)
+
+@app.on_event("startup")
+async def open_memory_database():
+    """Open the conversation database, migrating it to the current schema (runs before the other hooks)"""
+    global memory_maintenance
+    conversation_memory.open_database(MEMORY_DB_PATH)
+    memory_maintenance = MemoryMaintenance(MEMORY_DB_PATH)
+
+@app.on_event("startup")
+async def start_warmup():
+    """Preload history and build the catalog indexes in the background (STARTUP_WARMUP=0 leaves them lazy)"""
+    if os.environ.get("STARTUP_WARMUP", "1") != "0":
+        readiness.start()
+
+@app.on_event("startup")
+async def watch_intent_definitions():
+    """Hot-reload intent definitions when the file changes"""
+    intent_scorer.watch_definitions()
+
+@app.on_event("startup")
+async def schedule_memory_maintenance():
+    """Prune and archive old conversations periodically when configured"""
+    interval_hours = os.environ.get("MEMORY_MAINTENANCE_INTERVAL_HOURS")
+    if interval_hours:
+        memory_maintenance.schedule(float(interval_hours))
+
+@app.on_event("startup")
+async def schedule_memory_sampling():
+    """Take periodic tracemalloc snapshots and log allocation growth when configured"""
+    interval_seconds = os.environ.get("MEMORY_TRACE_INTERVAL_SECONDS")
+    if interval_seconds:
+        from memory_accounting import allocation_tracker
+        allocation_tracker.start_sampler(float(interval_seconds))
+
+@app.on_event("shutdown")
+async def close_memory_database():
+    """Flush buffered unknown queries and close the conversation database"""
+    conversation_memory.close_database()
+
 # Pydantic models
 class ChatMessage(BaseModel):
     message: str
@@ -77,9 +138,16 @@ async def root():
         "endpoints": {
             "chat": "/chat - Main chatbot interaction",
             "products": "/products - Product search",
+            "similar": "/products/{product_id}/similar - Similar products",
             "stats": "/stats - System statistics",
-            "memory": "/memory/{user_id} - User conversation history",
-            "intents": "/intents/test - Test intent detection"
+            "memory": "/memory/{user_id} - User conversation history (cursor-paginated)",
+            "intents": "/intents/test - Test intent detection",
+            "reload_intents": "/admin/intents/reload - Hot-reload intent definitions",
+            "maintenance": "/admin/maintenance - Apply retention and archive old conversations",
+            "metrics": "/metrics - Per-stage latency histograms (Prometheus format)",
+            "debug_memory": "/debug/memory - Per-structure memory footprint and allocation snapshots",
+            "ready": "/ready - Readiness (503 until the startup warm-up is done)",
+            "handoff": "/admin/handoff/{user_id} - Release a user moved to another worker by the affinity router"
         },
         "documentation": "/docs"
     }
@@ -104,16 +172,17 @@ async def chat_endpoint(chat_message: ChatMessage):
         
         logger.info(f"Generated response with confidence {response.confidence:.2f}")
         
-        return ChatResponse(
-            response=response.message,
-            products=response.products,
-            confidence=response.confidence,
-            detected_intents=response.detected_intents,
-            context_used=response.context_used,
-            needs_clarification=response.needs_clarification,
-            suggested_questions=response.suggested_questions,
-            timestamp=datetime.now()
-        )
+        with metrics.stage("serialization"):
+            return ChatResponse(
+                response=response.message,
+                products=response.products,
+                confidence=response.confidence,
+                detected_intents=response.detected_intents,
+                context_used=response.context_used,
+                needs_clarification=response.needs_clarification,
+                suggested_questions=response.suggested_questions,
+                timestamp=datetime.now()
+            )
         
     except HTTPException:
         raise
@@ -153,7 +222,7 @@ async def search_products(search_request: ProductSearchRequest):
         
         # Perform search
         if criteria:
-            products = product_db.complex_search(**criteria)
+            products = product_db.cached_search(**criteria)
         else:
             products = product_db.get_all_products()
         
@@ -167,22 +236,54 @@ async def search_products(search_request: ProductSearchRequest):
         logger.error(f"Search error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
+@app.get("/products/{product_id}/similar")
+async def get_similar_products(product_id: int, limit: Optional[int] = 6):
+    """Get the precomputed most similar products ("you may also like")"""
+    try:
+        if product_db.get_product_by_id(product_id) is None:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        
+        products = similarity_index.get_similar_products(product_id, k=limit)
+        return {"product_id": product_id, "products": products, "total": len(products)}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Similarity error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Similarity error: {str(e)}")
+
 @app.get("/memory/{user_id}")
-async def get_user_memory(user_id: str, limit: Optional[int] = 10):
-    """Get conversation history for a specific user"""
+async def get_user_memory(user_id: str, limit: Optional[int] = 10, cursor: Optional[str] = None,
+                          intent: Optional[str] = None, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None):
+    """
+    Get conversation history for a specific user, newest first
+    Pass next_cursor back as cursor to page through the full persisted history
+    """
     try:
-        history = conversation_memory.get_conversation_history(user_id, limit=limit)
+        if not limit or not 1 <= limit <= MAX_HISTORY_PAGE_SIZE:
+            raise HTTPException(status_code=400,
+                                detail=f"limit must be between 1 and {MAX_HISTORY_PAGE_SIZE}")
+        try:
+            history, next_cursor = conversation_memory.get_history_page(
+                user_id, limit=limit, cursor=cursor, intent=intent, since=since, until=until
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         context = conversation_memory.get_conversation_context(user_id)
         preferences = conversation_memory.get_user_preferences(user_id)
         
         return {
             "user_id": user_id,
             "conversation_history": [turn.to_dict() for turn in history],
+            "next_cursor": next_cursor,
             "current_context": context,
             "user_preferences": preferences,
             "total_conversations": len(history)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Memory error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Memory error: {str(e)}")
@@ -199,6 +300,17 @@ async def clear_user_memory(user_id: str):
         logger.error(f"Clear memory error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Clear memory error: {str(e)}")
 
+@app.post("/admin/handoff/{user_id}")
+async def handoff_user(user_id: str):
+    """Drop a user's in-memory context when the affinity router moves them to another worker"""
+    try:
+        released = conversation_memory.release_user(user_id)
+        return {"user_id": user_id, "released": released}
+        
+    except Exception as e:
+        logger.error(f"Handoff error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Handoff error: {str(e)}")
+
 @app.get("/stats")
 async def get_system_stats():
     """Get comprehensive system statistics"""
@@ -213,6 +325,7 @@ async def get_system_stats():
                 "total_products": len(product_db.get_all_products()),
                 "categories": list(set(p["category"] for p in product_db.get_all_products()))
             },
+            "intent_definitions": intent_scorer.get_snapshot_info(),
             "api_version": "2.0.0",
             "features": ["intent_scoring", "conversation_memory", "learning"]
         }
@@ -222,14 +335,20 @@ async def get_system_stats():
         raise HTTPException(status_code=500, detail=f"Stats error: {str(e)}")
 
 @app.get("/intents/test")
-async def test_intent_detection(message: str):
-    """Test intent detection for a specific message"""
+async def test_intent_detection(message: str, engine: Optional[str] = None):
+    """Test intent detection for a specific message (engine: keywords or model)"""
     try:
-        primary_intent = intent_scorer.get_primary_intent(message)
-        all_intents = intent_scorer.detect_intents(message, top_k=5)
+        if engine not in (None, *ENGINES):
+            raise HTTPException(status_code=400, detail=f"Unknown engine '{engine}'")
+        if engine == "model" and intent_scorer.intent_model is None:
+            raise HTTPException(status_code=400, detail="No intent model loaded")
+        
+        primary_intent = intent_scorer.get_primary_intent(message, engine=engine)
+        all_intents = intent_scorer.detect_intents(message, top_k=5, engine=engine)
         
         return {
             "message": message,
+            "engine": engine or intent_scorer.engine,
             "primary_intent": {
                 "intent": primary_intent.intent,
                 "confidence": primary_intent.confidence,
@@ -246,10 +365,79 @@ async def test_intent_detection(message: str):
             ]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Intent test error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Intent test error: {str(e)}")
 
+@app.post("/admin/intents/reload")
+async def reload_intent_definitions():
+    """Reload intent definitions from file and swap them in atomically"""
+    try:
+        intent_scorer.reload_definitions()
+        return {"status": "reloaded", **intent_scorer.get_snapshot_info()}
+        
+    except ValueError as e:
+        # Invalid file: the previous definitions stay active
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Intent reload error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Intent reload error: {str(e)}")
+
+@app.post("/admin/maintenance")
+def run_memory_maintenance(vacuum: bool = False):
+    """Apply retention policies, roll up and archive expired rows, then compact"""
+    # Plain def: FastAPI runs it in the threadpool, so a long pass doesn't block the event loop
+    try:
+        return memory_maintenance.run(full_vacuum=vacuum)
+        
+    except Exception as e:
+        logger.error(f"Memory maintenance error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Memory maintenance error: {str(e)}")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Per-stage latency histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/memory")
+def get_memory_report(types: int = 20):
+    """Deep sizes of the long-lived structures, object counts by type and tracing status"""
+    # Plain def: walking the heap takes a while on large catalogs and histories
+    try:
+        from memory_accounting import memory_report
+        return memory_report(types)
+        
+    except Exception as e:
+        logger.error(f"Memory report error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Memory report error: {str(e)}")
+
+@app.post("/debug/memory/snapshots")
+def take_memory_snapshot(label: Optional[str] = None, limit: int = 10):
+    """Take a tracemalloc snapshot (tracing starts on first call) and return its top allocation sites"""
+    try:
+        from memory_accounting import allocation_tracker
+        label = allocation_tracker.take_snapshot(label)
+        return {"label": label, "top": allocation_tracker.top(label, limit), **allocation_tracker.get_status()}
+        
+    except Exception as e:
+        logger.error(f"Memory snapshot error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Memory snapshot error: {str(e)}")
+
+@app.get("/debug/memory/diff")
+def diff_memory_snapshots(base: str, current: Optional[str] = None, limit: int = 10):
+    """Allocation sites that grew the most between two snapshots (current defaults to the latest)"""
+    try:
+        from memory_accounting import allocation_tracker
+        return {"base": base, "current": current, "diff": allocation_tracker.diff(base, current, limit)}
+        
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown snapshot: {str(e)}")
+    except Exception as e:
+        logger.error(f"Memory diff error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Memory diff error: {str(e)}")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -276,6 +464,15 @@ async def health_check():
             "timestamp": datetime.now()
         }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the startup warm-up is done, 503 while it runs"""
+    status = readiness.get_status()
+    status["history_preloaded"] = conversation_memory.history_preloaded
+    status["startup_cache"] = startup_cache.get_stats()
+    status["state_backend"] = state_backend.get_stats()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 # Legacy compatibility endpoint (for existing frontend)
 @app.post("/chatbot")
 async def legacy_chatbot_endpoint(chat_message: ChatMessage):
@@ -309,10 +506,17 @@ if __name__ == "__main__":
     print("💾 SQLite Database: backend/chatbot_memory.db")
     print("🤖 Ready to serve intelligent conversations!")
     
+    # Several workers (WEB_CONCURRENCY) need a shared STATE_BACKEND, and can't reload
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    if workers > 1 and not state_backend.shared:
+        print("⚠️ Several workers without a shared STATE_BACKEND: each worker keeps its own sessions")
+    
+    import uvicorn
     uvicorn.run(
         "main_intelligent:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=workers == 1,
+        workers=workers,
         log_level="info"
     )
\ No newline at end of file
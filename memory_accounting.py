@@ -0,0 +1,293 @@
+"""
+Memory Accounting
+Deep sizes of the chatbot's long-lived structures, object counts by type,
+and tracemalloc snapshots with top allocation sites and diffs
+Usage: python memory_accounting.py [--types 20] [--top 15] [--trace-startup]
+"""
+
+import gc
+import linecache
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter, OrderedDict
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (report name, module, attribute path); structures of modules that are not
+# imported in this process are reported as not loaded rather than imported
+STRUCTURES = [
+    ("conversation_memory.user_conversations", "conversation_memory", "conversation_memory.user_conversations"),
+    ("conversation_memory.user_preferences", "conversation_memory", "conversation_memory.user_preferences"),
+    ("conversation_memory.unknown_query_counter", "conversation_memory",
+     "conversation_memory.unknown_query_counter"),
+    ("conversation_memory.codec", "conversation_memory", "conversation_memory.codec"),
+    ("ecommerce_chatbot.user_sessions", "chatbot_logic", "ecommerce_chatbot.user_sessions"),
+    ("ecommerce_chatbot.typo_index", "chatbot_logic", "ecommerce_chatbot.typo_index"),
+    ("product_db.products", "database", "product_db.products"),
+    ("product_db.search_cache", "database", "product_db.search_cache"),
+    ("intent_scorer.snapshot", "intent_scorer", "intent_scorer.snapshot"),
+    ("similarity_index", "product_similarity", "similarity_index"),
+    ("product_text_index", "text_search", "product_text_index"),
+]
+
+# Shared code and type objects are never part of a structure's footprint
+SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, types.CodeType, types.FrameType)
+DEFAULT_MAX_OBJECTS = 5_000_000
+# Allocations of the tracing machinery itself are left out of snapshots
+TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def deep_sizeof(root: Any, stop: Iterable[Any] = (),
+                max_objects: int = DEFAULT_MAX_OBJECTS) -> Tuple[int, int, bool]:
+    """
+    Bytes and object count reachable from root, and whether the walk was cut
+    at max_objects. Objects in stop (owners of other structures) are not
+    entered, so a structure is not charged for what it merely references.
+    """
+    seen = {id(obj) for obj in stop}
+    stack = [root]
+    size = count = 0
+    getsizeof, get_referents = sys.getsizeof, gc.get_referents
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SKIPPED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += getsizeof(obj)
+        count += 1
+        if count >= max_objects:
+            return size, count, True
+        stack.extend(get_referents(obj))
+        if isinstance(obj, dict):
+            # Dicts with only str keys don't report them as referents
+            stack.extend(obj)
+    return size, count, False
+
+
+def resolve(module_name: str, path: str) -> Tuple[bool, Any]:
+    module = sys.modules.get(module_name)
+    if module is None:
+        return False, None
+    obj = module
+    for attribute in path.split("."):
+        obj = getattr(obj, attribute)
+    return True, obj
+
+
+def structure_sizes(max_objects: int = DEFAULT_MAX_OBJECTS) -> Dict[str, Dict[str, Any]]:
+    """Deep size, object count and entry count of each registered structure"""
+    roots = {}
+    for name, module_name, path in STRUCTURES:
+        loaded, obj = resolve(module_name, path)
+        if loaded:
+            roots[name] = obj
+    # The global instances owning the structures (product_db, conversation_memory, ...)
+    owners = []
+    for _, module_name, path in STRUCTURES:
+        loaded, owner = resolve(module_name, path.split(".")[0])
+        if loaded and all(owner is not known for known in owners):
+            owners.append(owner)
+
+    report = {}
+    for name, _, _ in STRUCTURES:
+        if name not in roots:
+            report[name] = {"loaded": False}
+            continue
+        root = roots[name]
+        stop = [owner for owner in owners if owner is not root]
+        stop += [obj for other, obj in roots.items() if other != name]
+        size, objects, truncated = deep_sizeof(root, stop, max_objects)
+        entry = {"loaded": True, "bytes": size, "mb": round(size / 2 ** 20, 3), "objects": objects}
+        if hasattr(root, "__len__"):
+            entry["entries"] = len(root)
+        if truncated:
+            entry["truncated"] = True
+        report[name] = entry
+    return report
+
+
+def object_counts(limit: int = 20) -> List[Dict[str, Any]]:
+    """Most common types among the objects tracked by the garbage collector"""
+    counts = Counter()
+    for obj in gc.get_objects():
+        kind = type(obj)
+        counts[kind.__qualname__ if kind.__module__ == "builtins" else f"{kind.__module__}.{kind.__qualname__}"] += 1
+    return [{"type": name, "count": count} for name, count in counts.most_common(limit)]
+
+
+def process_memory() -> Dict[str, float]:
+    """Current and peak resident set size"""
+    result = {}
+    try:
+        import resource
+        result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as statm:
+            result["rss_mb"] = round(int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    return result
+
+
+class AllocationTracker:
+    """
+    Named tracemalloc snapshots, their top allocation sites and diffs
+    Tracing stores one frame per allocation by default, which keeps its
+    overhead low enough to leave a periodic sampler on in production.
+    """
+
+    def __init__(self, frames: int = 1, keep: int = 10):
+        self.frames = frames
+        self.keep = keep
+        self.snapshots: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_sampling = threading.Event()
+        self._counter = 0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        """Stop the sampler and tracing, and drop the stored snapshots"""
+        self._stop_sampling.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        tracemalloc.stop()
+        with self._lock:
+            self.snapshots.clear()
+
+    def take_snapshot(self, label: Optional[str] = None) -> str:
+        """Store a snapshot (tracing starts on first use) and return its label"""
+        self.start()
+        snapshot = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+        with self._lock:
+            self._counter += 1
+            label = label or f"{time.strftime('%H:%M:%S')}-{self._counter}"
+            self.snapshots.pop(label, None)
+            self.snapshots[label] = snapshot
+            while len(self.snapshots) > self.keep:
+                self.snapshots.popitem(last=False)
+        return label
+
+    def get_snapshot(self, label: Optional[str] = None) -> tracemalloc.Snapshot:
+        """A stored snapshot, the latest when label is None (KeyError if unknown)"""
+        with self._lock:
+            if label is None:
+                if not self.snapshots:
+                    raise KeyError("no snapshot taken yet")
+                return next(reversed(self.snapshots.values()))
+            return self.snapshots[label]
+
+    def top(self, label: Optional[str] = None, limit: int = 10, key_type: str = "lineno") -> List[Dict[str, Any]]:
+        """Allocation sites holding the most memory in a snapshot"""
+        return [
+            {"site": str(stat.traceback), "kb": round(stat.size / 1024, 1), "blocks": stat.count}
+            for stat in self.get_snapshot(label).statistics(key_type)[:limit]
+        ]
+
+    def diff(self, base: str, current: Optional[str] = None, limit: int = 10,
+             key_type: str = "lineno") -> List[Dict[str, Any]]:
+        """Allocation sites that grew (or shrank) the most between two snapshots"""
+        stats = self.get_snapshot(current).compare_to(self.get_snapshot(base), key_type)
+        return [
+            {"site": str(stat.traceback), "kb": round(stat.size / 1024, 1),
+             "kb_diff": round(stat.size_diff / 1024, 1), "blocks_diff": stat.count_diff}
+            for stat in stats[:limit]
+        ]
+
+    def start_sampler(self, interval: float = 300.0, limit: int = 5) -> threading.Thread:
+        """Snapshot every interval seconds in a daemon thread and log the top growth"""
+        if self._sampler is None or not self._sampler.is_alive():
+            self._stop_sampling.clear()
+
+            def sample():
+                previous = self.take_snapshot()
+                while not self._stop_sampling.wait(interval):
+                    current = self.take_snapshot()
+                    try:
+                        growth = [site for site in self.diff(previous, current, limit) if site["kb_diff"] > 0]
+                    except KeyError:
+                        growth = []  # evicted by manual snapshots in the meantime
+                    if growth:
+                        logger.info(f"Memory growth since {previous}: {growth}")
+                    previous = current
+
+            self._sampler = threading.Thread(target=sample, name="memory-sampler", daemon=True)
+            self._sampler.start()
+        return self._sampler
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {"tracing": tracemalloc.is_tracing(), "snapshots": list(self.snapshots),
+                  "sampler_running": self._sampler is not None and self._sampler.is_alive()}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            status.update({"traced_mb": round(current / 2 ** 20, 2), "traced_peak_mb": round(peak / 2 ** 20, 2),
+                           "overhead_mb": round(tracemalloc.get_tracemalloc_memory() / 2 ** 20, 2)})
+        return status
+
+
+def memory_report(types_limit: int = 20) -> Dict[str, Any]:
+    """Everything /debug/memory returns"""
+    start = time.perf_counter()
+    report = {
+        "process": process_memory(),
+        "structures": structure_sizes(),
+        "object_types": object_counts(types_limit),
+        "tracemalloc": allocation_tracker.get_status(),
+    }
+    report["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return report
+
+
+# Global tracker
+allocation_tracker = AllocationTracker()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {"--types": 20, "--top": 15}
+    for option in options:
+        if option in args:
+            options[option] = int(args[args.index(option) + 1])
+    trace_startup = "--trace-startup" in args
+    if trace_startup:
+        allocation_tracker.start()
+
+    # The structures of both APIs
+    import intelligent_chatbot  # noqa: F401
+    import chatbot_logic  # noqa: F401
+    import product_similarity  # noqa: F401
+
+    report = memory_report(options["--types"])
+    print(f"💾 Process: {report['process']}")
+    print("\n📦 Structures")
+    for name, entry in report["structures"].items():
+        if not entry["loaded"]:
+            print(f"   {name:<44} not loaded")
+            continue
+        entries = f"{entry['entries']:>9} entries" if "entries" in entry else " " * 17
+        print(f"   {name:<44}{entry['mb']:>10.3f} MiB {entry['objects']:>10} objects {entries}")
+    print("\n🔢 Objects by type")
+    for row in report["object_types"]:
+        print(f"   {row['type']:<44}{row['count']:>10}")
+    if trace_startup:
+        label = allocation_tracker.take_snapshot("startup")
+        print(f"\n📍 Top allocation sites at startup ({report['tracemalloc'].get('traced_mb')} MiB traced)")
+        for site in allocation_tracker.top(label, options["--top"]):
+            print(f"   {site['site']:<60}{site['kb']:>10.1f} KiB {site['blocks']:>8} blocks")
@@ -0,0 +1,310 @@
+"""
+Conversation Memory Maintenance
+Retention, daily rollups, compressed archives and incremental vacuum for
+chatbot_memory.db, done in small chunks so the chatbot keeps writing
+Usage: python memory_maintenance.py [db_path] [--archive-dir DIR] [--vacuum]
+(the command migrates an older database to the current schema first)
+"""
+
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Sequence, Union
+
+from context_codec import ContextCodec
+from memory_schema import SCHEMA_VERSION, get_schema_version, migrate
+from response_templates import TemplateStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = "archives"
+# Rows deleted per transaction; each chunk holds the write lock for a few ms
+DEFAULT_CHUNK_SIZE = 500
+# Free pages returned to the filesystem per maintenance run
+DEFAULT_VACUUM_PAGES = 2000
+
+
+class OutdatedSchemaError(RuntimeError):
+    """The database predates the current schema: its timestamps cannot be compared to the cutoffs"""
+
+
+@dataclass
+class RetentionPolicy:
+    """How long rows of a table are kept, and what happens to expired rows"""
+    table: str
+    timestamp_column: str
+    max_age_days: int
+    # "epoch_ms" for integer milliseconds, "iso" for datetime.isoformat() text,
+    # "sql" for CURRENT_TIMESTAMP text (UTC)
+    timestamp_format: str = "epoch_ms"
+    archive: bool = True
+    rollup: bool = False
+    # Unique column used to walk the expired rows (tables WITHOUT ROWID need their key)
+    key_column: str = "rowid"
+
+    def cutoff(self, now: Optional[datetime] = None) -> Union[int, str]:
+        if self.timestamp_format == "epoch_ms":
+            moment = (now or datetime.now()) - timedelta(days=self.max_age_days)
+            return int(moment.timestamp() * 1000)
+        if self.timestamp_format == "sql":
+            moment = (now or datetime.utcnow()) - timedelta(days=self.max_age_days)
+            return moment.strftime("%Y-%m-%d %H:%M:%S")
+        moment = (now or datetime.now()) - timedelta(days=self.max_age_days)
+        return moment.isoformat()
+
+
+DEFAULT_POLICIES = (
+    RetentionPolicy("conversations", "timestamp", 90, rollup=True),
+    RetentionPolicy("unknown_queries", "last_seen", 180, timestamp_format="sql"),
+    RetentionPolicy("user_preferences", "updated_at", 365, timestamp_format="sql", key_column="user_id"),
+)
+
+
+def delete_in_chunks(conn: sqlite3.Connection, table: str, where: str, params: Sequence[Any] = (),
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, pause: float = 0.0) -> int:
+    """
+    Delete matching rows chunk_size at a time, committing after each chunk
+    so other writers get the database lock between chunks
+    """
+    deleted = 0
+    while True:
+        cursor = conn.execute(
+            f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)",
+            (*params, chunk_size)
+        )
+        conn.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < chunk_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+class MemoryMaintenance:
+    """
+    Applies retention policies to the conversation memory database
+    Expired rows are read in key order one chunk at a time; each chunk is
+    appended to a gzip JSONL archive, folded into daily per-intent stats
+    when the policy asks for it, and deleted in its own short transaction.
+    """
+
+    def __init__(self, db_path: str, policies: Sequence[RetentionPolicy] = DEFAULT_POLICIES,
+                 archive_dir: Optional[str] = DEFAULT_ARCHIVE_DIR, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 pause: float = 0.01, vacuum_pages: int = DEFAULT_VACUUM_PAGES):
+        self.db_path = db_path
+        self.policies = list(policies)
+        self.archive_dir = archive_dir
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self._lock = threading.Lock()
+        self._scheduler: Optional[threading.Thread] = None
+        self.last_report: Dict[str, Any] = {}
+        self.init_tables()
+        # Archives are plain JSON: binary context_data and template replies are decoded on the way out
+        self.codec = ContextCodec(db_path)
+        self.templates = TemplateStore(db_path, self.codec)
+
+    def init_tables(self):
+        """Create the rollup table"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_daily_stats (
+                    day TEXT NOT NULL,
+                    intent TEXT NOT NULL,
+                    turns INTEGER NOT NULL,
+                    confidence_sum REAL NOT NULL,
+                    PRIMARY KEY (day, intent)
+                ) WITHOUT ROWID
+            """)
+            conn.commit()
+
+    def archive_path(self, table: str, run_started: float) -> str:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(run_started))
+        return os.path.join(self.archive_dir, f"{table}-{stamp}.jsonl.gz")
+
+    def prune_table(self, conn: sqlite3.Connection, policy: RetentionPolicy,
+                    run_started: float, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Archive, roll up and delete the expired rows of one table"""
+        cutoff = policy.cutoff(now)
+        archive = None
+        if policy.archive and self.archive_dir:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            archive_path = self.archive_path(policy.table, run_started)
+            archive = gzip.open(archive_path, "at", encoding="utf-8")
+
+        key = policy.key_column
+        removed, last_key = 0, None
+        try:
+            conn.row_factory = sqlite3.Row
+            while True:
+                # Keyset pagination: each chunk starts after the last key seen
+                rows = conn.execute(f"""
+                    SELECT {key} AS _key, * FROM {policy.table}
+                    WHERE {policy.timestamp_column} < ? AND (? IS NULL OR {key} > ?)
+                    ORDER BY {key} LIMIT ?
+                """, (cutoff, last_key, last_key, self.chunk_size)).fetchall()
+                if not rows:
+                    break
+                last_key = rows[-1]["_key"]
+
+                # Archive first: a crash before the delete re-archives, never loses rows
+                if archive is not None:
+                    for row in rows:
+                        record = dict(row)
+                        del record["_key"]
+                        if isinstance(record.get("context_data"), bytes):
+                            record["context_data"] = self.codec.decode(record["context_data"])
+                        if isinstance(record.get("response"), bytes):
+                            record["response"] = str(self.templates.decode(record["response"]))
+                        archive.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    archive.flush()
+
+                if policy.rollup:
+                    self.rollup_turns(conn, rows)
+                conn.executemany(f"DELETE FROM {policy.table} WHERE {key} = ?",
+                                 [(row["_key"],) for row in rows])
+                conn.commit()
+                removed += len(rows)
+                if self.pause:
+                    time.sleep(self.pause)
+        finally:
+            conn.row_factory = None
+            if archive is not None:
+                archive.close()
+                if not removed:
+                    os.remove(archive_path)
+
+        return {"cutoff": cutoff, "removed": removed,
+                "archive": archive_path if archive is not None and removed else None}
+
+    def rollup_turns(self, conn: sqlite3.Connection, rows: List[sqlite3.Row]):
+        """Add a chunk of conversation turns to the daily per-intent counts"""
+        totals: Dict[tuple, List[float]] = {}
+        for row in rows:
+            day = datetime.fromtimestamp(row["timestamp"] / 1000).strftime("%Y-%m-%d")
+            key = (day, row["intent"])
+            total = totals.setdefault(key, [0, 0.0])
+            total[0] += 1
+            total[1] += row["confidence"]
+
+        conn.executemany("""
+            INSERT INTO conversation_daily_stats (day, intent, turns, confidence_sum)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(day, intent) DO UPDATE SET
+                turns = turns + excluded.turns,
+                confidence_sum = confidence_sum + excluded.confidence_sum
+        """, [(day, intent, turns, confidence) for (day, intent), (turns, confidence) in totals.items()])
+
+    def enable_incremental_vacuum(self, conn: sqlite3.Connection) -> bool:
+        """
+        Switch the database to auto_vacuum=INCREMENTAL
+        Existing databases need one full VACUUM for the mode to take effect,
+        so this is only done on request (--vacuum), not on every run
+        """
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+
+    def compact(self, conn: sqlite3.Connection, removed: int) -> Dict[str, Any]:
+        """Return free pages in small steps and refresh planner statistics"""
+        freed = 0
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            freed = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})").fetchall()
+            freed -= conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if removed:
+            conn.execute("ANALYZE")
+        else:
+            conn.execute("PRAGMA optimize")
+        conn.commit()
+        return {"freed_pages": freed, "analyzed": bool(removed)}
+
+    def run(self, full_vacuum: bool = False, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """One maintenance pass over every policy"""
+        with self._lock:
+            run_started = time.time()
+            report: Dict[str, Any] = {"tables": {}}
+            with sqlite3.connect(self.db_path) as conn:
+                # Version 0 stores text timestamps, which no cutoff would ever match
+                version = get_schema_version(conn)
+                if version < SCHEMA_VERSION:
+                    raise OutdatedSchemaError(
+                        f"{self.db_path} is at schema version {version}, expected {SCHEMA_VERSION}: "
+                        f"migrate it first (python memory_schema.py {self.db_path})")
+                for policy in self.policies:
+                    report["tables"][policy.table] = self.prune_table(conn, policy, run_started, now)
+                removed = sum(table["removed"] for table in report["tables"].values())
+                if full_vacuum:
+                    # After pruning, so the one-time VACUUM also drops the expired rows' pages
+                    report["incremental_vacuum_enabled"] = self.enable_incremental_vacuum(conn)
+                report.update(self.compact(conn, removed))
+            report["duration_ms"] = round((time.time() - run_started) * 1000, 1)
+            self.last_report = report
+            logger.info(f"Memory maintenance: {report}")
+            return report
+
+    def schedule(self, interval_hours: float = 24.0) -> threading.Thread:
+        """Run maintenance every interval_hours in a daemon thread"""
+        if self._scheduler is None or not self._scheduler.is_alive():
+            def run_periodically():
+                while True:
+                    time.sleep(interval_hours * 3600)
+                    try:
+                        self.run()
+                    except (sqlite3.Error, OSError, OutdatedSchemaError) as e:
+                        logger.error(f"Memory maintenance failed: {e}")
+
+            self._scheduler = threading.Thread(target=run_periodically, name="memory-maintenance", daemon=True)
+            self._scheduler.start()
+        return self._scheduler
+
+    def get_daily_stats(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Rolled-up turns per day and intent"""
+        since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            return [
+                {"day": row["day"], "intent": row["intent"], "turns": row["turns"],
+                 "avg_confidence": row["confidence_sum"] / row["turns"]}
+                for row in conn.execute("""
+                    SELECT day, intent, turns, confidence_sum FROM conversation_daily_stats
+                    WHERE day >= ? ORDER BY day, intent
+                """, (since,))
+            ]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = sys.argv[1:]
+    full_vacuum = "--vacuum" in args
+    if full_vacuum:
+        args.remove("--vacuum")
+    archive_dir = DEFAULT_ARCHIVE_DIR
+    if "--archive-dir" in args:
+        position = args.index("--archive-dir")
+        archive_dir = args[position + 1]
+        del args[position:position + 2]
+    db_path = args[0] if args else "chatbot_memory.db"
+    if not os.path.exists(db_path):
+        sys.exit(f"No database at {db_path}")
+
+    from_version = migrate(db_path)
+    if from_version < SCHEMA_VERSION:
+        print(f"🔄 Migrated {db_path} from schema version {from_version} to {SCHEMA_VERSION}")
+    size_before = os.path.getsize(db_path)
+    report = MemoryMaintenance(db_path, archive_dir=archive_dir).run(full_vacuum=full_vacuum)
+    for table, result in report["tables"].items():
+        print(f"🧹 {table}: {result['removed']} rows older than {result['cutoff']}"
+              + (f" -> {result['archive']}" if result["archive"] else ""))
+    print(f"💾 {size_before / 1024:.0f} KiB -> {os.path.getsize(db_path) / 1024:.0f} KiB "
+          f"({report['freed_pages']} pages freed, {report['duration_ms']} ms)")
@@ -0,0 +1,173 @@
+"""
+Conversation Memory Schema
+Versioned schema of chatbot_memory.db (PRAGMA user_version) and the
+migrations that convert existing database files in place
+Usage: python memory_schema.py [db_path ...]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from context_codec import ContextCodec
+from response_templates import TemplateStore
+
+# Version 0: ISO text timestamps, JSON text context_data (original schema)
+# Version 1: epoch-millisecond timestamps, binary context_data, (user_id, timestamp) index
+SCHEMA_VERSION = 1
+MIGRATION_BATCH_SIZE = 5000
+
+
+def to_epoch_ms(moment: datetime) -> int:
+    """Naive datetimes are local time, as written by datetime.now()"""
+    return int(moment.timestamp() * 1000)
+
+
+def from_epoch_ms(epoch_ms: int) -> datetime:
+    return datetime.fromtimestamp(epoch_ms / 1000)
+
+
+def create_conversations_table(conn: sqlite3.Connection, name: str = "conversations"):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            message TEXT NOT NULL,
+            intent TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            context_data BLOB NOT NULL,
+            response TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def create_user_preferences_table(conn: sqlite3.Connection, name: str = "user_preferences"):
+    # One small row per user looked up by key: no separate rowid b-tree needed
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            user_id TEXT PRIMARY KEY,
+            preferences TEXT NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    """)
+
+
+def create_indexes(conn: sqlite3.Connection):
+    # Rowid tables append the rowid to every index entry, so (user_id, timestamp)
+    # covers history and keyset queries ordered by (timestamp, id)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_user_time ON conversations(user_id, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp)")
+
+
+def create_schema(conn: sqlite3.Connection):
+    """Current schema, for new databases"""
+    create_conversations_table(conn)
+    create_user_preferences_table(conn)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS unknown_queries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message TEXT NOT NULL,
+            frequency INTEGER DEFAULT 1,
+            first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(message)
+        )
+    """)
+    ContextCodec.create_table(conn)
+    TemplateStore.create_table(conn)
+    create_indexes(conn)
+
+
+def migrate_v0_to_v1(conn: sqlite3.Connection, codec: ContextCodec):
+    """Rewrite conversations and user_preferences in the version 1 layout"""
+    ContextCodec.create_table(conn)
+    create_conversations_table(conn, "conversations_v1")
+    last_id = 0
+    while True:
+        rows = conn.execute("""
+            SELECT id, user_id, message, intent, confidence, context_data, response, timestamp, created_at
+            FROM conversations WHERE id > ? ORDER BY id LIMIT ?
+        """, (last_id, MIGRATION_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        conn.executemany("""
+            INSERT INTO conversations_v1
+            (id, user_id, message, intent, confidence, context_data, response, timestamp, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (row_id, user_id, message, intent, confidence,
+             codec.encode(json.loads(context_data), conn), response,
+             to_epoch_ms(datetime.fromisoformat(timestamp)), created_at)
+            for row_id, user_id, message, intent, confidence, context_data, response, timestamp, created_at in rows
+        ])
+        last_id = rows[-1][0]
+
+    conn.execute("DROP TABLE conversations")
+    conn.execute("ALTER TABLE conversations_v1 RENAME TO conversations")
+
+    create_user_preferences_table(conn, "user_preferences_v1")
+    conn.execute("INSERT INTO user_preferences_v1 SELECT user_id, preferences, updated_at FROM user_preferences")
+    conn.execute("DROP TABLE user_preferences")
+    conn.execute("ALTER TABLE user_preferences_v1 RENAME TO user_preferences")
+
+
+# MIGRATIONS[n] upgrades a database from version n to n + 1
+MIGRATIONS: List[Callable[[sqlite3.Connection, ContextCodec], None]] = [migrate_v0_to_v1]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path: str, codec: Optional[ContextCodec] = None) -> int:
+    """
+    Bring a database to SCHEMA_VERSION and return the version it started at
+    Each migration runs in one IMMEDIATE transaction, so a failure leaves
+    the file untouched at its previous version
+    """
+    codec = codec or ContextCodec()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            start_version = version = get_schema_version(conn)
+            has_tables = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'conversations'"
+            ).fetchone()[0]
+            if not has_tables:
+                version = SCHEMA_VERSION
+            while version < SCHEMA_VERSION:
+                MIGRATIONS[version](conn, codec)
+                version += 1
+            create_schema(conn)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if start_version < SCHEMA_VERSION and has_tables:
+            conn.execute("ANALYZE")
+        return start_version
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    for db_path in sys.argv[1:] or ["chatbot_memory.db"]:
+        size_before = os.path.getsize(db_path)
+        start = time.perf_counter()
+        from_version = migrate(db_path)
+        elapsed = time.perf_counter() - start
+        if from_version == SCHEMA_VERSION:
+            print(f"✅ {db_path} already at schema version {SCHEMA_VERSION}")
+            continue
+        with sqlite3.connect(db_path, isolation_level=None) as conn:
+            conn.execute("VACUUM")
+        print(f"🔄 {db_path}: schema {from_version} -> {SCHEMA_VERSION} in {elapsed:.2f} s, "
+              f"{size_before / 1024:.0f} KiB -> {os.path.getsize(db_path) / 1024:.0f} KiB")
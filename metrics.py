@@ -0,0 +1,225 @@
+"""
+Pipeline Latency Metrics
+Per-stage wall and CPU time histograms for the chat hot path, exported in
+the Prometheus text format
+"""
+
+import functools
+import os
+import threading
+import time
+from typing import Dict, List, Any, Callable, Tuple
+
+# Log-linear (HDR-style) buckets over integer microseconds: each power of two
+# is split into 8 linear sub-buckets, so a recorded value is off by < 12.5%
+SUB_BUCKET_BITS = 4
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+MAX_EXPONENT = 36  # about 19 hours
+BUCKET_COUNT = (MAX_EXPONENT + 2) * SUB_BUCKET_HALF
+MAX_TRACKABLE_US = (1 << (MAX_EXPONENT + SUB_BUCKET_BITS)) - 1
+
+# Bucket bounds (seconds) exposed to Prometheus, derived from the fine buckets
+PROMETHEUS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                      0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = "chatbot_stage"
+
+
+def bucket_index(value_us: int) -> int:
+    if value_us > MAX_TRACKABLE_US:
+        value_us = MAX_TRACKABLE_US
+    exponent = value_us.bit_length() - SUB_BUCKET_BITS
+    if exponent <= 0:
+        return value_us
+    return (exponent << (SUB_BUCKET_BITS - 1)) + (value_us >> exponent)
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """[lower, upper) microsecond range of a bucket"""
+    if index < 2 * SUB_BUCKET_HALF:
+        return index, index + 1
+    exponent = (index >> (SUB_BUCKET_BITS - 1)) - 1
+    lower = (index - (exponent << (SUB_BUCKET_BITS - 1))) << exponent
+    return lower, lower + (1 << exponent)
+
+
+class StageCounts:
+    """Wall and CPU histograms of one stage, owned by a single thread"""
+    __slots__ = ("wall", "cpu", "wall_sum_us", "cpu_sum_us", "count")
+
+    def __init__(self):
+        self.wall = [0] * BUCKET_COUNT
+        self.cpu = [0] * BUCKET_COUNT
+        self.wall_sum_us = 0
+        self.cpu_sum_us = 0
+        self.count = 0
+
+    def add(self, wall_us: int, cpu_us: int):
+        self.wall[bucket_index(wall_us)] += 1
+        self.cpu[bucket_index(cpu_us)] += 1
+        self.wall_sum_us += wall_us
+        self.cpu_sum_us += cpu_us
+        self.count += 1
+
+
+class StageTimer:
+    """Context manager recording the wall and thread CPU time of a block"""
+    __slots__ = ("registry", "name", "wall_start", "cpu_start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self) -> "StageTimer":
+        self.wall_start = time.perf_counter_ns()
+        self.cpu_start = time.thread_time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.registry.record(self.name, (time.perf_counter_ns() - self.wall_start) // 1000,
+                             (time.thread_time_ns() - self.cpu_start) // 1000)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    Stage histograms accumulated in per-thread shards
+    Each thread writes only to its own shard, so recording takes no lock;
+    readers merge all shards when metrics are scraped. A scrape racing with
+    a write may miss that one sample, which is fine for monitoring.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._local = threading.local()
+        self._shards: List[Dict[str, StageCounts]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[str, StageCounts]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard: Dict[str, StageCounts] = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def record(self, stage: str, wall_us: int, cpu_us: int):
+        shard = self._shard()
+        counts = shard.get(stage)
+        if counts is None:
+            counts = shard[stage] = StageCounts()
+        counts.add(wall_us, cpu_us)
+
+    def stage(self, name: str):
+        """with metrics.stage("intent_scoring"): ..."""
+        return StageTimer(self, name) if self.enabled else NULL_TIMER
+
+    def timed(self, name: str) -> Callable:
+        """Decorator form of stage()"""
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def merged(self) -> Dict[str, StageCounts]:
+        """Sum of all thread shards, per stage"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals: Dict[str, StageCounts] = {}
+        for shard in shards:
+            for stage, counts in list(shard.items()):
+                total = totals.get(stage)
+                if total is None:
+                    total = totals[stage] = StageCounts()
+                total.wall = [a + b for a, b in zip(total.wall, counts.wall)]
+                total.cpu = [a + b for a, b in zip(total.cpu, counts.cpu)]
+                total.wall_sum_us += counts.wall_sum_us
+                total.cpu_sum_us += counts.cpu_sum_us
+                total.count += counts.count
+        return totals
+
+    def reset(self):
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage count, mean and percentiles in milliseconds"""
+        result = {}
+        for stage, counts in sorted(self.merged().items()):
+            if not counts.count:
+                continue
+            result[stage] = {
+                "count": counts.count,
+                "wall_ms": summarize(counts.wall, counts.wall_sum_us, counts.count),
+                "cpu_ms": summarize(counts.cpu, counts.cpu_sum_us, counts.count)
+            }
+        return result
+
+    def render_prometheus(self) -> str:
+        """Histograms in the Prometheus text exposition format (version 0.0.4)"""
+        merged = sorted(self.merged().items())
+        lines = []
+        for kind, description in (("wall", "Wall-clock time"), ("cpu", "Thread CPU time")):
+            name = f"{METRIC_PREFIX}_{kind}_seconds"
+            lines.append(f"# HELP {name} {description} spent in each chat pipeline stage")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, counts in merged:
+                buckets = counts.wall if kind == "wall" else counts.cpu
+                total_us = counts.wall_sum_us if kind == "wall" else counts.cpu_sum_us
+                label = f'stage="{stage}"'
+                cumulative, index = 0, 0
+                for bound in PROMETHEUS_BUCKETS:
+                    bound_us = bound * 1_000_000
+                    while index < BUCKET_COUNT and bucket_bounds(index)[1] <= bound_us:
+                        cumulative += buckets[index]
+                        index += 1
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {counts.count}')
+                lines.append(f"{name}_sum{{{label}}} {total_us / 1_000_000:.6f}")
+                lines.append(f"{name}_count{{{label}}} {counts.count}")
+        return "\n".join(lines) + "\n"
+
+
+def percentile(buckets: List[int], count: int, fraction: float) -> float:
+    """Upper bound (µs) of the bucket holding the given fraction of samples"""
+    if not count:
+        return 0.0
+    rank = max(1, int(fraction * count + 0.5))
+    seen = 0
+    for index, bucket in enumerate(buckets):
+        seen += bucket
+        if seen >= rank:
+            return float(bucket_bounds(index)[1])
+    return float(MAX_TRACKABLE_US)
+
+
+def summarize(buckets: List[int], total_us: int, count: int) -> Dict[str, float]:
+    return {
+        "mean": round(total_us / count / 1000, 3),
+        "p50": round(percentile(buckets, count, 0.50) / 1000, 3),
+        "p95": round(percentile(buckets, count, 0.95) / 1000, 3),
+        "p99": round(percentile(buckets, count, 0.99) / 1000, 3),
+        "max": round(percentile(buckets, count, 1.0) / 1000, 3)
+    }
+
+
+# Global registry; CHATBOT_METRICS=0 turns every timer into a no-op
+metrics = MetricsRegistry(enabled=os.environ.get("CHATBOT_METRICS", "1") != "0")
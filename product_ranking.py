@@ -0,0 +1,137 @@
+"""
+Product Relevance Ranking
+Scores candidate products against the conversation context and keeps the top K
+"""
+
+import heapq
+from typing import Dict, List, Any, Iterable, Optional, Set
+
+from database import product_db, ProductDatabase
+from product_similarity import similarity_index, SimilarityIndex
+
+
+# Weights of each ranking signal (exposed in the chatbot context_used)
+RANKING_WEIGHTS = {
+    "criteria_match": 3.0,   # share of search criteria satisfied
+    "budget_fit": 1.5,       # closeness to the budget, penalty when above it
+    "in_stock": 0.5,         # stock availability
+    "tag_overlap": 1.0,      # product tags shared with the conversation context
+    "text_match": 2.0        # BM25 score of the message, relative to the best match
+}
+
+# Context keys whose values are compared with product tags
+CONTEXT_TAG_KEYS = ["recipient", "occasion", "color", "category"]
+
+# Stock level from which availability stops improving the score
+FULL_STOCK_LEVEL = 10
+
+
+class ProductRanker:
+    """
+    Ranks candidate product ids with a weighted linear score
+    Selection uses heapq.nlargest so cost is O(n log k) without sorting all results
+    """
+
+    def __init__(self, database: ProductDatabase, similarity: Optional[SimilarityIndex] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        self.database = database
+        self.similarity = similarity
+        self.weights = dict(weights or RANKING_WEIGHTS)
+
+    def context_tags(self, context: Dict[str, Any]) -> Set[str]:
+        """Extract tag-like words from the conversation context"""
+        tags = set()
+        for key in CONTEXT_TAG_KEYS:
+            value = context.get(key)
+            if isinstance(value, str) and value:
+                tags.add(value.lower())
+        return tags
+
+    def score(self, product: Dict[str, Any], context: Dict[str, Any],
+              criteria_ratio: float, context_tags: Set[str],
+              text_score: float = 0.0) -> float:
+        """Compute the relevance score of a single product"""
+        weights = self.weights
+        score = weights["criteria_match"] * criteria_ratio
+
+        max_price = context.get("max_price")
+        if max_price:
+            distance = abs(max_price - product["price"]) / max_price
+            budget_fit = 1.0 - min(distance, 1.0)
+            if product["price"] > max_price:
+                budget_fit -= 1.0
+            score += weights["budget_fit"] * budget_fit
+
+        stock = product.get("stock", 0)
+        score += weights["in_stock"] * min(max(stock, 0), FULL_STOCK_LEVEL) / FULL_STOCK_LEVEL
+
+        if context_tags:
+            product_tags = {tag.lower() for tag in product["tags"]}
+            overlap = len(product_tags & context_tags) / len(context_tags)
+            score += weights["tag_overlap"] * overlap
+
+        score += weights["text_match"] * text_score
+
+        return score
+
+    def top_k(self, product_ids: Iterable[int], context: Dict[str, Any], k: int,
+              criteria_ratio: float = 1.0,
+              text_scores: Optional[Dict[int, float]] = None) -> List[Dict[str, Any]]:
+        """Return the k best products among the candidate ids (ties keep catalog order)"""
+        if k <= 0:
+            return []
+
+        context_tags = self.context_tags(context)
+        get_product = self.database.get_product_by_id
+        text_scores = text_scores or {}
+
+        def key(product_id: int) -> float:
+            product = get_product(product_id)
+            if product is None:
+                return float("-inf")
+            return self.score(product, context, criteria_ratio, context_tags,
+                              text_scores.get(product_id, 0.0))
+
+        best_ids = heapq.nlargest(k, product_ids, key=key)
+        return [product for product in map(get_product, best_ids) if product is not None]
+
+    def alternatives(self, partial_ids: Iterable[int], context: Dict[str, Any], k: int,
+                     text_scores: Optional[Dict[int, float]] = None) -> List[Dict[str, Any]]:
+        """
+        Full-text matches and closest partial matches first, then their precomputed
+        neighbors (O(K) lookups), then the best of the rest of the catalog
+        """
+        candidates = list(partial_ids)
+        if text_scores:
+            known = set(candidates)
+            candidates += [product_id for product_id in text_scores if product_id not in known]
+
+        products = self.top_k(candidates, context, k, criteria_ratio=0.0, text_scores=text_scores)
+        chosen = {product["id"] for product in products}
+
+        if self.similarity is not None:
+            for product in list(products):
+                if len(products) >= k:
+                    break
+                neighbors = [product_id for product_id in self.similarity.get_similar_ids(product["id"])
+                             if product_id not in chosen]
+                for neighbor in self.top_k(neighbors, context, k - len(products),
+                                           criteria_ratio=0.0, text_scores=text_scores):
+                    products.append(neighbor)
+                    chosen.add(neighbor["id"])
+
+        if len(products) < k:
+            rest = (product_id for product_id in self.database.get_all_product_ids()
+                    if product_id not in chosen)
+            products += self.top_k(rest, context, k - len(products),
+                                   criteria_ratio=0.0, text_scores=text_scores)
+
+        return products
+
+    def get_weights(self) -> Dict[str, float]:
+        """Return a copy of the ranking weights"""
+        return dict(self.weights)
+
+
+# Global instance
+product_ranker = ProductRanker(product_db, similarity_index)
@@ -0,0 +1,301 @@
+"""
+Similar Products Index
+Precomputed top-K neighbor lists used for alternatives and "you may also like"
+"""
+
+import heapq
+import threading
+from array import array
+from typing import Dict, List, Any, Optional, Tuple
+
+from database import product_db, ProductDatabase
+
+
+# Weights of each similarity signal
+SIMILARITY_WEIGHTS = {
+    "category": 3.0,
+    "subcategory": 2.0,
+    "color": 1.0,
+    "price": 1.0,
+    "tags": 1.5,
+    "audience": 1.0
+}
+
+# Below this size every pair is compared, above it candidates are blocked
+EXACT_BUILD_LIMIT = 2000
+
+
+class ProductFeatures:
+    """Flat per-slot feature columns, cheaper to compare than product dicts"""
+
+    def __init__(self):
+        self.category: List[str] = []
+        self.subcategory: List[str] = []
+        self.color: List[str] = []
+        self.price: List[float] = []
+        self.tags: List[frozenset] = []
+        self.gender: List[str] = []
+        self.age_group: List[str] = []
+
+    def set(self, slot: int, product: Dict[str, Any]):
+        """Store the features of a product at a slot (appending if needed)"""
+        values = (
+            product["category"], product["subcategory"], product["color"],
+            float(product["price"]), frozenset(tag.lower() for tag in product["tags"]),
+            product["gender"], product["age_group"]
+        )
+        columns = (self.category, self.subcategory, self.color, self.price,
+                   self.tags, self.gender, self.age_group)
+
+        for column, value in zip(columns, values):
+            if slot == len(column):
+                column.append(value)
+            else:
+                column[slot] = value
+
+
+class SimilarityIndex:
+    """
+    For each product, the ids of its K most similar products
+    Neighbors are stored as a flat int32 array of K slots per product, scores alongside
+    """
+
+    def __init__(self, database: ProductDatabase, k: int = 8, window: int = 24,
+                 weights: Optional[Dict[str, float]] = None):
+        self.database = database
+        self.k = k
+        self.window = window
+        self.weights = dict(weights or SIMILARITY_WEIGHTS)
+
+        self.slot_of: Dict[int, int] = {}
+        self.ids = array("i")
+        self.neighbors = array("i")    # slot ids, -1 when empty
+        self.scores = array("d")
+        self.features = ProductFeatures()
+        self.built = False
+        self._build_lock = threading.Lock()
+
+        database.add_change_listener(self.on_catalog_change)
+
+    def similarity(self, a: int, b: int) -> float:
+        """Similarity between two slots"""
+        f = self.features
+        w = self.weights
+        score = 0.0
+
+        if f.category[a] == f.category[b]:
+            score += w["category"]
+        if f.subcategory[a] == f.subcategory[b]:
+            score += w["subcategory"]
+        if f.color[a] == f.color[b]:
+            score += w["color"]
+
+        price_a, price_b = f.price[a], f.price[b]
+        highest = max(price_a, price_b)
+        if highest > 0:
+            score += w["price"] * (1.0 - abs(price_a - price_b) / highest)
+
+        tags_a, tags_b = f.tags[a], f.tags[b]
+        if tags_a and tags_b:
+            shared = len(tags_a & tags_b)
+            if shared:
+                score += w["tags"] * shared / len(tags_a | tags_b)
+
+        audience = 0.0
+        if f.gender[a] == f.gender[b]:
+            audience += 0.5
+        if f.age_group[a] == f.age_group[b]:
+            audience += 0.5
+        score += w["audience"] * audience
+
+        return score
+
+    def build(self):
+        """Compute every neighbor list from scratch"""
+        products = self.database.get_all_products()
+        n = len(products)
+        k = self.k
+
+        self.slot_of = {}
+        self.ids = array("i", (p["id"] for p in products))
+        self.features = ProductFeatures()
+        for slot, product in enumerate(products):
+            self.slot_of[product["id"]] = slot
+            self.features.set(slot, product)
+
+        # Per-slot min-heaps of (score, neighbor slot), bounded to k
+        heaps: List[List[Tuple[float, int]]] = [[] for _ in range(n)]
+
+        for a, b in self._candidate_pairs(n):
+            score = self.similarity(a, b)
+            self._push(heaps[a], score, b)
+            self._push(heaps[b], score, a)
+
+        self.neighbors = array("i", [-1]) * (n * k)
+        self.scores = array("d", [0.0]) * (n * k)
+        for slot in range(n):
+            self._store_row(slot, heaps[slot])
+
+        self.built = True
+
+    def _candidate_pairs(self, n: int):
+        """
+        Pairs to compare: all of them for small catalogs, otherwise products
+        close in price within the same category, sorted once by subcategory
+        and once by color so that the best matches are neighbors in the order
+        """
+        if n <= EXACT_BUILD_LIMIT:
+            for a in range(n):
+                for b in range(a + 1, n):
+                    yield a, b
+            return
+
+        f = self.features
+        by_category: Dict[str, List[int]] = {}
+        for slot in range(n):
+            by_category.setdefault(f.category[slot], []).append(slot)
+
+        seen = set()
+        for slots in by_category.values():
+            for sort_key in (lambda s: (f.subcategory[s], f.price[s]),
+                             lambda s: (f.color[s], f.price[s])):
+                ordered = sorted(slots, key=sort_key)
+                for i, a in enumerate(ordered):
+                    for b in ordered[i + 1:i + 1 + self.window]:
+                        pair = (a, b) if a < b else (b, a)
+                        if pair not in seen:
+                            seen.add(pair)
+                            yield pair
+            seen.clear()
+
+    def _push(self, heap: List[Tuple[float, int]], score: float, slot: int):
+        if len(heap) < self.k:
+            heapq.heappush(heap, (score, slot))
+        elif score > heap[0][0]:
+            heapq.heapreplace(heap, (score, slot))
+
+    def _store_row(self, slot: int, heap: List[Tuple[float, int]]):
+        base = slot * self.k
+        best = sorted(heap, key=lambda item: (-item[0], item[1]))
+        for i in range(self.k):
+            if i < len(best):
+                self.scores[base + i], self.neighbors[base + i] = best[i]
+            else:
+                self.scores[base + i], self.neighbors[base + i] = 0.0, -1
+
+    def _row(self, slot: int) -> List[Tuple[float, int]]:
+        base = slot * self.k
+        return [(self.scores[base + i], self.neighbors[base + i])
+                for i in range(self.k) if self.neighbors[base + i] >= 0]
+
+    def _recompute_row(self, slot: int):
+        heap: List[Tuple[float, int]] = []
+        for other in range(len(self.ids)):
+            if other != slot and self.ids[other] >= 0:
+                self._push(heap, self.similarity(slot, other), other)
+        self._store_row(slot, heap)
+
+    def on_catalog_change(self, action: str, product_id: int):
+        """Incrementally maintain neighbor lists when a product changes"""
+        if not self.built:
+            return
+
+        if action == "reload":
+            self.built = False
+
+        elif action == "add":
+            product = self.database.get_product_by_id(product_id)
+            slot = len(self.ids)
+            self.ids.append(product_id)
+            self.slot_of[product_id] = slot
+            self.features.set(slot, product)
+            self.neighbors.extend([-1] * self.k)
+            self.scores.extend([0.0] * self.k)
+            self._refresh_around(slot)
+
+        elif action == "update":
+            slot = self.slot_of.get(product_id)
+            if slot is None:
+                return
+            self.features.set(slot, self.database.get_product_by_id(product_id))
+            self._refresh_around(slot, changed=True)
+
+        elif action == "remove":
+            slot = self.slot_of.pop(product_id, None)
+            if slot is None:
+                return
+            self.ids[slot] = -1
+            base = slot * self.k
+            for i in range(self.k):
+                self.neighbors[base + i] = -1
+            for other in self._rows_containing(slot):
+                self._recompute_row(other)
+
+    def _refresh_around(self, slot: int, changed: bool = False):
+        """Recompute one row and offer the product to every other row"""
+        stale = set(self._rows_containing(slot)) if changed else set()
+        self._recompute_row(slot)
+
+        for other in range(len(self.ids)):
+            if other == slot or self.ids[other] < 0:
+                continue
+            if other in stale:
+                self._recompute_row(other)
+                continue
+
+            row = self._row(other)
+            score = self.similarity(slot, other)
+            if len(row) < self.k or score > row[-1][0]:
+                heap = [(s, n) for s, n in row]
+                heapq.heapify(heap)
+                self._push(heap, score, slot)
+                self._store_row(other, heap)
+
+    def _rows_containing(self, slot: int) -> List[int]:
+        neighbors = self.neighbors
+        k = self.k
+        return sorted({i // k for i in range(len(neighbors)) if neighbors[i] == slot})
+
+    def ensure_built(self):
+        """Build on first use (a request and the startup warm-up may both get here)"""
+        if not self.built:
+            with self._build_lock:
+                if not self.built:
+                    self.build()
+
+    def get_similar_ids(self, product_id: int, k: Optional[int] = None) -> List[int]:
+        """Ids of the most similar products, O(K)"""
+        self.ensure_built()
+
+        slot = self.slot_of.get(product_id)
+        if slot is None:
+            return []
+
+        base = slot * self.k
+        result = []
+        for i in range(min(k or self.k, self.k)):
+            neighbor = self.neighbors[base + i]
+            if neighbor < 0:
+                break
+            result.append(self.ids[neighbor])
+        return result
+
+    def get_similar_products(self, product_id: int, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The most similar products of a product"""
+        get_product = self.database.get_product_by_id
+        return [p for p in map(get_product, self.get_similar_ids(product_id, k)) if p is not None]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        return {
+            "built": self.built,
+            "products": len(self.slot_of),
+            "k": self.k,
+            "bytes": (self.neighbors.itemsize * len(self.neighbors) +
+                      self.scores.itemsize * len(self.scores) +
+                      self.ids.itemsize * len(self.ids))
+        }
+
+
+# Global instance (built lazily on first lookup)
+similarity_index = SimilarityIndex(product_db)
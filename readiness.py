@@ -0,0 +1,83 @@
+"""
+Startup Readiness
+Heavy initialization deferred to a background warm-up after the server starts
+(history preload, catalog indexes), and the state the /ready endpoint reports
+Requests are served during the warm-up: each structure still builds or loads
+itself on first use, the warm-up only moves that cost off the first requests.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Module import time, the closest the process has to a start time
+PROCESS_START = time.time()
+
+
+class Readiness:
+    """
+    Ordered warm-up steps run once in a daemon thread
+    A failing step is logged and reported, the next steps still run: the
+    structure it warms builds on first use anyway.
+    """
+
+    def __init__(self):
+        self.steps: List[Tuple[str, Callable[[], Any]]] = []
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.state = "pending"
+        self.ready_at: Optional[float] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def add_step(self, name: str, step: Callable[[], Any]):
+        self.steps.append((name, step))
+
+    @property
+    def is_ready(self) -> bool:
+        return self._done.is_set()
+
+    def run(self):
+        """Run every step in order, in the calling thread"""
+        self.state = "warming"
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                step()
+                result = {"ok": True}
+            except Exception as e:
+                logger.exception(f"Warm-up step {name} failed")
+                result = {"ok": False, "error": str(e)}
+            result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            self.results[name] = result
+        self.state = "ready" if all(result["ok"] for result in self.results.values()) else "degraded"
+        self.ready_at = time.time()
+        self._done.set()
+        logger.info(f"Warm-up finished ({self.state}) {round((self.ready_at - PROCESS_START) * 1000)} ms "
+                    f"after start: {self.results}")
+
+    def start(self) -> threading.Thread:
+        """Run the warm-up in a daemon thread (once)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="startup-warmup", daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {"ready": self.is_ready, "state": self.state,
+                  "uptime_ms": round((time.time() - PROCESS_START) * 1000, 1),
+                  "steps": {name: dict(self.results.get(name, {"pending": True})) for name, _ in self.steps}}
+        if self.ready_at is not None:
+            status["ready_after_ms"] = round((self.ready_at - PROCESS_START) * 1000, 1)
+        return status
+
+
+# Global warm-up of the API process
+readiness = Readiness()
@@ -0,0 +1,233 @@
+"""
+Response Templates
+Chatbot replies as references to precompiled templates plus their parameters,
+rendered only when the text is needed (API serialization, history display)
+Templates are compiled once into literal fragments and field slots. A reply
+is a flat tuple of templates, each followed by its parameter values, and is
+stored in the conversations table as a small blob whose template ids come
+from a per-database table, like the context keys.
+"""
+
+import sqlite3
+import string
+import threading
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+from context_codec import ContextCodec
+
+RESPONSE_ENCODING_VERSION = 1
+_parser = string.Formatter()
+
+
+class ResponseTemplate:
+    """
+    A format string compiled into literals and (parameter index, spec) slots
+    A sequence parameter is joined with its spec as separator, so
+    "{criteria:, }" renders ("pour fille", "budget 30 DT") as a comma list;
+    other values are formatted with the spec ("{confidence:.1%}").
+    """
+    __slots__ = ("source", "names", "literals", "fields")
+
+    def __init__(self, source: str):
+        self.source = source
+        names: List[str] = []
+        literals: List[str] = []
+        fields: List[Tuple[int, str]] = []
+        literal = ""
+        for text, name, spec, conversion in _parser.parse(source):
+            literal += text
+            if name is None:
+                continue
+            if not name or conversion:
+                raise ValueError(f"Template fields must be named, without conversion: {source!r}")
+            if name not in names:
+                names.append(name)
+            literals.append(literal)
+            literal = ""
+            fields.append((names.index(name), spec))
+        literals.append(literal)
+        self.names = tuple(names)
+        self.literals = tuple(literals)
+        self.fields = tuple(fields)
+
+    def __call__(self, **params: Any) -> "Response":
+        return Response((self, *[params[name] for name in self.names]))
+
+    def __repr__(self) -> str:
+        return f"ResponseTemplate({self.source!r})"
+
+    def render_into(self, out: List[str], values: tuple, start: int):
+        """Append the rendered fragments, reading parameters from values[start:]"""
+        literals = self.literals
+        out.append(literals[0])
+        for i, (index, spec) in enumerate(self.fields, 1):
+            value = values[start + index]
+            if isinstance(value, Response):
+                out.append(str(value))
+            elif isinstance(value, (tuple, list)):
+                out.append(spec.join(map(str, value)))
+            elif spec:
+                out.append(format(value, spec))
+            else:
+                out.append(value if type(value) is str else str(value))
+            out.append(literals[i])
+
+
+class Response(tuple):
+    """
+    A reply: each template followed by its parameter values
+    Concatenate with + and render with str(). A plain string added to a reply
+    is kept as a parameter, never compiled: constant text should come from
+    text() or template() so that it is stored as a template id.
+    """
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        out: List[str] = []
+        position, end = 0, len(self)
+        while position < end:
+            current = self[position]
+            current.render_into(out, self, position + 1)
+            position += 1 + len(current.names)
+        return "".join(out)
+
+    def __add__(self, other: Any) -> "Response":
+        if isinstance(other, str):
+            other = (PLAIN, other)
+        return Response(tuple.__add__(self, other))
+
+    def __radd__(self, other: Any) -> "Response":
+        if isinstance(other, str):
+            return Response((PLAIN, other, *self))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Response({str(self)!r})"
+
+    def parts(self) -> Iterable[Tuple[ResponseTemplate, tuple]]:
+        """(template, parameter values) pairs"""
+        position, end = 0, len(self)
+        while position < end:
+            current = self[position]
+            arity = len(current.names)
+            yield current, self[position + 1:position + 1 + arity]
+            position += 1 + arity
+
+
+# Compiled templates by source; sources are a few hundred constant strings
+_compiled: Dict[str, ResponseTemplate] = {}
+
+EMPTY = Response()
+
+
+def template(source: str) -> ResponseTemplate:
+    """Compiled template for a source, compiled on first use only"""
+    compiled = _compiled.get(source)
+    if compiled is None:
+        compiled = _compiled.setdefault(source, ResponseTemplate(source))
+    return compiled
+
+
+PLAIN = template("{text}")
+
+
+def templates(sources: Iterable[str]) -> Tuple[ResponseTemplate, ...]:
+    """Variants to pick from with random.choice"""
+    return tuple(template(source) for source in sources)
+
+
+def text(source: str) -> Response:
+    """Constant reply"""
+    return template(source)()
+
+
+class TemplateStore:
+    """
+    Encodes replies as: version byte, then for each template its id and its
+    parameter values, tagged like context values. Ids come from the
+    response_templates table, which keeps the source of every template ever
+    stored, so old rows still render after a template is edited.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, codec: Optional[ContextCodec] = None):
+        self.db_path = db_path
+        self.codec = codec or ContextCodec()
+        self.ids: Dict[str, int] = {}
+        self.sources: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        if db_path:
+            self.reload()
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_templates (
+                id INTEGER PRIMARY KEY,
+                source TEXT NOT NULL UNIQUE
+            )
+        """)
+
+    def reload(self):
+        """Read the stored templates (other processes may have added some)"""
+        with sqlite3.connect(self.db_path) as conn:
+            self.create_table(conn)
+            rows = conn.execute("SELECT id, source FROM response_templates").fetchall()
+        with self._lock:
+            for template_id, source in rows:
+                self.ids[source] = template_id
+                self.sources[template_id] = source
+
+    def intern(self, source: str, conn: Optional[sqlite3.Connection] = None) -> int:
+        """
+        Id of a template source, adding it to response_templates on first use
+        Pass conn when already inside a transaction on the same database
+        """
+        template_id = self.ids.get(source)
+        if template_id is not None:
+            return template_id
+
+        with self._lock:
+            if source in self.ids:
+                return self.ids[source]
+            if conn is not None:
+                template_id = self._insert(conn, source)
+            elif self.db_path:
+                with sqlite3.connect(self.db_path) as own_conn:
+                    template_id = self._insert(own_conn, source)
+                    own_conn.commit()
+            else:
+                template_id = len(self.ids)
+            self.ids[source] = template_id
+            self.sources[template_id] = source
+            return template_id
+
+    def _insert(self, conn: sqlite3.Connection, source: str) -> int:
+        self.create_table(conn)
+        conn.execute("INSERT OR IGNORE INTO response_templates (source) VALUES (?)", (source,))
+        return conn.execute("SELECT id FROM response_templates WHERE source = ?", (source,)).fetchone()[0]
+
+    def encode(self, response: Response, conn: Optional[sqlite3.Connection] = None) -> bytes:
+        out = bytearray((RESPONSE_ENCODING_VERSION,))
+        for current, values in response.parts():
+            self.codec.encode_values(out, (self.intern(current.source, conn), *values), conn)
+        return bytes(out)
+
+    def decode(self, data: bytes) -> Response:
+        data = bytes(data)
+        if not data or data[0] != RESPONSE_ENCODING_VERSION:
+            raise ValueError(f"Unsupported response encoding version {data[:1]!r}")
+        items: List[Any] = []
+        position, end = 1, len(data)
+        while position < end:
+            (template_id,), position = self.codec.decode_values(data, position, 1)
+            source = self.sources.get(template_id)
+            if source is None:
+                # A template stored by another process: refresh once
+                if self.db_path:
+                    self.reload()
+                source = self.sources[template_id]
+            current = template(source)
+            values, position = self.codec.decode_values(data, position, len(current.names))
+            items.append(current)
+            items.extend(tuple(value) if isinstance(value, list) else value for value in values)
+        return Response(items)
@@ -0,0 +1,102 @@
+"""
+Search Result Cache
+Bounded LRU cache for catalog searches keyed by normalized criteria
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Optional, Tuple
+
+
+def canonicalize_criteria(criteria: Dict[str, Any]) -> Tuple:
+    """
+    Build a hashable, order-independent key from search criteria
+    Empty values are dropped since complex_search ignores them anyway
+    """
+    items = []
+    for key, value in criteria.items():
+        if value is None or value == "" or value == [] or value == 0:
+            continue
+
+        if isinstance(value, str):
+            value = value.strip().lower()
+        elif isinstance(value, (list, tuple, set)):
+            value = tuple(sorted(str(v).strip().lower() for v in value))
+        elif isinstance(value, (int, float)):
+            value = float(value)
+
+        items.append((key, value))
+
+    return tuple(sorted(items))
+
+
+class SearchCache:
+    """
+    Bounded LRU cache storing product id lists per canonical criteria key
+    Entries are tagged with the catalog version and dropped when it changes
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.catalog_version = 0
+
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, catalog_version: int) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            if catalog_version != self.catalog_version:
+                self._reset(catalog_version)
+
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, catalog_version: int):
+        """Store a value, evicting the least recently used entry if full"""
+        with self._lock:
+            if catalog_version != self.catalog_version:
+                self._reset(catalog_version)
+
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, catalog_version: int):
+        """Drop every entry (called when the catalog changes)"""
+        with self._lock:
+            self._reset(catalog_version)
+
+    def _reset(self, catalog_version: int):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self.catalog_version = catalog_version
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "catalog_version": self.catalog_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,140 @@
+"""
+Startup Cache
+Compiled state that is slow to build but only depends on its inputs (typo
+indexes, the catalog text index) pickled between process starts
+Entries are keyed by a digest of everything they are built from, including
+the source of the modules that build them, so a changed definitions file,
+catalog or algorithm is rebuilt rather than loaded stale. The cache lives
+next to the bytecode cache and, like it, is trusted local state.
+Usage: python startup_cache.py [--clear]
+"""
+
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__", "startup")
+# Errors meaning an entry is unreadable or was pickled by incompatible code
+LOAD_ERRORS = (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, IndexError, TypeError)
+
+_source_digests: Dict[str, tuple] = {}
+
+
+def source_digest(*module_names: str) -> str:
+    """Digest of the source files of modules (already imported), memoized per modification time"""
+    parts = []
+    for name in module_names:
+        path = sys.modules[name].__file__
+        mtime = os.stat(path).st_mtime_ns
+        cached = _source_digests.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, "rb") as handle:
+                cached = (mtime, hashlib.sha256(handle.read()).hexdigest())
+            _source_digests[path] = cached
+        parts.append(cached[1])
+    return hashlib.sha256("".join(parts).encode()).hexdigest()
+
+
+def digest(*parts: Any) -> str:
+    """Key of an entry: parts must have a deterministic repr (str, numbers, tuples, dicts, ...)"""
+    return hashlib.sha256(repr((CACHE_FORMAT_VERSION, sys.version_info[:2], parts)).encode()).hexdigest()
+
+
+class StartupCache:
+    """
+    One pickle file per entry name, holding the state for one key
+    Storing a new key replaces the entry, so the cache stays as small as the
+    state it holds whatever the number of edits of the definitions.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, enabled: bool = True):
+        self.directory = directory
+        self.enabled = enabled
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def path(self, name: str, key: str) -> str:
+        return os.path.join(self.directory, f"{name}-{key[:24]}.pickle")
+
+    def load(self, name: str, key: str) -> Optional[Any]:
+        """Stored state for name and key, or None"""
+        path = self.path(name, key)
+        try:
+            with open(path, "rb") as handle:
+                return pickle.load(handle)
+        except FileNotFoundError:
+            return None
+        except LOAD_ERRORS as e:
+            logger.warning(f"Discarding unreadable startup cache entry {path}: {e!r}")
+            return None
+
+    def store(self, name: str, key: str, value: Any):
+        """Write atomically (other processes may be reading) and drop the entry's previous keys"""
+        path = self.path(name, key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary, "wb") as handle:
+                pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+            for previous in glob.glob(os.path.join(self.directory, f"{glob.escape(name)}-*.pickle")):
+                if previous != path:
+                    os.remove(previous)
+        except (OSError, pickle.PicklingError) as e:
+            # A read-only deployment still starts, it just rebuilds every time
+            logger.warning(f"Could not write startup cache entry {path}: {e!r}")
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def cached(self, name: str, key: str, build: Callable[[], Any]) -> Any:
+        """State for key: loaded when stored, else built and stored"""
+        start = time.perf_counter()
+        value = self.load(name, key) if self.enabled else None
+        hit = value is not None
+        if not hit:
+            value = build()
+            if self.enabled:
+                self.store(name, key, value)
+        with self._lock:
+            entry = self.stats.setdefault(name, {"hits": 0, "misses": 0})
+            entry["hits" if hit else "misses"] += 1
+            entry["last_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return value
+
+    def clear(self) -> int:
+        """Remove every entry; returns how many there were"""
+        paths = glob.glob(os.path.join(self.directory, "*.pickle"))
+        for path in paths:
+            os.remove(path)
+        return len(paths)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"enabled": self.enabled, "directory": self.directory,
+                    "entries": {name: dict(entry) for name, entry in self.stats.items()}}
+
+
+# Global cache (STARTUP_CACHE=0 disables it, STARTUP_CACHE_DIR moves it)
+startup_cache = StartupCache(
+    directory=os.environ.get("STARTUP_CACHE_DIR") or DEFAULT_CACHE_DIR,
+    enabled=os.environ.get("STARTUP_CACHE", "1") != "0"
+)
+
+
+if __name__ == "__main__":
+    if "--clear" in sys.argv[1:]:
+        print(f"🧹 Removed {startup_cache.clear()} entries from {startup_cache.directory}")
+    else:
+        entries = sorted(glob.glob(os.path.join(startup_cache.directory, "*.pickle")))
+        print(f"📦 Startup cache: {startup_cache.directory} ({len(entries)} entries)")
+        for path in entries:
+            print(f"   {os.path.basename(path):<50}{os.path.getsize(path) / 1024:>10.1f} KiB")
@@ -0,0 +1,495 @@
+"""
+State Backend
+Per-user state the API workers have to agree on: chatbot sessions, learned
+preferences and the running conversation context (the last turns)
+With one worker the state stays in process memory, as before. Several
+workers (uvicorn --workers N, or several hosts) need it outside the
+processes so a user can reach any of them: the SQLite backend shares it
+between the workers of one host, the key-value backend between hosts. The
+key-value server shipped here is a local stand-in for a networked store
+(Redis, memcached...) with the same get / set / compare-and-set contract,
+spoken as JSON lines over TCP. Its connections are authenticated with the
+STATE_KV_AUTHKEY shared secret, which it requires on any non-loopback host.
+Configured with STATE_BACKEND: memory (default), sqlite[:path] or kv://host:port
+Usage: STATE_KV_AUTHKEY=<secret> python state_backend.py serve [--host 127.0.0.1] [--port 8765]
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = "chatbot_state.db"
+DEFAULT_KV_PORT = 8765
+# Largest request or response line of the key-value protocol
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+# Attempts of a compare-and-set update before giving up on a hot key
+MAX_UPDATE_ATTEMPTS = 50
+
+
+class StateConflictError(RuntimeError):
+    """An update kept losing to concurrent writers of the same key"""
+
+
+class StateBackend(ABC):
+    """
+    Values are JSON documents addressed by (namespace, key)
+    Every backend hands out copies: mutating a value read from the backend
+    changes nothing until it is put back. update() is the only safe
+    read-modify-write when other processes write the same key.
+    """
+
+    # Whether other processes see the state; process-local state is better
+    # kept in the owners' own structures
+    shared = False
+
+    def __init__(self):
+        self.stats = {"reads": 0, "writes": 0, "deletes": 0, "conflicts": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Stored value, or None"""
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, value: Any):
+        """Store value, replacing the previous one"""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        """Remove the value if there is one"""
+
+    @abstractmethod
+    def update(self, namespace: str, key: str, change: Callable[[Optional[Any]], Optional[Any]]) -> Optional[Any]:
+        """
+        Atomically replace the value by change(value), value being None when
+        absent; a None result deletes it. change may run more than once.
+        Returns the new value.
+        """
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {"backend": type(self).__name__, "shared": self.shared, **self.stats}
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode(stored: Optional[str]) -> Optional[Any]:
+    return None if stored is None else json.loads(stored)
+
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local state, the single-worker default"""
+
+    def __init__(self):
+        super().__init__()
+        self._values: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        self._count("reads")
+        return _decode(self._values.get((namespace, key)))
+
+    def put(self, namespace: str, key: str, value: Any):
+        stored = _encode(value)
+        with self._lock:
+            self._values[(namespace, key)] = stored
+        self._count("writes")
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._values.pop((namespace, key), None)
+        self._count("deletes")
+
+    def update(self, namespace: str, key: str, change: Callable[[Optional[Any]], Optional[Any]]) -> Optional[Any]:
+        with self._lock:
+            value = change(_decode(self._values.get((namespace, key))))
+            if value is None:
+                self._values.pop((namespace, key), None)
+            else:
+                self._values[(namespace, key)] = _encode(value)
+        self._count("writes")
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "keys": len(self._values)}
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    State in a SQLite file shared by the workers of one host
+    WAL mode lets readers run alongside the single writer; updates are
+    BEGIN IMMEDIATE transactions, so a read-modify-write holds the write
+    lock from its read on and never loses a concurrent update.
+    """
+
+    shared = True
+
+    def __init__(self, db_path: str = DEFAULT_SQLITE_PATH, timeout: float = 5.0):
+        super().__init__()
+        self.db_path = db_path
+        self.timeout = timeout
+        # One connection per thread (sqlite3 connections are not shared across threads)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS state (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit: transactions are opened explicitly by update()
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        row = self._connection().execute("SELECT value FROM state WHERE namespace = ? AND key = ?",
+                                         (namespace, key)).fetchone()
+        self._count("reads")
+        return _decode(row[0]) if row else None
+
+    def _write(self, conn: sqlite3.Connection, namespace: str, key: str, value: Optional[Any]):
+        if value is None:
+            conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+        else:
+            conn.execute("""
+                INSERT INTO state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(namespace, key) DO UPDATE SET
+                    value = excluded.value, updated_at = excluded.updated_at
+            """, (namespace, key, _encode(value), int(time.time() * 1000)))
+
+    def put(self, namespace: str, key: str, value: Any):
+        self._write(self._connection(), namespace, key, value)
+        self._count("writes")
+
+    def delete(self, namespace: str, key: str):
+        self._write(self._connection(), namespace, key, None)
+        self._count("deletes")
+
+    def update(self, namespace: str, key: str, change: Callable[[Optional[Any]], Optional[Any]]) -> Optional[Any]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM state WHERE namespace = ? AND key = ?",
+                               (namespace, key)).fetchone()
+            value = change(_decode(row[0]) if row else None)
+            self._write(conn, namespace, key, value)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("writes")
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        keys = self._connection().execute("SELECT COUNT(*) FROM state").fetchone()[0]
+        return {**super().get_stats(), "path": self.db_path, "keys": keys}
+
+
+class KeyValueStore:
+    """The store served by the key-value server: JSON strings by key"""
+
+    def __init__(self):
+        self._values: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        return self._values.get(key)
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._values[key] = value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def compare_and_set(self, key: str, expected: Optional[str], value: Optional[str]) -> bool:
+        """Set (or delete, for None) only if the key still holds expected"""
+        with self._lock:
+            if self._values.get(key) != expected:
+                return False
+            if value is None:
+                self._values.pop(key, None)
+            else:
+                self._values[key] = value
+            return True
+
+    def size(self) -> int:
+        return len(self._values)
+
+
+def is_loopback(host: str) -> bool:
+    """Whether only this machine can reach host"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _authkey_from_env() -> Optional[bytes]:
+    return os.environ.get("STATE_KV_AUTHKEY", "").encode() or None
+
+
+def _sign(authkey: bytes, challenge: str) -> str:
+    return hmac.new(authkey, challenge.encode(), hashlib.sha256).hexdigest()
+
+
+def _send(stream, message: Dict[str, Any]):
+    stream.write((json.dumps(message, separators=(",", ":")) + "\n").encode())
+    stream.flush()
+
+
+def _receive(stream) -> Optional[Dict[str, Any]]:
+    """The next message, or None once the peer closed the connection"""
+    line = stream.readline(MAX_MESSAGE_BYTES + 1)
+    if not line:
+        return None
+    if len(line) > MAX_MESSAGE_BYTES or not line.endswith(b"\n"):
+        raise ValueError("Key-value message too long")
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError("Key-value messages are JSON objects")
+    return message
+
+
+class KeyValueRequestHandler(socketserver.StreamRequestHandler):
+    """
+    One client connection: an authentication challenge, then one JSON request
+    per line ({"op": "get", "args": [...]}) answered by {"result": ...} or
+    {"error": ...}. Only the store operations below can be called.
+    """
+
+    operations = ("get", "set", "delete", "compare_and_set", "size")
+
+    def handle(self):
+        authkey = self.server.authkey
+        challenge = secrets.token_hex(16) if authkey else None
+        try:
+            _send(self.wfile, {"challenge": challenge})
+            if authkey:
+                answer = _receive(self.rfile)
+                if answer is None or not hmac.compare_digest(str(answer.get("auth")).encode(),
+                                                              _sign(authkey, challenge).encode()):
+                    logger.warning(f"Rejected key-value client {self.client_address[0]}: bad authentication")
+                    _send(self.wfile, {"error": "authentication failed"})
+                    return
+                _send(self.wfile, {"result": True})
+
+            while True:
+                request = _receive(self.rfile)
+                if request is None:
+                    return
+                op, args = request.get("op"), request.get("args", [])
+                if op not in self.operations or not isinstance(args, list):
+                    _send(self.wfile, {"error": f"unknown operation {op!r}"})
+                    continue
+                try:
+                    _send(self.wfile, {"result": getattr(self.server.store, op)(*args)})
+                except TypeError as e:
+                    _send(self.wfile, {"error": str(e)})
+        except (OSError, ValueError) as e:
+            logger.debug(f"Key-value client {self.client_address[0]} dropped: {e}")
+
+
+class KeyValueServer(socketserver.ThreadingTCPServer):
+    """A KeyValueStore served to the workers, one thread per connection"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], authkey: Optional[bytes] = None):
+        super().__init__(address, KeyValueRequestHandler)
+        self.store = KeyValueStore()
+        self.authkey = authkey
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.server_address[:2]
+
+
+def key_value_server(host: str = "127.0.0.1", port: int = DEFAULT_KV_PORT,
+                     authkey: Optional[bytes] = None) -> KeyValueServer:
+    """
+    A key-value server bound to (host, port) (0 picks a free port); run it with serve_forever()
+    Without an authkey any local process may read and write the state, so
+    only loopback hosts are accepted.
+    """
+    if not authkey and not is_loopback(host):
+        raise ValueError(f"Refusing to serve state on {host} without STATE_KV_AUTHKEY")
+    if not authkey:
+        logger.warning("Key-value state server running without STATE_KV_AUTHKEY (loopback only)")
+    return KeyValueServer((host, port), authkey)
+
+
+class KeyValueClient:
+    """Calls the store of a key-value server, over one connection per thread"""
+
+    def __init__(self, address: Tuple[str, int], authkey: Optional[bytes] = None, timeout: float = 5.0):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        stream = sock.makefile("rwb")
+        try:
+            challenge = _receive(stream)
+            if challenge is None:
+                raise ConnectionError(f"Key-value server {self.address} closed the connection")
+            if challenge.get("challenge") is not None:
+                if not self.authkey:
+                    raise PermissionError("The key-value server requires STATE_KV_AUTHKEY")
+                _send(stream, {"auth": _sign(self.authkey, challenge["challenge"])})
+                answer = _receive(stream)
+                if answer is None or "error" in answer:
+                    raise PermissionError("Key-value server rejected STATE_KV_AUTHKEY")
+        except BaseException:
+            stream.close()
+            sock.close()
+            raise
+        self._local.connection = (sock, stream)
+        return stream
+
+    def _disconnect(self):
+        sock, stream = self._local.connection
+        self._local.connection = None
+        stream.close()
+        sock.close()
+
+    def call(self, op: str, *args) -> Any:
+        connection = getattr(self._local, "connection", None)
+        stream = connection[1] if connection else self._connect()
+        try:
+            _send(stream, {"op": op, "args": list(args)})
+            response = _receive(stream)
+        except (OSError, ValueError):
+            self._disconnect()
+            raise
+        if response is None:
+            self._disconnect()
+            raise ConnectionError(f"Key-value server {self.address} closed the connection")
+        if "error" in response:
+            raise RuntimeError(f"Key-value server error: {response['error']}")
+        return response["result"]
+
+
+class KeyValueStateBackend(StateBackend):
+    """
+    State in a key-value server reached over TCP
+    Keys are "namespace:key" and values JSON strings, as they would be in
+    Redis; updates are optimistic compare-and-set loops, retried when another
+    worker wrote the key in between.
+    """
+
+    shared = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_KV_PORT,
+                 authkey: Optional[bytes] = None):
+        super().__init__()
+        self.address = (host, port)
+        self._client = KeyValueClient(self.address, authkey)
+        # Fail at startup rather than on the first request
+        self._client.call("size")
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"{namespace}:{key}"
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        self._count("reads")
+        return _decode(self._client.call("get", self._key(namespace, key)))
+
+    def put(self, namespace: str, key: str, value: Any):
+        self._client.call("set", self._key(namespace, key), _encode(value))
+        self._count("writes")
+
+    def delete(self, namespace: str, key: str):
+        self._client.call("delete", self._key(namespace, key))
+        self._count("deletes")
+
+    def update(self, namespace: str, key: str, change: Callable[[Optional[Any]], Optional[Any]]) -> Optional[Any]:
+        full_key = self._key(namespace, key)
+        for _ in range(MAX_UPDATE_ATTEMPTS):
+            stored = self._client.call("get", full_key)
+            value = change(_decode(stored))
+            if self._client.call("compare_and_set", full_key, stored, None if value is None else _encode(value)):
+                self._count("writes")
+                return value
+            self._count("conflicts")
+        raise StateConflictError(f"Could not update {full_key} after {MAX_UPDATE_ATTEMPTS} attempts")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "address": f"{self.address[0]}:{self.address[1]}",
+                "keys": self._client.call("size")}
+
+
+def create_backend(url: Optional[str] = None) -> StateBackend:
+    """
+    Backend for a STATE_BACKEND value
+    memory | sqlite | sqlite:<path> | kv://<host>:<port>
+    """
+    url = url or "memory"
+    if url == "memory":
+        return InMemoryStateBackend()
+    if url == "sqlite" or url.startswith("sqlite:"):
+        return SQLiteStateBackend(url.partition(":")[2] or DEFAULT_SQLITE_PATH)
+    if url.startswith("kv://"):
+        host, _, port = url[len("kv://"):].partition(":")
+        return KeyValueStateBackend(host or "127.0.0.1", int(port or DEFAULT_KV_PORT), _authkey_from_env())
+    raise ValueError(f"Unknown state backend: {url!r}")
+
+
+# Global backend of the process (STATE_BACKEND, memory by default)
+state_backend = create_backend(os.environ.get("STATE_BACKEND"))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Shared state for multi-worker deployments")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the key-value server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_KV_PORT)
+    args = parser.parse_args()
+
+    try:
+        server = key_value_server(args.host, args.port, _authkey_from_env())
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"🗄️ Key-value state server on {args.host}:{server.address[1]} "
+          f"(workers: STATE_BACKEND=kv://{args.host}:{server.address[1]})")
+    sys.stdout.flush()
+    server.serve_forever()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Tests for the affinity router
+Checks consistent-hash placement, minimal movement on rebalancing, the handoff
+of moved users and failover, against in-process HTTP workers
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(__file__))
+
+from affinity_router import AffinityRouter, HashRing, extract_user_id
+from conversation_memory import ConversationMemory, ConversationTurn
+
+
+class FakeWorker(BaseHTTPRequestHandler):
+    """Answers {"worker": port} and records (method, path, body) on its server"""
+    protocol_version = "HTTP/1.1"
+
+    def handle_request(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append((self.command, self.path, body))
+        payload = json.dumps({"worker": self.server.server_address[1], "path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if self.path == "/chunked":
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(payload), 7):
+                chunk = payload[start:start + 7]
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    do_GET = do_POST = do_DELETE = handle_request
+
+    def log_message(self, *args):
+        pass
+
+
+def start_worker() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeWorker)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def url_of(server: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def call(app, method: str, path: str, content=None, query: bytes = b""):
+    """One request through the ASGI app: (status, JSON body)"""
+    body = json.dumps(content).encode() if content is not None else b""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "raw_path": path.encode(),
+             "query_string": query, "headers": [(b"content-type", b"application/json")]}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+def test_ring_rebalancing():
+    """Users spread evenly; a joining or leaving worker only moves its own share"""
+    print("💍 Testing hash ring")
+
+    users = [f"user{index}" for index in range(20000)]
+    ring = HashRing([f"http://worker{index}" for index in range(4)])
+    before = {user: ring.node_for(user) for user in users}
+    shares = [list(before.values()).count(node) / len(users) for node in ring.nodes]
+    assert all(0.18 < share < 0.32 for share in shares), shares
+
+    ring.add("http://worker4")
+    after = {user: ring.node_for(user) for user in users}
+    moved = [user for user in users if before[user] != after[user]]
+    assert all(after[user] == "http://worker4" for user in moved)
+    assert 0.14 < len(moved) / len(users) < 0.26
+
+    ring.remove("http://worker1")
+    removed = {user: ring.node_for(user) for user in users}
+    moved = [user for user in users if after[user] != removed[user]]
+    assert all(after[user] == "http://worker1" for user in moved)
+    assert HashRing(ring.nodes).node_for("alice") == ring.node_for("alice")
+    print(f"   ✅ Shares {[round(share, 3) for share in shares]}, join moved only the new worker's users")
+
+
+def test_extract_user_id():
+    """Users come from the memory path, the query or the chat body"""
+    print("🔎 Testing user extraction")
+
+    assert extract_user_id("/memory/alice", b"", b"") == "alice"
+    assert extract_user_id("/memory/alice/", b"limit=5", b"") == "alice"
+    assert extract_user_id("/products", b"user_id=bob", b"") == "bob"
+    assert extract_user_id("/chat", b"", b'{"message": "robe", "user_id": "carol"}') == "carol"
+    assert extract_user_id("/chat", b"", b'{"message": "robe"}') == "anonymous"
+    assert extract_user_id("/chat", b"", b"not json") is None
+    assert extract_user_id("/products", b"", b"") is None
+    print("   ✅ /memory/{user_id}, ?user_id= and chat bodies")
+
+
+def test_routing_and_handoff():
+    """Requests of a user stick to one worker; a moved user is handed off before its next request"""
+    print("🔀 Testing routing and handoff")
+
+    workers = [start_worker() for _ in range(3)]
+    try:
+        router = AffinityRouter([url_of(worker) for worker in workers[:2]])
+        users = [f"user{index}" for index in range(40)]
+        first = {user: call(router, "POST", "/chat", {"message": "robe", "user_id": user})[1]["worker"]
+                 for user in users}
+        assert all(call(router, "GET", f"/memory/{user}")[1]["worker"] == first[user] for user in users)
+        assert router.stats["handoffs"] == 0 and len(set(first.values())) == 2
+
+        for worker in workers:
+            worker.requests.clear()
+        status, result = call(router, "POST", "/router/workers", {"url": url_of(workers[2])})
+        assert status == 200 and result["changed"] and len(result["workers"]) == 3
+
+        newcomer = workers[2].server_address[1]
+        second = {user: call(router, "POST", "/chat", {"message": "robe", "user_id": user})[1]["worker"]
+                  for user in users}
+        moved = [user for user in users if second[user] != first[user]]
+        assert moved and all(second[user] == newcomer for user in moved)
+        assert router.stats["handoffs"] == len(moved)
+        for user in moved:
+            previous = next(worker for worker in workers if worker.server_address[1] == first[user])
+            assert ("POST", f"/admin/handoff/{user}", b"") in previous.requests
+            handoff, chat = (workers[2].requests.index(("POST", f"/admin/handoff/{user}", b"")),
+                             [request[2] for request in workers[2].requests].index(
+                                 json.dumps({"message": "robe", "user_id": user}).encode()))
+            assert handoff < chat
+        stayed = [user for user in users if user not in moved]
+        assert not any(request[1] == f"/admin/handoff/{user}" for worker in workers
+                       for request in worker.requests for user in stayed)
+
+        # Responses without a length are reassembled
+        assert call(router, "GET", "/chunked")[1]["path"] == "/chunked"
+        print(f"   ✅ {len(moved)}/{len(users)} users moved to the new worker, each handed off first")
+    finally:
+        for worker in workers:
+            worker.shutdown()
+            worker.server_close()
+
+
+def test_failover():
+    """An unreachable worker leaves the ring; its users go to the next owner"""
+    print("🚑 Testing failover")
+
+    workers = [start_worker() for _ in range(2)]
+    router = AffinityRouter([url_of(worker) for worker in workers])
+    users = [f"user{index}" for index in range(20)]
+    owners = {user: call(router, "POST", "/chat", {"message": "robe", "user_id": user})[1]["worker"]
+              for user in users}
+    dead, alive = workers
+    dead.shutdown()
+    dead.server_close()
+    try:
+        for user in users:
+            status, result = call(router, "POST", "/chat", {"message": "robe", "user_id": user})
+            assert status == 200 and result["worker"] == alive.server_address[1]
+        status, state = call(router, "GET", "/router")
+        assert state["workers"] == [url_of(alive)] and state["failovers"] == 1
+        assert state["handoffs"] == sum(1 for owner in owners.values() if owner == dead.server_address[1])
+
+        router.remove_worker(url_of(alive))
+        assert call(router, "GET", "/products")[0] == 503
+        print(f"   ✅ {state['handoffs']} users failed over, {state['handoff_errors']} flushes skipped")
+    finally:
+        alive.shutdown()
+        alive.server_close()
+
+
+def test_release_user():
+    """A released user is reread from the database, with what another worker wrote"""
+    print("🤝 Testing user release")
+
+    now = datetime.now().replace(microsecond=0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "memory.db")
+        previous = ConversationMemory(db_path=path, memory_limit=3)
+        assert previous.history_preloaded
+        for index in range(2):
+            previous.add_conversation_turn(ConversationTurn(
+                user_id="alice", message=f"message {index}", intent="product_search", confidence=0.8,
+                context_data={"color": "rouge"}, response="ok", timestamp=now + timedelta(seconds=index)))
+
+        # Ownership moves away and back: the other worker's turns are not in memory here
+        assert previous.release_user("alice") and not previous.release_user("alice")
+        assert previous.user_conversations == {} and previous.user_preferences == {}
+        owner = ConversationMemory(db_path=path, memory_limit=3)
+        owner.release_user("alice")
+        owner.add_conversation_turn(ConversationTurn(
+            user_id="alice", message="message 2", intent="product_search", confidence=0.8,
+            context_data={"color": "rouge"}, response="ok", timestamp=now + timedelta(seconds=2)))
+
+        previous.release_user("alice")
+        assert [turn.message for turn in previous.get_conversation_history("alice")] == [
+            "message 0", "message 1", "message 2"]
+        assert previous.get_user_preferences("alice") == {"color": {"value": "rouge", "frequency": 3}}
+    print("   ✅ History and preferences reread after the handoff")
+
+
+if __name__ == "__main__":
+    print("🚀 Affinity Router Tests")
+    print("=" * 50)
+    test_ring_rebalancing()
+    test_extract_user_id()
+    test_routing_and_handoff()
+    test_failover()
+    test_release_user()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the batch intent classifier
+Checks that offline results are identical to the online scorer
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), "benchmarks"))
+
+from batch_intent_classifier import BatchIntentClassifier, KeywordAutomaton
+from intent_scorer import intent_scorer
+from bench_normalizer import build_corpus
+
+EXTRA_MESSAGES = [
+    "Bonjour, comment allez-vous ?", "Qui est Messi ?", "quel âge as-tu",
+    "merci au revoir", "xyz blabla", "", "   ", "je cherche une casqette bleue marrine"
+]
+
+
+def test_automaton_finds_overlapping_keywords():
+    """Every occurrence is found, including overlapping ones"""
+    print("🔎 Testing keyword automaton")
+
+    automaton = KeywordAutomaton(["cadeau", "eau", "pour un", "un"])
+    found = sorted(automaton.find("un cadeau pour un ami"))
+
+    assert found == [(0, 9), (1, 9), (2, 17), (3, 2), (3, 17)]
+    print(f"   ✅ {found}")
+
+
+def test_identical_to_online_scorer():
+    """Intents, confidences, keywords and context match detect_intents exactly"""
+    print("🎯 Testing equality with the online scorer")
+
+    classifier = BatchIntentClassifier()
+    corpus = build_corpus(2000) + EXTRA_MESSAGES
+
+    online = [intent_scorer.detect_intents(message) for message in corpus]
+    offline = list(classifier.classify(corpus, chunk_size=300))
+
+    assert offline == online
+    print(f"   ✅ {len(corpus)} messages identical ({classifier.get_stats()['columns']} columns)")
+
+
+def test_process_pool():
+    """Worker processes return the same results, in order"""
+    print("⚙️ Testing process pool")
+
+    classifier = BatchIntentClassifier()
+    corpus = build_corpus(600, seed=7)
+
+    assert list(classifier.classify(corpus, chunk_size=100, workers=2)) == \
+        list(classifier.classify(corpus, chunk_size=100))
+    print("   ✅ Same results with 2 workers")
+
+
+if __name__ == "__main__":
+    print("🚀 Batch Intent Classifier Tests")
+    print("=" * 50)
+    test_automaton_finds_overlapping_keywords()
+    test_identical_to_online_scorer()
+    test_process_pool()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact conversation turn
+Checks field round trips, shared contexts, lazy responses and the database round trip
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+
+from conversation_memory import ConversationMemory, ConversationTurn, compact_context
+from memory_accounting import deep_sizeof
+
+NOW = datetime(2026, 3, 14, 15, 9, 26, 535000)
+RESPONSE = "🎯 J'ai trouvé 3 produits qui correspondent à votre recherche. Voici mes meilleures suggestions ! ✨" * 3
+
+
+def make_turn(**overrides) -> ConversationTurn:
+    fields = dict(user_id="alice", message="robe rouge pour ma fille", intent="product_search",
+                  confidence=0.85, context_data={"color": "rouge", "recipient": "fille"},
+                  response=RESPONSE, timestamp=NOW)
+    fields.update(overrides)
+    return ConversationTurn(**fields)
+
+
+def test_fields():
+    """Every field reads back as it was given"""
+    print("🧱 Testing fields")
+
+    turn = make_turn()
+    assert turn.user_id == "alice" and turn.intent == "product_search"
+    assert turn.confidence == 0.85
+    assert turn.timestamp == NOW and turn.timestamp_ms == int(NOW.timestamp() * 1000)
+    assert turn.context_data == {"color": "rouge", "recipient": "fille"}
+    assert turn.response == RESPONSE
+    assert turn.turn_id is None
+
+    turn.turn_id = 42
+    assert turn.turn_id == 42 and turn.confidence == 0.85 and turn.timestamp == NOW
+    assert make_turn(timestamp=turn.timestamp_ms).timestamp == NOW
+    assert not hasattr(turn, "__dict__")
+    print(f"   ✅ {turn!r}")
+
+
+def test_dict_round_trip():
+    """to_dict is JSON-ready and from_dict rebuilds an equal turn"""
+    print("🔁 Testing dict round trip")
+
+    turn = make_turn(turn_id=7)
+    data = turn.to_dict()
+    assert list(data) == ["user_id", "message", "intent", "confidence", "context_data", "response",
+                          "timestamp", "turn_id"]
+    assert data["timestamp"] == NOW.isoformat() and data["turn_id"] == 7
+    data["context_data"]["color"] = "bleu"
+    assert turn.context_data["color"] == "rouge"
+    data["context_data"]["color"] = "rouge"
+    assert ConversationTurn.from_dict(data) == turn
+    print("   ✅ Round trip preserved every field")
+
+
+def test_shared_state():
+    """Intents, user ids and flat contexts are shared between turns"""
+    print("🤝 Testing shared state")
+
+    first = make_turn(user_id="".join(["bo", "b"]), intent="".join(["greet", "ing"]))
+    second = make_turn(user_id="".join(["b", "ob"]), intent="".join(["gre", "eting"]))
+    assert first.user_id is second.user_id and first.intent is second.intent
+    assert first.context_items is second.context_items
+    assert compact_context({}) == ()
+
+    nested = make_turn(context_data={"tags": ["marin", "été"]})
+    assert nested.context_data == {"tags": ["marin", "été"]}
+    print("   ✅ Shared user ids, intents and contexts")
+
+
+def test_lazy_response():
+    """Deferred responses are rendered when read"""
+    print("💤 Testing deferred responses")
+
+    class Deferred:
+        renders = 0
+
+        def __str__(self):
+            Deferred.renders += 1
+            return "rendu"
+
+    turn = make_turn(response=Deferred())
+    assert Deferred.renders == 0
+    assert turn.response == "rendu" and turn.to_dict()["response"] == "rendu"
+    assert Deferred.renders == 2
+    print("   ✅ Rendered on access only")
+
+
+def test_footprint():
+    """A turn takes less memory than its fields as plain objects"""
+    print("📏 Testing footprint")
+
+    turn = make_turn()
+    plain = {"user_id": "alice", "message": turn.message, "intent": "product_search", "confidence": 0.85,
+             "context_data": turn.context_data, "response": RESPONSE, "timestamp": NOW, "turn_id": None}
+    compact_size = deep_sizeof(turn)[0]
+    plain_size = deep_sizeof(plain)[0]
+    assert compact_size < plain_size * 0.6, (compact_size, plain_size)
+    print(f"   ✅ {compact_size} bytes instead of {plain_size}")
+
+
+def test_history_limit():
+    """Memory keeps the last memory_limit turns of each user"""
+    print("📚 Testing history limit")
+
+    memory = ConversationMemory(memory_limit=3)
+    for index in range(5):
+        memory.add_conversation_turn(make_turn(message=f"message {index}"))
+    history = memory.get_conversation_history("alice")
+    assert [turn.message for turn in history] == ["message 2", "message 3", "message 4"]
+    assert [turn.message for turn in memory.get_conversation_history("alice", limit=2)] == ["message 3", "message 4"]
+    print(f"   ✅ {len(history)} turns kept")
+
+
+def test_database_round_trip():
+    """A saved turn loads back equal, with a shared context"""
+    print("🗄️ Testing database round trip")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "memory.db")
+        memory = ConversationMemory(db_path=path)
+        recent = datetime.now().replace(microsecond=0)
+        for index in range(3):
+            memory.add_conversation_turn(make_turn(message=f"message {index}", timestamp=recent))
+        saved = memory.get_conversation_history("alice")
+
+        reloaded = ConversationMemory(db_path=path).get_conversation_history("alice")
+        assert len(reloaded) == 3 and reloaded == saved and all(turn.turn_id for turn in reloaded)
+        assert reloaded[0].context_items is reloaded[1].context_items
+        assert ConversationMemory(db_path=path).get_conversation_context("alice")["color"] == "rouge"
+    print(f"   ✅ {len(reloaded)} turns reloaded")
+
+
+if __name__ == "__main__":
+    print("🚀 Compact Conversation Turn Tests")
+    print("=" * 50)
+    test_fields()
+    test_dict_round_trip()
+    test_shared_state()
+    test_lazy_response()
+    test_footprint()
+    test_history_limit()
+    test_database_round_trip()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for typo-tolerant keyword matching
+Checks corrections, untouched valid words and the per-message latency budget
+"""
+
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from fuzzy_matcher import SymSpellIndex, edit_distance
+from intent_scorer import IntentScorer
+from chatbot_logic import SmartSalesAssistant
+
+# Average correction cost allowed per message, in milliseconds
+LATENCY_BUDGET_MS = 0.5
+
+
+def test_edit_distance():
+    """Transpositions count as a single edit"""
+    print("📏 Testing edit distance")
+
+    assert edit_distance("casqette", "casquette", 2) == 1
+    assert edit_distance("bleu", "belu", 2) == 1
+    assert edit_distance("cadaux", "cadeau", 2) == 2
+    assert edit_distance("cadaux", "cadeaux", 2) == 1
+    assert edit_distance("sac", "montre", 2) == 3
+    print("   ✅ Distances are correct")
+
+
+def test_misspelled_messages_are_understood():
+    """Misspelled keywords reach the right intent and context"""
+    print("🔤 Testing typo correction in both scorers")
+
+    scorer = IntentScorer()
+    assert scorer.normalize_message("casqette bleue marrine") == "casquette bleue marine"
+    # Keywords are indexed with their plurals: "cadaux" is one edit from "cadeaux"
+    assert scorer.normalize_message("des cadaux pour ma fille") == "des cadeaux pour fille"
+    assert scorer.get_primary_intent("des cadaux pour ma fille").intent == "gift_intent"
+    assert scorer.get_primary_intent("des cadaeu pour ma fille").intent == "gift_intent"
+
+    assistant = SmartSalesAssistant()
+    context = assistant.detect_intent_and_context("une casqette bleue marrine", "typo")
+    assert context["category"] == "casquette"
+    assert context["color"] == "bleu"
+    print(f"   ✅ {context['category']} / {context['color']}")
+
+
+def test_valid_words_are_kept():
+    """Known words, short words and inflections are never rewritten"""
+    print("🛡️ Testing that valid words are kept")
+
+    index = SymSpellIndex()
+    index.add_words(["casquette", "cadeau", "trouve", "sac"])
+    index.add_known_words(["trouver"])
+
+    assert index.correct_text("trouver un sac") == "trouver un sac"
+    assert index.correct_text("casquettes") == "casquettes"
+    assert index.correct_text("sca") == "sca"
+    assert index.correct_text("Casqette, svp !") == "casquette, svp !"
+    print("   ✅ Valid words untouched")
+
+
+def test_real_words_are_not_corrected():
+    """French words close to a keyword keep their meaning"""
+    print("📖 Testing that real words are not corrected")
+
+    scorer = IntentScorer()
+    assistant = SmartSalesAssistant()
+    # fils/film, visage/voyage, chapeau/cadeau, taille/fille, cahier/cher, bonnet/donne
+    for word in ["fils", "visage", "chapeau", "taille", "cahier", "bonnet"]:
+        assert scorer.typo_index.correct_word(word) == word, word
+        assert assistant.typo_index.correct_word(word) == word, word
+
+    assert scorer.get_primary_intent("je cherche un chapeau pour mon fils").intent == "product_search"
+    assert scorer.get_primary_intent("crème visage").intent != "off_topic"
+    assert scorer.get_primary_intent("mon fils a 5 ans").intent != "off_topic"
+    assert scorer.get_primary_intent("un cahier et un bonnet").intent != "off_topic"
+    assert assistant.detect_intent_and_context("quelle est la taille", "taille")["recipient"] is None
+
+    # Unknown short words are only corrected one edit away, keeping their first letter
+    index = SymSpellIndex()
+    index.add_words(["film", "cadeau", "fille"])
+    assert index.correct_text("filn chapeu taile") == "film chapeu taile"
+    print("   ✅ Real words kept, rejecting intents never reached by a correction")
+
+
+def test_rejecting_keywords_are_not_targets():
+    """Off-topic and personal keywords are never the result of a correction"""
+    print("🚫 Testing rejecting keywords")
+
+    scorer = IntentScorer()
+    for intent in ["off_topic", "personal_question"]:
+        for entry in scorer.snapshot.compiled_keywords[intent]:
+            for word in entry.keyword.split():
+                assert word not in scorer.typo_index.words, (intent, word)
+    assert scorer.normalize_message("un flim") == "un flim"
+    print("   ✅ No rejecting keyword in the correction vocabulary")
+
+
+def test_latency_budget():
+    """Correcting a message stays well under the latency budget"""
+    print("⏱️ Testing latency budget")
+
+    scorer = IntentScorer()
+    messages = [
+        "je cherche une casqette bleue marrine pour mon fils",
+        "des cadaux pas chers pour ma fille de 8 ans",
+        "avez-vous un sac en cuir noir pour le bureau ?",
+        "montre élégante pour homme budget 100 dt"
+    ]
+    rounds = 250
+    corrected = [scorer.typo_index.correct_text(message) for message in messages]
+    assert "casquette bleue marine" in corrected[0] and "cadeaux" in corrected[1]
+    assert corrected[2] == messages[2]
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        for message in messages:
+            # A new unknown word each round defeats the lookup cache
+            suffix = "abcdefghij"[i % 10] + "abcdefghij"[i // 10 % 10]
+            scorer.typo_index.correct_text(f"{message} produit{suffix}")
+    elapsed_ms = (time.perf_counter() - start) * 1000 / (rounds * len(messages))
+
+    assert elapsed_ms < LATENCY_BUDGET_MS, f"{elapsed_ms:.3f} ms per message"
+    print(f"   ✅ {elapsed_ms * 1000:.1f} µs per message")
+
+
+if __name__ == "__main__":
+    print("🚀 Fuzzy Matching Tests")
+    print("=" * 50)
+    test_edit_distance()
+    test_misspelled_messages_are_understood()
+    test_valid_words_are_kept()
+    test_real_words_are_not_corrected()
+    test_rejecting_keywords_are_not_targets()
+    test_latency_budget()
+    print("\n✅ All tests passed!")
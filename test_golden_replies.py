@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Golden reply tests
+Rendered replies are compared with the texts the chatbots returned before
+replies were built from response templates, for a fixed set of messages
+and random seeds
+"""
+
+import sys
+import os
+import random
+
+sys.path.append(os.path.dirname(__file__))
+
+from intelligent_chatbot import intelligent_chatbot, POPULAR_PRODUCT_COUNT
+from database import product_db
+from chatbot_logic import SmartSalesAssistant
+
+# (message, reply) for a new user each, random seeded with the message index
+INTELLIGENT_REPLIES = [
+    ("je veux un cadeau",
+     "🎯 Génial ! Voici ce que j'ai trouvé pour vous.\n\n✨ J'ai trouvé 8 produit(s) correspondant !"),
+    ("je cherche quelque chose",
+     "🛍️ Parfait ! Je vais vous trouver exactement ce qu'il vous faut.\n\n✨ J'ai trouvé 8 produit(s) correspondant !"),
+    ("Je cherche un cadeau pour ma fille de 8 ans",
+     "🛍️ Parfait ! Je vois que vous cherchez quelque chose de spécial.\n\n✅ J'ai compris: cherche\n\n🔍 J'ai trouvé 5 produit(s) correspondant !\n\n💬 Pour affiner la recherche, précisez-moi:\n• La couleur souhaitée\n• Votre budget maximum\n• L'occasion ou le style"),
+    ("Avez-vous des casquettes rouges pas chères ?",
+     "💭 Hmm, pouvez-vous être plus précis sur ce que vous cherchez ?\n\n💡 Je suis un assistant e-commerce. Je peux vous aider à:\n• Trouver des produits par catégorie\n• Suggérer des cadeaux personnalisés\n• Filtrer par budget et couleur\n\n👉 Soyez plus précis:\n• 'Je cherche un cadeau pour ma fille de 8 ans'\n• 'Montrez-moi des casquettes rouges'\n• 'Budget maximum 30 DT'"),
+    ("Mon budget est de 50 DT maximum",
+     "💰 Très bien ! Budget enregistré.\n\n🔍 Avec ces informations, j'ai trouvé 21 produit(s) !"),
+    ("Je veux quelque chose de bleu pour un garçon",
+     "⭐ Super ! J'ai plusieurs options intéressantes à vous proposer.\n\n📋 Critères: pour garçon, couleur bleu\n\n✨ J'ai trouvé 2 produit(s) correspondant !"),
+    ("C'est pour un anniversaire",
+     "🔍 Excellente idée ! Laissez-moi chercher ça pour vous.\n\n✨ J'ai trouvé 8 produit(s) correspondant !"),
+    ("cadeau pour ma femme budget 60 DT",
+     "💰 Très bien ! Budget enregistré.\n\n🔍 Avec ces informations, j'ai trouvé 16 produit(s) !"),
+    ("jouet pour garçon de 5 ans",
+     "💭 Hmm, pouvez-vous être plus précis sur ce que vous cherchez ?\n\n💡 Basé sur vos critères, voici quelques suggestions:\n\n👉 Soyez plus précis:\n• 'Je cherche un cadeau pour ma fille de 8 ans'\n• 'Montrez-moi des casquettes rouges'\n• 'Budget maximum 30 DT'"),
+    ("je veux un sac bleu",
+     "🎯 Génial ! Voici ce que j'ai trouvé pour vous.\n\n📋 Critères: couleur bleu\n\n✨ J'ai trouvé 10 produit(s) correspondant !"),
+    ("je cherche une montre noire",
+     "🔍 Excellente idée ! Laissez-moi chercher ça pour vous.\n\n✨ J'ai trouvé 8 produit(s) correspondant !"),
+    ("livre bleu pour enfant",
+     "🎯 Génial ! Voici ce que j'ai trouvé pour vous.\n\n📋 Critères: pour enfant, couleur bleu\n\n✨ J'ai trouvé 4 produit(s) correspondant !"),
+    ("Bonjour, comment allez-vous ?",
+     "Je suis spécialisé dans l'e-commerce. Pour les questions personnelles, consultez d'autres sources.\n\n🛍️ Je peux vous aider à trouver des produits ou des cadeaux."),
+    ("salut",
+     "🌟 Hello ! Prêt pour une expérience shopping personnalisée ?"),
+    ("aide moi",
+     "🤝 Bien sûr ! Je peux vous aider à trouver des produits selon vos critères.\n\n💡 Voici ce que je peux faire:\n• 🔍 Recherche de produits par catégorie\n• 🎁 Suggestions de cadeaux personnalisés\n• 💰 Filtrage par budget\n• 🌈 Recherche par couleur\n• 👥 Recommandations selon l'âge/genre"),
+    ("Qui est Messi ?",
+     "Je suis spécialisé dans l'aide à l'achat. Je ne peux répondre qu'aux questions sur les produits et le shopping.\n\n👉 Par exemple : 'Je cherche un cadeau pour ma sœur'"),
+    ("quel âge as-tu",
+     "Mon rôle est de vous assister dans vos recherches de produits. Je ne réponds qu'aux questions liées au shopping.\n\n🎯 Parlez-moi de vos besoins d'achat."),
+    ("xyz blabla",
+     "❓ Pouvez-vous m'expliquer différemment ce que vous voulez ?\n\n💡 Je suis un assistant e-commerce. Je peux vous aider à:\n• Trouver des produits par catégorie\n• Suggérer des cadeaux personnalisés\n• Filtrer par budget et couleur\n\n👉 Soyez plus précis:\n• 'Je cherche un cadeau pour ma fille de 8 ans'\n• 'Montrez-moi des casquettes rouges'\n• 'Budget maximum 30 DT'"),
+    ("une casquette verte",
+     "🛍️ Parfait ! Je vais vous trouver exactement ce qu'il vous faut.\n\n✨ J'ai trouvé 8 produit(s) correspondant !"),
+    ("pour mon fils de 14 ans",
+     "🤔 Je ne suis pas sûr de bien comprendre. Pouvez-vous reformuler ?\n\n💡 Je suis un assistant e-commerce. Je peux vous aider à:\n• Trouver des produits par catégorie\n• Suggérer des cadeaux personnalisés\n• Filtrer par budget et couleur\n\n👉 Soyez plus précis:\n• 'Je cherche un cadeau pour ma fille de 8 ans'\n• 'Montrez-moi des casquettes rouges'\n• 'Budget maximum 30 DT'"),
+]
+
+# One sales conversation, random seeded with the message index
+SALES_CONVERSATION = [
+    ("Bonjour",
+     "🌟 Bonjour ! Prêt(e) pour une session shopping réussie ?\n\n💡 Pour vous proposer exactement ce qu'il vous faut :\n• 🎯 Pour commencer, dites-moi : c'est pour qui ?\n• 💰 Quel est votre budget approximatif ?\n• 🌈 Avez-vous une couleur préférée ?\n\n✨ Plus vous me donnez d'infos, mieux je peux vous conseiller !"),
+    ("je veux un cadeau",
+     "💡 Excellent ! Laissez-moi en savoir un peu plus.\n\n📝 Récapitulatif : pour cadeau\n\n\n\n💬 Répondez simplement, je prépare une sélection personnalisée !"),
+    ("pour une fille",
+     "🎉 PARFAIT ! J'ai trouvé 3 produit(s) idéal(s) !\n\n📋 Profil : fille, pour cadeau\n\n🎁 Ces produits feront des cadeaux formidables !\n💰 Tous respectent votre budget de None DT !\n\n✨ Voici ma sélection personnalisée :"),
+    ("budget 30 DT",
+     "🎉 PARFAIT ! J'ai trouvé 2 produit(s) idéal(s) !\n\n📋 Profil : fille, pour cadeau, budget 30.0 DT\n\n🎁 Ces produits feront des cadeaux formidables !\n💰 Tous respectent votre budget de 30.0 DT !\n\n✨ Voici ma sélection personnalisée :"),
+    ("elle aime le bleu",
+     "🎉 PARFAIT ! J'ai trouvé 2 produit(s) idéal(s) !\n\n📋 Profil : fille, pour cadeau, budget 30.0 DT, couleur bleu\n\n🎁 Ces produits feront des cadeaux formidables !\n💰 Tous respectent votre budget de 30.0 DT !\n\n✨ Voici ma sélection personnalisée :"),
+    ("une casquette verte",
+     "🤔 Hmm, je n'ai pas trouvé de produits qui correspondent exactement à :\n\n📋 fille, pour cadeau, budget 30.0 DT, couleur vert\n\n💡 Mais regardez ces alternatives qui pourraient vous intéresser :"),
+    ("au revoir",
+     "🛒 Merci pour votre visite ! N'hésitez pas à revenir !"),
+]
+
+
+def test_intelligent_replies():
+    """Each message gets the reply rendered before templates"""
+    print("📜 Testing intelligent chatbot replies")
+
+    for index, (message, expected) in enumerate(INTELLIGENT_REPLIES):
+        random.seed(index)
+        reply = intelligent_chatbot.process_message(f"golden_user_{index}", message).message
+        assert reply == expected, f"{message!r}:\n{reply!r}\n!=\n{expected!r}"
+    print(f"   ✅ {len(INTELLIGENT_REPLIES)} replies identical")
+
+
+def test_sales_conversation():
+    """A whole sales conversation renders the same texts"""
+    print("🛍️ Testing sales assistant replies")
+
+    assistant = SmartSalesAssistant()
+    for index, (message, expected) in enumerate(SALES_CONVERSATION):
+        random.seed(index)
+        reply = assistant.generate_smart_response(message, "golden")["response"]
+        assert reply == expected, f"{message!r}:\n{reply!r}\n!=\n{expected!r}"
+    print(f"   ✅ {len(SALES_CONVERSATION)} replies identical")
+
+
+def test_popular_selection():
+    """Without criteria, the products returned are the ones reported: the first of the catalog"""
+    print("⭐ Testing popular selection")
+
+    products = intelligent_chatbot.search_products_with_context({})
+    assert products == product_db.get_all_products()[:POPULAR_PRODUCT_COUNT]
+    assert len(intelligent_chatbot.search_products_with_context({"color": "rouge"})) == len(
+        product_db.complex_search(color="rouge"))
+    print(f"   ✅ {len(products)} products, as in the reply")
+
+
+if __name__ == "__main__":
+    print("🚀 Golden Reply Tests")
+    print("=" * 50)
+    test_intelligent_replies()
+    test_sales_conversation()
+    test_popular_selection()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for buffered unknown-query counting
+Checks the Space-Saving counter bounds and the batched upsert flush
+"""
+
+import sys
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from heavy_hitters import SpaceSavingCounter
+from conversation_memory import ConversationMemory
+
+
+def test_exact_below_capacity():
+    """Counts are exact while fewer items than the capacity are seen"""
+    print("🔢 Testing exact counts")
+
+    counter = SpaceSavingCounter(capacity=10)
+    for word in ["a", "b", "a", "c", "a", "b"]:
+        counter.add(word)
+
+    assert counter.top(3) == [("a", 3, 0), ("b", 2, 0), ("c", 1, 0)]
+    assert counter.evictions == 0
+    print(f"   ✅ {counter.get_stats()}")
+
+
+def test_bounded_under_spam():
+    """A flood of unique messages cannot grow the counter or hide frequent ones"""
+    print("🌊 Testing adversarial stream")
+
+    rng = random.Random(7)
+    counter = SpaceSavingCounter(capacity=100)
+    frequent = {"livraison gratuite": 0, "frais de port": 0}
+    for i in range(50000):
+        if rng.random() < 0.1:
+            message = rng.choice(list(frequent))
+            frequent[message] += 1
+        else:
+            message = f"spam {i}"
+        counter.add(message)
+
+    assert len(counter) == 100
+    top = {item: (count, error) for item, count, error in counter.top(2)}
+    for message, true_count in frequent.items():
+        count, error = top[message]
+        assert count - error <= true_count <= count
+        assert error <= 50000 / 100
+    print(f"   ✅ {counter.get_stats()}")
+
+
+def test_batched_flush():
+    """Buffered hits are merged into unknown_queries on flush and before reads"""
+    print("💾 Testing batched upsert")
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(db_path=os.path.join(directory, "memory.db"),
+                                    unknown_flush_interval=3600)
+        for message in ["quel temps fait-il", "horaires magasin", "quel temps fait-il"]:
+            memory.log_unknown_query(message)
+        assert memory.flush_unknown_queries() == 2
+
+        memory.log_unknown_query("quel temps fait-il")
+        queries = memory.get_unknown_queries()
+        assert queries[0]["message"] == "quel temps fait-il"
+        assert queries[0]["frequency"] == 3
+        assert memory.flush_unknown_queries() == 0
+
+        with sqlite3.connect(memory.db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM unknown_queries").fetchone()[0] == 2
+        print(f"   ✅ {queries}")
+
+
+def test_failed_flush_keeps_counts():
+    """Counts drained by a flush that fails are written by the next one"""
+    print("🔒 Testing failed flush")
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(db_path=os.path.join(directory, "memory.db"),
+                                    unknown_flush_interval=3600)
+        for message in ["quel temps fait-il", "horaires magasin", "quel temps fait-il"]:
+            memory.log_unknown_query(message)
+
+        # A directory cannot be opened as a database
+        db_path, memory.db_path = memory.db_path, directory
+        try:
+            memory.flush_unknown_queries()
+            assert False, "the flush should fail"
+        except sqlite3.Error:
+            pass
+        memory.db_path = db_path
+
+        memory.log_unknown_query("quel temps fait-il")
+        assert memory.flush_unknown_queries() == 2
+        frequencies = {row["message"]: row["frequency"] for row in memory.get_unknown_queries()}
+        assert frequencies == {"quel temps fait-il": 3, "horaires magasin": 1}
+        print(f"   ✅ {frequencies}")
+
+
+def test_restore_when_full():
+    """Restored rows merge with new counts and respect the capacity"""
+    print("↩️ Testing restore")
+
+    counter = SpaceSavingCounter(capacity=2)
+    counter.add("a", now=1)
+    counter.add("a", now=2)
+    counter.add("b", now=3)
+    drained = counter.drain()
+    counter.add("b", now=4)
+    counter.restore(drained)
+    top = {item: (count, error) for item, count, error in counter.top()}
+    assert top == {"a": (2, 0), "b": (2, 0)} and counter.total == 4
+
+    # Full: a restored item replaces the smallest, inheriting its count as error
+    counter.restore([("c", 1, 0, 5.0, 5.0)])
+    top = {item: (count, error) for item, count, error in counter.top()}
+    assert len(counter) == 2 and top["c"] == (3, 2)
+    counter.add("d")
+    assert len(counter) == 2 and counter.get_stats()["min_count"] == 3
+    print(f"   ✅ {top}")
+
+
+def test_logging_is_cheap():
+    """Logging a burst only touches memory"""
+    print("⏱️ Testing burst latency")
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(db_path=os.path.join(directory, "memory.db"),
+                                    unknown_flush_interval=3600)
+        start = time.perf_counter()
+        for i in range(5000):
+            memory.log_unknown_query(f"bot message {i % 50}")
+        per_call_us = (time.perf_counter() - start) / 5000 * 1e6
+
+        start = time.perf_counter()
+        memory.flush_unknown_queries()
+        flush_ms = (time.perf_counter() - start) * 1000
+        assert sum(row["frequency"] for row in memory.get_unknown_queries(limit=100)) == 5000
+        print(f"   ✅ {per_call_us:.1f} µs per hit, flush in {flush_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    print("🚀 Unknown Query Counter Tests")
+    print("=" * 50)
+    test_exact_below_capacity()
+    test_bounded_under_spam()
+    test_batched_flush()
+    test_failed_flush_keeps_counts()
+    test_restore_when_full()
+    test_logging_is_cheap()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for paginated conversation history
+Checks keyset pages across memory and SQLite, filters and cursor validation
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+
+from conversation_memory import ConversationMemory, ConversationTurn, encode_history_cursor
+
+START = datetime(2026, 3, 1, 9, 0)
+
+
+def fill_history(memory: ConversationMemory, user_id: str, count: int):
+    for i in range(count):
+        # Pairs of turns share a millisecond, so ties are broken by id
+        memory.add_conversation_turn(ConversationTurn(
+            user_id, f"message {i}", ["greeting", "gift_intent", "budget_info"][i % 3], 0.9,
+            {"index": i}, "ok", START + timedelta(minutes=i // 2)
+        ))
+
+
+def collect_pages(memory: ConversationMemory, user_id: str, limit: int, **filters):
+    pages, cursor = [], None
+    while True:
+        page, cursor = memory.get_history_page(user_id, limit=limit, cursor=cursor, **filters)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_full_history():
+    """Paging returns every persisted turn once, newest first"""
+    print("📜 Testing full history pagination")
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(db_path=os.path.join(directory, "memory.db"),
+                                    memory_limit=5, unknown_flush_interval=3600)
+        fill_history(memory, "alice", 53)
+        fill_history(memory, "bob", 7)
+
+        pages = collect_pages(memory, "alice", limit=10)
+        indexes = [turn.context_data["index"] for page in pages for turn in page]
+        assert indexes == list(range(52, -1, -1))
+        assert [len(page) for page in pages] == [10, 10, 10, 10, 10, 3]
+
+        # The first page of 3 comes from memory alone
+        first, cursor = memory.get_history_page("alice", limit=3)
+        assert all(turn is memory_turn for turn, memory_turn
+                   in zip(first, reversed(memory.user_conversations["alice"])))
+        assert cursor is not None
+        print(f"   ✅ {len(indexes)} turns in {len(pages)} pages")
+
+
+def test_filters():
+    """Intent and date filters apply to memory and SQLite pages alike"""
+    print("🔎 Testing filters")
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(db_path=os.path.join(directory, "memory.db"),
+                                    unknown_flush_interval=3600)
+        fill_history(memory, "alice", 60)
+
+        pages = collect_pages(memory, "alice", limit=4, intent="gift_intent",
+                              since=START + timedelta(minutes=5), until=START + timedelta(minutes=25))
+        turns = [turn for page in pages for turn in page]
+        assert turns and all(turn.intent == "gift_intent" for turn in turns)
+        assert all(START + timedelta(minutes=5) <= turn.timestamp < START + timedelta(minutes=25)
+                   for turn in turns)
+        assert [turn.context_data["index"] for turn in turns] == [i for i in range(49, 9, -1) if i % 3 == 1]
+        print(f"   ✅ {len(turns)} matching turns")
+
+
+def test_constant_page_cost():
+    """Deep pages use the index seek, not an offset scan"""
+    print("⏱️ Testing page depth cost")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        memory = ConversationMemory(db_path=db_path, unknown_flush_interval=3600)
+        with sqlite3.connect(db_path) as conn:
+            conn.executemany("""
+                INSERT INTO conversations (user_id, message, intent, confidence, context_data, response, timestamp)
+                VALUES ('carol', 'm', 'greeting', 1.0, x'', 'ok', ?)
+            """, [(i,) for i in range(1, 50001)])
+
+        def page_time(cursor):
+            start = time.perf_counter()
+            for _ in range(20):
+                memory.get_history_page("carol", limit=20, cursor=cursor)
+            return (time.perf_counter() - start) / 20
+
+        first = page_time(None)
+        deep = page_time(encode_history_cursor(100, 100))
+        assert deep < first * 3 + 0.002
+        print(f"   ✅ first page {first * 1000:.2f} ms, page 2500 {deep * 1000:.2f} ms")
+
+    try:
+        memory.get_history_page("carol", cursor="not-a-cursor")
+        assert False, "malformed cursor must be rejected"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    print("🚀 History Pagination Tests")
+    print("=" * 50)
+    test_pages_cover_full_history()
+    test_filters()
+    test_constant_page_cost()
+    print("\n✅ All tests passed!")
@@ -7,6 +7,9 @@ Tests intent scoring, conversation memory, and learning capabilities
 import sys
 import os
 import json
+import atexit
+import shutil
+import tempfile
 from datetime import datetime
 
 # Add backend to path
@@ -16,6 +19,12 @@ from intelligent_chatbot import intelligent_chatbot
 from intent_scorer import intent_scorer
 from conversation_memory import conversation_memory
 
+# The suite writes conversations and unknown queries to a throwaway database
+TEST_DB_DIR = tempfile.mkdtemp(prefix="chatbot-test-")
+conversation_memory.open_database(os.path.join(TEST_DB_DIR, "memory.db"))
+atexit.register(shutil.rmtree, TEST_DB_DIR, True)
+atexit.register(conversation_memory.close_database)  # runs first: flushes before the removal
+
 
 def test_intent_scoring():
     """Test the intent scoring system"""
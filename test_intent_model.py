@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the linear intent model
+Checks hashing, training, the memory-mapped weight file and engine selection
+"""
+
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(__file__))
+
+from intent_model import HashingFeaturizer, IntentModel, train_model, save_model, evaluate
+from intent_scorer import IntentScorer
+
+TRAINING = [
+    ("bonjour", "greeting"), ("salut tout le monde", "greeting"), ("bonsoir", "greeting"),
+    ("cadeau pour fille", "gift_intent"), ("offrir cadeau anniversaire", "gift_intent"),
+    ("un cadeau pour mon fils", "gift_intent"), ("qui est messi", "off_topic"),
+    ("meteo demain", "off_topic"), ("qui a gagne le match", "off_topic"),
+    ("blabla xyz", "unknown"), ("qsdf azer", "unknown")
+]
+
+
+def train_to_file(path: str):
+    scorer = IntentScorer()
+    messages = [scorer.normalize_message(message) for message, _ in TRAINING]
+    featurizer = HashingFeaturizer(dimension=1 << 12)
+    labels, bias, weights = train_model(messages, [label for _, label in TRAINING],
+                                        featurizer, epochs=30)
+    save_model(path, labels, bias, weights, featurizer)
+
+
+def test_featurizer_is_stable():
+    """Hashed features are deterministic and L2-normalized"""
+    print("#️⃣ Testing hashing featurizer")
+
+    featurizer = HashingFeaturizer(dimension=1 << 10)
+    features = featurizer.features("cadeau pour fille")
+
+    assert features == HashingFeaturizer(dimension=1 << 10).features("cadeau pour fille")
+    assert abs(sum(value * value for value in features.values()) - 1.0) < 1e-9
+    assert all(0 <= index < 1 << 10 for index in features)
+    print(f"   ✅ {len(features)} features")
+
+
+def test_weight_file_round_trip():
+    """The memory-mapped model predicts its training labels"""
+    print("💾 Testing weight file")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.bin")
+        train_to_file(path)
+        model = IntentModel.load(path)
+
+        assert isinstance(model.weights, memoryview)
+        assert model.predict("bonjour")[0][0] == "greeting"
+        report = evaluate(model, [m for m, _ in TRAINING], [l for _, l in TRAINING],
+                          IntentScorer().normalize_message)
+        assert report["accuracy"] >= 0.9
+        print(f"   ✅ accuracy {report['accuracy']:.0%}, {report['latency_us']:.1f} µs/message")
+        del model  # releases the mapping before the directory is removed
+
+
+def test_engine_selection():
+    """The model engine runs side by side with keyword scoring"""
+    print("🔀 Testing engine selection")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.bin")
+        train_to_file(path)
+
+        scorer = IntentScorer(model_path=path)
+        assert scorer.engine == "keywords"
+        model_intents = scorer.detect_intents("qui est messi", engine="model")
+        assert [score.intent for score in model_intents] == ["off_topic"]
+        assert scorer.detect_intents("blabla xyz", engine="model") == []
+
+        scorer.set_engine("model")
+        assert scorer.get_primary_intent("bonjour").intent == "greeting"
+        del scorer
+
+    try:
+        IntentScorer(engine="model")
+        assert False, "model engine without a model must fail"
+    except ValueError:
+        pass
+    print("   ✅ Engines are selectable")
+
+
+if __name__ == "__main__":
+    print("🚀 Intent Model Tests")
+    print("=" * 50)
+    test_featurizer_is_stable()
+    test_weight_file_round_trip()
+    test_engine_selection()
+    print("\n✅ All tests passed!")
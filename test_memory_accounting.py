@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for memory accounting
+Checks deep sizes, per-structure attribution and tracemalloc snapshots and diffs
+"""
+
+import sys
+import os
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(__file__))
+
+from memory_accounting import (AllocationTracker, deep_sizeof, structure_sizes, object_counts,
+                               memory_report, STRUCTURES)
+
+
+def test_deep_sizeof():
+    """Deep size grows with the content and stops at the given objects"""
+    print("📏 Testing deep sizes")
+
+    small = {f"user{i}": [f"message {j}" for j in range(5)] for i in range(10)}
+    large = {f"user{i}": [f"message {j}" for j in range(5)] for i in range(1000)}
+    small_size, small_objects, truncated = deep_sizeof(small)
+    large_size, large_objects, _ = deep_sizeof(large)
+    assert not truncated
+    assert small_objects == 1 + 10 * (1 + 1 + 5)
+    assert large_size > small_size * 50
+
+    shared = [b"x" * 100000]
+    holder = {"shared": shared}
+    assert deep_sizeof(holder)[0] > 100000
+    assert deep_sizeof(holder, stop=[shared])[0] < 1000
+
+    _, objects, truncated = deep_sizeof(large, max_objects=100)
+    assert truncated and objects == 100
+    print(f"   ✅ {large_objects} objects, {large_size / 1024:.0f} KiB")
+
+
+def test_structure_sizes():
+    """Loaded structures are measured, the others reported as not loaded"""
+    print("📦 Testing structure sizes")
+
+    import database  # noqa: F401
+    report = structure_sizes()
+    assert set(report) == {name for name, _, _ in STRUCTURES}
+    products = report["product_db.products"]
+    assert products["loaded"] and products["entries"] > 0 and products["bytes"] > 0
+    for entry in report.values():
+        assert entry == {"loaded": False} or entry["bytes"] > 0
+    print(f"   ✅ product_db.products: {products['objects']} objects, {products['entries']} entries")
+
+
+def test_object_counts():
+    """The most common types come first"""
+    print("🔢 Testing object counts")
+
+    counts = object_counts(5)
+    assert len(counts) == 5
+    assert [row["count"] for row in counts] == sorted((row["count"] for row in counts), reverse=True)
+    print(f"   ✅ Top type: {counts[0]['type']} ({counts[0]['count']})")
+
+
+def test_snapshots_and_diff():
+    """A diff between two snapshots points at the line that allocated"""
+    print("📍 Testing snapshots and diffs")
+
+    tracker = AllocationTracker(keep=2)
+    try:
+        tracker.take_snapshot("before")
+        retained = [bytearray(1024) for _ in range(2000)]
+        tracker.take_snapshot("after")
+
+        growth = tracker.diff("before", "after", limit=3)
+        assert "test_memory_accounting.py" in growth[0]["site"]
+        assert growth[0]["kb_diff"] >= 2000
+        assert tracker.top("after", 5)
+
+        tracker.take_snapshot("third")
+        assert list(tracker.snapshots) == ["after", "third"]
+        try:
+            tracker.diff("before")
+            assert False, "evicted snapshot should be unknown"
+        except KeyError:
+            pass
+        assert len(retained) == 2000
+    finally:
+        tracker.stop()
+    assert not tracemalloc.is_tracing() and not tracker.snapshots
+    print(f"   ✅ Top growth: {growth[0]['site']} (+{growth[0]['kb_diff']} KiB)")
+
+
+def test_sampler():
+    """The sampler snapshots periodically in a background thread"""
+    print("⏲️ Testing periodic sampler")
+
+    tracker = AllocationTracker(keep=3)
+    try:
+        thread = tracker.start_sampler(interval=0.05)
+        assert thread.daemon and tracker.start_sampler(interval=0.05) is thread
+        time.sleep(0.3)
+        status = tracker.get_status()
+        assert status["tracing"] and status["sampler_running"]
+        assert len(status["snapshots"]) == 3
+    finally:
+        tracker.stop()
+    print(f"   ✅ Snapshots kept: {status['snapshots']}")
+
+
+def test_memory_report():
+    """The report has every section"""
+    print("💾 Testing memory report")
+
+    report = memory_report(3)
+    assert set(report) == {"process", "structures", "object_types", "tracemalloc", "duration_ms"}
+    assert len(report["object_types"]) == 3
+    print(f"   ✅ Report built in {report['duration_ms']} ms")
+
+
+if __name__ == "__main__":
+    print("🚀 Memory Accounting Tests")
+    print("=" * 50)
+    test_deep_sizeof()
+    test_structure_sizes()
+    test_object_counts()
+    test_snapshots_and_diff()
+    test_sampler()
+    test_memory_report()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for conversation memory maintenance
+Checks retention, daily rollups, gzip archives, chunked deletes and vacuum
+"""
+
+import sys
+import os
+import gzip
+import json
+import sqlite3
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+
+from conversation_memory import ConversationMemory, ConversationTurn
+from memory_maintenance import MemoryMaintenance, RetentionPolicy, OutdatedSchemaError, delete_in_chunks
+from memory_schema import SCHEMA_VERSION, get_schema_version
+
+
+def fill_memory(db_path: str, now: datetime) -> ConversationMemory:
+    memory = ConversationMemory(db_path=db_path, unknown_flush_interval=3600)
+    for day in range(0, 200, 2):
+        for i in range(3):
+            memory.save_conversation_turn(ConversationTurn(
+                user_id=f"user{i}", message=f"message {day} {i}", intent=["greeting", "gift_intent"][i % 2],
+                confidence=0.5 + 0.1 * i, context_data={"age": i}, response="ok",
+                timestamp=now - timedelta(days=day, hours=i)
+            ))
+    return memory
+
+
+def count(db_path: str, table: str) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_retention_rollup_and_archive():
+    """Expired turns are archived, rolled up per day and intent, then deleted"""
+    print("🧹 Testing retention")
+
+    now = datetime(2026, 6, 1, 12, 0)
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        fill_memory(db_path, now)
+        total = count(db_path, "conversations")
+
+        maintenance = MemoryMaintenance(
+            db_path, policies=[RetentionPolicy("conversations", "timestamp", 90, rollup=True)],
+            archive_dir=os.path.join(directory, "archives"), chunk_size=16, pause=0
+        )
+        report = maintenance.run(now=now)
+        result = report["tables"]["conversations"]
+
+        kept = count(db_path, "conversations")
+        assert result["removed"] == total - kept > 0
+        with sqlite3.connect(db_path) as conn:
+            oldest = conn.execute("SELECT MIN(timestamp) FROM conversations").fetchone()[0]
+            rolled_up = conn.execute("SELECT SUM(turns) FROM conversation_daily_stats").fetchone()[0]
+        assert oldest >= (now - timedelta(days=90)).timestamp() * 1000
+        assert rolled_up == result["removed"]
+
+        with gzip.open(result["archive"], "rt", encoding="utf-8") as archive:
+            records = [json.loads(line) for line in archive]
+        assert len(records) == result["removed"]
+        assert {"user_id", "message", "intent", "timestamp"} <= set(records[0])
+
+        # A second pass has nothing left to do
+        assert maintenance.run(now=now)["tables"]["conversations"]["removed"] == 0
+        print(f"   ✅ removed {result['removed']}, kept {kept}, {report['duration_ms']} ms")
+
+
+def test_incremental_vacuum():
+    """After switching to incremental auto-vacuum, freed pages are returned"""
+    print("🗜️ Testing incremental vacuum")
+
+    now = datetime(2026, 6, 1, 12, 0)
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        fill_memory(db_path, now)
+        maintenance = MemoryMaintenance(db_path, policies=[RetentionPolicy("conversations", "timestamp", 150)],
+                                        archive_dir=None, pause=0)
+        assert maintenance.run(full_vacuum=True, now=now)["incremental_vacuum_enabled"]
+
+        # Later passes give pages back without a full VACUUM
+        maintenance.policies = [RetentionPolicy("conversations", "timestamp", 10)]
+        size_before = os.path.getsize(db_path)
+        report = maintenance.run(now=now)
+        assert report["freed_pages"] > 0
+        assert os.path.getsize(db_path) < size_before
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        print(f"   ✅ {report['freed_pages']} pages freed")
+
+
+def test_chunked_user_deletion():
+    """clear_user_data removes every row even when it spans many chunks"""
+    print("🗑️ Testing chunked deletes")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        memory = fill_memory(db_path, datetime.now())
+        with sqlite3.connect(db_path) as conn:
+            deleted = delete_in_chunks(conn, "conversations", "user_id = ?", ("user1",), chunk_size=7)
+        assert deleted == 100
+
+        memory.clear_user_data("user0")
+        with sqlite3.connect(db_path) as conn:
+            users = {row[0] for row in conn.execute("SELECT DISTINCT user_id FROM conversations")}
+        assert users == {"user2"}
+        print(f"   ✅ {count(db_path, 'conversations')} rows left")
+
+
+def test_outdated_schema():
+    """Retention refuses a version 0 database; the command migrates it first"""
+    print("🔄 Testing outdated schema")
+
+    now = datetime.now().replace(microsecond=0)
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE conversations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, message TEXT NOT NULL,
+                    intent TEXT NOT NULL, confidence REAL NOT NULL, context_data TEXT NOT NULL,
+                    response TEXT NOT NULL, timestamp TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE TABLE user_preferences (
+                    user_id TEXT PRIMARY KEY, preferences TEXT NOT NULL, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            conn.executemany("""
+                INSERT INTO conversations (user_id, message, intent, confidence, context_data, response, timestamp)
+                VALUES ('alice', ?, 'greeting', 0.9, '{}', 'ok', ?)
+            """, [("old", (now - timedelta(days=400)).isoformat()), ("new", now.isoformat())])
+
+        try:
+            MemoryMaintenance(db_path, archive_dir=None).run()
+            assert False, "a version 0 database should be refused"
+        except OutdatedSchemaError:
+            pass
+        assert count(db_path, "conversations") == 2
+
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                     "memory_maintenance.py"), db_path],
+                       cwd=directory, check=True, capture_output=True)
+        with sqlite3.connect(db_path) as conn:
+            assert get_schema_version(conn) == SCHEMA_VERSION
+            assert [row[0] for row in conn.execute("SELECT message FROM conversations")] == ["new"]
+    print("   ✅ Refused before migration, pruned after")
+
+
+if __name__ == "__main__":
+    print("🚀 Memory Maintenance Tests")
+    print("=" * 50)
+    test_retention_rollup_and_archive()
+    test_incremental_vacuum()
+    test_chunked_user_deletion()
+    test_outdated_schema()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the conversation memory schema
+Checks the context codec, the legacy migration and its rollback
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+
+from context_codec import ContextCodec
+from conversation_memory import ConversationMemory, ConversationTurn
+from memory_schema import SCHEMA_VERSION, migrate, get_schema_version
+
+LEGACY_SCHEMA = """
+    CREATE TABLE conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, message TEXT NOT NULL,
+        intent TEXT NOT NULL, confidence REAL NOT NULL, context_data TEXT NOT NULL,
+        response TEXT NOT NULL, timestamp TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE user_preferences (
+        user_id TEXT PRIMARY KEY, preferences TEXT NOT NULL, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_conversations_user_id ON conversations(user_id);
+"""
+
+
+def create_legacy_database(path: str, timestamps):
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        conn.executemany("""
+            INSERT INTO conversations (user_id, message, intent, confidence, context_data, response, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [("alice", f"message {i}", "gift_intent", 0.8,
+               json.dumps({"recipient": "fille", "age": i}), "ok", timestamp)
+              for i, timestamp in enumerate(timestamps)])
+        conn.execute("INSERT INTO user_preferences (user_id, preferences) VALUES ('alice', '{}')")
+        conn.commit()
+
+
+def test_codec_round_trip():
+    """Context values survive encoding; keys are stored once per database"""
+    print("🧬 Testing context codec")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        writer, reader = ContextCodec(db_path), ContextCodec(db_path)
+        context = {"recipient": "garçon", "age": 8, "max_price": 30.0, "colors": ["rouge", None],
+                   "nested": {"flag": True, "delta": -3}}
+        blob = writer.encode(context)
+
+        # The reader learns keys interned by the writer after it started
+        assert reader.decode(blob) == context
+        assert writer.encode({}) == b"" and reader.decode(b"") == {}
+        assert len(blob) < len(json.dumps(context))
+        print(f"   ✅ {len(blob)} bytes instead of {len(json.dumps(context))}")
+
+
+def test_legacy_migration():
+    """An original-schema file is converted and loads like before"""
+    print("🔄 Testing migration")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        now = datetime.now().replace(microsecond=0)
+        create_legacy_database(db_path, [(now - timedelta(minutes=m)).isoformat() for m in (3, 2, 1)])
+
+        memory = ConversationMemory(db_path=db_path, unknown_flush_interval=3600)
+        history = memory.get_conversation_history("alice")
+        assert [turn.context_data["age"] for turn in history] == [0, 1, 2]
+        assert history[-1].timestamp == now - timedelta(minutes=1)
+        assert memory.get_user_preferences("alice") == {}
+
+        memory.add_conversation_turn(ConversationTurn("alice", "merci", "farewell", 1.0, {}, "au revoir", now))
+        with sqlite3.connect(db_path) as conn:
+            assert get_schema_version(conn) == SCHEMA_VERSION
+            types = {row[0] for row in conn.execute("SELECT typeof(timestamp) FROM conversations")}
+            assert types == {"integer"}
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM conversations "
+                                "WHERE user_id = ? ORDER BY timestamp DESC", ("alice",)).fetchall()
+            assert "COVERING INDEX idx_conversations_user_time" in plan[0][-1]
+        assert migrate(db_path) == SCHEMA_VERSION
+        print(f"   ✅ {len(history)} turns migrated")
+
+
+def test_failed_migration_rolls_back():
+    """A row that cannot be converted leaves the file at version 0"""
+    print("🛡️ Testing migration rollback")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        create_legacy_database(db_path, [datetime.now().isoformat(), "not a date"])
+        try:
+            migrate(db_path)
+            assert False, "invalid timestamp must abort the migration"
+        except ValueError:
+            pass
+
+        with sqlite3.connect(db_path) as conn:
+            assert get_schema_version(conn) == 0
+            assert conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0] == 2
+            assert conn.execute("SELECT typeof(timestamp) FROM conversations").fetchone()[0] == "text"
+        print("   ✅ Original schema kept")
+
+
+if __name__ == "__main__":
+    print("🚀 Memory Schema Tests")
+    print("=" * 50)
+    test_codec_round_trip()
+    test_legacy_migration()
+    test_failed_migration_rolls_back()
+    print("\n✅ All tests passed!")
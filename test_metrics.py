@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for per-stage latency metrics
+Checks the HDR bucket layout, per-thread accumulation and the Prometheus output
+"""
+
+import sys
+import os
+import random
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from metrics import MetricsRegistry, bucket_index, bucket_bounds, BUCKET_COUNT, MAX_TRACKABLE_US
+
+
+def test_bucket_layout():
+    """Every value falls in the bucket whose bounds contain it, within 12.5%"""
+    print("🪣 Testing bucket layout")
+
+    previous_upper = 0
+    for index in range(BUCKET_COUNT):
+        lower, upper = bucket_bounds(index)
+        assert lower == previous_upper, (index, lower, previous_upper)
+        previous_upper = upper
+
+    rng = random.Random(3)
+    values = list(range(200)) + [rng.randrange(1, 10 ** 9) for _ in range(5000)]
+    for value in values:
+        lower, upper = bucket_bounds(bucket_index(value))
+        assert lower <= value < upper, (value, lower, upper)
+        assert value < 16 or (upper - lower) / lower <= 0.125
+    assert bucket_index(MAX_TRACKABLE_US * 4) == BUCKET_COUNT - 1
+    print(f"   ✅ {BUCKET_COUNT} contiguous buckets")
+
+
+def test_percentiles():
+    """Percentiles match the exact ones up to the bucket resolution"""
+    print("📈 Testing percentiles")
+
+    registry = MetricsRegistry()
+    rng = random.Random(5)
+    samples = sorted(int(rng.lognormvariate(7, 1)) for _ in range(20000))
+    for value in samples:
+        registry.record("intent_scoring", value, value // 2)
+
+    wall = registry.snapshot()["intent_scoring"]["wall_ms"]
+    for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        exact_ms = samples[int(fraction * len(samples)) - 1] / 1000
+        assert exact_ms <= wall[name] <= exact_ms * 1.13 + 0.002, (name, exact_ms, wall[name])
+    print(f"   ✅ {wall}")
+
+
+def test_threads_merge():
+    """Samples recorded by many threads all show up in one merged histogram"""
+    print("🧵 Testing per-thread shards")
+
+    registry = MetricsRegistry()
+
+    def worker():
+        for _ in range(1000):
+            with registry.stage("sqlite_write"):
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert registry.snapshot()["sqlite_write"]["count"] == 8000
+    assert len(registry._shards) == 8
+    registry.reset()
+    assert registry.snapshot() == {}
+    print("   ✅ 8000 samples from 8 threads")
+
+
+def test_prometheus_format():
+    """Bucket counts are cumulative and end with +Inf == _count"""
+    print("📝 Testing Prometheus exposition")
+
+    registry = MetricsRegistry()
+    for wall_us in (50, 800, 3000, 3000, 40000, 20_000_000):
+        registry.record("product_search", wall_us, 10)
+
+    text = registry.render_prometheus()
+    lines = [line for line in text.splitlines()
+             if line.startswith('chatbot_stage_wall_seconds_bucket{stage="product_search"')]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in lines]
+    assert counts == sorted(counts)
+    assert lines[-1].endswith('le="+Inf"} 6')
+    assert 'chatbot_stage_wall_seconds_bucket{stage="product_search",le="0.0001"} 1' in text
+    assert 'chatbot_stage_wall_seconds_bucket{stage="product_search",le="0.005"} 4' in text
+    assert 'chatbot_stage_wall_seconds_bucket{stage="product_search",le="10.0"} 5' in text
+    assert 'chatbot_stage_cpu_seconds_count{stage="product_search"} 6' in text
+    assert "# TYPE chatbot_stage_wall_seconds histogram" in text
+    print(f"   ✅ {len(text.splitlines())} lines")
+
+
+def test_disabled_registry():
+    """A disabled registry records nothing"""
+    print("🔕 Testing disabled metrics")
+
+    registry = MetricsRegistry(enabled=False)
+    with registry.stage("serialization"):
+        pass
+    assert registry.snapshot() == {}
+    print("   ✅ No samples")
+
+
+def test_pipeline_stages():
+    """process_message reports every pipeline stage"""
+    print("🤖 Testing chat pipeline instrumentation")
+
+    from metrics import metrics
+    from intelligent_chatbot import intelligent_chatbot
+    from conversation_memory import conversation_memory
+
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as directory:
+        conversation_memory.open_database(os.path.join(directory, "memory.db"))
+        try:
+            intelligent_chatbot.process_message("metrics_test_user", "je cherche un cadeau pour ma fille")
+        finally:
+            conversation_memory.close_database()
+    stages = metrics.snapshot()
+    for stage in ("intent_detection", "intent_scoring", "context_fetch", "context_merge",
+                  "response_generation", "product_search", "persistence", "sqlite_write"):
+        assert stage in stages, (stage, sorted(stages))
+    summary = ", ".join(f"{name}={value['wall_ms']['p50']}ms" for name, value in stages.items())
+    print(f"   ✅ {summary}")
+
+
+def test_overhead():
+    """A timed block costs a few microseconds"""
+    print("⏱️ Testing timer overhead")
+
+    registry = MetricsRegistry()
+    start = time.perf_counter()
+    for _ in range(50000):
+        with registry.stage("context_merge"):
+            pass
+    per_call_us = (time.perf_counter() - start) / 50000 * 1e6
+    assert per_call_us < 50
+    print(f"   ✅ {per_call_us:.2f} µs per stage")
+
+
+if __name__ == "__main__":
+    print("🚀 Pipeline Metrics Tests")
+    print("=" * 50)
+    test_bucket_layout()
+    test_percentiles()
+    test_threads_merge()
+    test_prometheus_format()
+    test_disabled_registry()
+    test_pipeline_stages()
+    test_overhead()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for product relevance ranking
+Checks top-k selection, budget preference and exposed weights
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from database import ProductDatabase
+from product_ranking import ProductRanker, RANKING_WEIGHTS
+
+
+def test_top_k_prefers_budget_and_tags():
+    """Products close to the budget and sharing context tags come first"""
+    print("🏆 Testing top-k ranking")
+
+    db = ProductDatabase()
+    ranker = ProductRanker(db)
+    context = {"recipient": "fille", "occasion": "cadeau", "max_price": 40}
+    candidates = [p["id"] for p in db.complex_search(gender="fille", age_group="enfant")]
+
+    ranked = ranker.top_k(candidates, context, 3)
+    scores = [ranker.score(p, context, 1.0, ranker.context_tags(context)) for p in ranked]
+
+    assert len(ranked) == 3
+    assert scores == sorted(scores, reverse=True)
+    assert all(p["price"] <= 40 for p in ranked)
+    print(f"   ✅ {[p['name'] for p in ranked]}")
+
+
+def test_alternatives_fill_up_to_k():
+    """Alternatives start with partial matches and are completed from the catalog"""
+    print("🔁 Testing alternatives")
+
+    db = ProductDatabase()
+    ranker = ProductRanker(db)
+    result = db.relaxed_search({"color": "vert", "category": "casquette"}, [])
+
+    alternatives = ranker.alternatives(result.partial_ids, {"color": "vert"}, 6)
+    ids = [p["id"] for p in alternatives]
+
+    assert len(ids) == 6 and len(set(ids)) == 6
+    assert set(result.partial_ids) <= set(ids)
+    print(f"   ✅ {ids}")
+
+
+def test_weights_are_exposed():
+    """The chatbot exposes the ranking weights in context_used"""
+    print("⚖️ Testing exposed weights")
+
+    from intelligent_chatbot import intelligent_chatbot
+
+    context = intelligent_chatbot.with_ranking_weights({"color": "bleu"})
+    assert context["ranking_weights"] == RANKING_WEIGHTS
+    assert context["color"] == "bleu"
+    print(f"   ✅ {context['ranking_weights']}")
+
+
+if __name__ == "__main__":
+    print("🚀 Product Ranking Tests")
+    print("=" * 50)
+    test_top_k_prefers_budget_and_tags()
+    test_alternatives_fill_up_to_k()
+    test_weights_are_exposed()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the similar products index
+Checks neighbor lists and their incremental maintenance
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from database import ProductDatabase
+from product_similarity import SimilarityIndex
+
+
+def test_neighbors_are_similar():
+    """Neighbors of a cap start with the other cap"""
+    print("🧭 Testing neighbor lists")
+
+    db = ProductDatabase()
+    index = SimilarityIndex(db, k=5)
+
+    similar = index.get_similar_ids(1)
+    assert similar[0] == 2
+    assert 1 not in similar and len(similar) == 5
+    print(f"   ✅ Similar to 1: {similar}")
+
+
+def test_incremental_updates_match_rebuild():
+    """Adding, updating and removing products keeps lists equal to a full rebuild"""
+    print("♻️ Testing incremental updates")
+
+    db = ProductDatabase()
+    index = SimilarityIndex(db, k=4)
+    index.build()
+
+    db.add_product({**db.get_product_by_id(6), "id": 31, "name": "Collier Rose", "color": "rose"})
+    db.update_product(12, color="bleu", price=20.0)
+    db.remove_product(2)
+
+    rebuilt = SimilarityIndex(db, k=4)
+    rebuilt.build()
+
+    for product in db.get_all_products():
+        assert index.get_similar_ids(product["id"]) == rebuilt.get_similar_ids(product["id"]), product["id"]
+    assert index.get_similar_ids(2) == []
+    print("   ✅ Incremental lists match a full rebuild")
+
+
+if __name__ == "__main__":
+    print("🚀 Similar Products Index Tests")
+    print("=" * 50)
+    test_neighbors_are_similar()
+    test_incremental_updates_match_rebuild()
+    print("\n✅ All tests passed!")
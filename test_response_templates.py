@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for precompiled response templates
+Checks rendering, composition, the compact encoding and storage of chatbot replies
+"""
+
+import sys
+import os
+import gzip
+import json
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+
+from conversation_memory import ConversationMemory, ConversationTurn
+from memory_maintenance import MemoryMaintenance, RetentionPolicy
+from response_templates import Response, TemplateStore, template, templates, text, EMPTY, PLAIN
+
+SEARCH = template("\n\n📋 Critères: {criteria:, }")
+FOUND = template("\n\n✨ J'ai trouvé {count} produit(s) correspondant !")
+INTRO = text("🎯 Excellente question ! Laissez-moi vous montrer nos meilleures options...")
+
+
+def search_reply(count: int = 12) -> Response:
+    return INTRO + SEARCH(criteria=("pour fille", "budget 30 DT")) + FOUND(count=count)
+
+
+def test_render():
+    """Fields are joined, formatted or rendered as given"""
+    print("🧩 Testing rendering")
+
+    assert str(search_reply()) == ("🎯 Excellente question ! Laissez-moi vous montrer nos meilleures options..."
+                                   "\n\n📋 Critères: pour fille, budget 30 DT"
+                                   "\n\n✨ J'ai trouvé 12 produit(s) correspondant !")
+    confidence = template("({intent}) avec {confidence:.1%} de confiance")
+    assert str(confidence(intent="greeting", confidence=0.8512)) == "(greeting) avec 85.1% de confiance"
+    twice = template("{name} et {name}")
+    assert twice.names == ("name",) and str(twice(name="Ana")) == "Ana et Ana"
+    assert template("{count}") is template("{count}")
+    assert templates(["a", "b"]) == (template("a"), template("b"))
+    try:
+        template("{}")
+        assert False, "positional fields should be rejected"
+    except ValueError:
+        pass
+    print("   ✅ Joined lists, format specs and repeated fields render")
+
+
+def test_composition():
+    """Replies concatenate; plain strings stay parameters of PLAIN"""
+    print("➕ Testing composition")
+
+    reply = EMPTY + INTRO
+    assert reply == INTRO and str(EMPTY) == ""
+    mixed = "Bonjour " + INTRO + " merci"
+    assert isinstance(mixed, Response)
+    assert str(mixed) == "Bonjour " + str(INTRO) + " merci"
+    assert [current for current, _ in mixed.parts()] == [PLAIN, template(str(INTRO)), PLAIN]
+    assert "Bonjour " not in [current.source for current, _ in mixed.parts()]
+    print(f"   ✅ {mixed!r}")
+
+
+def test_store_round_trip():
+    """Encoded replies decode equal, in a new store on the same database too"""
+    print("🔁 Testing encode/decode")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        store = TemplateStore(db_path)
+        reply = search_reply() + "note libre"
+        blob = store.encode(reply)
+        assert store.decode(blob) == reply
+
+        other = TemplateStore(db_path)
+        assert other.decode(blob) == reply and str(other.decode(blob)) == str(reply)
+        with sqlite3.connect(db_path) as conn:
+            stored = conn.execute("SELECT COUNT(*) FROM response_templates").fetchone()[0]
+        assert stored == 4  # INTRO, SEARCH, FOUND and PLAIN
+
+        # Ids interned by another process are picked up on decode
+        late = TemplateStore(db_path)
+        newer = store.encode(text("ajouté plus tard"))
+        assert str(late.decode(newer)) == "ajouté plus tard"
+        assert len(blob) < len(str(reply).encode("utf-8")) / 2
+    print(f"   ✅ {len(blob)} bytes instead of {len(str(reply).encode('utf-8'))}")
+
+
+def test_conversation_storage():
+    """Conversation memory stores replies as blobs and reloads them rendered identically"""
+    print("🗄️ Testing conversation storage")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        memory = ConversationMemory(db_path=db_path)
+        now = datetime.now().replace(microsecond=0)
+        memory.add_conversation_turn(ConversationTurn(
+            user_id="alice", message="robe pour ma fille", intent="product_search", confidence=0.9,
+            context_data={"recipient": "fille"}, response=search_reply(), timestamp=now
+        ))
+        memory.add_conversation_turn(ConversationTurn(
+            user_id="alice", message="merci", intent="farewell", confidence=0.9,
+            context_data={}, response="👋 Au revoir !", timestamp=now + timedelta(seconds=1)
+        ))
+        with sqlite3.connect(db_path) as conn:
+            stored = [row[0] for row in conn.execute("SELECT response FROM conversations ORDER BY id")]
+        assert isinstance(stored[0], bytes) and stored[1] == "👋 Au revoir !"
+
+        history = ConversationMemory(db_path=db_path).get_conversation_history("alice")
+        assert [turn.response for turn in history] == [str(search_reply()), "👋 Au revoir !"]
+        assert history[0].to_dict()["response"] == str(search_reply())
+    print(f"   ✅ {len(stored[0])} byte blob reloaded")
+
+
+def test_archive_renders_text():
+    """Archived turns carry the rendered reply"""
+    print("📦 Testing archive")
+
+    now = datetime(2026, 6, 1, 12, 0)
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        memory = ConversationMemory(db_path=db_path)
+        memory.save_conversation_turn(ConversationTurn(
+            user_id="bob", message="sac bleu", intent="product_search", confidence=0.8,
+            context_data={"color": "bleu"}, response=search_reply(3), timestamp=now - timedelta(days=200)
+        ))
+        maintenance = MemoryMaintenance(db_path, policies=[RetentionPolicy("conversations", "timestamp", 90)],
+                                        archive_dir=os.path.join(directory, "archives"), pause=0)
+        result = maintenance.run(now=now)["tables"]["conversations"]
+        with gzip.open(result["archive"], "rt", encoding="utf-8") as archive:
+            records = [json.loads(line) for line in archive]
+        assert [record["response"] for record in records] == [str(search_reply(3))]
+    print("   ✅ Archived reply rendered")
+
+
+if __name__ == "__main__":
+    print("🚀 Response Template Tests")
+    print("=" * 50)
+    test_render()
+    test_composition()
+    test_store_round_trip()
+    test_conversation_storage()
+    test_archive_renders_text()
+    print("\n✅ All tests passed!")
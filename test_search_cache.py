@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests du cache de résultats de recherche produits
+Vérifie les clés normalisées, le repli en cache et l'invalidation par version
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from database import ProductDatabase
+from search_cache import canonicalize_criteria
+
+
+def test_canonical_key():
+    """Deux critères équivalents donnent la même clé"""
+    print("🔑 Test des clés normalisées")
+
+    key1 = canonicalize_criteria({"gender": "Fille", "age_group": "enfant", "max_price": 30})
+    key2 = canonicalize_criteria({"max_price": 30.0, "age_group": "enfant ", "gender": "fille", "color": None})
+
+    assert key1 == key2
+    print(f"   ✅ {key1}")
+
+
+def test_cache_hits():
+    """Les recherches répétées sont servies par le cache"""
+    print("📦 Test des hits du cache")
+
+    db = ProductDatabase()
+    criteria = {"gender": "fille", "age_group": "enfant", "max_price": 30}
+
+    first = db.cached_search(**criteria)
+    second = db.cached_search(**criteria)
+
+    assert [p["id"] for p in first] == [p["id"] for p in db.complex_search(**criteria)]
+    assert first == second
+
+    stats = db.search_cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    print(f"   ✅ Hit rate: {stats['hit_rate']:.0%}")
+
+
+def test_relaxation_chain():
+    """La chaîne de repli est calculée une fois puis réutilisée"""
+    print("🔄 Test de la chaîne de repli")
+
+    db = ProductDatabase()
+    criteria = {"color": "vert", "category": "bijoux", "age_group": "adulte"}
+
+    result = db.search_with_relaxation(criteria, ["color", "category", "age_group"])
+    products, relaxed = db.resolve(result), result.relaxed
+    assert products and relaxed == ("color",)
+
+    db.search_with_relaxation(criteria, ["color", "category", "age_group"])
+    assert db.search_cache.get_stats()["hits"] == 1
+    print(f"   ✅ Critère retiré: {relaxed}, {len(products)} produit(s)")
+
+
+def test_single_pass_matches_successive_searches():
+    """Le repli en un passage donne les mêmes paliers que les recherches successives"""
+    print("🧮 Test du repli en un seul passage")
+
+    db = ProductDatabase()
+    relax_order = ["color", "category", "age_group"]
+    checked = 0
+
+    for color in [None, "bleu", "vert", "rouge"]:
+        for category in [None, "bijoux", "jouets", "sacs"]:
+            for max_price in [None, 20, 60]:
+                for gender, age_group in [(None, None), ("fille", "enfant"), ("homme", "adulte")]:
+                    criteria = {k: v for k, v in {
+                        "color": color, "category": category, "max_price": max_price,
+                        "gender": gender, "age_group": age_group
+                    }.items() if v}
+
+                    expected = db.complex_search(**criteria)
+                    expected_relaxed = ()
+                    if not expected and len(criteria) > 1:
+                        for key in relax_order:
+                            if key in criteria:
+                                reduced = {k: v for k, v in criteria.items() if k != key}
+                                expected = db.complex_search(**reduced)
+                                if expected:
+                                    expected_relaxed = (key,)
+                                    break
+
+                    result = db.relaxed_search(criteria, relax_order)
+                    assert db.resolve(result) == expected, criteria
+                    assert result.relaxed == expected_relaxed, criteria
+                    checked += 1
+
+    print(f"   ✅ {checked} combinaisons vérifiées")
+
+
+def test_invalidation_on_catalog_change():
+    """Une modification du catalogue invalide le cache"""
+    print("♻️ Test de l'invalidation")
+
+    db = ProductDatabase()
+    before = db.cached_search(color="vert")
+
+    db.update_product(1, color="vert")
+    after = db.cached_search(color="vert")
+
+    assert len(after) == len(before) + 1
+    assert db.search_cache.get_stats()["invalidations"] == 1
+    print(f"   ✅ Version du catalogue: {db.catalog_version}")
+
+
+if __name__ == "__main__":
+    print("🚀 Tests du cache de recherche")
+    print("=" * 50)
+    test_canonical_key()
+    test_cache_hits()
+    test_relaxation_chain()
+    test_single_pass_matches_successive_searches()
+    test_invalidation_on_catalog_change()
+    print("\n✅ Tous les tests sont passés !")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Tests for fast startup
+Checks the startup cache, deferred history loading and the warm-up readiness state
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+
+from startup_cache import StartupCache, digest
+from conversation_memory import ConversationMemory, ConversationTurn, open_memories
+from database import ProductDatabase
+from readiness import Readiness
+
+
+def make_turn(user_id: str, index: int, when: datetime) -> ConversationTurn:
+    return ConversationTurn(user_id=user_id, message=f"message {index}", intent="product_search",
+                            confidence=0.8, context_data={"color": "rouge"}, response=f"réponse {index}",
+                            timestamp=when)
+
+
+def test_startup_cache():
+    """Entries are built once per key, replaced on a new key and rebuilt when unreadable"""
+    print("📦 Testing startup cache")
+
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"words": ["casquette", "montre"]}
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = StartupCache(directory)
+        key = digest({"intent": ("cadeau",)}, "catalog-1")
+        assert cache.cached("typo", key, build) == {"words": ["casquette", "montre"]}
+        assert StartupCache(directory).cached("typo", key, build) == {"words": ["casquette", "montre"]}
+        assert len(builds) == 1
+
+        other = digest({"intent": ("cadeau", "offrir")}, "catalog-1")
+        assert other != key and digest({"intent": ("cadeau",)}, "catalog-1") == key
+        cache.cached("typo", other, build)
+        assert len(builds) == 2 and os.listdir(directory) == [os.path.basename(cache.path("typo", other))]
+
+        with open(cache.path("typo", other), "wb") as handle:
+            handle.write(b"not a pickle")
+        cache.cached("typo", other, build)
+        assert len(builds) == 3
+        stats = cache.get_stats()["entries"]["typo"]
+        assert stats["hits"] == 0 and stats["misses"] == 3
+
+        disabled = StartupCache(directory, enabled=False)
+        disabled.cached("typo", other, build)
+        assert len(builds) == 4 and cache.clear() == 1
+    print("   ✅ Built once per key, rebuilt when invalid")
+
+
+def test_catalog_fingerprint():
+    """The fingerprint follows catalog changes"""
+    print("🔏 Testing catalog fingerprint")
+
+    db = ProductDatabase()
+    first = db.catalog_fingerprint()
+    assert ProductDatabase().catalog_fingerprint() == first
+    db.update_product(1, price=19.0)
+    assert db.catalog_fingerprint() != first
+    print(f"   ✅ {first[:12]} -> {db.catalog_fingerprint()[:12]}")
+
+
+def test_deferred_history():
+    """Without preload, a user's recent turns are read on first access, in order"""
+    print("💤 Testing deferred history")
+
+    now = datetime.now().replace(microsecond=0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "memory.db")
+        memory = ConversationMemory(db_path=path, memory_limit=3)
+        for user_id in ("alice", "bob"):
+            for index in range(5):
+                memory.add_conversation_turn(make_turn(user_id, index, now - timedelta(minutes=10 - index)))
+        memory.add_conversation_turn(make_turn("carol", 0, now - timedelta(days=30)))
+
+        eager = ConversationMemory(db_path=path, memory_limit=3)
+        lazy = ConversationMemory(db_path=path, memory_limit=3, preload=False)
+        assert eager.history_preloaded and not lazy.history_preloaded
+        assert lazy.user_conversations == {}
+        assert lazy.get_conversation_history("alice") == eager.get_conversation_history("alice")
+        assert [turn.message for turn in lazy.get_conversation_history("alice")] == [
+            "message 2", "message 3", "message 4"]
+        assert lazy.get_conversation_history("carol") == []
+
+        # A new turn goes after the persisted ones
+        lazy.add_conversation_turn(make_turn("bob", 5, now))
+        assert [turn.message for turn in lazy.get_conversation_history("bob")] == [
+            "message 3", "message 4", "message 5"]
+        assert list(lazy.user_conversations) == ["alice", "bob"]
+    print("   ✅ Loaded per user on first access")
+
+
+def test_database_lifecycle():
+    """An opened database keeps its file when the directory changes, and is flushed once"""
+    print("📂 Testing database lifecycle")
+
+    previous_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(unknown_flush_interval=3600)
+        assert memory not in open_memories
+        os.chdir(directory)
+        try:
+            memory.open_database("memory.db")
+            memory.open_database("memory.db")
+        finally:
+            os.chdir(previous_directory)
+        path = os.path.join(directory, "memory.db")
+        assert memory.db_path == os.path.abspath(path) and memory in open_memories
+
+        memory.log_unknown_query("quel temps fait-il")
+        memory.close_database()
+        assert memory not in open_memories and memory.db_path is None
+        assert not os.path.exists("memory.db")
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT frequency FROM unknown_queries").fetchall() == [(1,)]
+    print("   ✅ Absolute path, flushed on close instead of at exit")
+
+
+def test_background_preload():
+    """The preload skips users already loaded or cleared, then marks the history complete"""
+    print("🔄 Testing background preload")
+
+    now = datetime.now().replace(microsecond=0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "memory.db")
+        memory = ConversationMemory(db_path=path, memory_limit=3)
+        for user_index in range(12):
+            for index in range(4):
+                memory.add_conversation_turn(make_turn(f"user{user_index:02d}", index,
+                                                       now - timedelta(minutes=10 - index)))
+
+        lazy = ConversationMemory(db_path=path, memory_limit=3, preload=False)
+        lazy.add_conversation_turn(make_turn("user03", 4, now))
+        lazy.clear_user_data("user05")
+        lazy.load_recent_conversations(batch_size=5)
+
+        assert lazy.history_preloaded and len(lazy.user_conversations) == 11
+        assert "user05" not in lazy.user_conversations
+        assert [turn.message for turn in lazy.get_conversation_history("user03")] == [
+            "message 2", "message 3", "message 4"]
+        assert lazy.user_conversations["user07"] == memory.user_conversations["user07"]
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM conversations WHERE user_id = 'user05'").fetchone()[0] == 0
+    print(f"   ✅ {len(lazy.user_conversations)} users preloaded")
+
+
+def test_readiness():
+    """Steps run in order; a failing step is reported without blocking readiness"""
+    print("🚦 Testing readiness")
+
+    calls = []
+    readiness = Readiness()
+    readiness.add_step("history", lambda: calls.append("history"))
+    readiness.add_step("broken", lambda: 1 / 0)
+    readiness.add_step("indexes", lambda: calls.append("indexes"))
+    status = readiness.get_status()
+    assert not status["ready"] and status["steps"]["history"] == {"pending": True}
+
+    thread = readiness.start()
+    assert readiness.start() is thread and readiness.wait(5)
+    status = readiness.get_status()
+    assert calls == ["history", "indexes"]
+    assert status["ready"] and status["state"] == "degraded"
+    assert not status["steps"]["broken"]["ok"] and "division" in status["steps"]["broken"]["error"]
+    assert status["ready_after_ms"] >= 0
+    print(f"   ✅ {status['state']} after {status['ready_after_ms']} ms")
+
+
+if __name__ == "__main__":
+    print("🚀 Startup Tests")
+    print("=" * 50)
+    test_startup_cache()
+    test_catalog_fingerprint()
+    test_deferred_history()
+    test_database_lifecycle()
+    test_background_preload()
+    test_readiness()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Tests for shared state backends
+Checks the backend contract, concurrent updates and two workers sharing sessions,
+preferences and conversation context
+"""
+
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+
+from state_backend import (InMemoryStateBackend, SQLiteStateBackend, KeyValueStateBackend,
+                           KeyValueClient, key_value_server, create_backend)
+from conversation_memory import ConversationMemory, ConversationTurn
+from chatbot_logic import SmartSalesAssistant, MAX_SESSION_HISTORY
+
+
+AUTHKEY = b"test-state-secret"
+
+
+def start_key_value_server(authkey=AUTHKEY):
+    """A key-value server on a free port, served by a daemon thread"""
+    server = key_value_server(port=0, authkey=authkey)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.address
+
+
+def make_turn(user_id: str, index: int, when: datetime, **context) -> ConversationTurn:
+    return ConversationTurn(user_id=user_id, message=f"message {index}", intent="product_search",
+                            confidence=0.8, context_data=context, response=f"réponse {index}",
+                            timestamp=when)
+
+
+def check_contract(backend):
+    assert backend.get("sessions", "alice") is None
+    session = {"context": {"color": "rouge", "max_price": 30.0}, "last_questions": ["Pour qui ?"]}
+    backend.put("sessions", "alice", session)
+    stored = backend.get("sessions", "alice")
+    assert stored == session
+    stored["context"]["color"] = "bleu"
+    assert backend.get("sessions", "alice")["context"]["color"] == "rouge"
+    assert backend.get("preferences", "alice") is None
+
+    assert backend.update("counters", "alice", lambda value: (value or 0) + 1) == 1
+    assert backend.update("counters", "alice", lambda value: value + 1) == 2
+    assert backend.update("counters", "alice", lambda value: None) is None
+    assert backend.get("counters", "alice") is None
+
+    backend.delete("sessions", "alice")
+    backend.delete("sessions", "alice")
+    assert backend.get("sessions", "alice") is None
+
+
+def test_backend_contract():
+    """Every backend stores copies of JSON values by namespace and key"""
+    print("🗄️ Testing backend contract")
+
+    host, port = start_key_value_server()
+    with tempfile.TemporaryDirectory() as directory:
+        backends = [InMemoryStateBackend(), SQLiteStateBackend(os.path.join(directory, "state.db")),
+                    KeyValueStateBackend(host, port, AUTHKEY)]
+        for backend in backends:
+            check_contract(backend)
+            stats = backend.get_stats()
+            assert stats["keys"] == 0 and stats["writes"] == 4
+        assert [backend.shared for backend in backends] == [False, True, True]
+    print("   ✅ memory, sqlite and key-value backends agree")
+
+
+def test_concurrent_updates():
+    """Concurrent read-modify-writes of one key from several workers lose nothing"""
+    print("🔀 Testing concurrent updates")
+
+    host, port = start_key_value_server()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.db")
+        for make_backend in (lambda: SQLiteStateBackend(path), lambda: KeyValueStateBackend(host, port, AUTHKEY)):
+            # One backend per thread, as each worker process has its own
+            workers = [make_backend() for _ in range(4)]
+
+            def increment(backend):
+                for _ in range(50):
+                    backend.update("counters", "shared", lambda value: (value or 0) + 1)
+
+            threads = [threading.Thread(target=increment, args=(backend,)) for backend in workers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert workers[0].get("counters", "shared") == 200
+            conflicts = sum(backend.get_stats()["conflicts"] for backend in workers)
+            print(f"   ✅ {type(workers[0]).__name__}: 200 increments, {conflicts} retried")
+
+
+def test_shared_conversation_memory():
+    """Two workers see each other's turns and preferences, in order and capped"""
+    print("👥 Testing shared conversation memory")
+
+    now = datetime.now().replace(microsecond=0)
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        state_path = os.path.join(directory, "state.db")
+        first = ConversationMemory(db_path=db_path, memory_limit=3, state=SQLiteStateBackend(state_path))
+        second = ConversationMemory(db_path=db_path, memory_limit=3, state=SQLiteStateBackend(state_path))
+        assert first.history_preloaded and first.shared_state is not None
+
+        for index in range(5):
+            worker = first if index % 2 == 0 else second
+            worker.add_conversation_turn(make_turn("alice", index, now + timedelta(seconds=index),
+                                                   color="rouge", recipient="fille" if index else None))
+        history = second.get_conversation_history("alice")
+        assert [turn.message for turn in history] == ["message 2", "message 3", "message 4"]
+        assert history == first.get_conversation_history("alice") and all(turn.turn_id for turn in history)
+        assert first.get_conversation_context("alice")["recipient"] == "fille"
+        assert second.get_user_preferences("alice") == {"color": {"value": "rouge", "frequency": 5},
+                                                        "recipient": {"value": "fille", "frequency": 4}}
+        assert first.user_conversations == {} and first.user_preferences == {}
+
+        # Pages continue from the shared turns into SQLite
+        page, cursor = first.get_history_page("alice", limit=4)
+        older, end = first.get_history_page("alice", limit=4, cursor=cursor)
+        assert [turn.message for turn in page + older] == [f"message {index}" for index in range(4, -1, -1)]
+        assert end is None
+
+        second.clear_user_data("alice")
+        assert first.get_conversation_history("alice") == [] and first.get_user_preferences("alice") == {}
+    print("   ✅ Turns written by either worker are read by both")
+
+
+def test_history_seeded_from_database():
+    """Turns persisted before the backend was deployed start the shared history"""
+    print("🌱 Testing shared history seeding")
+
+    now = datetime.now().replace(microsecond=0)
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "memory.db")
+        local = ConversationMemory(db_path=db_path, memory_limit=3)
+        for index in range(2):
+            local.add_conversation_turn(make_turn("bob", index, now + timedelta(seconds=index)))
+
+        shared = ConversationMemory(db_path=db_path, memory_limit=3,
+                                    state=SQLiteStateBackend(os.path.join(directory, "state.db")))
+        assert [turn.message for turn in shared.get_conversation_history("bob")] == ["message 0", "message 1"]
+        shared.add_conversation_turn(make_turn("bob", 2, now + timedelta(seconds=2)))
+        shared.add_conversation_turn(make_turn("bob", 3, now + timedelta(seconds=3)))
+        assert [record["message"] for record in shared.shared_state.get("history", "bob")] == [
+            "message 1", "message 2", "message 3"]
+    print("   ✅ Persisted turns carried into the backend")
+
+
+def test_shared_sales_sessions():
+    """A sales session continues on whichever worker gets the next message"""
+    print("🛍️ Testing shared sales sessions")
+
+    host, port = start_key_value_server()
+    workers = [SmartSalesAssistant(state=KeyValueStateBackend(host, port, AUTHKEY)) for _ in range(2)]
+    local = SmartSalesAssistant()
+    messages = ["Je cherche un cadeau", "pour ma fille", "en rouge"]
+    for index, message in enumerate(messages):
+        shared_result = workers[index % 2].generate_smart_response(message, "carol")
+        local_result = local.generate_smart_response(message, "carol")
+        assert shared_result["criteria"] == local_result["criteria"]
+        assert bool(shared_result["products"]) == bool(local_result["products"])
+
+    session = workers[0].shared_state.get("sessions", "carol")
+    assert session["context"] == local.user_sessions["carol"]["context"]
+    assert len(session["conversation_history"]) == 3
+    assert workers[0].user_sessions == {} and workers[1].user_sessions == {}
+    print(f"   ✅ Criteria after 3 messages on 2 workers: {session['context']}")
+
+
+def test_concurrent_sales_messages():
+    """Messages of one session handled at once by two workers are all kept"""
+    print("🏁 Testing concurrent sales messages")
+
+    host, port = start_key_value_server()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.db")
+        for make_backend in (lambda: SQLiteStateBackend(path), lambda: KeyValueStateBackend(host, port, AUTHKEY)):
+            workers = [SmartSalesAssistant(state=make_backend()) for _ in range(2)]
+
+            def send(worker, messages):
+                for message in messages:
+                    worker.generate_smart_response(message, "dave")
+
+            threads = [threading.Thread(target=send, args=(worker, [f"un sac {color}"] * 6))
+                       for worker, color in zip(workers, ["rouge", "bleu"])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            history = workers[0].shared_state.get("sessions", "dave")["conversation_history"]
+            assert len(history) == 12, len(history)
+            assert sorted(turn["user"] for turn in history) == ["un sac bleu"] * 6 + ["un sac rouge"] * 6
+
+            # The history is capped
+            send(workers[0], ["un sac noir"] * MAX_SESSION_HISTORY)
+            history = workers[1].shared_state.get("sessions", "dave")["conversation_history"]
+            assert len(history) == MAX_SESSION_HISTORY and history[-1]["user"] == "un sac noir"
+            print(f"   ✅ {type(workers[0].shared_state).__name__}: 12 of 12 messages kept, "
+                  f"history capped at {MAX_SESSION_HISTORY}")
+
+
+def test_create_backend():
+    """STATE_BACKEND values select the backend"""
+    print("⚙️ Testing backend configuration")
+
+    host, port = start_key_value_server()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.db")
+        assert isinstance(create_backend(None), InMemoryStateBackend)
+        assert isinstance(create_backend("memory"), InMemoryStateBackend)
+        assert create_backend(f"sqlite:{path}").db_path == path
+        os.environ["STATE_KV_AUTHKEY"] = AUTHKEY.decode()
+        try:
+            assert create_backend(f"kv://{host}:{port}").address == (host, port)
+        finally:
+            del os.environ["STATE_KV_AUTHKEY"]
+        try:
+            create_backend("redis://localhost")
+            assert False, "unknown backends should be rejected"
+        except ValueError:
+            pass
+    print("   ✅ memory, sqlite:<path> and kv://<host>:<port>")
+
+
+def test_key_value_authentication():
+    """Clients need the shared secret; remote hosts are never served without one"""
+    print("🔐 Testing key-value authentication")
+
+    host, port = start_key_value_server()
+    for authkey in (None, b"wrong-secret"):
+        try:
+            KeyValueStateBackend(host, port, authkey)
+            assert False, "the server should reject this client"
+        except PermissionError:
+            pass
+
+    # Only store operations can be called, with JSON values
+    client = KeyValueClient((host, port), AUTHKEY)
+    assert client.call("compare_and_set", "k", None, '"v"') is True and client.call("get", "k") == '"v"'
+    for op in ("__init__", "_values", "shutdown"):
+        try:
+            client.call(op)
+            assert False, f"{op} should not be callable"
+        except RuntimeError:
+            pass
+
+    # Without a secret, loopback only
+    open_host, open_port = start_key_value_server(authkey=None)
+    assert KeyValueStateBackend(open_host, open_port).get("sessions", "alice") is None
+    try:
+        key_value_server("0.0.0.0", 0)
+        assert False, "a non-loopback host needs STATE_KV_AUTHKEY"
+    except ValueError:
+        pass
+    print("   ✅ Bad secrets rejected, unauthenticated server limited to loopback")
+
+
+if __name__ == "__main__":
+    print("🚀 State Backend Tests")
+    print("=" * 50)
+    test_backend_contract()
+    test_concurrent_updates()
+    test_shared_conversation_memory()
+    test_history_seeded_from_database()
+    test_shared_sales_sessions()
+    test_concurrent_sales_messages()
+    test_create_backend()
+    test_key_value_authentication()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for message normalization
+Checks accent folding, single-pass phrase rewrites and folded keyword matching
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from text_normalizer import fold_text, collapse_whitespace, PhraseRewriter
+from intent_scorer import IntentScorer
+
+
+def test_fold_text():
+    """Case, accents and ligatures are folded, other symbols are kept"""
+    print("🔤 Testing accent folding")
+
+    assert fold_text("Ne DÉPASSE pas 40€") == "ne depasse pas 40€"
+    assert fold_text("Cœur de bébé") == "coeur de bebe"
+    assert collapse_whitespace("  un   sac \t bleu ") == "un sac bleu"
+    print("   ✅ Folding is correct")
+
+
+def test_rewrites_in_one_pass():
+    """Chained rewrites give the same result as rewriting until stable"""
+    print("🔁 Testing phrase rewrites")
+
+    rewriter = PhraseRewriter({
+        "cadeau a": "cadeau", "cadeau à": "cadeau", "comme un cadeau": "cadeau",
+        "pour ma": "pour", "ne dépasse pas": "maximum"
+    })
+    assert "cadeau à" not in rewriter.rewrites and rewriter.rewrites["cadeau a"] == "cadeau"
+    assert rewriter.rewrite("comme un cadeau a ma fille") == "cadeau ma fille"
+    assert rewriter.rewrite("ca ne depasse pas 40 dt") == "ca maximum 40 dt"
+    # Whole words only
+    assert rewriter.rewrite("pour maman") == "pour maman"
+    print("   ✅ Rewrites are correct")
+
+
+def test_accent_variants_match_keywords():
+    """Unaccented messages match accented keywords and extracted values"""
+    print("🎯 Testing folded keyword matching")
+
+    scorer = IntentScorer()
+    accented = scorer.detect_intents("Je veux un cadeau pour un garçon, pas chère")
+    plain = scorer.detect_intents("je veux un cadeau pour un garcon, pas chere")
+
+    assert [(s.intent, s.confidence) for s in accented] == [(s.intent, s.confidence) for s in plain]
+    assert plain[0].context_data["recipient"] == "garçon"
+    print(f"   ✅ {plain[0].intent} ({plain[0].confidence:.2f}), keywords: {plain[0].matched_keywords}")
+
+
+def test_short_keywords_match_words():
+    """Short folded keywords don't match inside other words ("âge" in "image")"""
+    print("🔤 Testing short keyword boundaries")
+
+    scorer = IntentScorer()
+    assert scorer.score_intent("une image", "age_info").confidence == 0.0
+    assert scorer.get_primary_intent("une image").intent == "unknown"
+    assert scorer.score_intent("il a quel âge", "age_info").matched_keywords == ["âge"]
+    assert scorer.score_intent("des âges variés", "age_info").matched_keywords == ["âge"]
+    assert scorer.score_intent("50dt max", "budget_info").matched_keywords == ["dt"]
+    assert scorer.score_intent("je l'adore", "recipient_info").matched_keywords == []
+
+    # The batch classifier applies the same rule
+    from batch_intent_classifier import BatchIntentClassifier
+    messages = ["une image", "des âges variés", "sacs en cuir", "hello"]
+    assert list(BatchIntentClassifier(scorer).classify(messages)) == [scorer.detect_intents(m) for m in messages]
+    print("   ✅ image ≠ âge, plurals and amounts still match")
+
+
+if __name__ == "__main__":
+    print("🚀 Text Normalization Tests")
+    print("=" * 50)
+    test_fold_text()
+    test_rewrites_in_one_pass()
+    test_accent_variants_match_keywords()
+    test_short_keywords_match_words()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the BM25 full-text product search
+Checks analysis, ranking, early termination and incremental updates
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), "benchmarks"))
+
+from database import ProductDatabase
+from text_search import ProductTextIndex, analyze
+from synthetic_catalog import build_synthetic_database
+
+
+def test_analyze_folds_and_stems():
+    """Accents, plurals and feminine endings are folded"""
+    print("🔤 Testing text analysis")
+
+    assert analyze("Casquettes Bleues ÉLÉGANTES") == analyze("casquette bleu elegant")
+    assert "pour" not in analyze("sac pour le bureau")
+    print(f"   ✅ {analyze('Sac en cuir pour le bureau')}")
+
+
+def test_search_finds_free_text():
+    """Free-text queries match name, description and tags"""
+    print("🔍 Testing free-text search")
+
+    index = ProductTextIndex(ProductDatabase())
+    hits = index.search("sac en cuir pour le bureau", 3)
+
+    assert hits[0][0] == 3
+    assert index.search("écouteurs sans fil", 1)[0][0] == 25
+    print(f"   ✅ {hits}")
+
+
+def test_early_termination_keeps_top_k():
+    """Max-score early termination returns the same top-k as exhaustive scoring"""
+    print("⏱️ Testing early termination")
+
+    index = ProductTextIndex(build_synthetic_database(3000))
+    index.build()
+    bm25 = index.index
+
+    for query in ["casquette bleu sport", "cadeau enfant doux", "lampe bureau moderne noir"]:
+        exhaustive = bm25.search(query, k=len(bm25.doc_keys))
+        top = bm25.search(query, k=5)
+        assert [score for _, score in top] == [score for _, score in exhaustive[:5]], query
+    print("   ✅ Same top-5 scores as exhaustive scoring")
+
+
+def test_incremental_updates():
+    """Added, updated and removed products are reflected immediately"""
+    print("♻️ Testing incremental updates")
+
+    db = ProductDatabase()
+    index = ProductTextIndex(db)
+    index.build()
+
+    db.add_product({**db.get_product_by_id(1), "id": 31, "name": "Trottinette Électrique",
+                    "description": "Trottinette pliable", "tags": ["mobilité"]})
+    db.update_product(15, name="Lampe de Chevet Noire")
+    db.remove_product(25)
+
+    assert index.search("trottinette", 1)[0][0] == 31
+    assert index.search("chevet", 1)[0][0] == 15
+    assert all(product_id != 25 for product_id, _ in index.search("écouteurs bluetooth", 5))
+    print(f"   ✅ {index.get_stats()}")
+
+
+if __name__ == "__main__":
+    print("🚀 BM25 Text Search Tests")
+    print("=" * 50)
+    test_analyze_folds_and_stems()
+    test_search_finds_free_text()
+    test_early_termination_keeps_top_k()
+    test_incremental_updates()
+    print("\n✅ All tests passed!")
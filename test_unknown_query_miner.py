@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for unknown-query mining
+Checks MinHash clustering, near-duplicate counting, bounded memory and patches
+"""
+
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(__file__))
+
+from conversation_memory import ConversationMemory
+from intent_scorer import IntentScorer, compile_snapshot
+from unknown_query_miner import MinHasher, UnknownQueryMiner, estimated_similarity, apply_patch
+
+UNKNOWN_QUERIES = [
+    "quels sont les frais de livraison", "frais de livraison vers sfax",
+    "frais de livraison pour sousse", "les frais de livraison",
+    "remboursement de ma commande", "remboursement commande annulee",
+    "je veux un remboursement commande", "merci pour tout"
+]
+
+
+def test_minhash_similarity():
+    """Similar shingle sets get similar signatures"""
+    print("#️⃣ Testing MinHash signatures")
+
+    hasher = MinHasher(num_perm=32)
+    first = hasher.signature(["frais", "livraison", "sfax", "frais livraison"])
+    same = hasher.signature(["livraison", "frais livraison", "sfax", "frais"])
+    other = hasher.signature(["remboursement", "commande", "remboursement commande"])
+
+    assert first == same and len(first) == 32
+    assert estimated_similarity(first, same) == 1.0
+    assert estimated_similarity(first, other) < 0.3
+    print(f"   ✅ unrelated similarity {estimated_similarity(first, other):.2f}")
+
+
+def test_clusters_from_database():
+    """Unknown queries streamed from SQLite group by topic"""
+    print("🗂️ Testing clustering")
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(db_path=os.path.join(directory, "memory.db"))
+        for message in UNKNOWN_QUERIES + ["frais de livraison vers sfax"]:
+            memory.log_unknown_query(message)
+
+        miner = UnknownQueryMiner(IntentScorer()).process(memory.iter_unknown_queries(batch_size=3))
+        top = miner.top_clusters(limit=2)
+        stats = miner.get_stats()
+
+        # "merci pour tout" has no content words and is skipped
+        assert stats["messages"] == len(UNKNOWN_QUERIES) - 1
+        assert all("livraison" in sample for sample in top[0].samples)
+        assert top[0].frequency == 5
+        assert "remboursement" in miner.extract_keywords(top[1])
+        print(f"   ✅ {stats}")
+
+
+def test_memory_is_bounded():
+    """Old, rare clusters are evicted once max_clusters is reached"""
+    print("📦 Testing bounded clusters")
+
+    miner = UnknownQueryMiner(IntentScorer(), max_clusters=20)
+    miner.process((f"produit inconnu reference{i} modele{i}", 1) for i in range(200))
+
+    assert len(miner.clusters) <= 20
+    assert miner.evicted > 0
+    assert sum(len(members) for members in miner.buckets.values()) <= len(miner.clusters) * miner.bands
+    print(f"   ✅ {miner.get_stats()}")
+
+
+def test_patch_applies_to_definitions():
+    """A mined patch produces a valid, higher-version definitions document"""
+    print("🩹 Testing patch generation")
+
+    scorer = IntentScorer()
+    miner = UnknownQueryMiner(scorer).process((message, 3) for message in UNKNOWN_QUERIES)
+    patch = miner.propose_patch(min_frequency=2)
+
+    assert patch["proposed_version"] == scorer.snapshot.version + 1
+    assert patch["clusters"]
+    keywords = {k for intent in patch["new_intents"].values() for k in intent["keywords"]}
+    keywords |= {k for added in patch["add_keywords"].values() for k in added}
+    assert "livraison" in keywords and "remboursement" in keywords
+
+    patched = apply_patch(scorer.snapshot.to_document(), patch)
+    snapshot = compile_snapshot(patched)
+    assert snapshot.version == patch["proposed_version"]
+    assert "livraison" not in scorer.snapshot.to_document()["intents"].get("gift_intent", {})["keywords"]
+    print(f"   ✅ {len(patch['add_keywords'])} intents extended, {len(patch['new_intents'])} new")
+
+
+if __name__ == "__main__":
+    print("🚀 Unknown Query Miner Tests")
+    print("=" * 50)
+    test_minhash_similarity()
+    test_clusters_from_database()
+    test_memory_is_bounded()
+    test_patch_applies_to_definitions()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,133 @@
+"""
+Text Normalization Helpers
+Case and accent folding with a precomputed translation table
+and single-pass phrase rewriting
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+
+def _build_accent_fold_table() -> Dict[int, str]:
+    """Map every accented Latin letter to its unaccented lowercase form"""
+    table = {}
+    for codepoint in range(0xC0, 0x250):
+        char = chr(codepoint)
+        decomposed = unicodedata.normalize("NFD", char)
+        base = "".join(c for c in decomposed if not unicodedata.combining(c))
+        if base != char and base.isascii():
+            table[codepoint] = base.lower()
+
+    # Ligatures and apostrophes commonly found in French text
+    table.update({
+        ord("œ"): "oe", ord("Œ"): "oe",
+        ord("æ"): "ae", ord("Æ"): "ae",
+        ord("ß"): "ss",
+        ord("’"): "'", ord("‘"): "'"
+    })
+    return table
+
+
+ACCENT_FOLD_TABLE = _build_accent_fold_table()
+
+NON_ASCII_RUN = re.compile(r"[^\x00-\x7f]+")
+
+
+def _fold_run(match: re.Match) -> str:
+    return match.group().translate(ACCENT_FOLD_TABLE)
+
+
+def fold_text(text: str) -> str:
+    """
+    Lowercase and strip accents with the translation table
+    Pure ASCII text skips translation, and otherwise only the non-ASCII
+    runs are translated (str.translate is slow on the whole string)
+    """
+    text = text.lower()
+    if text.isascii():
+        return text
+    return NON_ASCII_RUN.sub(_fold_run, text)
+
+
+def fold_pattern(pattern: str) -> str:
+    """Strip accents from a regex without lowercasing its escapes (\\d, \\s...)"""
+    return pattern.translate(ACCENT_FOLD_TABLE)
+
+
+def collapse_whitespace(text: str) -> str:
+    """Trim and collapse runs of whitespace into single spaces"""
+    return " ".join(text.split())
+
+
+class PhraseRewriter:
+    """
+    Applies a set of phrase rewrites with one compiled alternation
+    Phrases are folded, so accent variants need a single entry, and the
+    longest phrase wins when several start at the same position
+    """
+
+    def __init__(self, rewrites: Dict[str, str]):
+        self.rewrites: Dict[str, str] = {}
+        for old, new in rewrites.items():
+            self.rewrites.setdefault(fold_text(old), fold_text(new))
+
+        self.pattern = self._compile(self.rewrites)
+        if self.pattern is not None:
+            self._add_chained_phrases()
+            self.pattern = self._compile(self.rewrites)
+
+    @staticmethod
+    def _compile(rewrites: Dict[str, str]) -> Optional[re.Pattern]:
+        if not rewrites:
+            return None
+        alternatives = sorted(rewrites, key=len, reverse=True)
+        return re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, alternatives)) + r")(?!\w)")
+
+    def _add_chained_phrases(self):
+        """
+        A rewrite can produce text that starts or ends another phrase
+        ("comme un cadeau a" -> "cadeau a" -> "cadeau"). Such overlaps are
+        added as phrases of their own and every phrase maps to its final
+        rewrite, so a single scan gives the same result as rewriting until
+        nothing changes
+        """
+        def word_suffixes(text: str) -> List[str]:
+            words = text.split(" ")
+            return [" ".join(words[i:]) for i in range(len(words))]
+
+        phrases = list(self.rewrites.items())
+        chained = set()
+        for old, new in phrases:
+            if not new:
+                continue
+            for other, _ in phrases:
+                # The rewrite output ends with the beginning of another phrase
+                for suffix in word_suffixes(new):
+                    if other.startswith(suffix + " "):
+                        chained.add(old + other[len(suffix):])
+                # Another phrase ends with the beginning of the rewrite output
+                for suffix in word_suffixes(other)[1:]:
+                    if new == suffix or new.startswith(suffix + " "):
+                        chained.add(other[:-len(suffix)] + old)
+
+        for phrase in chained:
+            self.rewrites.setdefault(phrase, phrase)
+        for phrase in list(self.rewrites):
+            self.rewrites[phrase] = self._rewrite_until_stable(phrase)
+
+    def _rewrite_until_stable(self, text: str, max_passes: int = 4) -> str:
+        for _ in range(max_passes):
+            text, count = self.pattern.subn(self._replace, text)
+            if not count:
+                break
+        return text
+
+    def _replace(self, match: re.Match) -> str:
+        return self.rewrites[match.group()]
+
+    def rewrite(self, text: str) -> str:
+        """Rewrite a folded text in a single scan"""
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._replace, text)
@@ -0,0 +1,292 @@
+"""
+Full-Text Product Search
+BM25 inverted index over product name, description and tags
+"""
+
+import heapq
+import math
+import re
+from array import array
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+from database import product_db, ProductDatabase
+from text_normalizer import fold_text
+from startup_cache import startup_cache, digest, source_digest
+
+
+# Words ignored by the index (already accent-folded)
+FRENCH_STOPWORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "cet", "cette", "dans", "de", "des", "du",
+    "elle", "en", "et", "il", "je", "la", "le", "les", "leur", "ma", "mes", "mon",
+    "ne", "ou", "par", "pas", "pour", "que", "qui", "sa", "se", "ses", "son", "sur",
+    "ta", "te", "tes", "ton", "tu", "un", "une", "vous", "veux", "cherche", "voudrais",
+    "quelque", "chose", "besoin", "est", "c", "d", "j", "l", "m", "n", "qu", "s", "t"
+}
+
+# Weight of each product field in term frequencies
+FIELD_WEIGHTS = {"name": 2.0, "tags": 1.5, "description": 1.0}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def light_stem(word: str) -> str:
+    """Light French stemmer: plural and feminine endings only"""
+    if len(word) > 4 and word.endswith("aux"):
+        return word[:-3] + "al"
+    if len(word) > 3 and word[-1] in "sx":
+        word = word[:-1]
+    if len(word) > 4 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def analyze(text: str) -> List[str]:
+    """Fold, tokenize, drop stopwords and stem"""
+    return [light_stem(token) for token in TOKEN_PATTERN.findall(fold_text(text))
+            if token not in FRENCH_STOPWORDS]
+
+
+class PostingList:
+    """
+    Postings of one term: delta-encoded doc numbers and weighted term frequencies
+    Doc numbers only grow, so new documents are appended without re-encoding
+    """
+
+    __slots__ = ("gaps", "tfs", "last_doc")
+
+    def __init__(self):
+        self.gaps = array("I")
+        self.tfs = array("f")
+        self.last_doc = 0
+
+    def append(self, doc: int, tf: float):
+        self.gaps.append(doc - self.last_doc)
+        self.tfs.append(tf)
+        self.last_doc = doc
+
+    def __iter__(self):
+        doc = 0
+        for gap, tf in zip(self.gaps, self.tfs):
+            doc += gap
+            yield doc, tf
+
+    def __len__(self):
+        return len(self.gaps)
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index with incremental updates
+    Removed documents are tombstoned and dropped by compact()
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self.postings: Dict[str, PostingList] = {}
+        self.doc_keys = array("i")       # doc number -> external key
+        self.doc_lengths = array("f")    # doc number -> weighted length
+        self.doc_of: Dict[int, int] = {}
+        self.deleted: Set[int] = set()
+        self.total_length = 0.0
+
+    @property
+    def doc_count(self) -> int:
+        return len(self.doc_keys) - len(self.deleted)
+
+    def add_document(self, key: int, fields: Dict[str, Tuple[str, float]]):
+        """Index a document given {field: (text, weight)}"""
+        if key in self.doc_of:
+            self.remove_document(key)
+
+        term_freqs: Dict[str, float] = {}
+        length = 0.0
+        for text, weight in fields.values():
+            for term in analyze(text):
+                term_freqs[term] = term_freqs.get(term, 0.0) + weight
+                length += weight
+
+        doc = len(self.doc_keys)
+        self.doc_keys.append(key)
+        self.doc_lengths.append(length)
+        self.doc_of[key] = doc
+        self.total_length += length
+
+        for term, tf in term_freqs.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = PostingList()
+            posting.append(doc, tf)
+
+    def remove_document(self, key: int):
+        """Tombstone a document, compacting when too many are dead"""
+        doc = self.doc_of.pop(key, None)
+        if doc is None:
+            return
+        self.deleted.add(doc)
+        self.total_length -= self.doc_lengths[doc]
+
+        if len(self.deleted) > 32 and len(self.deleted) * 4 > len(self.doc_keys):
+            self.compact()
+
+    def compact(self):
+        """Rebuild postings without tombstoned documents"""
+        renumber: Dict[int, int] = {}
+        doc_keys = array("i")
+        doc_lengths = array("f")
+        for doc, key in enumerate(self.doc_keys):
+            if doc not in self.deleted:
+                renumber[doc] = len(doc_keys)
+                doc_keys.append(key)
+                doc_lengths.append(self.doc_lengths[doc])
+
+        postings: Dict[str, PostingList] = {}
+        for term, posting in self.postings.items():
+            compacted = PostingList()
+            for doc, tf in posting:
+                if doc in renumber:
+                    compacted.append(renumber[doc], tf)
+            if len(compacted):
+                postings[term] = compacted
+
+        self.postings = postings
+        self.doc_keys = doc_keys
+        self.doc_lengths = doc_lengths
+        self.doc_of = {key: doc for doc, key in enumerate(doc_keys)}
+        self.deleted = set()
+
+    def idf(self, posting: PostingList) -> float:
+        n = self.doc_count
+        df = len(posting)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Top-k (key, score) pairs for a free-text query
+        Terms are scored by decreasing upper bound; once the remaining terms
+        cannot lift a new document above the current k-th score, they only
+        update documents that are already candidates (max-score early termination)
+        """
+        if not self.doc_count or k <= 0:
+            return []
+
+        terms = []
+        for term in set(analyze(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                idf = self.idf(posting)
+                terms.append((idf * (self.k1 + 1.0), idf, posting))
+        if not terms:
+            return []
+
+        terms.sort(key=lambda item: item[0], reverse=True)
+        remaining_bound = sum(bound for bound, _, _ in terms)
+
+        avg_length = self.total_length / self.doc_count or 1.0
+        k1, b = self.k1, self.b
+        lengths = self.doc_lengths
+        deleted = self.deleted
+        scores: Dict[int, float] = {}
+        threshold = 0.0
+
+        for bound, idf, posting in terms:
+            accept_new = remaining_bound > threshold
+            for doc, tf in posting:
+                if doc in deleted:
+                    continue
+                current = scores.get(doc)
+                if current is None and not accept_new:
+                    continue
+                norm = k1 * (1.0 - b + b * lengths[doc] / avg_length)
+                scores[doc] = (current or 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+
+            remaining_bound -= bound
+            if len(scores) >= k:
+                threshold = heapq.nlargest(k, scores.values())[-1]
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.doc_keys[doc], score) for doc, score in best]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        postings = sum(len(p) for p in self.postings.values())
+        return {
+            "documents": self.doc_count,
+            "terms": len(self.postings),
+            "postings": postings,
+            "tombstones": len(self.deleted),
+            "bytes": postings * 8 + len(self.doc_keys) * 8
+        }
+
+
+class ProductTextIndex:
+    """BM25 index over the product catalog, kept in sync with catalog changes"""
+
+    def __init__(self, database: ProductDatabase):
+        self.database = database
+        self.index: Optional[BM25Index] = None
+        database.add_change_listener(self.on_catalog_change)
+
+    def product_fields(self, product: Dict[str, Any]) -> Dict[str, Tuple[str, float]]:
+        return {
+            "name": (product["name"], FIELD_WEIGHTS["name"]),
+            "description": (product["description"], FIELD_WEIGHTS["description"]),
+            "tags": (" ".join(product["tags"]), FIELD_WEIGHTS["tags"])
+        }
+
+    def build(self) -> BM25Index:
+        """Index the whole catalog, or load the index of the same catalog from the startup cache"""
+        def build_index() -> BM25Index:
+            index = BM25Index()
+            for product in self.database.get_all_products():
+                index.add_document(product["id"], self.product_fields(product))
+            return index
+
+        key = digest(FIELD_WEIGHTS, self.database.catalog_fingerprint(),
+                     source_digest("text_normalizer", __name__))
+        self.index = index = startup_cache.cached("product_text_index", key, build_index)
+        return index
+
+    def on_catalog_change(self, action: str, product_id: int):
+        """Incrementally update the index when a product changes"""
+        if self.index is None:
+            return
+        if action == "reload":
+            self.index = None
+        elif action == "remove":
+            self.index.remove_document(product_id)
+        else:
+            product = self.database.get_product_by_id(product_id)
+            if product is not None:
+                self.index.add_document(product_id, self.product_fields(product))
+
+    def ensure_built(self) -> BM25Index:
+        """The index, built on first use (a racing second build only replaces it with an equal one)"""
+        index = self.index
+        if index is None:
+            index = self.build()
+        return index
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[int, float]]:
+        """Top-k (product id, score) pairs"""
+        return self.ensure_built().search(query, k)
+
+    def relative_scores(self, query: Optional[str], k: int = 50) -> Dict[int, float]:
+        """Scores of the best matches divided by the top score, in [0, 1]"""
+        if not query:
+            return {}
+        hits = self.search(query, k)
+        if not hits:
+            return {}
+        top = hits[0][1]
+        return {product_id: score / top for product_id, score in hits}
+
+    def get_stats(self) -> Dict[str, Any]:
+        if self.index is None:
+            return {"built": False}
+        return {"built": True, **self.index.get_stats()}
+
+
+# Global instance (built lazily on first query)
+product_text_index = ProductTextIndex(product_db)
@@ -0,0 +1,313 @@
+"""
+Unknown Query Mining
+Streams unknown_queries, groups near-duplicate messages with MinHash/LSH and
+proposes new intent keywords as a patch for intent_definitions.json
+Usage: python unknown_query_miner.py [db_path] [--output patch.json] [--min-frequency N]
+"""
+
+import hashlib
+import json
+import math
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+from fuzzy_matcher import COMMON_FRENCH_WORDS
+from intent_scorer import IntentScorer, IntentSnapshot, intent_scorer
+from text_normalizer import fold_text, collapse_whitespace
+from text_search import FRENCH_STOPWORDS, TOKEN_PATTERN
+
+# blake2b digests are at most 64 bytes, i.e. 32 16-bit hash values
+MAX_PERMUTATIONS = 32
+
+# Words that never make useful intent keywords (already accent-folded)
+IGNORED_WORDS = FRENCH_STOPWORDS | {fold_text(word) for word in COMMON_FRENCH_WORDS}
+
+
+class MinHasher:
+    """
+    MinHash signatures from one keyed blake2b digest per shingle
+    The digest is split into num_perm independent 16-bit hash values and the
+    per-position minimums are taken with C-level map/zip
+    """
+
+    def __init__(self, num_perm: int = 32, seed: int = 1):
+        if not 0 < num_perm <= MAX_PERMUTATIONS:
+            raise ValueError(f"num_perm must be between 1 and {MAX_PERMUTATIONS}")
+        self.num_perm = num_perm
+        self.key = seed.to_bytes(8, "little")
+
+    def signature(self, shingles: Iterable[str]) -> Tuple[int, ...]:
+        columns = [
+            memoryview(hashlib.blake2b(shingle.encode(), digest_size=2 * self.num_perm,
+                                       key=self.key).digest()).cast("H")
+            for shingle in set(shingles)
+        ]
+        if not columns:
+            return ()
+        return tuple(map(min, zip(*columns)))
+
+
+def estimated_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    if not first or len(first) != len(second):
+        return 0.0
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+@dataclass
+class QueryCluster:
+    """A group of near-identical unknown queries, with bounded statistics"""
+    cluster_id: int
+    signature: Tuple[int, ...]
+    band_keys: List[Tuple[int, Tuple[int, ...]]]
+    representative: str
+    representative_frequency: int = 0
+    frequency: int = 0
+    distinct: int = 0
+    token_counts: Dict[str, int] = field(default_factory=dict)
+    samples: List[str] = field(default_factory=list)
+
+
+class UnknownQueryMiner:
+    """
+    Streaming near-duplicate clustering of unknown queries
+    Each message is folded like the intent scorer does, shingled into words
+    and word pairs and MinHashed. LSH bands find candidate clusters in
+    O(bands); memory is bounded by max_clusters and by bucket and per-cluster
+    caps, and the least frequent clusters are evicted when the limit is reached.
+    """
+
+    def __init__(self, scorer: Optional[IntentScorer] = None, num_perm: int = 32, bands: int = 16,
+                 cluster_threshold: float = 0.5, duplicate_threshold: float = 0.8,
+                 max_clusters: int = 5000, max_tokens_per_cluster: int = 40,
+                 max_samples: int = 3, max_vocabulary: int = 100000, max_bucket_size: int = 32):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.scorer = scorer or intent_scorer
+        self.snapshot: IntentSnapshot = self.scorer.snapshot
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.cluster_threshold = cluster_threshold
+        self.duplicate_threshold = duplicate_threshold
+        self.max_clusters = max_clusters
+        self.max_tokens_per_cluster = max_tokens_per_cluster
+        self.max_samples = max_samples
+        self.max_vocabulary = max_vocabulary
+        self.max_bucket_size = max_bucket_size
+
+        self.clusters: Dict[int, QueryCluster] = {}
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self.token_document_frequency: Dict[str, int] = {}
+        self.next_cluster_id = 0
+        self.messages_seen = 0
+        self.duplicates = 0
+        self.evicted = 0
+
+    def tokens(self, message: str) -> List[str]:
+        """
+        Content words of a folded and rewritten message
+        Typo correction is skipped on purpose: it maps words the definitions do
+        not know yet ("frais" -> "fais") onto known ones, which is exactly the
+        vocabulary being mined. Once added as keywords they are no longer corrected.
+        """
+        normalized = self.snapshot.phrase_rewriter.rewrite(collapse_whitespace(fold_text(message)))
+        return [token for token in TOKEN_PATTERN.findall(normalized)
+                if len(token) > 2 and token not in IGNORED_WORDS and not token.isdigit()]
+
+    def add(self, message: str, frequency: int = 1):
+        """Cluster one unknown query"""
+        tokens = self.tokens(message)
+        if not tokens:
+            return
+        self.messages_seen += 1
+
+        shingles = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        signature = self.hasher.signature(shingles)
+        band_keys = [
+            (band, signature[band * self.rows_per_band:(band + 1) * self.rows_per_band])
+            for band in range(self.bands)
+        ]
+
+        candidates = set()
+        for key in band_keys:
+            candidates.update(self.buckets.get(key, ()))
+        best, best_similarity = None, 0.0
+        for cluster_id in candidates:
+            similarity = estimated_similarity(signature, self.clusters[cluster_id].signature)
+            if similarity > best_similarity:
+                best, best_similarity = self.clusters[cluster_id], similarity
+
+        if best is None or best_similarity < self.cluster_threshold:
+            best = self._new_cluster(signature, band_keys, message)
+
+        best.frequency += frequency
+        if best_similarity >= self.duplicate_threshold:
+            self.duplicates += 1
+        else:
+            best.distinct += 1
+            if len(best.samples) < self.max_samples and message not in best.samples:
+                best.samples.append(message)
+        if frequency > best.representative_frequency:
+            best.representative, best.representative_frequency = message, frequency
+
+        for token in set(tokens):
+            best.token_counts[token] = best.token_counts.get(token, 0) + frequency
+            self.token_document_frequency[token] = self.token_document_frequency.get(token, 0) + 1
+        if len(best.token_counts) > self.max_tokens_per_cluster:
+            kept = sorted(best.token_counts.items(), key=lambda item: -item[1])
+            best.token_counts = dict(kept[:self.max_tokens_per_cluster // 2])
+        if len(self.token_document_frequency) > self.max_vocabulary:
+            self.token_document_frequency = {
+                token: count for token, count in self.token_document_frequency.items() if count > 1
+            }
+
+    def _new_cluster(self, signature: Tuple[int, ...], band_keys, message: str) -> QueryCluster:
+        if len(self.clusters) >= self.max_clusters:
+            self._evict()
+        cluster = QueryCluster(self.next_cluster_id, signature, band_keys, message)
+        self.next_cluster_id += 1
+        self.clusters[cluster.cluster_id] = cluster
+        for key in band_keys:
+            members = self.buckets.setdefault(key, [])
+            members.append(cluster.cluster_id)
+            if len(members) > self.max_bucket_size:
+                # Very common bands (one frequent word) only keep recent clusters
+                del members[0]
+        return cluster
+
+    def _evict(self):
+        """Drop the least frequent tenth of the clusters (amortized O(1) per insert)"""
+        ordered = sorted(self.clusters.values(), key=lambda cluster: cluster.frequency)
+        for cluster in ordered[:max(1, len(ordered) // 10)]:
+            for key in cluster.band_keys:
+                members = self.buckets.get(key)
+                if members is not None and cluster.cluster_id in members:
+                    members.remove(cluster.cluster_id)
+                    if not members:
+                        del self.buckets[key]
+            del self.clusters[cluster.cluster_id]
+            self.evicted += 1
+
+    def process(self, rows: Iterable[Tuple[str, int]]) -> "UnknownQueryMiner":
+        """Consume (message, frequency) rows, e.g. ConversationMemory.iter_unknown_queries()"""
+        for message, frequency in rows:
+            self.add(message, frequency)
+        return self
+
+    def top_clusters(self, limit: int = 20, min_frequency: int = 1) -> List[QueryCluster]:
+        clusters = [c for c in self.clusters.values() if c.frequency >= min_frequency]
+        clusters.sort(key=lambda cluster: (-cluster.frequency, cluster.cluster_id))
+        return clusters[:limit]
+
+    def extract_keywords(self, cluster: QueryCluster, max_keywords: int = 6) -> Dict[str, float]:
+        """
+        Candidate keywords of a cluster weighted by tf-idf, scaled to the
+        0.5-1.0 range used by intent_definitions
+        """
+        documents = max(self.messages_seen, 1)
+        scores = {
+            token: (count / cluster.frequency) * math.log(1.0 + documents / self.token_document_frequency.get(token, 1))
+            for token, count in cluster.token_counts.items()
+        }
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:max_keywords]
+        if not best:
+            return {}
+        top = best[0][1] or 1.0
+        return {token: round(0.5 + 0.5 * score / top, 2) for token, score in best}
+
+    def target_intent(self, cluster: QueryCluster) -> Optional[str]:
+        """Closest existing intent (below its threshold, since the query was unknown)"""
+        best_intent, best_confidence = None, 0.0
+        for intent in self.snapshot.intent_definitions:
+            score = self.scorer.score_intent(cluster.representative, intent, self.snapshot)
+            if score.confidence > best_confidence:
+                best_intent, best_confidence = intent, score.confidence
+        return best_intent
+
+    def propose_patch(self, min_frequency: int = 2, limit: int = 20) -> Dict[str, Any]:
+        """Patch for intent_definitions.json: keywords to add and new intents"""
+        add_keywords: Dict[str, Dict[str, float]] = {}
+        new_intents: Dict[str, Dict[str, Any]] = {}
+        clusters = []
+
+        for cluster in self.top_clusters(limit, min_frequency):
+            keywords = self.extract_keywords(cluster)
+            intent = self.target_intent(cluster)
+            if intent is not None:
+                existing = self.snapshot.intent_definitions[intent]["keywords"]
+                keywords = {k: w for k, w in keywords.items() if k not in existing}
+                if keywords:
+                    add_keywords.setdefault(intent, {}).update(keywords)
+            elif keywords:
+                intent = f"candidate_{next(iter(keywords))}"
+                new_intents[intent] = {"keywords": keywords, "threshold": 0.6}
+
+            clusters.append({
+                "representative": cluster.representative,
+                "frequency": cluster.frequency,
+                "distinct_messages": cluster.distinct,
+                "samples": cluster.samples,
+                "target_intent": intent,
+                "keywords": keywords
+            })
+
+        return {
+            "base_version": self.snapshot.version,
+            "proposed_version": self.snapshot.version + 1,
+            "add_keywords": add_keywords,
+            "new_intents": new_intents,
+            "clusters": clusters
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "messages": self.messages_seen,
+            "near_duplicates": self.duplicates,
+            "clusters": len(self.clusters),
+            "evicted_clusters": self.evicted,
+            "buckets": len(self.buckets),
+            "vocabulary": len(self.token_document_frequency)
+        }
+
+
+def apply_patch(document: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of a definitions document with a mined patch applied"""
+    patched = json.loads(json.dumps(document))
+    for intent, keywords in patch["add_keywords"].items():
+        current = patched["intents"][intent]["keywords"]
+        for keyword, weight in keywords.items():
+            current.setdefault(keyword, weight)
+    for intent, definition in patch["new_intents"].items():
+        patched["intents"].setdefault(intent, definition)
+    patched["version"] = max(int(patched["version"]), int(patch["proposed_version"]))
+    return patched
+
+
+if __name__ == "__main__":
+    from conversation_memory import ConversationMemory
+
+    args = sys.argv[1:]
+    options = {"--output": None, "--min-frequency": "2"}
+    for option in list(options):
+        if option in args:
+            position = args.index(option)
+            options[option] = args[position + 1]
+            del args[position:position + 2]
+    db_path = args[0] if args else "chatbot_memory.db"
+
+    memory = ConversationMemory(db_path=None)
+    memory.db_path = db_path
+    miner = UnknownQueryMiner().process(memory.iter_unknown_queries())
+    patch = miner.propose_patch(min_frequency=int(options["--min-frequency"]))
+
+    print(f"🔍 {miner.get_stats()}")
+    for cluster in patch["clusters"]:
+        print(f"   [{cluster['frequency']:>4}] {cluster['representative']!r} -> "
+              f"{cluster['target_intent']}: {cluster['keywords']}")
+
+    if options["--output"]:
+        with open(options["--output"], "w", encoding="utf-8") as handle:
+            json.dump(patch, handle, ensure_ascii=False, indent=2)
+        print(f"💾 Patch written to {options['--output']}")